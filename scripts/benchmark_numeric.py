@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк колоночного разбора свечей (adapters.numeric) против поэлементного float(x.value).
+
+Использование:
+    python scripts/benchmark_numeric.py
+"""
+
+import itertools
+import sys
+import time
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "mcp-server"))
+
+from adapters.models import Bar, BarsResponse  # noqa: E402
+from adapters.numeric import BarColumns  # noqa: E402
+
+
+def benchmark(n_bars: int = 50_000, repeats: int = 3):
+    """Сравнение колоночного разбора с поэлементным float(x.value)."""
+    rng = np.random.default_rng(0)
+    closes = 100 + np.cumsum(rng.normal(0, 0.5, n_bars))
+    start = np.datetime64("2024-01-01T00:00:00", "s")
+    payload = [
+        {
+            "timestamp": str(start + np.timedelta64(i * 60, "s")) + "Z",
+            "open": {"value": f"{price:.2f}"},
+            "high": {"value": f"{price + 0.5:.2f}"},
+            "low": {"value": f"{price - 0.5:.2f}"},
+            "close": {"value": f"{price:.2f}"},
+            "volume": {"value": str(int(rng.integers(1, 10_000)))},
+        }
+        for i, price in enumerate(closes)
+    ]
+    bars = BarsResponse(symbol="BENCH@MISX", bars=payload).bars
+
+    def typical_price_loop(items: Sequence[Bar]) -> float:
+        total = 0.0
+        for bar in items:
+            total += (float(bar.high.value) + float(bar.low.value) + float(bar.close.value)) / 3
+        return total / len(items)
+
+    def typical_price_columns(columns: BarColumns) -> float:
+        return float(np.mean((columns.high + columns.low + columns.close) / 3))
+
+    def best_of(func) -> float:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    columns = BarColumns.from_bars(bars)
+    results = {
+        "JSON -> BarsResponse -> цикл float(x.value)": best_of(
+            lambda: typical_price_loop(BarsResponse(symbol="BENCH@MISX", bars=payload).bars)
+        ),
+        "JSON -> BarColumns.from_json -> NumPy": best_of(lambda: typical_price_columns(BarColumns.from_json(payload))),
+        "модели Bar -> цикл float(x.value)": best_of(lambda: typical_price_loop(bars)),
+        "модели Bar -> BarColumns.from_bars -> NumPy": best_of(lambda: typical_price_columns(BarColumns.from_bars(bars))),
+        "модели Bar -> BarColumns.from_bars (scale=2)": best_of(lambda: BarColumns.from_bars(bars, scale=2)),
+        "повторный расчет по готовым колонкам": best_of(lambda: typical_price_columns(columns)),
+        "обратно в модели, первые 500 свечей": best_of(lambda: list(itertools.islice(columns.iter_bars(2), 500))),
+    }
+    print(f"Бенчмарк на {n_bars} свечах (typical price), лучшее из {repeats} запусков:")
+    for name, seconds in results.items():
+        print(f"  {name:<50} {seconds * 1000:10.2f} мс")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -4,13 +4,88 @@ Streamlit веб-интерфейс для AI ассистента трейде
 """
 
 import asyncio
+import base64
 import json
+import re
 
 import httpx
+import pandas as pd
+import plotly.graph_objects as go
 import streamlit as st
 from typing import Optional
 from contextlib import asynccontextmanager
 
+# Маркер места графика в ответе агента
+CHART_MARKER = re.compile(r"\[\[chart:([0-9a-f]+)\]\]")
+
+
+def decode_chart(chart: dict) -> dict:
+    """Arrow IPC stream (base64) -> словарь графика с колонками; JSON-графики возвращаются как есть"""
+    if chart.get("encoding") != "arrow":
+        return chart
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(base64.b64decode(chart["data"])).read_all()
+    header = json.loads(table.schema.metadata[b"chart"])
+    return {**header, "columns": table.to_pydict()}
+
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def build_figure(chart_id: str, _chart: dict):
+    """Фигура plotly (или таблица) по данным графика. Кэш по chart_id: при перезапусках скрипта фигуры не пересобираются"""
+    chart = decode_chart(_chart)
+    kind, columns, meta = chart["kind"], chart["columns"], chart.get("meta", {})
+    if kind == "table":
+        return pd.DataFrame(columns)
+
+    x = pd.to_datetime(columns[meta["x"]], unit="ms") if "x" in meta else None
+    if kind == "candles":
+        figure = go.Figure(go.Candlestick(
+            x=x, open=columns["open"], high=columns["high"], low=columns["low"], close=columns["close"],
+            name=meta.get("symbol"),
+        ))
+        figure.update_layout(xaxis_rangeslider_visible=False)
+    elif kind == "line":
+        figure = go.Figure([
+            go.Scatter(x=x, y=columns[name], mode="lines", name=label)
+            for name, label in meta.get("series", {}).items()
+        ])
+    elif kind == "sunburst":
+        colors = [0 if value is None else value for value in columns.get(meta.get("color"), [])]
+        figure = go.Figure(go.Sunburst(
+            ids=columns["ids"], labels=columns["labels"], parents=columns["parents"], values=columns["values"],
+            branchvalues=meta.get("branchvalues", "total"),
+            marker=dict(colors=colors, colorscale="RdYlGn", cmid=0) if colors else None,
+        ))
+    else:
+        return None
+    figure.update_layout(title=chart["title"], height=420, margin=dict(l=10, r=10, t=40, b=10))
+    return figure
+
+
+def render_chart(chart: dict, key: str) -> None:
+    """Отрисовка графика ответа"""
+    figure = build_figure(chart["chart_id"], chart)
+    if isinstance(figure, pd.DataFrame):
+        column_config = {}
+        if "sparkline" in figure:
+            column_config["sparkline"] = st.column_config.LineChartColumn("Динамика", width="medium")
+        st.dataframe(figure, column_config=column_config, hide_index=True, use_container_width=True, key=key)
+    elif figure is not None:
+        st.plotly_chart(figure, use_container_width=True, key=key)
+
+
+def render_message(content: str, charts: list, key: str) -> None:
+    """Текст ответа с графиками на местах маркеров [[chart:<id>]]"""
+    charts_by_id = {chart["chart_id"]: chart for chart in charts}
+    # После split с группой: четные элементы - текст, нечетные - chart_id
+    for i, part in enumerate(CHART_MARKER.split(content)):
+        if i % 2 == 0:
+            if part.strip():
+                st.markdown(part)
+        elif part in charts_by_id:
+            render_chart(charts_by_id.pop(part), f"{key}-{i}")
+
 
 async def main() -> None:
     """Главная функция Streamlit приложения"""
@@ -67,9 +142,9 @@ async def main() -> None:
         st.session_state.messages = []
 
     # Отображение истории сообщений
-    for message in st.session_state.messages:
+    for index, message in enumerate(st.session_state.messages):
         with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+            render_message(message["content"], message.get("charts", []), f"message-{index}")
 
     # Обработка пользовательского ввода
     if prompt := st.chat_input("Напишите ваш вопрос..."):
@@ -91,11 +166,14 @@ async def main() -> None:
                         timeout=2*60*60
                     )
                     response.raise_for_status()
-                    print(response.json())
-                    st.markdown(response.json())
-
-                # Сохраняем сообщение ассистента
-                st.session_state.messages.append({"role": "assistant", "content": response.json()})
+                    reply = response.json()
+                    # Старый формат агента - просто строка без графиков
+                    if isinstance(reply, str):
+                        reply = {"text": reply, "charts": []}
+                    render_message(reply["text"], reply["charts"], f"message-{len(st.session_state.messages)}")
+
+                # Сохраняем сообщение ассистента вместе с данными графиков
+                st.session_state.messages.append({"role": "assistant", "content": reply["text"], "charts": reply["charts"]})
                 
             except Exception as e:
                 error_msg = f"❌ Ошибка при получении ответа: {e}"
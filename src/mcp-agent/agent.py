@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from mcp_agent.app import MCPApp
 from mcp_agent.agents.agent import Agent
 from mcp_agent.workflows.llm.augmented_llm_openai import OpenAIAugmentedLLM
@@ -6,26 +6,73 @@ from mcp_agent.workflows.llm.augmented_llm import RequestParams
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+import asyncio
+import base64
 import logging
+import os
+import re
+
+import httpx
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Базовый адрес MCP сервера для HTTP-маршрутов помимо /mcp (данные графиков)
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://mcp-server2:8000")
+# json - колонки как есть, arrow - Arrow IPC stream в base64 (если на сервере установлен pyarrow)
+CHART_FORMAT = os.getenv("CHART_FORMAT", "json")
+CHART_MARKER = re.compile(r"\[\[chart:([0-9a-f]+)\]\]")
+
+app = FastAPI()
+
 class PromptRequest(BaseModel):
     prompt: str
 
+class GenerateResponse(BaseModel):
+    text: str = Field(description="Ответ модели; маркеры [[chart:<id>]] отмечают места графиков")
+    charts: List[Dict[str, Any]] = Field(default_factory=list, description="Данные графиков, упомянутых в ответе")
+
+
+async def fetch_chart(client: httpx.AsyncClient, chart_id: str) -> Optional[Dict[str, Any]]:
+    """Данные графика с MCP сервера. Arrow запрашивается только при CHART_FORMAT=arrow, при отказе - JSON."""
+    url = f"{MCP_SERVER_URL}/charts/{chart_id}"
+    try:
+        if CHART_FORMAT == "arrow":
+            response = await client.get(url, params={"format": "arrow"})
+            if response.status_code == 200:
+                return {"chart_id": chart_id, "encoding": "arrow", "data": base64.b64encode(response.content).decode("ascii")}
+        response = await client.get(url)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        logging.warning(f"Не удалось получить график {chart_id}: {e}")
+        return None
+
+
+async def collect_charts(text: str) -> List[Dict[str, Any]]:
+    """Графики по маркерам [[chart:<id>]] из ответа модели, в порядке упоминания."""
+    chart_ids = list(dict.fromkeys(CHART_MARKER.findall(text)))
+    if not chart_ids:
+        return []
+    async with httpx.AsyncClient(timeout=30) as client:
+        charts = await asyncio.gather(*(fetch_chart(client, chart_id) for chart_id in chart_ids))
+    return [chart for chart in charts if chart is not None]
+
+
 @app.post("/generate_str")
-async def generate_str(prompt: PromptRequest) -> str:
-    app = MCPApp(name="trader_agent")
+async def generate_str(prompt: PromptRequest) -> GenerateResponse:
+    mcp_app = MCPApp(name="trader_agent")
 
-    async with app.run() as mcp_agent_app:
+    async with mcp_app.run() as mcp_agent_app:
         agent = Agent(
-            name="security_scanner",
-            instruction='''You are an AI Cybersecurity Specialist.
-            Perform security analysis using available tools (You are connected to MCP server, so, choose tools).
-            Tools can't be run as root user. 
+            name="trader_assistant",
+            instruction='''You are an AI assistant for a trader working with Finam TradeAPI.
+            Answer using available tools (You are connected to MCP server, so, choose tools).
+            Some tool responses contain chart_id. To show the chart to the user, put the marker
+            [[chart:<chart_id>]] on a separate line where the chart belongs. Do not repeat the
+            chart data as text - describe only the key numbers.
             ''',
-            server_names=["pentest_tools"]
+            server_names=["trader_tools"]
         )
 
         async with agent:
@@ -33,15 +80,14 @@ async def generate_str(prompt: PromptRequest) -> str:
                 OpenAIAugmentedLLM
             )
             llm.history = None
-            result = await llm.generate_str(prompt, params=RequestParams(
+            result = await llm.generate_str(prompt.prompt, params=RequestParams(
                         temperature=0.1,
                         max_tokens=1000
                     ))
 
-    return result
+    return GenerateResponse(text=result, charts=await collect_charts(result))
 
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
-
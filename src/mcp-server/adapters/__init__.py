@@ -1,3 +1,30 @@
+from .dispatcher import RequestDispatcher
+from .hedging import HedgePolicy
 from .finam_client import FinamApiClient
+from .trade_tape import TradeTapeStore
+from .snapshot import MarketSnapshotService
+from .bars_history import BarsHistory
+from .scanner import AssetCatalog, MarketScanner
+from .backtest import BacktestEngine
+from .jobs import JobRegistry
+from .sweep import SweepRunner
+from .portfolio import PortfolioAnalytics
+from .asset_info import AssetInfoCache
+from .rebalance import Rebalancer
+from .local_store import LocalStore
+from .history_sync import HistorySync
+from .portfolio_history import PortfolioHistory
+from .pairs import PairsFinder
+from .charts import ChartStore
+from .pretrade import PreTradeChecker
+from .latency import OrderLatencyTracker
+from .order_submissions import SubmissionLog
+from .order_router import OrderRouter
+from .order_state import OrderStateStore
+from .account_cache import AccountSnapshotCache
+from .multi_account import MultiAccountService
+from .fx import FxService, PortfolioValuation
+from .pnl import PnLEngine
+from .cashflow import CashFlowReport
 
-__all__ = ["FinamAPIClient"]
+__all__ = ["RequestDispatcher", "HedgePolicy", "FinamApiClient", "TradeTapeStore", "MarketSnapshotService", "BarsHistory", "AssetCatalog", "MarketScanner", "BacktestEngine", "JobRegistry", "SweepRunner", "PortfolioAnalytics", "AssetInfoCache", "Rebalancer", "LocalStore", "HistorySync", "PortfolioHistory", "PairsFinder", "ChartStore", "PreTradeChecker", "OrderLatencyTracker", "SubmissionLog", "OrderRouter", "OrderStateStore", "AccountSnapshotCache", "MultiAccountService", "FxService", "PortfolioValuation", "PnLEngine", "CashFlowReport"]
@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple, Union
+
+from .finam_client import FinamApiClient
+from .history_sync import HistorySync
+from .models import *
+from .order_router import OrderRouter
+from .order_state import OrderStateStore
+
+
+@dataclass
+class _Snapshot:
+    response: GetAccountResponse
+    fetched_at: float
+    generation: int
+
+
+class AccountSnapshotCache:
+    """Кэш снимков get_account по счетам с инвалидацией по торговым событиям.
+
+    Снимок моложе ttl отдается без запроса. Снимок старше ttl, но моложе stale_ttl отдается
+    сразу, а обновление идет в фоне (stale-while-revalidate); такой снимок помечается stale.
+    stale_ttl короткий: деньги и позиции не должны выглядеть текущими спустя минуты. Свои выставления и отмены заявок,
+    изменения заявок в OrderStateStore и новые сделки/транзакции из синхронизации истории
+    сразу делают снимок счета недействительным: следующее чтение ждет свежих данных.
+    """
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        router: Optional[OrderRouter] = None,
+        order_states: Optional[OrderStateStore] = None,
+        history_sync: Optional[HistorySync] = None,
+        ttl: float = 10.0,
+        stale_ttl: float = 30.0,
+    ):
+        self.api = api
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._snapshots: Dict[str, _Snapshot] = {}
+        # account_id -> (поколение, загрузка)
+        self._loading: Dict[str, Tuple[int, asyncio.Task]] = {}
+        # Поколение счета растет при каждом событии; снимок старого поколения недействителен
+        self._generations: Dict[str, int] = defaultdict(int)
+        # Сделки и транзакции приходят из потока синхронизации истории
+        self._lock = threading.Lock()
+        if router is not None:
+            router.add_listener(lambda account_id, response: self.invalidate(account_id))
+        if order_states is not None:
+            order_states.add_listener(self.invalidate)
+        if history_sync is not None:
+            for stream in HistoryStream:
+                history_sync.add_listener(stream, self._on_history)
+
+    def invalidate(self, account_id: str):
+        with self._lock:
+            self._generations[account_id] += 1
+
+    def _on_history(self, connection: sqlite3.Connection, account_id: str, items: list):
+        if items:
+            self.invalidate(account_id)
+
+    def _generation(self, account_id: str) -> int:
+        with self._lock:
+            return self._generations[account_id]
+
+    async def _load(self, account_id: str, generation: int) -> Union[GetAccountResponse, ErrorResponse]:
+        response = await self.api.get_account(GetAccountRequest(account_id=account_id))
+        current = self._snapshots.get(account_id)
+        # Если во время запроса пришло событие, снимок сохраняется со старым поколением и не считается свежим;
+        # опоздавший ответ старой загрузки не затирает более новый снимок
+        if not isinstance(response, ErrorResponse) and (current is None or current.generation <= generation):
+            self._snapshots[account_id] = _Snapshot(response, time.monotonic(), generation)
+        return response
+
+    def _refresh(self, account_id: str) -> asyncio.Task:
+        """Одна загрузка на счет и поколение: параллельные чтения и фоновое обновление ждут один запрос,
+        а чтение после события не ждет загрузку, начатую до него."""
+        generation = self._generation(account_id)
+        loading = self._loading.get(account_id)
+        if loading is not None and loading[0] == generation and not loading[1].done():
+            return loading[1]
+        task = asyncio.create_task(self._load(account_id, generation))
+        self._loading[account_id] = (generation, task)
+        return task
+
+    async def snapshot(self, account_id: str, max_age_s: Optional[float] = None) -> Tuple[Union[GetAccountResponse, ErrorResponse], AccountSource]:
+        """Снимок счета и его происхождение. С max_age_s снимок старше max_age_s (и ttl) не отдается даже как устаревший."""
+        ttl = self.ttl if max_age_s is None else min(self.ttl, max_age_s)
+        snapshot = self._snapshots.get(account_id)
+        if snapshot is not None and snapshot.generation == self._generation(account_id):
+            age = time.monotonic() - snapshot.fetched_at
+            if age <= ttl:
+                return snapshot.response, AccountSource(account_id=account_id, cached=True, age_s=round(age, 3))
+            if max_age_s is None and age <= self.stale_ttl:
+                self._refresh(account_id)
+                return snapshot.response, AccountSource(account_id=account_id, cached=True, age_s=round(age, 3), stale=True)
+        # shield: отмена одного читателя не отменяет общую загрузку
+        response = await asyncio.shield(self._refresh(account_id))
+        return response, AccountSource(account_id=account_id, cached=False, age_s=0.0)
+
+    async def get_account(self, request: GetAccountRequest) -> Union[GetAccountResponse, ErrorResponse]:
+        """Замена api.get_account с кэшем."""
+        response, _ = await self.snapshot(request.account_id)
+        return response
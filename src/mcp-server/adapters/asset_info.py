@@ -0,0 +1,94 @@
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple, Union
+
+from .cache import AsyncTTLCache
+from .finam_client import FinamApiClient
+from .models import *
+
+# Типы инструментов, у которых цена - стоимость одной штуки. У остальных (фьючерсы, опционы,
+# облигации) цена в пунктах или процентах номинала, а множителя в ответах API нет
+UNIT_PRICED_TYPES = {"EQUITIES", "FUNDS", "CURRENCIES"}
+
+
+@dataclass(frozen=True)
+class TradingSpec:
+    """Торговые ограничения инструмента из GetAssetResponse в числовом виде."""
+    symbol: str
+    lot_size: float
+    decimals: int
+    price_step: float
+
+    @classmethod
+    def from_asset(cls, symbol: str, asset: GetAssetResponse) -> "TradingSpec":
+        lot_size = float(asset.lot_size.value or 1) or 1.0
+        # Шаг цены: min_step / 10^decimals
+        price_step = float(asset.min_step or 1) / 10 ** asset.decimals
+        return cls(symbol=symbol, lot_size=lot_size, decimals=asset.decimals, price_step=price_step or 10.0 ** -asset.decimals)
+
+    def round_price(self, price: float, direction: int = 0) -> float:
+        """Цена, приведенная к шагу: direction > 0 - вверх, < 0 - вниз, 0 - к ближайшему."""
+        steps = price / self.price_step
+        # Допуск на ошибку представления: 10.2 / 0.1 = 101.99999999999999
+        steps = round(steps) if abs(steps - round(steps)) < 1e-9 else steps
+        if direction > 0:
+            steps = math.ceil(steps)
+        elif direction < 0:
+            steps = math.floor(steps)
+        else:
+            steps = round(steps)
+        return round(steps * self.price_step, self.decimals)
+
+    def format_price(self, price: float) -> str:
+        return f"{price:.{self.decimals}f}"
+
+
+class AssetInfoCache:
+    """Кэш справочной информации (get_asset) и торговых параметров (get_asset_params) по инструментам для расчетов и проверки заявок."""
+
+    def __init__(self, api: FinamApiClient, ttl: float = 6 * 60 * 60, params_ttl: float = 5 * 60, max_size: int = 4096):
+        self.api = api
+        self._assets = AsyncTTLCache(ttl=ttl, max_size=max_size)
+        # Доступность лонга/шорта и маржинальные требования меняются в течение дня, поэтому живут меньше
+        self._params = AsyncTTLCache(ttl=params_ttl, max_size=max_size)
+
+    async def get_asset(self, symbol: str, account_id: str) -> Union[GetAssetResponse, ErrorResponse]:
+        return await self._assets.get_or_load(
+            ("asset", symbol, account_id),
+            lambda: self.api.get_asset(GetAssetRequest(symbol=symbol, account_id=account_id)),
+            should_cache=lambda value: not isinstance(value, ErrorResponse),
+        )
+
+    async def get_asset_params(self, symbol: str, account_id: str) -> Union[GetAssetParamsResponse, ErrorResponse]:
+        return await self._params.get_or_load(
+            (symbol, account_id),
+            lambda: self.api.get_asset_params(GetAssetParamsRequest(symbol=symbol, account_id=account_id)),
+            should_cache=lambda value: not isinstance(value, ErrorResponse),
+        )
+
+    async def trading_spec(self, symbol: str, account_id: str) -> Union[TradingSpec, ErrorResponse]:
+        asset = await self.get_asset(symbol, account_id)
+        if isinstance(asset, ErrorResponse):
+            return asset
+        return TradingSpec.from_asset(symbol, asset)
+
+    async def trading_specs(self, symbols: Sequence[str], account_id: str) -> Dict[str, Union[TradingSpec, ErrorResponse]]:
+        specs = await asyncio.gather(*(self.trading_spec(symbol, account_id) for symbol in symbols))
+        return dict(zip(symbols, specs))
+
+    async def unit_priced(self, symbols: Sequence[str], account_id: str) -> Tuple[Dict[str, bool], List[str]]:
+        """Цена инструмента - деньги за штуку (тип из UNIT_PRICED_TYPES) или нет, и предупреждения.
+        Только для таких инструментов количество * цена - денежная сумма. Тип не известен - цена считается ценой за штуку."""
+        symbols = list(dict.fromkeys(symbols))
+        assets = await asyncio.gather(*(self.get_asset(symbol, account_id) for symbol in symbols))
+        flags, warnings = {}, []
+        for symbol, asset in zip(symbols, assets):
+            if isinstance(asset, ErrorResponse):
+                flags[symbol] = True
+                warnings.append(f"{symbol}: тип инструмента не известен ({asset.error}), цена считается ценой за штуку")
+                continue
+            flags[symbol] = asset.type.upper() in UNIT_PRICED_TYPES
+            if not flags[symbol]:
+                warnings.append(f"{symbol}: цена {asset.type} не в деньгах за штуку (пункты или % номинала), в денежные суммы не включается")
+        return flags, warnings
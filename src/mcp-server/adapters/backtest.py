@@ -0,0 +1,266 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .bars_history import DAY, NS_IN_SECOND, BarsHistory, align_series
+from .downsample import lttb_indices
+from .models import *
+from .numeric import BarColumns, format_timestamp, timestamp_column
+
+YEAR_SECONDS = 365 * DAY
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Скользящее среднее через кумулятивные суммы. Первые window - 1 значений - NaN."""
+    result = np.full(len(values), np.nan)
+    if window <= 0 or len(values) < window:
+        return result
+    sums = np.cumsum(np.insert(values, 0, 0.0))
+    result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return result
+
+
+def rolling_zscore(values: np.ndarray, window: int) -> np.ndarray:
+    """Отклонение от скользящего среднего в скользящих стандартных отклонениях."""
+    # Центрирование уменьшает потерю точности в разности E[x^2] - E[x]^2
+    centered = values - np.nanmean(values) if len(values) else values
+    mean = rolling_mean(centered, window)
+    variance = rolling_mean(centered * centered, window) - mean * mean
+    std = np.sqrt(np.maximum(variance, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(std > 0, (centered - mean) / std, np.nan)
+
+
+def _hold(enter: np.ndarray, leave: np.ndarray) -> np.ndarray:
+    """Состояние 0/1: включается на enter и держится до leave (вход приоритетнее выхода)."""
+    state = np.full(len(enter), np.nan)
+    state[leave] = 0.0
+    state[enter] = 1.0
+    valid = ~np.isnan(state)
+    last = np.maximum.accumulate(np.where(valid, np.arange(len(state)), 0)) if len(state) else np.empty(0, dtype=np.int64)
+    filled = state[last]
+    filled[~np.maximum.accumulate(valid)] = 0.0
+    return filled
+
+
+def band_positions(signal: np.ndarray, entry_level: float, exit_level: float, allow_short: bool = True) -> np.ndarray:
+    """Позиция возврата к среднему: шорт от signal >= entry_level до signal <= exit_level, лонг - зеркально.
+
+    При entry_level > |exit_level| шорт и лонг не могут быть открыты одновременно: вход в одну сторону
+    всегда удовлетворяет условию выхода из другой.
+    """
+    with np.errstate(invalid="ignore"):
+        long = _hold(signal <= -entry_level, signal >= -exit_level)
+        short = _hold(signal >= entry_level, signal <= exit_level) if allow_short else 0.0
+    return long - short
+
+
+def crossover_positions(values: np.ndarray, fast: int, slow: int, allow_short: bool = True) -> np.ndarray:
+    """Позиция по пересечению скользящих средних: лонг, пока быстрая выше медленной, иначе шорт (или вне рынка)."""
+    with np.errstate(invalid="ignore"):
+        position = np.nan_to_num(np.sign(rolling_mean(values, fast) - rolling_mean(values, slow)))
+    return position if allow_short else np.maximum(position, 0.0)
+
+
+def leg_weights(request: BacktestRequest) -> np.ndarray:
+    """Веса ног: одна нога [1] или пара [1, -hedge_ratio] (спред = первая - hedge_ratio * вторая)."""
+    return np.array([1.0, -request.hedge_ratio]) if request.second_symbol else np.array([1.0])
+
+
+def strategy_positions(request: BacktestRequest, value: np.ndarray) -> np.ndarray:
+    """Целевая позиция (-1, 0, 1) на закрытии каждой свечи по ряду value (цена или спред)."""
+    if request.strategy == StrategyType.SPREAD_THRESHOLD:
+        return band_positions(value, request.entry_threshold, request.exit_threshold, request.allow_short)
+    if request.strategy == StrategyType.ZSCORE_REVERSION:
+        zscore = rolling_zscore(value, request.lookback)
+        return band_positions(zscore, request.entry_threshold, request.exit_threshold, request.allow_short)
+    return crossover_positions(value, request.fast_window, request.slow_window, request.allow_short)
+
+
+def validate_request(request: BacktestRequest) -> Optional[ErrorResponse]:
+    if request.strategy == StrategyType.SPREAD_THRESHOLD and not request.second_symbol:
+        return ErrorResponse(status_code=-1, error="Для spread_threshold нужен second_symbol")
+    if request.strategy in (StrategyType.SPREAD_THRESHOLD, StrategyType.ZSCORE_REVERSION):
+        if request.entry_threshold <= abs(request.exit_threshold):
+            return ErrorResponse(status_code=-1, error="entry_threshold должен быть больше |exit_threshold|")
+        if request.strategy == StrategyType.ZSCORE_REVERSION and request.lookback < 2:
+            return ErrorResponse(status_code=-1, error="lookback должен быть не меньше 2")
+    if request.strategy == StrategyType.SMA_CROSS and not 0 < request.fast_window < request.slow_window:
+        return ErrorResponse(status_code=-1, error="Нужно 0 < fast_window < slow_window")
+    if request.quantity <= 0:
+        return ErrorResponse(status_code=-1, error="quantity должен быть положительным")
+    return None
+
+
+@dataclass
+class BacktestResult:
+    """Результат векторного прогона: ряды по свечам и сделки в виде массивов."""
+    timestamp: np.ndarray
+    value: np.ndarray
+    position: np.ndarray
+    pnl: np.ndarray
+    fees: np.ndarray
+    equity: np.ndarray
+    trade_entry: np.ndarray
+    trade_exit: np.ndarray
+    trade_closed: np.ndarray
+    trade_pnl: np.ndarray
+
+    def metrics(self, initial_capital: Optional[float] = None) -> Dict[str, Optional[float]]:
+        equity = self.equity
+        n = len(equity)
+        closed_pnl = self.trade_pnl[self.trade_closed]
+
+        peak = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] if n else equity
+        max_drawdown = float(np.max(peak - equity)) if n else 0.0
+        max_drawdown_pct = None
+        return_pct = None
+        if initial_capital:
+            capital_curve = initial_capital + equity
+            capital_peak = initial_capital + peak
+            max_drawdown_pct = float(np.max((capital_peak - capital_curve) / capital_peak) * 100) if n else 0.0
+            return_pct = float(equity[-1] / initial_capital * 100) if n else 0.0
+
+        sharpe = None
+        net = self.pnl - self.fees
+        if n > 2:
+            span_years = (self.timestamp[-1] - self.timestamp[0]) / NS_IN_SECOND / YEAR_SECONDS
+            std = np.std(net[1:])
+            if span_years > 0 and std > 0:
+                bars_per_year = (n - 1) / span_years
+                sharpe = float(np.mean(net[1:]) / std * np.sqrt(bars_per_year))
+
+        held = np.concatenate(([0.0], self.position[:-1])) if n else self.position
+        return {
+            "total_pnl": float(equity[-1]) if n else 0.0,
+            "return_pct": return_pct,
+            "max_drawdown": max_drawdown,
+            "max_drawdown_pct": max_drawdown_pct,
+            "trades": int(len(self.trade_pnl)),
+            "win_rate": float(np.mean(closed_pnl > 0) * 100) if len(closed_pnl) else None,
+            "avg_trade_pnl": float(np.mean(self.trade_pnl)) if len(self.trade_pnl) else None,
+            "sharpe": sharpe,
+            "exposure_pct": float(np.mean(held != 0) * 100) if n else 0.0,
+            "fees": float(np.sum(self.fees)),
+        }
+
+
+def simulate(timestamps: np.ndarray, prices: np.ndarray, request: BacktestRequest) -> BacktestResult:
+    """Векторный прогон стратегии по матрице цен закрытия (время x ноги).
+
+    Сигнал считается по закрытию свечи, сделка исполняется по той же цене закрытия,
+    позиция удерживается со следующей свечи. Комиссия берется с оборота всех ног.
+    """
+    weights = leg_weights(request)
+    value = prices @ weights
+    notional = np.abs(prices) @ np.abs(weights)
+    position = strategy_positions(request, value)
+
+    held = np.concatenate(([0.0], position[:-1]))
+    pnl = held * np.diff(value, prepend=value[:1]) * request.quantity
+    unit_fee = notional * request.quantity * request.commission_pct / 100
+    change = np.diff(position, prepend=0.0)
+    fees = np.abs(change) * unit_fee
+    equity = np.cumsum(pnl - fees)
+
+    # Сделка - отрезок постоянной ненулевой позиции: от изменения позиции до следующего изменения
+    change_idx = np.flatnonzero(change != 0)
+    entries = change_idx[position[change_idx] != 0]
+    next_change = np.searchsorted(change_idx, entries, side="right")
+    closed = next_change < len(change_idx)
+    exits = np.where(closed, change_idx[np.minimum(next_change, max(len(change_idx) - 1, 0))], len(value) - 1)
+    cum_pnl = np.cumsum(pnl)
+    trade_pnl = cum_pnl[exits] - cum_pnl[entries] - unit_fee[entries] - np.where(closed, unit_fee[exits], 0.0)
+
+    return BacktestResult(
+        timestamp=timestamps,
+        value=value,
+        position=position,
+        pnl=pnl,
+        fees=fees,
+        equity=equity,
+        trade_entry=entries,
+        trade_exit=exits,
+        trade_closed=closed,
+        trade_pnl=trade_pnl,
+    )
+
+
+def prepare_prices(series: Dict[str, BarColumns], symbols: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Цены закрытия ног на общих метках времени (только свечи, которые есть у всех ног)."""
+    timestamps, closes = align_series(series, symbols, "close")
+    complete = ~np.isnan(closes).any(axis=1) if closes.size else np.zeros(len(timestamps), dtype=bool)
+    return timestamps[complete], closes[complete]
+
+
+def request_period(request: BacktestRequest) -> Tuple[float, float]:
+    """Период бэктеста в секундах UNIX."""
+    if request.interval is not None:
+        start, end = timestamp_column([request.interval.start_time, request.interval.end_time]) / NS_IN_SECOND
+        return float(start), float(end)
+    end = time.time()
+    return end - request.days * DAY, end
+
+
+class BacktestEngine:
+    """Бэктест стратегий по историческим свечам: загрузка через BarsHistory и векторный расчет."""
+
+    def __init__(self, history: BarsHistory):
+        self.history = history
+
+    async def load_prices(self, request: BacktestRequest) -> Union[Tuple[List[str], np.ndarray, np.ndarray], ErrorResponse]:
+        symbols = [request.symbol] + ([request.second_symbol] if request.second_symbol else [])
+        start, end = request_period(request)
+        series = await self.history.load_many(symbols, request.timeframe, start, end)
+        for symbol in symbols:
+            if isinstance(series[symbol], ErrorResponse):
+                return series[symbol]
+        timestamps, prices = prepare_prices(series, symbols)
+        if len(timestamps) < 2:
+            return ErrorResponse(status_code=-1, error="Недостаточно свечей за период для бэктеста")
+        return symbols, timestamps, prices
+
+    async def run(self, request: BacktestRequest) -> Union[BacktestReport, ErrorResponse]:
+        error = validate_request(request)
+        if error is not None:
+            return error
+        loaded = await self.load_prices(request)
+        if isinstance(loaded, ErrorResponse):
+            return loaded
+        symbols, timestamps, prices = loaded
+
+        started = time.perf_counter()
+        result = simulate(timestamps, prices, request)
+        return build_report(request, symbols, result, (time.perf_counter() - started) * 1000)
+
+
+def build_report(request: BacktestRequest, symbols: List[str], result: BacktestResult, elapsed_ms: float) -> BacktestReport:
+    timestamps = result.timestamp
+    trades = [
+        BacktestTrade(
+            side="LONG" if result.position[entry] > 0 else "SHORT",
+            entry_time=format_timestamp(timestamps[entry]),
+            exit_time=format_timestamp(timestamps[exit_idx]) if closed else None,
+            entry_price=float(result.value[entry]),
+            exit_price=float(result.value[exit_idx]),
+            pnl=float(pnl),
+        )
+        for entry, exit_idx, closed, pnl in zip(result.trade_entry, result.trade_exit, result.trade_closed, result.trade_pnl)
+    ]
+    curve_idx = lttb_indices(timestamps, result.equity, request.equity_points)
+    return BacktestReport(
+        strategy=request.strategy,
+        symbols=symbols,
+        bars=len(timestamps),
+        start=format_timestamp(timestamps[0]),
+        end=format_timestamp(timestamps[-1]),
+        metrics=BacktestMetrics(**result.metrics(request.initial_capital)),
+        trades=trades[-request.max_trades:] if request.max_trades > 0 else [],
+        equity_curve=[
+            EquityPoint(timestamp=format_timestamp(timestamps[i]), equity=float(result.equity[i]))
+            for i in curve_idx
+        ],
+        elapsed_ms=elapsed_ms,
+    )
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .cache import AsyncTTLCache
+from .finam_client import FinamApiClient
+from .models import *
+from .numeric import BarColumns
+
+DAY = 24 * 60 * 60
+
+# Длина одного запроса к /bars по таймфреймам (с запасом относительно ограничений API)
+CHUNK_SECONDS = {
+    TimeFrame.TIME_FRAME_M1: 7 * DAY,
+    TimeFrame.TIME_FRAME_M5: 30 * DAY,
+    TimeFrame.TIME_FRAME_M15: 30 * DAY,
+    TimeFrame.TIME_FRAME_M30: 30 * DAY,
+    TimeFrame.TIME_FRAME_H1: 90 * DAY,
+    TimeFrame.TIME_FRAME_H2: 90 * DAY,
+    TimeFrame.TIME_FRAME_H4: 90 * DAY,
+    TimeFrame.TIME_FRAME_H8: 90 * DAY,
+    TimeFrame.TIME_FRAME_D: 365 * DAY,
+    TimeFrame.TIME_FRAME_W: 5 * 365 * DAY,
+    TimeFrame.TIME_FRAME_MN: 5 * 365 * DAY,
+    TimeFrame.TIME_FRAME_QR: 5 * 365 * DAY,
+}
+
+NS_IN_SECOND = 1_000_000_000
+
+
+def format_api_time(ts: float) -> str:
+    """Секунды UNIX -> строка интервала API (%Y-%m-%dT%H:%M:%SZ)."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def empty_bars() -> BarColumns:
+    empty_float = np.empty(0, dtype=np.float64)
+    return BarColumns(np.empty(0, dtype=np.int64), empty_float, empty_float, empty_float, empty_float, empty_float)
+
+
+def concat_bars(parts: Sequence[BarColumns]) -> BarColumns:
+    """Склейка кусков ряда с сортировкой и удалением повторов на границах кусков."""
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        return empty_bars()
+    merged = BarColumns(
+        timestamp=np.concatenate([part.timestamp for part in parts]),
+        open=np.concatenate([part.open for part in parts]),
+        high=np.concatenate([part.high for part in parts]),
+        low=np.concatenate([part.low for part in parts]),
+        close=np.concatenate([part.close for part in parts]),
+        volume=np.concatenate([part.volume for part in parts]),
+    )
+    _, unique_idx = np.unique(merged.timestamp, return_index=True)
+    return merged.take(unique_idx)
+
+
+class BarsHistory:
+    """Загрузчик исторических свечей в колоночном виде.
+
+    Период разбивается на куски фиксированной сетки (CHUNK_SECONDS), куски запрашиваются
+    параллельно с ограничением одновременных запросов и кэшируются: завершенные куски
+    надолго, текущий (еще формирующийся) - на short_ttl секунд.
+    """
+
+    def __init__(self, api: FinamApiClient, max_concurrency: int = 8, short_ttl: float = 60.0, long_ttl: float = 6 * 60 * 60, max_chunks: int = 4096):
+        self.api = api
+        self.short_ttl = short_ttl
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache = AsyncTTLCache(ttl=long_ttl, max_size=max_chunks)
+
+    async def _load_chunk(self, symbol: str, timeframe: TimeFrame, chunk_start: int, chunk_end: int) -> Union[BarColumns, ErrorResponse]:
+        now = time.time()
+        closed = chunk_end <= now
+
+        async def fetch() -> Union[BarColumns, ErrorResponse]:
+            request = BarsRequest(
+                symbol=symbol,
+                timeframe=timeframe,
+                interval=Interval(start_time=format_api_time(chunk_start), end_time=format_api_time(min(chunk_end, now))),
+            )
+            async with self._semaphore:
+                return await self.api.get_bars_columns(request)
+
+        key = (symbol, timeframe, chunk_start, closed)
+        return await self._cache.get_or_load(
+            key,
+            fetch,
+            ttl=None if closed else self.short_ttl,
+            should_cache=lambda value: not isinstance(value, ErrorResponse),
+        )
+
+    async def load(self, symbol: str, timeframe: TimeFrame, start: float, end: Optional[float] = None) -> Union[BarColumns, ErrorResponse]:
+        """Свечи инструмента за период [start, end] (секунды UNIX, end по умолчанию - текущий момент)."""
+        end = min(end or time.time(), time.time())
+        chunk = CHUNK_SECONDS.get(timeframe, 30 * DAY)
+        first = int(start // chunk) * chunk
+        chunk_starts = range(first, int(end) + 1, chunk)
+
+        parts = await asyncio.gather(*(self._load_chunk(symbol, timeframe, s, s + chunk) for s in chunk_starts))
+        for part in parts:
+            if isinstance(part, ErrorResponse):
+                return part
+
+        merged = concat_bars(parts)
+        mask = (merged.timestamp >= int(start * NS_IN_SECOND)) & (merged.timestamp <= int(end * NS_IN_SECOND))
+        return merged.take(mask)
+
+    async def load_many(self, symbols: Sequence[str], timeframe: TimeFrame, start: float, end: Optional[float] = None) -> Dict[str, Union[BarColumns, ErrorResponse]]:
+        """Параллельная загрузка свечей по списку инструментов."""
+        results = await asyncio.gather(*(self.load(symbol, timeframe, start, end) for symbol in symbols), return_exceptions=True)
+        loaded: Dict[str, Union[BarColumns, ErrorResponse]] = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Не удалось загрузить свечи {symbol}: {result}")
+                result = ErrorResponse(status_code=-1, error=str(result))
+            loaded[symbol] = result
+        return loaded
+
+
+def align_series(series: Dict[str, BarColumns], symbols: Optional[Sequence[str]] = None, field: str = "close") -> Tuple[np.ndarray, np.ndarray]:
+    """Матрица значений поля свечей (время x инструменты) на общей временной сетке. Пропуски -> NaN."""
+    symbols = list(symbols) if symbols is not None else list(series)
+    if not symbols:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+    timestamps = np.unique(np.concatenate([series[symbol].timestamp for symbol in symbols]))
+    matrix = np.full((len(timestamps), len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        columns = series[symbol]
+        matrix[np.searchsorted(timestamps, columns.timestamp), j] = getattr(columns, field)
+    return timestamps, matrix
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Заполнение пропусков (NaN) предыдущим известным значением по оси времени (ось 0)."""
+    if not matrix.size:
+        return matrix
+    valid = ~np.isnan(matrix)
+    index = np.where(valid, np.arange(matrix.shape[0])[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = matrix[index, np.arange(matrix.shape[1])]
+    # До первого известного значения остается NaN
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
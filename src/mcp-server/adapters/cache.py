@@ -0,0 +1,74 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class AsyncTTLCache:
+    """LRU-кэш с временем жизни записей и объединением одновременных загрузок одного ключа."""
+
+    def __init__(self, ttl: float, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Значение из кэша или None, если записи нет или она устарела."""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._items[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        should_cache: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """Значение из кэша или результат loader(). Параллельные запросы одного ключа ждут одну загрузку.
+
+        Загрузка идет в отдельной задаче: отмена любого из ожидающих, в том числе начавшего загрузку,
+        не отменяет ее для остальных.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        pending = self._loading.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load(key, loader, ttl, should_cache))
+            # Если все ожидающие отменены, ошибку загрузки никто не заберет - забираем сами, чтобы не было предупреждения
+            pending.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self._loading[key] = pending
+        return await asyncio.shield(pending)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float], should_cache: Callable[[Any], bool]) -> Any:
+        try:
+            value = await loader()
+        finally:
+            self._loading.pop(key, None)
+        if should_cache(value):
+            self.set(key, value, ttl)
+        return value
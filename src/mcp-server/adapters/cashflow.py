@@ -0,0 +1,199 @@
+import logging
+import sqlite3
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from .history_sync import NS_IN_DAY, HistorySync, date_range_ns
+from .local_store import LocalStore, count_transactions
+from .models import *
+from .numeric import format_timestamp, money_column, timestamp_column
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cashflow_daily (
+    account_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    amount REAL NOT NULL,
+    inflow REAL NOT NULL,
+    outflow REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (account_id, day, category, currency, symbol)
+);
+"""
+
+
+def apply_cashflows(connection: sqlite3.Connection, account_id: str, transactions: Sequence[Transaction]):
+    """Добавление новых транзакций в дневные итоги по категории, валюте и инструменту."""
+    if not transactions:
+        return
+    days = (timestamp_column([transaction.timestamp for transaction in transactions]) // NS_IN_DAY).tolist()
+    amounts = money_column([transaction.change for transaction in transactions]).tolist()
+    totals: Dict[Tuple[int, str, str, str], List[float]] = {}
+    for transaction, day, amount in zip(transactions, days, amounts):
+        key = (day, transaction.transaction_category.value, transaction.change.currency_code, transaction.symbol)
+        item = totals.setdefault(key, [0.0, 0.0, 0.0, 0])
+        item[0] += amount
+        item[1] += max(amount, 0.0)
+        item[2] += max(-amount, 0.0)
+        item[3] += 1
+    connection.executemany(
+        """INSERT INTO cashflow_daily (account_id, day, category, currency, symbol, amount, inflow, outflow, count)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (account_id, day, category, currency, symbol) DO UPDATE SET
+           amount = amount + excluded.amount, inflow = inflow + excluded.inflow,
+           outflow = outflow + excluded.outflow, count = count + excluded.count""",
+        [(account_id, *key, *item) for key, item in totals.items()],
+    )
+
+
+def ensure_consistent(connection: sqlite3.Connection, account_id: str) -> bool:
+    """Пересборка итогов счета из сохраненных транзакций, если часть из них в итоги не попала
+    (сохранены до подключения сводки)."""
+    counted = connection.execute("SELECT COALESCE(SUM(count), 0) FROM cashflow_daily WHERE account_id = ?", (account_id,)).fetchone()[0]
+    if counted == count_transactions(connection, account_id):
+        return False
+    connection.execute("DELETE FROM cashflow_daily WHERE account_id = ?", (account_id,))
+    connection.execute(
+        """INSERT INTO cashflow_daily (account_id, day, category, currency, symbol, amount, inflow, outflow, count)
+           SELECT account_id, timestamp / ?, category, currency, symbol,
+                  SUM(amount), SUM(MAX(amount, 0)), SUM(MAX(-amount, 0)), COUNT(*)
+           FROM transactions WHERE account_id = ?
+           GROUP BY account_id, timestamp / ?, category, currency, symbol""",
+        (NS_IN_DAY, account_id, NS_IN_DAY),
+    )
+    return True
+
+
+def period_starts(days: np.ndarray, period: CashFlowPeriod) -> np.ndarray:
+    """Первый день периода (дни от эпохи) для каждого дня: неделя с понедельника, календарный месяц."""
+    if period == CashFlowPeriod.DAY:
+        return days
+    if period == CashFlowPeriod.WEEK:
+        # 1970-01-01 - четверг
+        return days - (days + 3) % 7
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+
+def _day_to_date(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+class CashFlowReport:
+    """Сводка денежных потоков счета по категориям транзакций, валютам и периодам.
+
+    Каждая новая транзакция из HistorySync при сохранении добавляется в дневные итоги
+    (категория, валюта, инструмент), поэтому отчет за год читает сотни строк итогов вместо
+    тысяч транзакций, а повторные вызовы догружают только хвост истории. Недели и месяцы
+    собираются из дневных итогов векторно.
+    """
+
+    def __init__(self, store: LocalStore, history_sync: HistorySync):
+        self.store = store
+        self.history_sync = history_sync
+        self.store.register_schema(SCHEMA)
+        history_sync.add_listener(HistoryStream.TRANSACTIONS, apply_cashflows)
+
+    async def report(self, request: CashFlowRequest) -> Union[CashFlowResponse, ErrorResponse]:
+        period = date_range_ns(request.start_date, request.end_date)
+        if isinstance(period, ErrorResponse):
+            return period
+        start_ns, end_ns = period
+        warnings: List[str] = []
+        synced = await self.history_sync.sync(request.account_id, HistoryStream.TRANSACTIONS, start_ns)
+        if isinstance(synced, ErrorResponse):
+            # Отдаем то, что уже есть локально: ошибка API не должна скрывать сохраненную историю
+            warnings.append(f"Не удалось догрузить транзакции, сводка по сохраненным данным: {synced.error}")
+            logging.warning(f"Денежные потоки {request.account_id}: {synced.error}")
+
+        conditions = ["account_id = ?", "day BETWEEN ? AND ?"]
+        params: list = [request.account_id, start_ns // NS_IN_DAY, end_ns // NS_IN_DAY]
+        if request.categories:
+            conditions.append(f"category IN ({', '.join('?' * len(request.categories))})")
+            params.extend(category.value for category in request.categories)
+        if request.currency:
+            conditions.append("currency = ?")
+            params.append(request.currency)
+        if request.symbol:
+            conditions.append("symbol = ?")
+            params.append(request.symbol)
+        query = f"SELECT day, category, currency, amount, inflow, outflow, count FROM cashflow_daily WHERE {' AND '.join(conditions)}"
+
+        def load(connection: sqlite3.Connection):
+            if ensure_consistent(connection, request.account_id):
+                logging.info(f"Денежные потоки {request.account_id}: итоги пересобраны по сохраненным транзакциям")
+            return connection.execute(query, params).fetchall()
+
+        rows = await self.store.run(load)
+        response = CashFlowResponse(
+            account_id=request.account_id,
+            period_from=format_timestamp(start_ns),
+            period_to=format_timestamp(end_ns),
+            period=request.period,
+            totals=[],
+            net=[],
+            new_transactions=0 if isinstance(synced, ErrorResponse) else synced.new_items,
+            warnings=warnings,
+        )
+        if not rows:
+            return response
+
+        days = np.array([row[0] for row in rows], dtype=np.int64)
+        values = np.array([row[3:6] for row in rows], dtype=np.float64)
+        counts = np.array([row[6] for row in rows], dtype=np.int64)
+        # Группа - пара (категория, валюта)
+        labels, group = np.unique(np.array([f"{row[1]}|{row[2]}" for row in rows]), return_inverse=True)
+        group = group.reshape(-1)
+        keys = [tuple(label.split("|", 1)) for label in labels.tolist()]
+
+        totals = np.zeros((len(keys), 3))
+        np.add.at(totals, group, values)
+        total_counts = np.bincount(group, weights=counts, minlength=len(keys)).astype(np.int64)
+        response.totals = sorted(
+            (
+                CashFlowTotal(
+                    category=TransactionCategory(category),
+                    currency=currency,
+                    amount=round(float(totals[i, 0]), 2),
+                    inflow=round(float(totals[i, 1]), 2),
+                    outflow=round(float(totals[i, 2]), 2),
+                    count=int(total_counts[i]),
+                )
+                for i, (category, currency) in enumerate(keys)
+            ),
+            key=lambda total: -abs(total.amount),
+        )
+
+        currencies = sorted({currency for _, currency in keys})
+        currency_index = np.array([currencies.index(currency) for _, currency in keys])
+        net = np.zeros((len(currencies), 3))
+        np.add.at(net, currency_index, totals)
+        response.net = [
+            CurrencyNet(currency=currency, amount=round(float(amount), 2), inflow=round(float(inflow), 2), outflow=round(float(outflow), 2))
+            for currency, (amount, inflow, outflow) in zip(currencies, net)
+        ]
+
+        if request.include_series:
+            starts = period_starts(days, request.period)
+            # Уникальные пары (группа, начало периода) в порядке возрастания
+            cells, cell = np.unique(np.stack([group, starts], axis=1), axis=0, return_inverse=True)
+            cell = cell.reshape(-1)
+            sums = np.zeros((len(cells), 3))
+            np.add.at(sums, cell, values)
+            cell_counts = np.bincount(cell, weights=counts, minlength=len(cells)).astype(np.int64)
+            series: Dict[int, CashFlowSeries] = {}
+            for j, (i, start) in enumerate(cells.tolist()):
+                category, currency = keys[i]
+                item = series.setdefault(i, CashFlowSeries(category=TransactionCategory(category), currency=currency, points=[]))
+                item.points.append(CashFlowPoint(
+                    period_start=_day_to_date(start),
+                    amount=round(float(sums[j, 0]), 2),
+                    inflow=round(float(sums[j, 1]), 2),
+                    outflow=round(float(sums[j, 2]), 2),
+                    count=int(cell_counts[j]),
+                ))
+            order = {(total.category.value, total.currency): k for k, total in enumerate(response.totals)}
+            response.series = sorted(series.values(), key=lambda item: order[(item.category.value, item.currency)])
+        return response
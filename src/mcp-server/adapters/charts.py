@@ -0,0 +1,184 @@
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow-кодирование необязательно, без него отдаем JSON
+    pa = None
+
+from .bars_history import DAY, BarsHistory
+from .cache import AsyncTTLCache
+from .downsample import lttb_indices
+from .models import *
+from .numeric import BarColumns, timestamp_column
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NS_IN_MS = 1_000_000
+SPARKLINE_POINTS = 40
+
+
+def epoch_ms(ns: np.ndarray) -> List[int]:
+    """int64 наносекунд -> миллисекунды UNIX (компактнее строк ISO и понятны plotly)."""
+    return (np.asarray(ns, dtype=np.int64) // NS_IN_MS).tolist()
+
+
+def float_list(values: Sequence[float], decimals: Optional[int] = None) -> List[Optional[float]]:
+    """Числа для JSON: NaN и бесконечности -> None, при необходимости округление."""
+    array = np.asarray(values, dtype=np.float64)
+    if decimals is not None:
+        array = np.round(array, decimals)
+    result = array.astype(object)
+    result[~np.isfinite(array)] = None
+    return result.tolist()
+
+
+def chart_to_arrow(chart: ChartPayload) -> Optional[bytes]:
+    """Колонки графика в Arrow IPC stream; описание графика - в метаданных схемы. None, если pyarrow не установлен."""
+    if pa is None:
+        return None
+    table = pa.table(chart.columns)
+    header = {"chart_id": chart.chart_id, "kind": chart.kind.value, "title": chart.title, "meta": chart.meta}
+    table = table.replace_schema_metadata({"chart": json.dumps(header, ensure_ascii=False)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class ChartStore:
+    """Хранилище готовых к отрисовке графиков.
+
+    Инструменты кладут сюда колоночные данные (уже прореженные) и отдают модели только chart_id,
+    чтобы не раздувать контекст; интерфейс забирает данные по chart_id напрямую с сервера.
+    """
+
+    def __init__(self, history: BarsHistory, ttl: float = 60 * 60, max_charts: int = 256):
+        self.history = history
+        self._cache = AsyncTTLCache(ttl=ttl, max_size=max_charts)
+
+    def get(self, chart_id: str) -> Optional[ChartPayload]:
+        return self._cache.get(chart_id)
+
+    def put(self, kind: ChartKind, title: str, columns: Dict[str, List[Any]], meta: Optional[Dict[str, Any]] = None) -> str:
+        chart_id = uuid.uuid4().hex[:12]
+        self._cache.set(chart_id, ChartPayload(chart_id=chart_id, kind=kind, title=title, columns=columns, meta=meta or {}))
+        return chart_id
+
+    def bars(self, symbol: str, columns: BarColumns) -> str:
+        """Свечной график по (уже прореженному) ряду."""
+        return self.put(
+            ChartKind.CANDLES,
+            symbol,
+            {
+                "x": epoch_ms(columns.timestamp),
+                "open": float_list(columns.open),
+                "high": float_list(columns.high),
+                "low": float_list(columns.low),
+                "close": float_list(columns.close),
+                "volume": float_list(columns.volume),
+            },
+            {"x": "x", "symbol": symbol},
+        )
+
+    def backtest(self, report: BacktestReport) -> str:
+        """Кривая капитала бэктеста."""
+        return self.put(
+            ChartKind.LINE,
+            f"{report.strategy.value}: {' / '.join(report.symbols)}",
+            {
+                "x": epoch_ms(timestamp_column([point.timestamp for point in report.equity_curve])),
+                "equity": float_list([point.equity for point in report.equity_curve], 2),
+            },
+            {"x": "x", "series": {"equity": "Результат"}},
+        )
+
+    def portfolio_history(self, response: PortfolioHistoryResponse) -> str:
+        """Стоимость счета, деньги и накопленные вводы/выводы по дням."""
+        points = response.points
+        return self.put(
+            ChartKind.LINE,
+            f"Счет {response.account_id}: {response.start} - {response.end}",
+            {
+                "x": epoch_ms(timestamp_column([point.date for point in points])),
+                "equity": float_list([point.equity for point in points], 2),
+                "cash": float_list([point.cash for point in points], 2),
+                "cumulative_net_flow": float_list([point.cumulative_net_flow for point in points], 2),
+            },
+            {"x": "x", "series": {"equity": "Стоимость", "cash": "Деньги", "cumulative_net_flow": "Вводы - выводы"}},
+        )
+
+    def portfolio_weights(self, response: PortfolioAnalyticsResponse) -> str:
+        """Состав портфеля: корень -> длинные/короткие позиции -> инструменты, площадь по модулю стоимости."""
+        root = "Портфель"
+        groups = {"long": "Лонг", "short": "Шорт"}
+        ids, labels, parents, values, returns = [root], [root], [""], [0.0], [response.return_pct]
+        sums = {key: 0.0 for key in groups}
+        leaves = []
+        for position in response.positions:
+            if position.market_value is None:
+                continue
+            group = "long" if position.quantity >= 0 else "short"
+            value = abs(position.market_value)
+            sums[group] += value
+            leaves.append((f"{group}/{position.symbol}", position.symbol, group, value, position.return_pct))
+
+        for key, label in groups.items():
+            if sums[key] > 0:
+                ids.append(key)
+                labels.append(label)
+                parents.append(root)
+                values.append(sums[key])
+                returns.append(None)
+        for leaf_id, label, parent, value, return_pct in leaves:
+            ids.append(leaf_id)
+            labels.append(label)
+            parents.append(parent)
+            values.append(value)
+            returns.append(return_pct)
+        values[0] = sum(sums.values())
+
+        return self.put(
+            ChartKind.SUNBURST,
+            f"Состав портфеля {response.account_id}",
+            {
+                "ids": ids,
+                "labels": labels,
+                "parents": parents,
+                "values": float_list(values, 2),
+                "return_pct": float_list([np.nan if value is None else value for value in returns], 2),
+            },
+            {"branchvalues": "total", "color": "return_pct"},
+        )
+
+    async def scan(self, response: ScanResponse, window_days: int) -> str:
+        """Таблица сканера со спарклайнами цен закрытия за окно (свечи берутся из кэша истории сканера)."""
+        symbols = [row.symbol for row in response.rows]
+        series = await self.history.load_many(symbols, TimeFrame.TIME_FRAME_D, time.time() - window_days * DAY)
+        sparklines = []
+        for symbol in symbols:
+            columns = series[symbol]
+            if isinstance(columns, ErrorResponse) or not len(columns):
+                sparklines.append([])
+                continue
+            keep = lttb_indices(columns.timestamp, columns.close, SPARKLINE_POINTS)
+            sparklines.append(float_list(columns.close[keep]))
+
+        rows = response.rows
+        return self.put(
+            ChartKind.TABLE,
+            "Результаты сканера",
+            {
+                "symbol": symbols,
+                "name": [row.name for row in rows],
+                "last_close": float_list([row.last_close for row in rows]),
+                "change_pct": float_list([np.nan if row.change_pct is None else row.change_pct for row in rows], 2),
+                "turnover": float_list([row.turnover for row in rows], 0),
+                "volatility_pct": float_list([np.nan if row.volatility_pct is None else row.volatility_pct for row in rows], 2),
+                "sparkline": sparklines,
+            },
+            {"sparkline": "sparkline"},
+        )
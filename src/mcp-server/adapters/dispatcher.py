@@ -0,0 +1,146 @@
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Deque, Dict, Optional
+
+
+class RequestPriority(IntEnum):
+    """Класс исходящего запроса к API: меньшее значение обслуживается раньше."""
+    TRADING = 0
+    INTERACTIVE = 1
+    BULK = 2
+
+
+# Сессия, от имени которой выполняются запросы (между сессиями одного класса очередь справедливая)
+request_session: contextvars.ContextVar[str] = contextvars.ContextVar("request_session", default="interactive")
+# Фоновые задачи понижают свои неторговые запросы до этого класса
+request_floor: contextvars.ContextVar[RequestPriority] = contextvars.ContextVar("request_floor", default=RequestPriority.TRADING)
+
+
+def bind_session(session: str, background: bool = False):
+    """Привязка текущей задачи asyncio к сессии; для фоновой задачи все неторговые запросы считаются массовыми."""
+    request_session.set(session)
+    if background:
+        request_floor.set(RequestPriority.BULK)
+
+
+class RequestDispatcher:
+    """Очередь исходящих запросов с приоритетами перед общим пулом соединений.
+
+    Это только порядок выдачи слотов: освободившийся слот получает ожидающий запрос самого
+    приоритетного класса, поэтому торговый запрос ставится в очередь перед ожидающими котировками
+    и историей. Выполняющиеся запросы не прерываются и слот не отдают - торговый запрос ждет,
+    пока какой-то из них завершится. Внутри класса сессии обслуживаются по кругу, чтобы одна
+    фоновая задача не занимала очередь класса целиком. У каждого класса свой лимит одновременных
+    запросов: массовые запросы не занимают весь пул, и у торговых остаются свободные слоты.
+    Отмененный ожидающий запрос убирается из очереди.
+    """
+
+    def __init__(self, max_concurrency: int = 10, class_limits: Optional[Dict[RequestPriority, int]] = None):
+        self.max_concurrency = max_concurrency
+        self.class_limits = class_limits or {
+            RequestPriority.TRADING: max_concurrency,
+            RequestPriority.INTERACTIVE: max(max_concurrency - 2, 1),
+            RequestPriority.BULK: max(max_concurrency // 2, 1),
+        }
+        self._active: Dict[RequestPriority, int] = {priority: 0 for priority in RequestPriority}
+        self._queues: Dict[RequestPriority, "OrderedDict[str, Deque[asyncio.Future]]"] = {priority: OrderedDict() for priority in RequestPriority}
+        self._total = 0
+
+    def effective_priority(self, priority: RequestPriority) -> RequestPriority:
+        if priority == RequestPriority.TRADING:
+            return priority
+        return max(priority, request_floor.get())
+
+    def queued(self, priority: RequestPriority) -> int:
+        return sum(len(waiters) for waiters in self._queues[priority].values())
+
+    def active(self, priority: RequestPriority) -> int:
+        return self._active[priority]
+
+    def available(self, priority: RequestPriority) -> bool:
+        """Запрос этого класса сейчас получит слот без ожидания в очереди."""
+        priority = self.effective_priority(priority)
+        return self._can_start(priority) and not any(self._queues[p] for p in RequestPriority if p <= priority)
+
+    def _can_start(self, priority: RequestPriority) -> bool:
+        return self._total < self.max_concurrency and self._active[priority] < self.class_limits[priority]
+
+    def _acquire(self, priority: RequestPriority):
+        self._active[priority] += 1
+        self._total += 1
+
+    def _release(self, priority: RequestPriority):
+        self._active[priority] -= 1
+        self._total -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Раздача свободных слотов: по приоритету классов, внутри класса - по кругу между сессиями."""
+        while self._total < self.max_concurrency:
+            for priority in RequestPriority:
+                sessions = self._queues[priority]
+                if not sessions or self._active[priority] >= self.class_limits[priority]:
+                    continue
+                session, waiters = next(iter(sessions.items()))
+                waiter = waiters.popleft()
+                if waiters:
+                    sessions.move_to_end(session)
+                else:
+                    del sessions[session]
+                if not waiter.done():
+                    self._acquire(priority)
+                    waiter.set_result(None)
+                break
+            else:
+                return
+
+    def _forget(self, priority: RequestPriority, waiter: asyncio.Future):
+        """Удаление ожидающего из очереди класса."""
+        sessions = self._queues[priority]
+        for session, waiters in sessions.items():
+            if waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del sessions[session]
+                return
+
+    @asynccontextmanager
+    async def slot(self, priority: RequestPriority):
+        """Слот для одного запроса: ждет своей очереди и освобождается по выходу из блока."""
+        priority = self.effective_priority(priority)
+        # Без очереди - только если никто из того же или более приоритетного класса не ждет
+        if self.available(priority):
+            self._acquire(priority)
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[priority].setdefault(request_session.get(), deque()).append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Слот уже выдан, но запрос отменен: возвращаем слот следующему
+                    self._release(priority)
+                else:
+                    self._forget(priority, waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def prometheus(self) -> str:
+        """Занятые слоты и длина очереди по классам в текстовом формате Prometheus."""
+        lines = [
+            "# HELP api_requests_active Outbound Finam API requests in flight",
+            "# TYPE api_requests_active gauge",
+        ]
+        lines += [f'api_requests_active{{class="{priority.name.lower()}"}} {self._active[priority]}' for priority in RequestPriority]
+        lines += [
+            "# HELP api_requests_queued Outbound Finam API requests waiting for a slot",
+            "# TYPE api_requests_queued gauge",
+        ]
+        lines += [f'api_requests_queued{{class="{priority.name.lower()}"}} {self.queued(priority)}' for priority in RequestPriority]
+        return "\n".join(lines) + "\n"
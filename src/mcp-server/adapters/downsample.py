@@ -0,0 +1,118 @@
+from typing import Optional
+
+import numpy as np
+
+from .models import *
+from .numeric import BarColumns, format_timestamp
+
+
+def _bucket_edges(n: int, n_out: int) -> np.ndarray:
+    """Границы n_out примерно равных бакетов по n элементам."""
+    return np.linspace(0, n, n_out + 1).astype(np.int64)
+
+
+def ohlc_merge(columns: BarColumns, n_out: int) -> BarColumns:
+    """Слияние соседних свечей в n_out укрупненных: open первой, close последней, high/low экстремумы, объем суммой."""
+    if n_out <= 0 or len(columns) <= n_out:
+        return columns
+    starts = _bucket_edges(len(columns), n_out)[:-1]
+    ends = np.append(starts[1:], len(columns)) - 1
+    return BarColumns(
+        timestamp=columns.timestamp[starts],
+        open=columns.open[starts],
+        high=np.maximum.reduceat(columns.high, starts),
+        low=np.minimum.reduceat(columns.low, starts),
+        close=columns.close[ends],
+        volume=np.add.reduceat(columns.volume, starts),
+    )
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Индексы точек, выбранных алгоритмом Largest-Triangle-Three-Buckets."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n) if n_out >= n else np.linspace(0, n - 1, max(n_out, 0)).astype(np.int64)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    # Первая и последняя точки фиксированы, остальные n - 2 делятся на n_out - 2 бакета
+    edges = _bucket_edges(n - 2, n_out - 2) + 1
+    # Среднее каждого бакета для роли "третьей вершины" треугольника считаем заранее
+    sums_x = np.add.reduceat(x[1:-1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:-1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x, next_y = avg_x[bucket + 1], avg_y[bucket + 1]
+        areas = np.abs(
+            (x[prev] - next_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (next_y - y[prev])
+        )
+        prev = start + int(np.argmax(areas))
+        selected[bucket + 1] = prev
+    return selected
+
+
+def lttb_select(columns: BarColumns, n_out: int) -> BarColumns:
+    """Выбор n_out исходных свечей, сохраняющих форму ряда цен закрытия (LTTB)."""
+    if n_out <= 0 or len(columns) <= n_out:
+        return columns
+    return columns.take(lttb_indices(columns.timestamp, columns.close, n_out))
+
+
+def summarize(columns: BarColumns) -> BarsSummary:
+    """Сводная статистика по исходному ряду свечей."""
+    if not len(columns):
+        return BarsSummary(count=0, volume=0.0)
+
+    close = columns.close
+    first_open, last_close = float(columns.open[0]), float(close[-1])
+    returns = close[1:] / close[:-1] - 1 if len(close) > 1 else np.empty(0)
+    running_max = np.maximum.accumulate(close)
+    drawdown = close / running_max - 1
+    return BarsSummary(
+        count=len(columns),
+        start=format_timestamp(columns.timestamp[0]),
+        end=format_timestamp(columns.timestamp[-1]),
+        open=first_open,
+        close=last_close,
+        high=float(np.nanmax(columns.high)),
+        low=float(np.nanmin(columns.low)),
+        change_pct=(last_close / first_open - 1) * 100 if first_open else None,
+        volume=float(np.nansum(columns.volume)),
+        volatility_pct=float(np.nanstd(returns) * 100) if len(returns) > 1 else None,
+        max_drawdown_pct=float(np.nanmin(drawdown) * 100),
+    )
+
+
+def downsample(columns: BarColumns, max_points: int, method: DownsampleMethod = DownsampleMethod.OHLC) -> BarColumns:
+    if method == DownsampleMethod.LTTB:
+        return lttb_select(columns, max_points)
+    return ohlc_merge(columns, max_points)
+
+
+def downsample_bars(
+    symbol: str,
+    columns: BarColumns,
+    max_points: int,
+    method: DownsampleMethod = DownsampleMethod.OHLC,
+    decimals: Optional[int] = None,
+    reduced: Optional[BarColumns] = None,
+) -> DownsampledBarsResponse:
+    """Прореживание ряда до max_points свечей с приложенной статистикой исходного ряда.
+    reduced - уже прореженный ряд, если вызывающему он нужен и для другого (например, для графика)."""
+    if reduced is None:
+        reduced = downsample(columns, max_points, method)
+    return DownsampledBarsResponse(
+        symbol=symbol,
+        bars=reduced.to_bars(decimals),
+        original_count=len(columns),
+        method=method,
+        summary=summarize(columns),
+    )
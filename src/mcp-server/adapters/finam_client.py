@@ -3,7 +3,10 @@ from typing import Dict, Optional, Union, Any
 import asyncio
 from datetime import datetime, timedelta
 import jwt
+from .dispatcher import RequestDispatcher, RequestPriority
+from .hedging import HedgePolicy, hedged
 from .models import *
+from .numeric import BarColumns
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,21 +14,41 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 class FinamApiClient:
     """Клиент для работы с API Finam с автоматической аутентификацией."""
     
-    def __init__(self, secret_token: str, base_url: str = "https://api.finam.ru", timeout: float = 30.0):
+    def __init__(
+        self,
+        secret_token: str,
+        base_url: str = "https://api.finam.ru",
+        timeout: float = 30.0,
+        dispatcher: Optional[RequestDispatcher] = None,
+        hedging: Optional[HedgePolicy] = None,
+    ):
         self.base_url = base_url.rstrip('/')
         self.timeout = timeout
+        self.dispatcher = dispatcher or RequestDispatcher()
+        # Дублирование медленных запросов котировок и стакана; None - без дублирования
+        self.hedging = hedging
         self._token = None
         self._api_secret = secret_token
         self._token_expires_at = None
         self._client = None
 
     async def __aenter__(self):
-        self._client = httpx.AsyncClient()
+        self._http()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self._client:
             await self._client.aclose()
+
+    def _http(self) -> httpx.AsyncClient:
+        """Общий клиент с пулом keep-alive соединений; размер пула равен числу слотов диспетчера."""
+        if self._client is None or self._client.is_closed:
+            size = self.dispatcher.max_concurrency
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+            )
+        return self._client
             
     def set_api_secret(self, api_secret: str):
         """Установка API секрета для автоматической аутентификации."""
@@ -86,8 +109,13 @@ class FinamApiClient:
             # Если не удалось декодировать, устанавливаем время экспирации как None
             self._token_expires_at = None
 
-    async def _make_request(self, method: str, url: str, **kwargs) -> Union[httpx.Response, Dict[str, Any]]:
-        """Выполняет запрос с автоматической аутентификацией и улучшенной обработкой ошибок."""
+    async def _make_request(
+        self, method: str, url: str, priority: RequestPriority = RequestPriority.INTERACTIVE, **kwargs
+    ) -> Union[httpx.Response, Dict[str, Any]]:
+        """Выполняет запрос с автоматической аутентификацией и улучшенной обработкой ошибок.
+
+        Запрос ждет слота диспетчера своего класса priority и идет через общий пул соединений.
+        """
         try:
             await self._ensure_authenticated()
             
@@ -99,7 +127,8 @@ class FinamApiClient:
             max_retries = 2
             for attempt in range(max_retries):
                 try:
-                    async with httpx.AsyncClient() as client:
+                    async with self.dispatcher.slot(priority):
+                        client = self._http()
                         logging.info(f"MAKING REQUEST: {method} {url}")
                         print(f"🔍 Headers: { {k: v for k, v in headers.items() if k != 'Authorization'} }")
                         print(f"Args: {kwargs}")
@@ -144,6 +173,18 @@ class FinamApiClient:
         except Exception as e:
             return {'status_code': -1, 'error': str(e)}
 
+    async def _make_hedged_request(self, url: str, endpoint: str) -> Union[httpx.Response, Dict[str, Any]]:
+        """Идемпотентный интерактивный GET с дублированием при медленном ответе (если задан hedging)."""
+        if self.hedging is None:
+            return await self._make_request("GET", url)
+        return await hedged(
+            self.hedging,
+            endpoint,
+            lambda: self._make_request("GET", url),
+            can_hedge=lambda: self.dispatcher.available(RequestPriority.INTERACTIVE),
+            failed=lambda response: not isinstance(response, httpx.Response),
+        )
+
     def _prepare_response(self, response: Union[httpx.Response, Dict[str, Any]], response_model: Any) -> Union[Any, ErrorResponse]:
         if not isinstance(response, httpx.Response):
             response = ErrorResponse(**response)
@@ -154,6 +195,15 @@ class FinamApiClient:
                 response = ErrorResponse(status_code=-1, error=str(e))
 
         return response
+
+    def _prepare_columns(self, response: Union[httpx.Response, Dict[str, Any]], parser: Any) -> Any:
+        """Разбор сырого JSON ответа сразу в колонки NumPy, минуя валидацию моделей pydantic."""
+        if not isinstance(response, httpx.Response):
+            return ErrorResponse(**response)
+        try:
+            return parser(response.json())
+        except Exception as e:
+            return ErrorResponse(status_code=-1, error=str(e))
             
     
     async def token_details(self) -> Union[TokenDetailsResponse, ErrorResponse]:
@@ -189,7 +239,7 @@ class FinamApiClient:
                 "interval.end_time": request.interval.end_time
             })
             
-        response = await self._make_request("GET", url, params=params)
+        response = await self._make_request("GET", url, RequestPriority.BULK, params=params)
         return self._prepare_response(response, GetTradesResponse)
     
     async def get_transactions(self, request: TransactionsRequest) -> Union[GetTransactionsResponse, ErrorResponse]:
@@ -204,7 +254,7 @@ class FinamApiClient:
                 "interval.end_time": request.interval.end_time
             })
             
-        response = await self._make_request("GET", url, params=params)
+        response = await self._make_request("GET", url, RequestPriority.BULK, params=params)
         return self._prepare_response(response, GetTransactionsResponse)
 
     # ===== ИНСТРУМЕНТЫ =====
@@ -212,13 +262,13 @@ class FinamApiClient:
     async def get_exchanges(self) -> Union[GetExchangesResponse, ErrorResponse]:
         """Получение списка доступных бирж."""
         url = f"{self.base_url}/v1/exchanges"
-        response = await self._make_request("GET", url)
+        response = await self._make_request("GET", url, RequestPriority.BULK)
         return self._prepare_response(response, GetExchangesResponse)
     
     async def get_assets(self) -> GetAssetsResponse:
         """Получение списка доступных инструментов."""
         url = f"{self.base_url}/v1/assets"
-        response = await self._make_request("GET", url)
+        response = await self._make_request("GET", url, RequestPriority.BULK)
         return self._prepare_response(response, GetAssetsResponse)
     
     async def get_asset(self, request: GetAssetRequest) -> Union[GetAssetResponse, ErrorResponse]:
@@ -244,13 +294,13 @@ class FinamApiClient:
     async def get_options_chain(self, request: OptionsChainRequest) -> Union[OptionsChainResponse, ErrorResponse]:
         """Получение цепочки опционов для базового актива."""
         url = f"{self.base_url}/v1/assets/{request.underlying_symbol}/options"
-        response = await self._make_request("GET", url)
+        response = await self._make_request("GET", url, RequestPriority.BULK)
         return self._prepare_response(response, OptionsChainResponse)
     
     async def get_schedule(self, request: ScheduleRequest) -> Union[ScheduleResponse, ErrorResponse]:
         """Получение расписания торгов для инструмента."""
         url = f"{self.base_url}/v1/assets/{request.symbol}/schedule"
-        response = await self._make_request("GET", url)
+        response = await self._make_request("GET", url, RequestPriority.BULK)
         return self._prepare_response(response, ScheduleResponse)
     
     async def get_clock(self) -> ClockResponse:
@@ -261,28 +311,35 @@ class FinamApiClient:
 
     # ===== РЫНОЧНЫЕ ДАННЫЕ =====
     
-    async def get_bars(self, request: BarsRequest) -> Union[BarsResponse, ErrorResponse]:
-        """Получение исторических данных по инструменту (агрегированные свечи)."""
-        url = f"{self.base_url}/v1/instruments/{request.symbol}/bars"
-        params = {
+    def _bars_params(self, request: BarsRequest) -> Dict[str, str]:
+        return {
             "timeframe": request.timeframe.value,
             "interval.start_time": request.interval.start_time,
             "interval.end_time": request.interval.end_time
         }
-        
-        response = await self._make_request("GET", url, params=params)
+
+    async def get_bars(self, request: BarsRequest) -> Union[BarsResponse, ErrorResponse]:
+        """Получение исторических данных по инструменту (агрегированные свечи)."""
+        url = f"{self.base_url}/v1/instruments/{request.symbol}/bars"
+        response = await self._make_request("GET", url, RequestPriority.BULK, params=self._bars_params(request))
         return self._prepare_response(response, BarsResponse)
+
+    async def get_bars_columns(self, request: BarsRequest) -> Union[BarColumns, ErrorResponse]:
+        """Получение свечей сразу в колоночном виде (NumPy), без построения моделей Bar."""
+        url = f"{self.base_url}/v1/instruments/{request.symbol}/bars"
+        response = await self._make_request("GET", url, RequestPriority.BULK, params=self._bars_params(request))
+        return self._prepare_columns(response, lambda payload: BarColumns.from_json(payload.get("bars", [])))
     
     async def get_last_quote(self, request: QuoteRequest) -> Union[LastQuoteResponse, ErrorResponse]:
         """Получение последней котировки по инструменту."""
         url = f"{self.base_url}/v1/instruments/{request.symbol}/quotes/latest"
-        response = await self._make_request("GET", url)
+        response = await self._make_hedged_request(url, "last_quote")
         return self._prepare_response(response, LastQuoteResponse)
     
     async def get_orderbook(self, request: OrderBookRequest) -> Union[OrderBookResponse, ErrorResponse]:
         """Получение текущего стакана по инструменту."""
         url = f"{self.base_url}/v1/instruments/{request.symbol}/orderbook"
-        response = await self._make_request("GET", url)
+        response = await self._make_hedged_request(url, "orderbook")
         return self._prepare_response(response, OrderBookResponse)
     
     async def get_latest_trades(self, request: LatestTradesRequest) -> Union[LatestTradesResponse, ErrorResponse]:
@@ -299,14 +356,14 @@ class FinamApiClient:
         """Выставление биржевой заявки."""
         url = f"{self.base_url}/v1/accounts/{account_id}/orders"
         print(request.model_dump_json())
-        response = await self._make_request("POST", url, json=request.model_dump())
+        response = await self._make_request("POST", url, RequestPriority.TRADING, json=request.model_dump())
         return self._prepare_response(response, PlaceOrderResponse)
     
     async def cancel_order(self, request: CancelOrderRequest) -> Union[CancelOrderResponse, ErrorResponse]:
         """Отмена биржевой заявки."""
         print(request.model_dump_json())
         url = f"{self.base_url}/v1/accounts/{request.account_id}/orders/{request.order_id}"
-        response = await self._make_request("DELETE", url)
+        response = await self._make_request("DELETE", url, RequestPriority.TRADING)
         return self._prepare_response(response, CancelOrderResponse)
     
     async def get_orders(self, request: OrdersRequest) -> Union[GetOrdersResponse, ErrorResponse]:
@@ -0,0 +1,238 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .account_cache import AccountSnapshotCache
+from .asset_info import AssetInfoCache
+from .cache import AsyncTTLCache
+from .finam_client import FinamApiClient
+from .models import *
+from .numeric import PositionColumns, money_column
+
+RUB = "RUB"
+
+# Инструменты валютной секции MOEX (расчеты завтра): цена одной единицы валюты в рублях
+CURRENCY_INSTRUMENTS = {
+    "USD": "USD000UTSTOM@MISX",
+    "EUR": "EUR_RUB__TOM@MISX",
+    "CNY": "CNYRUB_TOM@MISX",
+    "HKD": "HKDRUB_TOM@MISX",
+}
+
+
+@dataclass
+class _RubQuote:
+    rate: float
+    fetched_at: float
+
+
+@dataclass
+class FxTable:
+    """Курсы к базовой валюте на один расчет; валюты без курса - в missing с причиной."""
+    base: str
+    rates: Dict[str, FxRate] = field(default_factory=dict)
+    missing: Dict[str, str] = field(default_factory=dict)
+
+    def factors(self, currencies: Sequence[str]) -> np.ndarray:
+        """Множители пересчета в базовую валюту для колонки валют; нет курса - NaN."""
+        if not len(currencies):
+            return np.empty(0)
+        unique, inverse = np.unique(np.array([currency.upper() for currency in currencies]), return_inverse=True)
+        values = np.array([self.rates[currency].rate if currency in self.rates else np.nan for currency in unique.tolist()])
+        return values[inverse.reshape(-1)]
+
+    def convert(self, amounts: np.ndarray, currencies: Sequence[str]) -> np.ndarray:
+        return np.asarray(amounts, dtype=np.float64) * self.factors(currencies)
+
+    def warnings(self) -> List[str]:
+        return [f"{currency}: нет курса к {self.base} ({reason}), суммы в этой валюте не вошли в итоги" for currency, reason in self.missing.items()]
+
+
+def _quote_price(quote: LastQuoteResponse) -> float:
+    """Последняя сделка, иначе середина спреда; 0 - цены нет."""
+    last = float(quote.quote.last.value or 0) if quote.quote.last is not None else 0.0
+    if last > 0:
+        return last
+    bid = float(quote.quote.bid.value or 0) if quote.quote.bid is not None else 0.0
+    ask = float(quote.quote.ask.value or 0) if quote.quote.ask is not None else 0.0
+    return (bid + ask) / 2 if bid > 0 and ask > 0 else 0.0
+
+
+class FxService:
+    """Курсы валют по котировкам валютных инструментов Финам.
+
+    Курс каждой валюты берется к рублю (instruments: валюта -> инструмент с ценой единицы
+    валюты в рублях), кросс-курсы считаются через рубль. Рублевые курсы кэшируются на ttl:
+    за один расчет запрашиваются только нужные валюты, каждая не больше одного раза,
+    параллельно, а одновременные расчеты ждут общий запрос.
+    """
+
+    def __init__(self, api: FinamApiClient, ttl: float = 30.0, instruments: Optional[Dict[str, str]] = None, max_size: int = 64):
+        self.api = api
+        self.instruments = {currency.upper(): symbol for currency, symbol in (instruments or CURRENCY_INSTRUMENTS).items()}
+        self._quotes = AsyncTTLCache(ttl=ttl, max_size=max_size)
+
+    async def _load(self, symbol: str) -> Union[_RubQuote, ErrorResponse]:
+        quote = await self.api.get_last_quote(QuoteRequest(symbol=symbol))
+        if isinstance(quote, ErrorResponse):
+            return quote
+        price = _quote_price(quote)
+        if price <= 0:
+            return ErrorResponse(status_code=-1, error=f"Нет цены по {symbol}")
+        return _RubQuote(price, time.monotonic())
+
+    async def _rub_quote(self, currency: str) -> Union[_RubQuote, ErrorResponse]:
+        if currency == RUB:
+            return _RubQuote(1.0, time.monotonic())
+        symbol = self.instruments.get(currency)
+        if symbol is None:
+            return ErrorResponse(status_code=-1, error="нет валютного инструмента")
+        return await self._quotes.get_or_load(
+            currency,
+            lambda: self._load(symbol),
+            should_cache=lambda value: not isinstance(value, ErrorResponse),
+        )
+
+    async def rates(self, currencies: Sequence[str], base: str = RUB) -> FxTable:
+        """Курсы всех валют из currencies к base."""
+        base = base.upper()
+        needed = list(dict.fromkeys([currency.upper() for currency in currencies if currency] + [base]))
+        quotes = dict(zip(needed, await asyncio.gather(*(self._rub_quote(currency) for currency in needed))))
+        table = FxTable(base=base)
+        now = time.monotonic()
+        for currency in needed:
+            if currency == base:
+                table.rates[currency] = FxRate(currency=currency, base_currency=base, rate=1.0, symbols=[], age_s=0.0)
+                continue
+            failed = [quote for quote in (quotes[currency], quotes[base]) if isinstance(quote, ErrorResponse)]
+            if failed:
+                table.missing[currency] = failed[0].error
+                continue
+            table.rates[currency] = FxRate(
+                currency=currency,
+                base_currency=base,
+                rate=quotes[currency].rate / quotes[base].rate,
+                symbols=[self.instruments[item] for item in (currency, base) if item != RUB],
+                age_s=round(now - min(quotes[currency].fetched_at, quotes[base].fetched_at), 3),
+            )
+        return table
+
+
+async def base_factors(fx: Optional[FxService], currencies: Sequence[str], base: str = RUB) -> Tuple[np.ndarray, List[str]]:
+    """Множители пересчета колонки валют в base и предупреждения. Без FxService в итоги идет только base."""
+    if fx is not None:
+        table = await fx.rates(currencies, base)
+        return table.factors(currencies), table.warnings()
+    base = base.upper()
+    upper = [currency.upper() for currency in currencies]
+    factors = np.array([1.0 if currency == base else np.nan for currency in upper])
+    other = sorted(set(upper) - {base})
+    return factors, [f"{currency}: пересчет валют не настроен, суммы в этой валюте не вошли в итоги" for currency in other]
+
+
+async def symbol_currencies(asset_info: AssetInfoCache, symbols: Sequence[str], account_id: str) -> Tuple[Dict[str, str], List[str]]:
+    """Валюта котировки по инструментам. Если валюта неизвестна, считается рублем - с предупреждением."""
+    symbols = list(dict.fromkeys(symbols))
+    assets = await asyncio.gather(*(asset_info.get_asset(symbol, account_id) for symbol in symbols))
+    currencies, assumed = {}, []
+    for symbol, asset in zip(symbols, assets):
+        currency = None if isinstance(asset, ErrorResponse) else asset.quote_currency
+        if not currency:
+            assumed.append(symbol)
+        currencies[symbol] = (currency or RUB).upper()
+    warnings = [f"Валюта котировки не известна, считается {RUB}: {', '.join(assumed)}"] if assumed else []
+    return currencies, warnings
+
+
+def account_currency(account: GetAccountResponse) -> str:
+    """Валюта equity счета: счета американских рынков (portfolio_mct) ведутся в долларах, остальные - в рублях."""
+    return "USD" if account.portfolio_mct is not None else RUB
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+class PortfolioValuation:
+    """Оценка позиций и денег счета в одной базовой валюте по текущим курсам FxService."""
+
+    def __init__(self, api: FinamApiClient, fx: FxService, asset_info: AssetInfoCache, accounts: Optional[AccountSnapshotCache] = None):
+        self.api = api
+        self.fx = fx
+        self.asset_info = asset_info
+        self.accounts = accounts
+
+    async def value(self, request: PortfolioValuationRequest) -> Union[PortfolioValuationResponse, ErrorResponse]:
+        if self.accounts is not None:
+            account, _ = await self.accounts.snapshot(request.account_id, request.max_age_s)
+        else:
+            account = await self.api.get_account(GetAccountRequest(account_id=request.account_id))
+        if isinstance(account, ErrorResponse):
+            return account
+        return await self.value_account(account, request.base_currency)
+
+    async def value_account(self, account: GetAccountResponse, base_currency: str = RUB) -> PortfolioValuationResponse:
+        """Оценка уже полученного снимка счета."""
+        positions = PositionColumns.from_positions(account.positions)
+        (currencies, warnings), (unit_priced, priced_warnings) = await asyncio.gather(
+            symbol_currencies(self.asset_info, positions.symbol, account.account_id),
+            self.asset_info.unit_priced(positions.symbol, account.account_id),
+        )
+        warnings += priced_warnings
+        position_currency = [currencies[symbol] for symbol in positions.symbol]
+        cash_currency = [money.currency_code.upper() for money in account.cash]
+        table = await self.fx.rates(position_currency + cash_currency, base_currency)
+        warnings += table.warnings()
+
+        # Стоимость только у инструментов с ценой за штуку и известной текущей ценой, остальные - NaN
+        no_price = [symbol for symbol, price in zip(positions.symbol, positions.current_price.tolist()) if np.isnan(price)]
+        if no_price:
+            warnings.append(f"Нет текущей цены, позиции не оценены: {', '.join(no_price)}")
+        priced = np.array([unit_priced[symbol] for symbol in positions.symbol], dtype=bool)
+        market_value = np.where(priced, positions.market_value, np.nan)
+        unrealized = np.nan_to_num(positions.unrealized_pnl)
+        factors = table.factors(position_currency)
+        market_value_base = market_value * factors
+        unrealized_base = unrealized * factors
+        cash = money_column(account.cash) if account.cash else np.empty(0)
+        cash_base = table.convert(cash, cash_currency)
+
+        positions_value = float(np.nansum(market_value_base))
+        cash_value = float(np.nansum(cash_base))
+        total_value = positions_value + cash_value
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = market_value_base / total_value * 100 if total_value > 0 else np.full(len(positions), np.nan)
+
+        valued = [
+            ValuedPosition(
+                symbol=symbol,
+                currency=position_currency[i],
+                quantity=float(np.nan_to_num(positions.quantity[i])),
+                current_price=None if np.isnan(positions.current_price[i]) else float(positions.current_price[i]),
+                market_value=_optional(market_value[i]),
+                market_value_base=_optional(market_value_base[i]),
+                unrealized_pnl=round(float(unrealized[i]), 2),
+                unrealized_pnl_base=_optional(unrealized_base[i]),
+                weight_pct=_optional(weights[i]),
+            )
+            for i, symbol in enumerate(positions.symbol)
+        ]
+        valued.sort(key=lambda position: -abs(position.market_value_base or 0.0))
+        return PortfolioValuationResponse(
+            account_id=account.account_id,
+            base_currency=table.base,
+            positions=valued,
+            cash=[
+                CashBalance(currency=currency, amount=round(float(amount), 2), amount_base=_optional(amount_base))
+                for currency, amount, amount_base in zip(cash_currency, cash, cash_base)
+            ],
+            positions_value=round(positions_value, 2),
+            cash_value=round(cash_value, 2),
+            total_value=round(total_value, 2),
+            unrealized_pnl=round(float(np.nansum(unrealized_base)), 2),
+            rates=[table.rates[currency] for currency in sorted(table.rates) if currency != table.base],
+            warnings=warnings,
+        )
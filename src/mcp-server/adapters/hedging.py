@@ -0,0 +1,122 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+import numpy as np
+
+
+class HedgePolicy:
+    """Параметры дублирования медленных идемпотентных GET-запросов.
+
+    Задержка перед дублем - перцентиль quantile недавних времен ответа эндпоинта, так что
+    дублируется примерно (1 - quantile) запросов. Дубли дополнительно ограничены бюджетом:
+    каждый запрос дает budget_ratio токена, дубль тратит один токен, поэтому нагрузка на API
+    растет не больше чем на budget_ratio даже при деградации.
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.9,
+        min_delay: float = 0.05,
+        max_delay: float = 2.0,
+        default_delay: float = 0.3,
+        budget_ratio: float = 0.1,
+        max_budget: float = 10.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.budget_ratio = budget_ratio
+        self.max_budget = max_budget
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._budget = max_budget
+        # Счетчики по эндпоинтам: запросы, отправленные дубли, ответы, пришедшие от дубля
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.hedged: Dict[str, int] = defaultdict(int)
+        self.hedge_wins: Dict[str, int] = defaultdict(int)
+
+    def delay(self, endpoint: str) -> float:
+        samples = self._samples[endpoint]
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        return float(np.clip(np.quantile(samples, self.quantile), self.min_delay, self.max_delay))
+
+    def observe(self, endpoint: str, seconds: float):
+        self._samples[endpoint].append(seconds)
+
+    def start(self, endpoint: str):
+        self.requests[endpoint] += 1
+        self._budget = min(self._budget + self.budget_ratio, self.max_budget)
+
+    def try_spend(self) -> bool:
+        if self._budget < 1.0:
+            return False
+        self._budget -= 1.0
+        return True
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP api_hedge_requests_total Hedging-eligible API requests",
+            "# TYPE api_hedge_requests_total counter",
+        ]
+        lines += [f'api_hedge_requests_total{{endpoint="{endpoint}"}} {count}' for endpoint, count in sorted(self.requests.items())]
+        lines += ["# HELP api_hedge_sent_total Hedge requests sent", "# TYPE api_hedge_sent_total counter"]
+        lines += [f'api_hedge_sent_total{{endpoint="{endpoint}"}} {count}' for endpoint, count in sorted(self.hedged.items())]
+        lines += ["# HELP api_hedge_wins_total Responses served by the hedge request", "# TYPE api_hedge_wins_total counter"]
+        lines += [f'api_hedge_wins_total{{endpoint="{endpoint}"}} {count}' for endpoint, count in sorted(self.hedge_wins.items())]
+        lines += ["# HELP api_hedge_delay_seconds Current hedge delay", "# TYPE api_hedge_delay_seconds gauge"]
+        lines += [f'api_hedge_delay_seconds{{endpoint="{endpoint}"}} {self.delay(endpoint):.3f}' for endpoint in sorted(self._samples)]
+        return "\n".join(lines) + "\n"
+
+
+async def hedged(
+    policy: HedgePolicy,
+    endpoint: str,
+    attempt: Callable[[], Awaitable[Any]],
+    can_hedge: Callable[[], bool],
+    failed: Callable[[Any], bool],
+) -> Any:
+    """Запрос attempt() с дублем: если ответа нет за policy.delay, отправляется второй запрос и берется первый успешный ответ.
+
+    Дубль не отправляется, если can_hedge() ложно (нет свободного слота без очереди) или исчерпан бюджет.
+    Проигравший запрос отменяется.
+    """
+    policy.start(endpoint)
+
+    async def timed() -> Any:
+        started = time.monotonic()
+        result = await attempt()
+        if not failed(result):
+            policy.observe(endpoint, time.monotonic() - started)
+        return result
+
+    first = asyncio.create_task(timed())
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=policy.delay(endpoint))
+        if done or not can_hedge() or not policy.try_spend():
+            return await first
+        policy.hedged[endpoint] += 1
+        tasks.append(asyncio.create_task(timed()))
+
+        pending = set(tasks)
+        result = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if not failed(result):
+                    if task is not first:
+                        policy.hedge_wins[endpoint] += 1
+                    return result
+        # Оба запроса завершились ошибкой: возвращаем последнюю
+        return result
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
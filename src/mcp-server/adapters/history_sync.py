@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .bars_history import DAY, NS_IN_SECOND, format_api_time
+from .finam_client import FinamApiClient
+from .local_store import LocalStore, count_trades, count_transactions, get_sync_state, insert_trades, insert_transactions, set_sync_state
+from .models import *
+from .numeric import format_timestamp, timestamp_column
+
+NS_IN_DAY = DAY * NS_IN_SECOND
+
+# Хвост синхронизации перекрывается с уже загруженным периодом: записи могут проводиться задним числом
+SYNC_OVERLAP_NS = NS_IN_DAY
+
+# Обработчик новых записей потока, вызывается в той же транзакции SQLite, что и сохранение
+HistoryListener = Callable[[sqlite3.Connection, str, list], None]
+
+
+def date_range_ns(start_date: Optional[str], end_date: Optional[str], default_days: int = 365) -> Union[Tuple[int, int], ErrorResponse]:
+    """Период [начало start_date, конец end_date] в наносекундах UTC."""
+    try:
+        end_ns = ((date.fromisoformat(end_date) - date(1970, 1, 1)).days + 1) * NS_IN_DAY - 1 if end_date else time.time_ns()
+        start_ns = (date.fromisoformat(start_date) - date(1970, 1, 1)).days * NS_IN_DAY if start_date else end_ns - default_days * NS_IN_DAY
+    except ValueError:
+        return ErrorResponse(status_code=-1, error="Даты должны быть в формате YYYY-MM-DD")
+    return start_ns, end_ns
+
+
+def split_range(start_ns: int, end_ns: int, window_ns: int) -> List[Tuple[int, int]]:
+    edges = list(range(start_ns, end_ns, window_ns)) + [end_ns]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+@dataclass
+class _SyncStats:
+    requests: int = 0
+    truncated: int = 0
+
+
+class HistorySync:
+    """Синхронизация истории сделок и транзакций счета с локальным хранилищем.
+
+    API отдает за запрос не больше limit записей без курсора продолжения, поэтому период
+    обходится окнами window_days параллельно, а окно, упершееся в лимит, делится пополам до
+    min_window_seconds. Записи дедуплицируются по id. Синхронизированный период хранится в
+    sync_state, и следующие вызовы загружают только хвост с момента последней синхронизации.
+    """
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        store: LocalStore,
+        window_days: int = 30,
+        page_limit: int = 1000,
+        min_window_seconds: int = 60,
+        max_concurrency: int = 4,
+    ):
+        self.api = api
+        self.store = store
+        self.window_ns = window_days * NS_IN_DAY
+        self.page_limit = page_limit
+        self.min_window_ns = min_window_seconds * NS_IN_SECOND
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._listeners: Dict[HistoryStream, List[HistoryListener]] = {stream: [] for stream in HistoryStream}
+        self._locks: Dict[Tuple[str, HistoryStream], asyncio.Lock] = {}
+
+    def add_listener(self, stream: HistoryStream, listener: HistoryListener):
+        """Подписка на новые записи потока (например, для инкрементальных агрегатов)."""
+        self._listeners[stream].append(listener)
+
+    async def _request(self, account_id: str, stream: HistoryStream, start_ns: int, end_ns: int) -> Union[list, ErrorResponse]:
+        interval = Interval(start_time=format_api_time(start_ns / NS_IN_SECOND), end_time=format_api_time(end_ns / NS_IN_SECOND))
+        async with self._semaphore:
+            if stream == HistoryStream.TRADES:
+                response = await self.api.get_trades(TradesRequest(account_id=account_id, limit=self.page_limit, interval=interval))
+            else:
+                response = await self.api.get_transactions(TransactionsRequest(account_id=account_id, limit=self.page_limit, interval=interval))
+        if isinstance(response, ErrorResponse):
+            return response
+        return response.trades if stream == HistoryStream.TRADES else response.transactions
+
+    async def _fetch_window(self, account_id: str, stream: HistoryStream, start_ns: int, end_ns: int, stats: _SyncStats) -> Union[list, ErrorResponse]:
+        items = await self._request(account_id, stream, start_ns, end_ns)
+        stats.requests += 1
+        if isinstance(items, ErrorResponse) or len(items) < self.page_limit:
+            return items
+        if end_ns - start_ns <= self.min_window_ns:
+            stats.truncated += 1
+            logging.warning(f"{stream.value} {account_id}: окно {format_timestamp(start_ns)} - {format_timestamp(end_ns)} упирается в лимит {self.page_limit}")
+            return items
+        middle = (start_ns + end_ns) // 2
+        halves = await asyncio.gather(
+            self._fetch_window(account_id, stream, start_ns, middle, stats),
+            self._fetch_window(account_id, stream, middle, end_ns, stats),
+        )
+        for half in halves:
+            if isinstance(half, ErrorResponse):
+                return half
+        return halves[0] + halves[1]
+
+    async def sync(self, account_id: str, stream: HistoryStream, start_ns: int) -> Union[HistorySyncResponse, ErrorResponse]:
+        """Догрузка потока: хвост после последней синхронизации и, при необходимости, период до start_ns."""
+        stream = HistoryStream(stream)
+        async with self._locks.setdefault((account_id, stream), asyncio.Lock()):
+            state = await self.store.run(lambda connection: get_sync_state(connection, account_id, stream.value))
+            now_ns = time.time_ns()
+            if state is None:
+                ranges = [(start_ns, now_ns)]
+            else:
+                ranges = [(max(state[1] - SYNC_OVERLAP_NS, state[0]), now_ns)]
+                if start_ns < state[0]:
+                    ranges.append((start_ns, state[0]))
+
+            stats = _SyncStats()
+            windows = [window for start, end in ranges for window in split_range(start, end, self.window_ns)]
+            results = await asyncio.gather(*(self._fetch_window(account_id, stream, start, end, stats) for start, end in windows))
+            for result in results:
+                if isinstance(result, ErrorResponse):
+                    return result
+
+            items = [item for result in results for item in result]
+            # Слушатели получают новые записи в хронологическом порядке
+            order = np.argsort(timestamp_column([item.timestamp for item in items]), kind="stable") if items else []
+            items = [items[i] for i in order]
+            synced_from = min(start_ns, state[0]) if state else start_ns
+            synced_to = max(now_ns, state[1]) if state else now_ns
+
+            def save(connection: sqlite3.Connection) -> Tuple[int, int]:
+                if stream == HistoryStream.TRADES:
+                    inserted = insert_trades(connection, account_id, items)
+                else:
+                    inserted = insert_transactions(connection, account_id, items)
+                for listener in self._listeners[stream]:
+                    listener(connection, account_id, inserted)
+                set_sync_state(connection, account_id, stream.value, synced_from, synced_to)
+                stored = count_trades(connection, account_id) if stream == HistoryStream.TRADES else count_transactions(connection, account_id)
+                return len(inserted), stored
+
+            new_items, stored = await self.store.run(save)
+            logging.info(f"Синхронизация {stream.value} {account_id}: {new_items} новых записей, {stats.requests} запросов")
+            return HistorySyncResponse(
+                account_id=account_id,
+                stream=stream,
+                new_items=new_items,
+                stored_items=stored,
+                synced_from=format_timestamp(synced_from),
+                synced_to=format_timestamp(synced_to),
+                requests=stats.requests,
+                truncated_windows=stats.truncated,
+            )
+
+    async def sync_all(self, account_id: str, start_ns: int) -> List[Union[HistorySyncResponse, ErrorResponse]]:
+        return list(await asyncio.gather(*(self.sync(account_id, stream, start_ns) for stream in HistoryStream)))
+
+    async def _query(self, request: StoredHistoryRequest, stream: HistoryStream) -> Union[List[str], ErrorResponse]:
+        period = date_range_ns(request.start_date, request.end_date)
+        if isinstance(period, ErrorResponse):
+            return period
+        start_ns, end_ns = period
+        synced = await self.sync(request.account_id, stream, start_ns)
+        if isinstance(synced, ErrorResponse):
+            # Отдаем то, что уже есть локально: ошибка API не должна скрывать сохраненную историю
+            logging.warning(f"Не удалось догрузить {stream.value} {request.account_id}: {synced.error}")
+
+        table = "trades" if stream == HistoryStream.TRADES else "transactions"
+        conditions = ["account_id = ?", "timestamp BETWEEN ? AND ?"]
+        params: list = [request.account_id, start_ns, end_ns]
+        if request.symbol:
+            conditions.append("symbol = ?")
+            params.append(request.symbol)
+        if request.category is not None and stream == HistoryStream.TRANSACTIONS:
+            conditions.append("category = ?")
+            params.append(request.category.value)
+        params.append(request.limit)
+        query = f"SELECT payload FROM {table} WHERE {' AND '.join(conditions)} ORDER BY timestamp DESC LIMIT ?"
+        rows = await self.store.run(lambda connection: connection.execute(query, params).fetchall())
+        return [payload for payload, in reversed(rows)]
+
+    async def stored_trades(self, request: StoredHistoryRequest) -> Union[GetTradesResponse, ErrorResponse]:
+        payloads = await self._query(request, HistoryStream.TRADES)
+        if isinstance(payloads, ErrorResponse):
+            return payloads
+        return GetTradesResponse(trades=[AccountTrade.model_validate_json(payload) for payload in payloads])
+
+    async def stored_transactions(self, request: StoredHistoryRequest) -> Union[GetTransactionsResponse, ErrorResponse]:
+        payloads = await self._query(request, HistoryStream.TRANSACTIONS)
+        if isinstance(payloads, ErrorResponse):
+            return payloads
+        return GetTransactionsResponse(transactions=[Transaction.model_validate_json(payload) for payload in payloads])
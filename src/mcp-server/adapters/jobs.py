@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from .dispatcher import bind_session
+from .models import *
+
+
+class Job:
+    """Фоновая задача: прогресс, промежуточное состояние и итог."""
+
+    def __init__(self, kind: str):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.state = JobState.PENDING
+        self.done = 0
+        self.total = 0
+        self.error: Optional[str] = None
+        # Промежуточное состояние задачи, которое читают инструменты статуса
+        self.data: Any = None
+        self.result: Any = None
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (JobState.DONE, JobState.CANCELLED, JobState.FAILED)
+
+    def info(self) -> JobInfo:
+        return JobInfo(
+            job_id=self.job_id,
+            kind=self.kind,
+            state=self.state,
+            done=self.done,
+            total=self.total,
+            elapsed_s=(self.finished_at or time.monotonic()) - self.started_at,
+            error=self.error,
+        )
+
+
+class JobRegistry:
+    """Реестр фоновых задач сервера с отменой и очисткой завершенных задач."""
+
+    def __init__(self, max_jobs: int = 100, ttl: float = 60 * 60):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def start(self, kind: str, runner: Callable[[Job], Awaitable[Any]]) -> Job:
+        """Запуск runner(job) фоновой задачей. Результат runner сохраняется в job.result."""
+        self._prune()
+        job = Job(kind)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, runner))
+        return job
+
+    async def _run(self, job: Job, runner: Callable[[Job], Awaitable[Any]]):
+        # Запросы задачи к API идут в массовом классе и не задерживают интерактивные вызовы
+        bind_session(f"{job.kind}:{job.job_id}", background=True)
+        job.state = JobState.RUNNING
+        try:
+            job.result = await runner(job)
+            job.state = JobState.DONE
+        except asyncio.CancelledError:
+            job.state = JobState.CANCELLED
+        except Exception as e:
+            logging.exception(f"Фоновая задача {job.kind} {job.job_id} завершилась с ошибкой")
+            job.state = JobState.FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.monotonic()
+
+    def get(self, job_id: str, kind: Optional[str] = None) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or (kind is not None and job.kind != kind):
+            return None
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.finished and job.task is not None:
+            job.task.cancel()
+        return job
+
+    def _prune(self):
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+        # При переполнении вытесняем самые старые завершенные задачи, активные не трогаем
+        for job_id, job in list(self._jobs.items()):
+            if len(self._jobs) < self.max_jobs:
+                break
+            if job.finished:
+                del self._jobs[job_id]
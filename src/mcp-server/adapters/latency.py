@@ -0,0 +1,238 @@
+import bisect
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .history_sync import HistorySync
+from .models import *
+from .numeric import NANOS_IN_UNIT, timestamp_column
+
+# Верхние границы корзин гистограммы, мс
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000, 900000, 3600000)
+
+FILL_STATUSES = {
+    OrderStatus.ORDER_STATUS_PARTIALLY_FILLED,
+    OrderStatus.ORDER_STATUS_FILLED,
+    OrderStatus.ORDER_STATUS_EXECUTED,
+}
+# Заявка снята без исполнения: принятия или сделки по ней уже не будет
+CLOSED_STATUSES = {
+    OrderStatus.ORDER_STATUS_CANCELED,
+    OrderStatus.ORDER_STATUS_REJECTED,
+    OrderStatus.ORDER_STATUS_EXPIRED,
+    OrderStatus.ORDER_STATUS_FAILED,
+    OrderStatus.ORDER_STATUS_DENIED_BY_BROKER,
+    OrderStatus.ORDER_STATUS_REJECTED_BY_EXCHANGE,
+}
+
+# (этап, тип заявки, срок действия, инструмент)
+_Key = Tuple[LatencyStage, str, str, str]
+
+
+def _epoch(value: Optional[str]) -> Optional[float]:
+    """ISO-метка времени брокера в секунды UNIX; None, если метки нет или она не разбирается."""
+    if not value:
+        return None
+    try:
+        return float(timestamp_column([value])[0]) / NANOS_IN_UNIT
+    except ValueError:
+        return None
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами: постоянная память, перцентили оцениваются по корзинам."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Линейная интерполяция внутри корзины, ограниченная фактическими min/max."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS_MS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+
+@dataclass
+class _TrackedOrder:
+    order_type: str
+    time_in_force: str
+    symbol: str
+    sent_at: float
+    accepted: bool = False
+    filled: bool = False
+
+
+class OrderLatencyTracker:
+    """Замеры задержек заявок от отправки place_order: ответ API, transact_at, accept_at и первая сделка.
+
+    Отправку и ответ фиксирует OrderRouter, принятие и исполнение - OrderStateStore при обновлении
+    состояния заявок и синхронизация сделок (метка первой сделки точнее момента, когда опрос
+    увидел исполнение). Метки брокера сравниваются с локальными часами, расхождение часов входит в замер.
+    Гистограммы хранятся в памяти по этапу, типу заявки, сроку действия и инструменту.
+    """
+
+    def __init__(self, history_sync: Optional[HistorySync] = None, retention: float = 6 * 60 * 60):
+        self.retention = retention
+        self.started_at = time.time()
+        self._histograms: Dict[_Key, LatencyHistogram] = {}
+        self._orders: Dict[str, _TrackedOrder] = {}
+        # Сделки приходят из потока синхронизации истории, остальное - из цикла событий
+        self._lock = threading.Lock()
+        if history_sync is not None:
+            history_sync.add_listener(HistoryStream.TRADES, self.on_trades)
+
+    def _record(self, stage: LatencyStage, order: _TrackedOrder, ms: float):
+        key = (stage, order.order_type, order.time_in_force, order.symbol)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram()
+        histogram.add(max(ms, 0.0))
+
+    def _prune(self, now: float):
+        expired = [order_id for order_id, order in self._orders.items() if now - order.sent_at > self.retention]
+        for order_id in expired:
+            del self._orders[order_id]
+
+    def _mark_filled(self, order: _TrackedOrder, filled_at: float):
+        order.filled = True
+        self._record(LatencyStage.FILL, order, (filled_at - order.sent_at) * 1000)
+
+    def record_response(
+        self, request: PlaceOrderRequest, sent_at: float, elapsed: float, response: Union[PlaceOrderResponse, ErrorResponse]
+    ):
+        """Ответ на place_order: sent_at - время отправки (UNIX), elapsed - длительность запроса в секундах."""
+        order = _TrackedOrder(
+            order_type=request.type.value,
+            time_in_force=request.time_in_force.value,
+            symbol=request.symbol.upper(),
+            sent_at=sent_at,
+        )
+        with self._lock:
+            self._record(LatencyStage.HTTP, order, elapsed * 1000)
+            if isinstance(response, ErrorResponse):
+                return
+            transact_at = _epoch(response.transact_at)
+            if transact_at is not None:
+                self._record(LatencyStage.TRANSACT, order, (transact_at - sent_at) * 1000)
+            self._prune(sent_at)
+            self._orders[response.order_id] = order
+            if response.status in FILL_STATUSES:
+                self._mark_filled(order, sent_at + elapsed)
+
+    def observe(self, states: Iterable[OrderState]):
+        """Обновление состояния заявок: первое появление accept_at и первый статус исполнения."""
+        now = time.time()
+        with self._lock:
+            for state in states:
+                order = self._orders.get(state.order_id)
+                if order is None:
+                    continue
+                if not order.accepted:
+                    accept_at = _epoch(state.accept_at)
+                    if accept_at is not None:
+                        order.accepted = True
+                        self._record(LatencyStage.ACCEPT, order, (accept_at - order.sent_at) * 1000)
+                if not order.filled and state.status in FILL_STATUSES:
+                    self._mark_filled(order, now)
+                if (order.accepted and order.filled) or state.status in CLOSED_STATUSES:
+                    del self._orders[state.order_id]
+
+    def on_trades(self, connection: sqlite3.Connection, account_id: str, trades: List[AccountTrade]):
+        """Новые сделки счета из синхронизации истории: первая сделка по отслеживаемой заявке."""
+        with self._lock:
+            for trade in trades:
+                order = self._orders.get(trade.order_id)
+                if order is None or order.filled:
+                    continue
+                filled_at = _epoch(trade.timestamp)
+                if filled_at is not None:
+                    self._mark_filled(order, filled_at)
+                    if order.accepted:
+                        del self._orders[trade.order_id]
+
+    def report(self, symbol: Optional[str] = None, stage: Optional[LatencyStage] = None, by_symbol: bool = False) -> OrderLatencyResponse:
+        """Сводка по этапам и группам (тип заявки, срок действия, при by_symbol - инструмент)."""
+        groups: Dict[Tuple, LatencyHistogram] = {}
+        with self._lock:
+            for (key_stage, order_type, time_in_force, key_symbol), histogram in self._histograms.items():
+                if symbol is not None and key_symbol != symbol.upper():
+                    continue
+                if stage is not None and key_stage != stage:
+                    continue
+                group = (key_stage, order_type, time_in_force, key_symbol if by_symbol or symbol is not None else None)
+                groups.setdefault(group, LatencyHistogram()).merge(histogram)
+            tracked = len(self._orders)
+
+        stages = list(LatencyStage)
+        stats = [
+            LatencyStats(
+                stage=key_stage,
+                order_type=order_type,
+                time_in_force=time_in_force,
+                symbol=key_symbol,
+                count=histogram.count,
+                mean_ms=round(histogram.total / histogram.count, 1),
+                min_ms=round(histogram.min, 1),
+                max_ms=round(histogram.max, 1),
+                p50_ms=round(histogram.quantile(0.5), 1),
+                p90_ms=round(histogram.quantile(0.9), 1),
+                p99_ms=round(histogram.quantile(0.99), 1),
+            )
+            for (key_stage, order_type, time_in_force, key_symbol), histogram in sorted(
+                groups.items(), key=lambda item: (stages.index(item[0][0]), item[0][1], item[0][2], item[0][3] or "")
+            )
+        ]
+        since = datetime.fromtimestamp(self.started_at, tz=timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+        return OrderLatencyResponse(since=since, tracked_orders=tracked, stats=stats)
+
+    def prometheus(self) -> str:
+        """Гистограммы в текстовом формате Prometheus (метрика order_latency_ms)."""
+        lines = [
+            "# HELP order_latency_ms Order lifecycle latency from place_order request, milliseconds",
+            "# TYPE order_latency_ms histogram",
+        ]
+        with self._lock:
+            items = sorted(self._histograms.items(), key=lambda item: (item[0][0].value,) + item[0][1:])
+            for (stage, order_type, time_in_force, symbol), histogram in items:
+                labels = f'stage="{stage.value}",order_type="{order_type}",time_in_force="{time_in_force}",symbol="{symbol}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS_MS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'order_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'order_latency_ms_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"order_latency_ms_sum{{{labels}}} {histogram.total:.3f}")
+                lines.append(f"order_latency_ms_count{{{labels}}} {histogram.count}")
+            lines.append("# HELP order_latency_tracked_orders Orders still awaiting accept or fill")
+            lines.append("# TYPE order_latency_tracked_orders gauge")
+            lines.append(f"order_latency_tracked_orders {len(self._orders)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from .models import *
+from .numeric import timestamp_column
+
+T = TypeVar("T")
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "trader_store.sqlite3")
+
+CORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    account_id TEXT NOT NULL,
+    stream TEXT NOT NULL,
+    synced_from INTEGER NOT NULL,
+    synced_to INTEGER NOT NULL,
+    PRIMARY KEY (account_id, stream)
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    account_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    category TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    amount REAL NOT NULL,
+    trade_size REAL,
+    trade_price REAL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (account_id, id)
+);
+CREATE INDEX IF NOT EXISTS transactions_by_time ON transactions (account_id, timestamp);
+CREATE TABLE IF NOT EXISTS trades (
+    account_id TEXT NOT NULL,
+    trade_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    price REAL NOT NULL,
+    size REAL NOT NULL,
+    order_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (account_id, trade_id)
+);
+CREATE INDEX IF NOT EXISTS trades_by_time ON trades (account_id, timestamp);
+"""
+
+
+class LocalStore:
+    """Локальное хранилище истории счета в SQLite.
+
+    Путь задается переменной окружения TRADER_STORE_PATH. Запросы выполняются в отдельном
+    потоке под общей блокировкой, каждый вызов run() - одна транзакция. Модули, которым
+    нужны свои таблицы, регистрируют схему через register_schema().
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("TRADER_STORE_PATH", DEFAULT_STORE_PATH)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._schemas: List[str] = [CORE_SCHEMA]
+        self._applied = 0
+
+    def register_schema(self, ddl: str):
+        if ddl not in self._schemas:
+            self._schemas.append(ddl)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        # Схемы модулей применяются при первом обращении после регистрации
+        while self._applied < len(self._schemas):
+            self._connection.executescript(self._schemas[self._applied])
+            self._applied += 1
+        return self._connection
+
+    def _run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return fn(connection)
+
+    async def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Выполнение fn(connection) в одной транзакции, не блокируя event loop."""
+        return await asyncio.to_thread(self._run, fn)
+
+
+def get_sync_state(connection: sqlite3.Connection, account_id: str, stream: str) -> Optional[Tuple[int, int]]:
+    """Синхронизированный период потока (наносекунды UTC) или None, если синхронизации не было."""
+    row = connection.execute(
+        "SELECT synced_from, synced_to FROM sync_state WHERE account_id = ? AND stream = ?",
+        (account_id, stream),
+    ).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def set_sync_state(connection: sqlite3.Connection, account_id: str, stream: str, synced_from: int, synced_to: int):
+    connection.execute(
+        """INSERT INTO sync_state (account_id, stream, synced_from, synced_to) VALUES (?, ?, ?, ?)
+           ON CONFLICT (account_id, stream) DO UPDATE SET synced_from = excluded.synced_from, synced_to = excluded.synced_to""",
+        (account_id, stream, synced_from, synced_to),
+    )
+
+
+def _optional_float(value: Optional[DecimalValue]) -> Optional[float]:
+    return float(value.value) if value is not None and value.value else None
+
+
+def insert_transactions(connection: sqlite3.Connection, account_id: str, transactions: Sequence[Transaction]) -> List[Transaction]:
+    """Сохранение транзакций с дедупликацией по id. Возвращает только новые транзакции."""
+    if not transactions:
+        return []
+    timestamps = timestamp_column([transaction.timestamp for transaction in transactions])
+    inserted = []
+    for transaction, timestamp in zip(transactions, timestamps.tolist()):
+        trade = transaction.trade
+        cursor = connection.execute(
+            """INSERT OR IGNORE INTO transactions
+               (account_id, id, timestamp, symbol, category, currency, amount, trade_size, trade_price, payload)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                account_id,
+                transaction.id,
+                timestamp,
+                transaction.symbol,
+                transaction.transaction_category.value,
+                transaction.change.currency_code,
+                int(transaction.change.units) + transaction.change.nanos / 1e9,
+                _optional_float(trade.size) if trade else None,
+                _optional_float(trade.price) if trade else None,
+                transaction.model_dump_json(),
+            ),
+        )
+        if cursor.rowcount:
+            inserted.append(transaction)
+    return inserted
+
+
+def insert_trades(connection: sqlite3.Connection, account_id: str, trades: Sequence[AccountTrade]) -> List[AccountTrade]:
+    """Сохранение сделок счета с дедупликацией по trade_id. Возвращает только новые сделки."""
+    if not trades:
+        return []
+    timestamps = timestamp_column([trade.timestamp for trade in trades])
+    inserted = []
+    for trade, timestamp in zip(trades, timestamps.tolist()):
+        cursor = connection.execute(
+            """INSERT OR IGNORE INTO trades
+               (account_id, trade_id, timestamp, symbol, side, price, size, order_id, payload)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                account_id,
+                trade.trade_id,
+                timestamp,
+                trade.symbol,
+                trade.side.value,
+                float(trade.price.value),
+                float(trade.size.value),
+                trade.order_id,
+                trade.model_dump_json(),
+            ),
+        )
+        if cursor.rowcount:
+            inserted.append(trade)
+    return inserted
+
+
+def count_transactions(connection: sqlite3.Connection, account_id: str) -> int:
+    return connection.execute("SELECT COUNT(*) FROM transactions WHERE account_id = ?", (account_id,)).fetchone()[0]
+
+
+def count_trades(connection: sqlite3.Connection, account_id: str) -> int:
+    return connection.execute("SELECT COUNT(*) FROM trades WHERE account_id = ?", (account_id,)).fetchone()[0]
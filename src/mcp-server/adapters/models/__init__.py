@@ -6,6 +6,24 @@ from .marketdata import *
 from .orders import *
 from .streams import *
 from .error import *
+from .tape import *
+from .snapshot import *
+from .scanner import *
+from .jobs import *
+from .backtest import *
+from .portfolio import *
+from .rebalance import *
+from .history import *
+from .pairs import *
+from .charts import *
+from .batch import *
+from .order_cache import *
+from .pretrade import *
+from .latency import *
+from .multi_account import *
+from .pnl import *
+from .cashflow import *
+from .fx import *
 
 __all__ = [
     # Common
@@ -33,7 +51,7 @@ __all__ = [
     "Bar", "BarsResponse", "QuoteOption", "Quote", "LastQuoteResponse", 
     "Trade", "LatestTradesResponse", "OrderBookRow", "OrderBook", 
     "OrderBookResponse", "BarsRequest", "QuoteRequest", "OrderBookRequest", 
-    "LatestTradesRequest",
+    "LatestTradesRequest", "DownsampleMethod", "BarsSummary", "DownsampledBarsResponse",
     
     # Orders
     "Leg", "Order", "OrderState", "CancelOrderResponse", "GetOrderResponse", 
@@ -49,5 +67,62 @@ __all__ = [
     "SubscribeBarsRequest", "SubscribeLatestTradesRequest",
 
     # Error
-    "ErrorResponse"
+    "ErrorResponse",
+
+    # Tape
+    "TapeWindowStats", "TradeTapeResponse",
+
+    # Snapshot
+    "SnapshotPart", "SnapshotOrderBook", "MarketSnapshotResponse",
+
+    # Scanner
+    "ScanSortField", "ScanRequest", "ScanRow", "ScanResponse",
+
+    # Jobs
+    "JobState", "JobInfo",
+
+    # Backtest
+    "StrategyType", "BacktestRequest", "BacktestTrade", "BacktestMetrics", "EquityPoint", "BacktestReport",
+    "SweepParameterName", "SweepParameter", "SweepMode", "SweepRankField", "SweepRequest", "SweepResult", "SweepStatus",
+
+    # Portfolio
+    "PortfolioAnalyticsRequest", "PositionAnalytics", "BenchmarkComparison", "CorrelationMatrix", "PortfolioAnalyticsResponse",
+    "PortfolioHistoryRequest", "PortfolioValuePoint", "PortfolioHistoryResponse",
+
+    # Rebalance
+    "TargetWeight", "RebalanceRequest", "RebalanceLine", "RebalanceResponse",
+
+    # History
+    "HistoryStream", "HistorySyncResponse", "StoredHistoryRequest",
+
+    # Pairs
+    "PairsSearchRequest", "PairStats", "PairsSearchStatus",
+
+    # Charts
+    "ChartKind", "ChartPayload",
+
+    # Batch
+    "BatchItemStatus", "BatchPlaceOrdersRequest", "BatchCancelOrdersRequest", "BatchItemResult", "BatchOrdersResponse",
+
+    # Order cache
+    "OrderDataSource", "OrderFreshness", "CachedOrdersResponse", "CachedOrderResponse",
+
+    # Pre-trade
+    "IssueSeverity", "PreTradeIssue", "PreTradeCheckResponse",
+
+    # Latency
+    "LatencyStage", "LatencyStats", "OrderLatencyResponse",
+
+    # Multi-account
+    "AccountFailure", "AccountSource", "CachedAccountResponse", "AccountSummary", "AllAccountsSummaryResponse",
+    "AccountOrdersSource", "AllOpenOrdersResponse", "PositionShare", "CombinedPosition", "CombinedPositionsResponse",
+
+    # PnL
+    "PnLRequest", "PnLLot", "SymbolPnL", "PnLResponse",
+
+    # Cash flow
+    "CashFlowPeriod", "CashFlowRequest", "CashFlowTotal", "CurrencyNet", "CashFlowPoint", "CashFlowSeries", "CashFlowResponse",
+
+    # FX
+    "FxRate", "PortfolioValuationRequest", "ValuedPosition", "CashBalance", "PortfolioValuationResponse",
 ]
\ No newline at end of file
@@ -0,0 +1,127 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from enum import Enum
+from .common import Interval, TimeFrame
+from .jobs import JobInfo
+from .charts import CHART_ID_DESCRIPTION
+
+class StrategyType(str, Enum):
+    """Тип стратегии бэктеста."""
+    SPREAD_THRESHOLD = "spread_threshold"
+    ZSCORE_REVERSION = "zscore_reversion"
+    SMA_CROSS = "sma_cross"
+
+class BacktestRequest(BaseModel):
+    """Параметры бэктеста стратегии на исторических свечах."""
+    strategy: StrategyType = Field(description="spread_threshold - вход при отклонении спреда на entry_threshold пунктов и выход при возврате к exit_threshold; zscore_reversion - то же для z-score (в сигмах); sma_cross - пересечение быстрой и медленной скользящих средних")
+    symbol: str = Field(description="Основной инструмент ticker@mic")
+    second_symbol: Optional[str] = Field(None, description="Второй инструмент для парной стратегии (спред = symbol - hedge_ratio * second_symbol)")
+    hedge_ratio: float = Field(1.0, description="Коэффициент хеджирования второго инструмента")
+    timeframe: TimeFrame = Field(TimeFrame.TIME_FRAME_H1, description="Таймфрейм свечей")
+    interval: Optional[Interval] = Field(None, description="Период бэктеста. Если не указан - последние days дней")
+    days: int = Field(90, description="Длина периода в днях, если interval не указан")
+    entry_threshold: float = Field(2.0, description="Порог входа: пункты спреда для spread_threshold, сигмы для zscore_reversion")
+    exit_threshold: float = Field(0.5, description="Порог выхода (меньше порога входа)")
+    lookback: int = Field(50, description="Окно z-score в свечах")
+    fast_window: int = Field(10, description="Быстрая скользящая средняя для sma_cross")
+    slow_window: int = Field(30, description="Медленная скользящая средняя для sma_cross")
+    allow_short: bool = Field(True, description="Разрешены ли короткие позиции")
+    quantity: float = Field(1.0, description="Размер позиции в шт. (на каждую ногу)")
+    commission_pct: float = Field(0.0, description="Комиссия в процентах от оборота сделки")
+    initial_capital: Optional[float] = Field(None, description="Начальный капитал для расчета доходности в процентах")
+    max_trades: int = Field(20, description="Сколько последних сделок вернуть в отчете")
+    equity_points: int = Field(100, description="Число точек прореженной кривой капитала в отчете")
+
+class BacktestTrade(BaseModel):
+    """Сделка бэктеста (полный цикл вход-выход)."""
+    side: str = Field(description="LONG или SHORT (для пары - по спреду)")
+    entry_time: str = Field(description="Время входа")
+    exit_time: Optional[str] = Field(None, description="Время выхода (пусто, если позиция открыта на конец периода)")
+    entry_price: float = Field(description="Цена (спред) входа")
+    exit_price: float = Field(description="Цена (спред) выхода или последняя")
+    pnl: float = Field(description="Результат сделки с учетом комиссий")
+
+class BacktestMetrics(BaseModel):
+    """Метрики бэктеста."""
+    total_pnl: float = Field(description="Итоговый результат с учетом комиссий")
+    return_pct: Optional[float] = Field(None, description="Доходность к начальному капиталу, %")
+    max_drawdown: float = Field(description="Максимальная просадка кривой капитала в абсолютных единицах")
+    max_drawdown_pct: Optional[float] = Field(None, description="Максимальная просадка к капиталу, %")
+    trades: int = Field(description="Количество сделок")
+    win_rate: Optional[float] = Field(None, description="Доля прибыльных сделок, %")
+    avg_trade_pnl: Optional[float] = Field(None, description="Средний результат сделки")
+    sharpe: Optional[float] = Field(None, description="Годовой коэффициент Шарпа по приращениям кривой капитала")
+    exposure_pct: float = Field(description="Доля времени в позиции, %")
+    fees: float = Field(description="Суммарные комиссии")
+
+class EquityPoint(BaseModel):
+    """Точка кривой капитала."""
+    timestamp: str = Field(description="Метка времени")
+    equity: float = Field(description="Накопленный результат")
+
+class BacktestReport(BaseModel):
+    """Компактный отчет бэктеста."""
+    strategy: StrategyType = Field(description="Стратегия")
+    symbols: List[str] = Field(description="Инструменты")
+    bars: int = Field(description="Количество свечей в расчете")
+    start: Optional[str] = Field(None, description="Начало периода")
+    end: Optional[str] = Field(None, description="Конец периода")
+    metrics: BacktestMetrics = Field(description="Метрики")
+    trades: List[BacktestTrade] = Field(description="Последние сделки")
+    equity_curve: List[EquityPoint] = Field(description="Прореженная кривая капитала")
+    elapsed_ms: float = Field(description="Время расчета, мс")
+    chart_id: Optional[str] = Field(None, description=CHART_ID_DESCRIPTION)
+
+class SweepParameterName(str, Enum):
+    """Параметр стратегии, перебираемый в оптимизации."""
+    ENTRY_THRESHOLD = "entry_threshold"
+    EXIT_THRESHOLD = "exit_threshold"
+    LOOKBACK = "lookback"
+    FAST_WINDOW = "fast_window"
+    SLOW_WINDOW = "slow_window"
+    HEDGE_RATIO = "hedge_ratio"
+
+class SweepParameter(BaseModel):
+    """Диапазон значений параметра: явный список values или сетка start..stop с шагом step."""
+    name: SweepParameterName = Field(description="Параметр стратегии")
+    values: Optional[List[float]] = Field(None, description="Явный список значений")
+    start: Optional[float] = Field(None, description="Начало сетки")
+    stop: Optional[float] = Field(None, description="Конец сетки (включительно)")
+    step: Optional[float] = Field(None, description="Шаг сетки")
+
+class SweepMode(str, Enum):
+    """Способ перебора: полная сетка или случайная выборка из нее."""
+    GRID = "grid"
+    RANDOM = "random"
+
+class SweepRankField(str, Enum):
+    """Метрика ранжирования результатов оптимизации."""
+    SHARPE = "sharpe"
+    TOTAL_PNL = "total_pnl"
+    WIN_RATE = "win_rate"
+    MAX_DRAWDOWN = "max_drawdown"
+
+class SweepRequest(BaseModel):
+    """Оптимизация параметров стратегии перебором по истории."""
+    base: BacktestRequest = Field(description="Базовые параметры бэктеста; перебираемые параметры подставляются поверх")
+    parameters: List[SweepParameter] = Field(description="Перебираемые параметры")
+    mode: SweepMode = Field(SweepMode.GRID, description="grid - все комбинации, random - случайная выборка samples комбинаций")
+    samples: int = Field(500, description="Размер случайной выборки для mode=random")
+    rank_by: SweepRankField = Field(SweepRankField.SHARPE, description="Метрика ранжирования (max_drawdown - чем меньше, тем лучше)")
+    min_trades: int = Field(5, description="Минимум сделок, чтобы результат попал в рейтинг")
+    top_n: int = Field(10, description="Сколько лучших комбинаций хранить и возвращать")
+    seed: Optional[int] = Field(None, description="Зерно генератора для mode=random")
+
+class SweepResult(BaseModel):
+    """Результат одной комбинации параметров."""
+    params: Dict[str, float] = Field(description="Значения перебираемых параметров")
+    metrics: BacktestMetrics = Field(description="Метрики бэктеста")
+
+class SweepStatus(BaseModel):
+    """Прогресс оптимизации и текущие лучшие комбинации."""
+    job: JobInfo = Field(description="Состояние фоновой задачи")
+    combinations: int = Field(0, description="Всего комбинаций к расчету")
+    bars: int = Field(0, description="Свечей в истории")
+    evaluated: int = Field(0, description="Рассчитано комбинаций")
+    skipped: int = Field(0, description="Пропущено недопустимых комбинаций")
+    best: List[SweepResult] = Field(default_factory=list, description="Лучшие комбинации на текущий момент")
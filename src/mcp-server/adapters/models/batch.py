@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from enum import Enum
+from .common import OrderStatus
+from .orders import PlaceOrderRequest
+
+class BatchItemStatus(str, Enum):
+    """Итог обработки элемента пакета."""
+    SENT = "sent"
+    INVALID = "invalid"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+class BatchPlaceOrdersRequest(BaseModel):
+    """Пакет заявок одного счета."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    orders: List[PlaceOrderRequest] = Field(description="Заявки; по одному инструменту отправляются строго в указанном порядке")
+    sells_first: bool = Field(False, description="Сначала отправить все продажи, затем покупки (для ребалансировки, чтобы покупки использовали освободившиеся деньги)")
+    stop_on_error: bool = Field(True, description="При ошибке заявки не отправлять следующие заявки того же инструмента")
+    allow_repeat: bool = Field(False, description="Отправлять заявки, совпадающие по содержимому с недавно отправленными (иначе они считаются повтором и не отправляются)")
+
+class BatchCancelOrdersRequest(BaseModel):
+    """Пакетная отмена заявок счета: по списку идентификаторов и/или всех активных заявок по инструментам."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    order_ids: Optional[List[str]] = Field(None, description="Идентификаторы заявок")
+    symbols: Optional[List[str]] = Field(None, description="Отменить все активные заявки по этим инструментам ticker@mic")
+    all_active: bool = Field(False, description="Отменить все активные заявки счета")
+
+class BatchItemResult(BaseModel):
+    """Результат по одному элементу пакета."""
+    index: int = Field(description="Номер элемента в пакете")
+    symbol: Optional[str] = Field(None, description="Инструмент")
+    order_id: Optional[str] = Field(None, description="Идентификатор заявки")
+    client_order_id: Optional[str] = Field(None, description="Клиентский идентификатор заявки, по нему заявку можно найти в get_orders")
+    status: BatchItemStatus = Field(description="Итог обработки")
+    order_status: Optional[OrderStatus] = Field(None, description="Статус заявки по ответу брокера")
+    error: Optional[str] = Field(None, description="Причина ошибки или пропуска")
+    suggested_order: Optional[PlaceOrderRequest] = Field(None, description="Исправленная заявка, если ошибки проверки исправимы автоматически")
+
+class BatchOrdersResponse(BaseModel):
+    """Результат пакетной операции с заявками."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    results: List[BatchItemResult] = Field(description="Результаты в порядке элементов пакета")
+    sent: int = Field(description="Успешно отправлено")
+    failed: int = Field(description="Ошибки валидации и отказы API")
+    skipped: int = Field(description="Пропущено из-за ошибки предыдущей заявки")
+    elapsed_ms: float = Field(description="Время выполнения, мс")
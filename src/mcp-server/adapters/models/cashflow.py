@@ -0,0 +1,63 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from enum import Enum
+from .accounts import TransactionCategory
+
+class CashFlowPeriod(str, Enum):
+    """Период группировки денежных потоков."""
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class CashFlowRequest(BaseModel):
+    """Запрос сводки денежных потоков счета по категориям транзакций."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    start_date: Optional[str] = Field(None, description="Начало периода YYYY-MM-DD. По умолчанию - 365 дней назад")
+    end_date: Optional[str] = Field(None, description="Конец периода YYYY-MM-DD включительно. По умолчанию - сегодня")
+    period: CashFlowPeriod = Field(CashFlowPeriod.MONTH, description="Группировка рядов: day, week (с понедельника) или month")
+    categories: Optional[List[TransactionCategory]] = Field(None, description="Только эти категории. По умолчанию - все")
+    currency: Optional[str] = Field(None, description="Только эта валюта, например RUB")
+    symbol: Optional[str] = Field(None, description="Фильтр по инструменту")
+    include_series: bool = Field(True, description="Включить ряды по периодам")
+
+class CashFlowTotal(BaseModel):
+    """Итог по категории и валюте за весь период."""
+    category: TransactionCategory = Field(description="Категория транзакций")
+    currency: str = Field(description="Валюта")
+    amount: float = Field(description="Сальдо: поступления минус списания")
+    inflow: float = Field(description="Поступления")
+    outflow: float = Field(description="Списания (положительное число)")
+    count: int = Field(description="Количество транзакций")
+
+class CurrencyNet(BaseModel):
+    """Сальдо по валюте по всем выбранным категориям."""
+    currency: str = Field(description="Валюта")
+    amount: float = Field(description="Сальдо")
+    inflow: float = Field(description="Поступления")
+    outflow: float = Field(description="Списания (положительное число)")
+
+class CashFlowPoint(BaseModel):
+    """Значение ряда за один период."""
+    period_start: str = Field(description="Начало периода YYYY-MM-DD (UTC)")
+    amount: float = Field(description="Сальдо")
+    inflow: float = Field(description="Поступления")
+    outflow: float = Field(description="Списания (положительное число)")
+    count: int = Field(description="Количество транзакций")
+
+class CashFlowSeries(BaseModel):
+    """Ряд по категории и валюте; периоды без транзакций пропущены."""
+    category: TransactionCategory = Field(description="Категория транзакций")
+    currency: str = Field(description="Валюта")
+    points: List[CashFlowPoint] = Field(description="Периоды по возрастанию")
+
+class CashFlowResponse(BaseModel):
+    """Сводка денежных потоков счета."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    period_from: str = Field(description="Начало периода")
+    period_to: str = Field(description="Конец периода")
+    period: CashFlowPeriod = Field(description="Группировка рядов")
+    totals: List[CashFlowTotal] = Field(description="Итоги по категориям и валютам по убыванию абсолютного сальдо")
+    net: List[CurrencyNet] = Field(description="Сальдо по валютам")
+    series: List[CashFlowSeries] = Field(default_factory=list, description="Ряды по периодам (если include_series)")
+    new_transactions: int = Field(0, description="Новых транзакций загружено при этом вызове")
+    warnings: List[str] = Field(default_factory=list, description="Предупреждения о неполноте данных")
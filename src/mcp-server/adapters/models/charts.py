@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List
+from enum import Enum
+
+# Описание поля chart_id в ответах инструментов, к которым прикладывается график
+CHART_ID_DESCRIPTION = "График для интерфейса: вставь в ответ маркер [[chart:<chart_id>]] там, где его нужно показать"
+
+class ChartKind(str, Enum):
+    """Тип графика для интерфейса."""
+    CANDLES = "candles"
+    LINE = "line"
+    SUNBURST = "sunburst"
+    TABLE = "table"
+
+class ChartPayload(BaseModel):
+    """Данные графика в колоночном виде, готовые к отрисовке без пересчета.
+
+    Колонки одинаковой длины; время - миллисекунды UNIX (колонка meta["x"]).
+    Ряды уже прорежены на стороне сервера.
+    """
+    chart_id: str = Field(description="Идентификатор графика")
+    kind: ChartKind = Field(description="Тип графика")
+    title: str = Field(description="Заголовок")
+    columns: Dict[str, List[Any]] = Field(description="Колонки данных")
+    meta: Dict[str, Any] = Field(default_factory=dict, description="Подсказки отрисовки: ось x, ряды, подписи")
@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class FxRate(BaseModel):
+    """Курс валюты к базовой валюте."""
+    currency: str = Field(description="Валюта")
+    base_currency: str = Field(description="Базовая валюта")
+    rate: float = Field(description="Стоимость одной единицы валюты в базовой валюте")
+    symbols: List[str] = Field(description="Инструменты, по котировкам которых получен курс (кросс-курсы - через рубль)")
+    age_s: float = Field(description="Возраст самой старой использованной котировки, сек")
+
+class PortfolioValuationRequest(BaseModel):
+    """Запрос оценки счета в одной валюте."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    base_currency: str = Field("RUB", description="Валюта оценки, например RUB, USD, CNY")
+    max_age_s: Optional[float] = Field(None, description="Максимальный возраст данных счета, сек")
+
+class ValuedPosition(BaseModel):
+    """Позиция с оценкой в валюте инструмента и в базовой валюте."""
+    symbol: str = Field(description="Символ инструмента")
+    currency: str = Field(description="Валюта котировки инструмента")
+    quantity: float = Field(description="Количество со знаком")
+    current_price: Optional[float] = Field(None, description="Текущая цена в валюте инструмента (нет цены - пусто)")
+    market_value: Optional[float] = Field(None, description="Рыночная стоимость в валюте инструмента; пусто, если нет цены или цена не в деньгах за штуку (фьючерсы, опционы, облигации)")
+    market_value_base: Optional[float] = Field(None, description="Рыночная стоимость в базовой валюте (нет курса - пусто)")
+    unrealized_pnl: float = Field(description="Нереализованная прибыль в валюте инструмента")
+    unrealized_pnl_base: Optional[float] = Field(None, description="Нереализованная прибыль в базовой валюте")
+    weight_pct: Optional[float] = Field(None, description="Доля в стоимости счета, %")
+
+class CashBalance(BaseModel):
+    """Денежный остаток в валюте и в базовой валюте."""
+    currency: str = Field(description="Валюта")
+    amount: float = Field(description="Сумма в валюте")
+    amount_base: Optional[float] = Field(None, description="Сумма в базовой валюте")
+
+class PortfolioValuationResponse(BaseModel):
+    """Стоимость счета в базовой валюте."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    base_currency: str = Field(description="Базовая валюта")
+    positions: List[ValuedPosition] = Field(description="Позиции по убыванию абсолютной стоимости в базовой валюте")
+    cash: List[CashBalance] = Field(description="Денежные остатки по валютам")
+    positions_value: float = Field(description="Стоимость оцененных позиций в базовой валюте")
+    cash_value: float = Field(description="Деньги в базовой валюте")
+    total_value: float = Field(description="Итого: позиции плюс деньги в базовой валюте")
+    unrealized_pnl: float = Field(description="Нереализованная прибыль в базовой валюте")
+    rates: List[FxRate] = Field(description="Использованные курсы")
+    warnings: List[str] = Field(default_factory=list, description="Позиции и суммы, которые не удалось пересчитать, и допущения о валюте")
@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from enum import Enum
+from .accounts import TransactionCategory
+
+class HistoryStream(str, Enum):
+    """Поток истории счета."""
+    TRADES = "trades"
+    TRANSACTIONS = "transactions"
+
+class HistorySyncResponse(BaseModel):
+    """Результат синхронизации потока истории счета с локальным хранилищем."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    stream: HistoryStream = Field(description="Поток истории")
+    new_items: int = Field(description="Новых записей сохранено")
+    stored_items: int = Field(description="Всего записей в хранилище")
+    synced_from: str = Field(description="Начало синхронизированного периода")
+    synced_to: str = Field(description="Конец синхронизированного периода")
+    requests: int = Field(description="Выполнено запросов к API")
+    truncated_windows: int = Field(0, description="Окон, где даже минимальный интервал упирался в лимит (данные могли быть обрезаны)")
+
+class StoredHistoryRequest(BaseModel):
+    """Запрос истории счета из локального хранилища (перед выдачей догружается хвост)."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    start_date: Optional[str] = Field(None, description="Начало периода YYYY-MM-DD. По умолчанию - 365 дней назад")
+    end_date: Optional[str] = Field(None, description="Конец периода YYYY-MM-DD включительно. По умолчанию - сегодня")
+    symbol: Optional[str] = Field(None, description="Фильтр по инструменту")
+    category: Optional[TransactionCategory] = Field(None, description="Фильтр по категории (только для транзакций)")
+    limit: int = Field(500, description="Максимум записей (последние по времени)")
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from enum import Enum
+
+class JobState(str, Enum):
+    """Состояние фоновой задачи."""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+class JobInfo(BaseModel):
+    """Информация о фоновой задаче и ее прогрессе."""
+    job_id: str = Field(description="Идентификатор задачи")
+    kind: str = Field(description="Тип задачи")
+    state: JobState = Field(description="Состояние")
+    done: int = Field(0, description="Выполнено шагов")
+    total: int = Field(0, description="Всего шагов (0 - еще неизвестно)")
+    elapsed_s: float = Field(0.0, description="Время выполнения, с")
+    error: Optional[str] = Field(None, description="Ошибка, если задача завершилась неудачно")
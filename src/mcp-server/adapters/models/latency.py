@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from enum import Enum
+
+class LatencyStage(str, Enum):
+    """Этап жизненного цикла заявки; задержка отсчитывается от отправки запроса place_order."""
+    HTTP = "http"
+    TRANSACT = "transact"
+    ACCEPT = "accept"
+    FILL = "fill"
+
+class LatencyStats(BaseModel):
+    """Распределение задержки этапа по группе заявок."""
+    stage: LatencyStage = Field(description="Этап: http - ответ API, transact - transact_at, accept - accept_at, fill - первая сделка")
+    order_type: Optional[str] = Field(None, description="Тип заявки (None - все типы)")
+    time_in_force: Optional[str] = Field(None, description="Срок действия (None - все)")
+    symbol: Optional[str] = Field(None, description="Инструмент (None - все)")
+    count: int = Field(description="Количество замеров")
+    mean_ms: float = Field(description="Среднее, мс")
+    min_ms: float = Field(description="Минимум, мс")
+    max_ms: float = Field(description="Максимум, мс")
+    p50_ms: float = Field(description="Медиана (оценка по корзинам гистограммы), мс")
+    p90_ms: float = Field(description="90-й перцентиль (оценка), мс")
+    p99_ms: float = Field(description="99-й перцентиль (оценка), мс")
+
+class OrderLatencyResponse(BaseModel):
+    """Задержки жизненного цикла заявок с момента запуска сервера."""
+    since: str = Field(description="Начало сбора статистики")
+    tracked_orders: int = Field(description="Заявок, для которых еще ожидаются принятие или исполнение")
+    stats: List[LatencyStats] = Field(description="Статистика по этапам и группам")
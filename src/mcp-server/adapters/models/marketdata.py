@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from enum import Enum
 from .common import DecimalValue, Side, TimeFrame, Interval, OrderBookAction
+from .charts import CHART_ID_DESCRIPTION
 
 class Bar(BaseModel):
     """Структура агрегированной свечи."""
@@ -99,4 +101,30 @@ class OrderBookRequest(BaseModel):
 
 class LatestTradesRequest(BaseModel):
     """Запрос списка последних сделок по инструменту."""
-    symbol: str = Field(description="Символ инструмента")
\ No newline at end of file
+    symbol: str = Field(description="Символ инструмента")
+
+class DownsampleMethod(str, Enum):
+    """Метод прореживания ряда свечей."""
+    OHLC = "ohlc"
+    LTTB = "lttb"
+
+class BarsSummary(BaseModel):
+    """Сводная статистика по исходному (непрореженному) ряду свечей."""
+    count: int = Field(description="Количество свечей в исходном ряду")
+    start: Optional[str] = Field(None, description="Метка времени первой свечи")
+    end: Optional[str] = Field(None, description="Метка времени последней свечи")
+    open: Optional[float] = Field(None, description="Цена открытия первой свечи")
+    close: Optional[float] = Field(None, description="Цена закрытия последней свечи")
+    high: Optional[float] = Field(None, description="Максимальная цена за период")
+    low: Optional[float] = Field(None, description="Минимальная цена за период")
+    change_pct: Optional[float] = Field(None, description="Изменение цены за период в процентах")
+    volume: float = Field(description="Суммарный объем за период")
+    volatility_pct: Optional[float] = Field(None, description="Стандартное отклонение доходностей свечей в процентах")
+    max_drawdown_pct: Optional[float] = Field(None, description="Максимальная просадка по ценам закрытия в процентах")
+
+class DownsampledBarsResponse(BarsResponse):
+    """Прореженный ряд свечей со сводной статистикой исходного ряда."""
+    original_count: int = Field(description="Количество свечей до прореживания")
+    method: DownsampleMethod = Field(description="Метод прореживания")
+    summary: BarsSummary = Field(description="Статистика по исходному ряду")
+    chart_id: Optional[str] = Field(None, description=CHART_ID_DESCRIPTION)
@@ -0,0 +1,85 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from .accounts import GetAccountResponse
+from .common import DecimalValue, Money
+from .order_cache import OrderFreshness
+from .orders import OrderState
+
+class AccountFailure(BaseModel):
+    """Счет, данные которого получить не удалось."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    status_code: int = Field(description="Код ошибки")
+    error: str = Field(description="Описание ошибки")
+
+class AccountSource(BaseModel):
+    """Происхождение данных счета."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    cached: bool = Field(description="Данные взяты из кэша без запроса к API")
+    age_s: float = Field(description="Возраст данных, сек")
+    stale: bool = Field(False, description="Снимок старше обычного срока свежести: отдан сразу, обновление идет в фоне")
+
+class CachedAccountResponse(GetAccountResponse):
+    """Снимок счета из кэша с возрастом данных."""
+    source: AccountSource = Field(description="Происхождение и возраст данных")
+
+class AccountSummary(BaseModel):
+    """Сводка по одному счету."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    type: str = Field(description="Тип аккаунта")
+    status: str = Field(description="Статус аккаунта")
+    equity: DecimalValue = Field(description="Доступные средства плюс стоимость открытых позиций")
+    unrealized_profit: DecimalValue = Field(description="Нереализованная прибыль")
+    cash: List[Money] = Field(description="Собственные денежные средства по валютам")
+    positions: int = Field(description="Количество позиций")
+    currency: str = Field(description="Валюта equity счета")
+    equity_base: Optional[DecimalValue] = Field(None, description="equity в базовой валюте сводки (нет курса - пусто)")
+    unrealized_profit_base: Optional[DecimalValue] = Field(None, description="Нереализованная прибыль в базовой валюте сводки (нет курса - пусто)")
+    source: AccountSource = Field(description="Происхождение данных")
+
+class AllAccountsSummaryResponse(BaseModel):
+    """Сводка по всем счетам токена."""
+    accounts: List[AccountSummary] = Field(description="Счета")
+    base_currency: str = Field(description="Базовая валюта итогов")
+    total_equity: DecimalValue = Field(description="Сумма equity счетов в базовой валюте")
+    total_unrealized_profit: DecimalValue = Field(description="Суммарная нереализованная прибыль по счетам в базовой валюте")
+    warnings: List[str] = Field(default_factory=list, description="Суммы, не вошедшие в итоги (нет курса валюты)")
+    failures: List[AccountFailure] = Field(default_factory=list, description="Счета, по которым не удалось получить данные")
+    elapsed_ms: float = Field(description="Время выполнения, мс")
+
+class AccountOrdersSource(BaseModel):
+    """Происхождение заявок счета."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    active_orders: int = Field(description="Активных заявок")
+    freshness: OrderFreshness = Field(description="Свежесть данных")
+
+class AllOpenOrdersResponse(BaseModel):
+    """Активные заявки всех счетов; счет каждой заявки - в order.account_id."""
+    orders: List[OrderState] = Field(description="Активные заявки")
+    accounts: List[AccountOrdersSource] = Field(description="Происхождение данных по счетам")
+    failures: List[AccountFailure] = Field(default_factory=list, description="Счета, по которым не удалось получить заявки")
+    elapsed_ms: float = Field(description="Время выполнения, мс")
+
+class PositionShare(BaseModel):
+    """Часть объединенной позиции на одном счете."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    quantity: DecimalValue = Field(description="Количество со знаком")
+    average_price: Optional[DecimalValue] = Field(None, description="Средняя цена на счете")
+    unrealized_pnl: DecimalValue = Field(description="Нереализованная прибыль на счете")
+
+class CombinedPosition(BaseModel):
+    """Позиция по инструменту, объединенная по счетам."""
+    symbol: str = Field(description="Символ инструмента")
+    quantity: DecimalValue = Field(description="Суммарное количество со знаком")
+    average_price: Optional[DecimalValue] = Field(None, description="Средняя цена, взвешенная по количеству (если известна на всех счетах)")
+    current_price: DecimalValue = Field(description="Текущая цена")
+    market_value: Optional[DecimalValue] = Field(None, description="Рыночная стоимость суммарной позиции; не заполняется для фьючерсов, опционов и облигаций (цена в пунктах или % номинала)")
+    unrealized_pnl: DecimalValue = Field(description="Суммарная нереализованная прибыль")
+    accounts: List[PositionShare] = Field(description="Разбивка по счетам")
+
+class CombinedPositionsResponse(BaseModel):
+    """Позиции всех счетов, объединенные по инструментам."""
+    positions: List[CombinedPosition] = Field(description="Позиции по убыванию абсолютной рыночной стоимости; позиции без стоимости - в конце")
+    sources: List[AccountSource] = Field(description="Происхождение данных по счетам")
+    warnings: List[str] = Field(default_factory=list, description="Позиции, стоимость которых не рассчитана или рассчитана с допущением")
+    failures: List[AccountFailure] = Field(default_factory=list, description="Счета, по которым не удалось получить позиции")
+    elapsed_ms: float = Field(description="Время выполнения, мс")
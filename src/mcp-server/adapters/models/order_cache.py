@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from enum import Enum
+from .orders import GetOrderResponse, GetOrdersResponse
+
+class OrderDataSource(str, Enum):
+    """Откуда получено последнее состояние заявок."""
+    STREAM = "stream"
+    POLL = "poll"
+    API = "api"
+    LOCAL = "local"
+
+class OrderFreshness(BaseModel):
+    """Свежесть локального состояния заявок."""
+    source: OrderDataSource = Field(description="Источник последнего обновления")
+    live: bool = Field(description="Подписка на заявки активна: состояние обновляется сразу при изменениях")
+    age_s: float = Field(description="Секунд с последнего подтверждения состояния брокером (0 при активной подписке)")
+    poll_interval_s: Optional[float] = Field(None, description="Текущий интервал опроса, если подписка недоступна")
+
+class CachedOrdersResponse(GetOrdersResponse):
+    """Список заявок из локального состояния с метаданными свежести."""
+    freshness: OrderFreshness = Field(description="Свежесть данных")
+
+class CachedOrderResponse(GetOrderResponse):
+    """Заявка из локального состояния с метаданными свежести."""
+    freshness: OrderFreshness = Field(description="Свежесть данных")
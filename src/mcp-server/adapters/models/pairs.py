@@ -0,0 +1,36 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from .jobs import JobInfo
+
+class PairsSearchRequest(BaseModel):
+    """Поиск коррелированных пар инструментов по дневным доходностям."""
+    asset_types: Optional[List[str]] = Field(None, description="Типы инструментов каталога (например EQUITY, FUND)")
+    mics: Optional[List[str]] = Field(None, description="Биржи (mic), например MISX")
+    symbols: Optional[List[str]] = Field(None, description="Явный список инструментов ticker@mic")
+    name_contains: Optional[List[str]] = Field(None, description="Подстроки названия или тикера")
+    target_symbol: Optional[str] = Field(None, description="Искать только пары с этим инструментом (\"что движется вместе с X\")")
+    days: int = Field(180, description="Длина истории в днях")
+    min_abs_correlation: float = Field(0.7, description="Минимальный модуль корреляции доходностей")
+    include_negative: bool = Field(True, description="Учитывать отрицательные корреляции (ранжирование по модулю)")
+    min_coverage: float = Field(0.8, description="Минимальная доля дней с котировками, чтобы инструмент участвовал в расчете")
+    top_n: int = Field(20, description="Сколько лучших пар вернуть")
+
+class PairStats(BaseModel):
+    """Пара инструментов и статистика спреда."""
+    symbol_a: str = Field(description="Первый инструмент")
+    symbol_b: str = Field(description="Второй инструмент")
+    correlation: float = Field(description="Корреляция дневных доходностей")
+    hedge_ratio: Optional[float] = Field(None, description="Коэффициент хеджирования по логарифмам цен: spread = ln(a) - hedge_ratio * ln(b)")
+    spread_zscore: Optional[float] = Field(None, description="Текущее отклонение спреда от среднего в стандартных отклонениях")
+    half_life_days: Optional[float] = Field(None, description="Период полураспада отклонения спреда, дней (если спред возвращается к среднему)")
+    adf_stat: Optional[float] = Field(None, description="t-статистика теста Энгла-Грейнджера для спреда (чем меньше, тем сильнее возврат к среднему)")
+    cointegrated: bool = Field(False, description="Статистика ниже 5% критического значения (-3.34)")
+
+class PairsSearchStatus(BaseModel):
+    """Прогресс поиска пар и лучшие найденные пары."""
+    job: JobInfo = Field(description="Состояние фоновой задачи")
+    phase: str = Field(description="Этап: loading - загрузка истории, correlating - расчет корреляций, done - готово")
+    universe_size: int = Field(0, description="Инструментов в выборке каталога")
+    evaluated: int = Field(0, description="Инструментов с достаточной историей")
+    truncated: bool = Field(False, description="Выборка обрезана до максимального размера")
+    pairs: List[PairStats] = Field(default_factory=list, description="Лучшие пары на текущий момент")
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class PnLRequest(BaseModel):
+    """Запрос прибыли и убытков счета по сделкам."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    symbol: Optional[str] = Field(None, description="Фильтр по инструменту")
+    start_date: Optional[str] = Field(None, description="Начало периода для реализованного результата и комиссий YYYY-MM-DD. По умолчанию - 365 дней назад")
+    end_date: Optional[str] = Field(None, description="Конец периода YYYY-MM-DD включительно. По умолчанию - сегодня")
+    include_lots: bool = Field(False, description="Включить в ответ открытые лоты по каждому инструменту")
+    base_currency: str = Field("RUB", description="Валюта сумм: результат и комиссии пересчитываются в нее по текущему курсу")
+
+class PnLLot(BaseModel):
+    """Открытый лот: непогашенный остаток одной сделки."""
+    trade_id: str = Field(description="Идентификатор открывающей сделки")
+    opened_at: str = Field(description="Время открывающей сделки")
+    quantity: float = Field(description="Остаток со знаком: больше 0 - длинный лот, меньше 0 - короткий")
+    price: float = Field(description="Цена открытия")
+    unrealized_pnl: Optional[float] = Field(None, description="Нереализованный результат лота по текущей цене")
+
+class SymbolPnL(BaseModel):
+    """Результат по одному инструменту."""
+    symbol: str = Field(description="Символ инструмента")
+    currency: str = Field(description="Валюта сумм: базовая или, если курса нет, валюта инструмента (такие инструменты не входят в итоги)")
+    fx_rate: Optional[float] = Field(None, description="Курс пересчета из валюты инструмента в базовую")
+    unit_priced: bool = Field(True, description="Цена - деньги за штуку. Если нет (фьючерсы, опционы, облигации), realized_pnl и unrealized_pnl - разница цен в пунктах или % номинала без пересчета, net_pnl пусто, инструмент не входит в итоги")
+    realized_pnl: float = Field(description="Реализованный результат закрытий за период (FIFO)")
+    closed_quantity: float = Field(description="Закрыто за период, шт.")
+    fees: float = Field(description="Комиссии по инструменту за период (по транзакциям COMMISSION)")
+    open_quantity: float = Field(description="Открытая позиция по сделкам со знаком")
+    average_open_price: Optional[float] = Field(None, description="Средняя цена открытых лотов")
+    market_price: Optional[float] = Field(None, description="Текущая цена для оценки открытых лотов")
+    unrealized_pnl: Optional[float] = Field(None, description="Нереализованный результат открытых лотов")
+    net_pnl: Optional[float] = Field(None, description="Реализованный минус комиссии плюс нереализованный (только при unit_priced)")
+    broker_quantity: Optional[float] = Field(None, description="Позиция по данным брокера, если она расходится с позицией по сделкам")
+    lots: List[PnLLot] = Field(default_factory=list, description="Открытые лоты в порядке закрытия (если include_lots)")
+
+class PnLResponse(BaseModel):
+    """Прибыль и убытки счета по инструментам."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    period_from: str = Field(description="Начало периода")
+    period_to: str = Field(description="Конец периода")
+    history_from: str = Field(description="С какого момента учтены сделки для восстановления лотов")
+    base_currency: str = Field(description="Валюта итогов")
+    symbols: List[SymbolPnL] = Field(description="Инструменты по убыванию абсолютного результата")
+    total_realized_pnl: float = Field(description="Реализованный результат за период")
+    total_fees: float = Field(description="Комиссии за период, включая не привязанные к инструменту")
+    unallocated_fees: float = Field(0.0, description="Комиссии за период без инструмента (входят в total_fees)")
+    total_unrealized_pnl: float = Field(description="Нереализованный результат открытых лотов")
+    total_net_pnl: float = Field(description="Итог: реализованный минус комиссии плюс нереализованный")
+    new_trades: int = Field(0, description="Новых сделок обработано при этом вызове")
+    warnings: List[str] = Field(default_factory=list, description="Предупреждения о неполноте данных")
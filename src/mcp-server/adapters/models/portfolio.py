@@ -0,0 +1,95 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from .common import TimeFrame
+from .charts import CHART_ID_DESCRIPTION
+
+class PortfolioAnalyticsRequest(BaseModel):
+    """Запрос аналитики портфеля счета."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    days: int = Field(90, description="Длина окна истории в днях")
+    timeframe: TimeFrame = Field(TimeFrame.TIME_FRAME_D, description="Таймфрейм свечей для расчета доходностей")
+    benchmark: Optional[str] = Field(None, description="Бенчмарк ticker@mic, например IMOEX@MISX")
+    include_correlation: bool = Field(True, description="Включить матрицу корреляций доходностей позиций")
+
+class PositionAnalytics(BaseModel):
+    """Аналитика позиции портфеля за окно."""
+    symbol: str = Field(description="Символ инструмента")
+    quantity: float = Field(description="Количество со знаком")
+    price: float = Field(description="Текущая цена")
+    market_value: Optional[float] = Field(None, description="Стоимость позиции; пусто для фьючерсов, опционов и облигаций (цена в пунктах или % номинала)")
+    weight_pct: Optional[float] = Field(None, description="Доля в стоимости позиций (по модулю), %; пусто, если нет стоимости")
+    return_pct: Optional[float] = Field(None, description="Изменение цены за окно, %")
+    volatility_pct: Optional[float] = Field(None, description="Годовая волатильность доходностей, %")
+    max_drawdown_pct: Optional[float] = Field(None, description="Максимальная просадка цены за окно, %")
+    beta: Optional[float] = Field(None, description="Бета к бенчмарку")
+    contribution_pct: Optional[float] = Field(None, description="Вклад позиции в доходность портфеля, п.п.")
+
+class BenchmarkComparison(BaseModel):
+    """Сравнение портфеля с бенчмарком."""
+    symbol: str = Field(description="Бенчмарк")
+    return_pct: Optional[float] = Field(None, description="Доходность бенчмарка за окно, %")
+    volatility_pct: Optional[float] = Field(None, description="Годовая волатильность бенчмарка, %")
+    excess_return_pct: Optional[float] = Field(None, description="Доходность портфеля минус доходность бенчмарка, п.п.")
+    beta: Optional[float] = Field(None, description="Бета портфеля к бенчмарку")
+    correlation: Optional[float] = Field(None, description="Корреляция доходностей портфеля и бенчмарка")
+    tracking_error_pct: Optional[float] = Field(None, description="Годовая ошибка слежения, %")
+
+class CorrelationMatrix(BaseModel):
+    """Матрица корреляций доходностей."""
+    symbols: List[str] = Field(description="Инструменты (порядок строк и столбцов)")
+    matrix: List[List[Optional[float]]] = Field(description="Коэффициенты корреляции")
+
+class PortfolioAnalyticsResponse(BaseModel):
+    """Аналитика портфеля счета."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    snapshot_id: str = Field(description="Идентификатор снимка позиций, по которому посчитана аналитика")
+    equity: Optional[float] = Field(None, description="Оценка счета по данным брокера")
+    positions_value: float = Field(description="Суммарная стоимость позиций с ценой за штуку")
+    start: Optional[str] = Field(None, description="Начало окна истории")
+    end: Optional[str] = Field(None, description="Конец окна истории")
+    bars: int = Field(0, description="Количество точек истории")
+    return_pct: Optional[float] = Field(None, description="Доходность текущего состава портфеля за окно, %")
+    volatility_pct: Optional[float] = Field(None, description="Годовая волатильность портфеля, %")
+    max_drawdown_pct: Optional[float] = Field(None, description="Максимальная просадка портфеля за окно, %")
+    sharpe: Optional[float] = Field(None, description="Годовой коэффициент Шарпа (без безрисковой ставки)")
+    positions: List[PositionAnalytics] = Field(description="Аналитика по позициям")
+    benchmark: Optional[BenchmarkComparison] = Field(None, description="Сравнение с бенчмарком")
+    correlation: Optional[CorrelationMatrix] = Field(None, description="Матрица корреляций доходностей позиций")
+    missing_history: List[str] = Field(default_factory=list, description="Позиции, по которым не удалось загрузить историю")
+    warnings: List[str] = Field(default_factory=list, description="Позиции, не вошедшие в стоимость и доли")
+    chart_id: Optional[str] = Field(None, description=CHART_ID_DESCRIPTION)
+
+class PortfolioHistoryRequest(BaseModel):
+    """Запрос истории стоимости счета."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    start_date: Optional[str] = Field(None, description="Начало периода в формате YYYY-MM-DD. Если не указано - последние days дней")
+    days: int = Field(365, description="Длина периода в днях, если start_date не указан")
+    base_currency: str = Field("RUB", description="Валюта, в которой считается стоимость счета")
+    max_points: int = Field(200, description="Максимум точек в ответе (ряд прореживается с сохранением формы)")
+
+class PortfolioValuePoint(BaseModel):
+    """Стоимость счета на конец дня."""
+    date: str = Field(description="Дата YYYY-MM-DD (UTC)")
+    equity: float = Field(description="Стоимость счета: деньги плюс позиции")
+    cash: float = Field(description="Деньги")
+    positions_value: float = Field(description="Стоимость позиций по цене закрытия")
+    cumulative_net_flow: float = Field(description="Накопленные с начала периода вводы минус выводы")
+
+class PortfolioHistoryResponse(BaseModel):
+    """История стоимости счета, восстановленная по транзакциям и дневным свечам."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    base_currency: str = Field("RUB", description="Валюта стоимости (деньги и позиции пересчитаны по текущему курсу)")
+    start: str = Field(description="Начало периода")
+    end: str = Field(description="Конец периода")
+    points: List[PortfolioValuePoint] = Field(description="Ряд стоимости счета (возможно прореженный)")
+    start_equity: float = Field(description="Стоимость в начале периода")
+    end_equity: float = Field(description="Стоимость в конце периода")
+    net_flows: float = Field(description="Вводы минус выводы за период")
+    pnl: float = Field(description="Результат за период без учета вводов и выводов")
+    twr_pct: Optional[float] = Field(None, description="Доходность, взвешенная по времени (без влияния вводов/выводов), %")
+    max_drawdown_pct: Optional[float] = Field(None, description="Максимальная просадка по доходности, взвешенной по времени, %")
+    new_transactions: int = Field(0, description="Новых транзакций загружено за этот вызов")
+    stored_transactions: int = Field(0, description="Всего транзакций счета в локальном хранилище")
+    missing_prices: List[str] = Field(default_factory=list, description="Инструменты без истории цен (их стоимость не учтена)")
+    warnings: List[str] = Field(default_factory=list, description="Валюты без курса и допущения о валюте инструментов")
+    chart_id: Optional[str] = Field(None, description=CHART_ID_DESCRIPTION)
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from enum import Enum
+from .orders import PlaceOrderRequest
+
+class IssueSeverity(str, Enum):
+    """Серьезность замечания проверки заявки."""
+    ERROR = "error"
+    WARNING = "warning"
+
+class PreTradeIssue(BaseModel):
+    """Замечание проверки заявки."""
+    field: str = Field(description="Поле заявки")
+    code: str = Field(description="Код проверки")
+    severity: IssueSeverity = Field(description="error - брокер отклонит заявку, warning - стоит обратить внимание")
+    message: str = Field(description="Описание")
+    suggested_value: Optional[str] = Field(None, description="Предлагаемое значение поля")
+
+class PreTradeCheckResponse(BaseModel):
+    """Результат локальной проверки заявки по правилам инструмента."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    symbol: str = Field(description="Символ инструмента")
+    passed: bool = Field(description="Ошибок нет, заявку можно отправлять")
+    issues: List[PreTradeIssue] = Field(default_factory=list, description="Ошибки и предупреждения")
+    fixed_order: Optional[PlaceOrderRequest] = Field(None, description="Заявка с примененными исправлениями, если все ошибки исправимы автоматически")
@@ -0,0 +1,45 @@
+from pydantic import BaseModel, Field
+from typing import List
+from .common import OrderType, TimeInForce
+from .orders import PlaceOrderRequest
+
+class TargetWeight(BaseModel):
+    """Целевая доля инструмента в стоимости счета."""
+    symbol: str = Field(description="Символ инструмента ticker@mic")
+    weight_pct: float = Field(description="Целевая доля в процентах от стоимости счета (отрицательная - шорт)")
+
+class RebalanceRequest(BaseModel):
+    """Запрос расчета ребалансировки портфеля к целевым долям."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    targets: List[TargetWeight] = Field(description="Целевые доли инструментов")
+    close_other_positions: bool = Field(False, description="Продать позиции, которых нет в targets (целевая доля 0)")
+    base_currency: str = Field("RUB", description="Валюта расчета стоимости счета, долей и сумм заявок")
+    cash_reserve_pct: float = Field(0.0, description="Доля стоимости счета, которая должна остаться в деньгах, %")
+    allow_short: bool = Field(False, description="Разрешить отрицательные целевые позиции")
+    min_order_value: float = Field(0.0, description="Не создавать заявки меньше этой суммы в базовой валюте")
+    order_type: OrderType = Field(OrderType.ORDER_TYPE_LIMIT, description="Тип заявок: ORDER_TYPE_LIMIT (цена по лучшей котировке, приведенная к шагу) или ORDER_TYPE_MARKET")
+    time_in_force: TimeInForce = Field(TimeInForce.TIME_IN_FORCE_DAY, description="Срок действия заявок")
+
+class RebalanceLine(BaseModel):
+    """Расчет по одному инструменту."""
+    symbol: str = Field(description="Символ инструмента")
+    price: float = Field(description="Цена расчета в валюте инструмента")
+    lot_size: float = Field(description="Штук в лоте")
+    current_quantity: float = Field(description="Текущее количество, шт.")
+    target_quantity: float = Field(description="Количество после исполнения заявок, шт.")
+    order_lots: int = Field(description="Изменение в лотах (плюс - покупка, минус - продажа)")
+    order_value: float = Field(description="Сумма заявки в базовой валюте")
+    current_weight_pct: float = Field(description="Текущая доля, %")
+    target_weight_pct: float = Field(description="Целевая доля, %")
+    resulting_weight_pct: float = Field(description="Доля после исполнения заявок, %")
+
+class RebalanceResponse(BaseModel):
+    """Результат расчета ребалансировки: черновики заявок, которые можно передать в place_order."""
+    account_id: str = Field(description="Идентификатор аккаунта")
+    base_currency: str = Field("RUB", description="Валюта сумм")
+    total_value: float = Field(description="Стоимость счета для расчета (позиции + деньги)")
+    cash_before: float = Field(description="Свободные деньги до ребалансировки")
+    cash_after: float = Field(description="Оценка свободных денег после исполнения заявок")
+    orders: List[PlaceOrderRequest] = Field(description="Черновики заявок: сначала продажи, затем покупки")
+    lines: List[RebalanceLine] = Field(description="Расчет по инструментам")
+    warnings: List[str] = Field(default_factory=list, description="Предупреждения (нет котировки, инструмент пропущен и т.п.)")
@@ -0,0 +1,48 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from enum import Enum
+from .charts import CHART_ID_DESCRIPTION
+
+class ScanSortField(str, Enum):
+    """Поле сортировки результатов сканера."""
+    CHANGE_PCT = "change_pct"
+    TURNOVER = "turnover"
+    VOLATILITY_PCT = "volatility_pct"
+
+class ScanRequest(BaseModel):
+    """Декларативные фильтры сканера рынка. Все фильтры необязательны и объединяются по И."""
+    asset_types: Optional[List[str]] = Field(None, description="Типы инструментов из каталога (например EQUITIES, FUNDS, BONDS, FUTURES)")
+    mics: Optional[List[str]] = Field(None, description="Биржи (mic), например MISX")
+    symbols: Optional[List[str]] = Field(None, description="Явный список инструментов ticker@mic вместо всего каталога")
+    name_contains: Optional[List[str]] = Field(None, description="Подстроки названия или тикера, достаточно совпадения любой")
+    window_days: int = Field(7, description="Окно расчета изменения цены, оборота и волатильности в календарных днях")
+    min_change_pct: Optional[float] = Field(None, description="Минимальное изменение цены за окно, %")
+    max_change_pct: Optional[float] = Field(None, description="Максимальное изменение цены за окно, %")
+    min_turnover: Optional[float] = Field(None, description="Минимальный оборот за окно (сумма close * volume по дневным свечам)")
+    min_volatility_pct: Optional[float] = Field(None, description="Минимальная волатильность (стандартное отклонение дневных доходностей), %")
+    max_volatility_pct: Optional[float] = Field(None, description="Максимальная волатильность (стандартное отклонение дневных доходностей), %")
+    shortable_only: bool = Field(False, description="Оставить только инструменты, доступные для шорта (нужен account_id)")
+    account_id: Optional[str] = Field(None, description="Аккаунт для проверки доступности шорта")
+    sort_by: ScanSortField = Field(ScanSortField.CHANGE_PCT, description="Поле сортировки")
+    descending: bool = Field(True, description="Сортировка по убыванию")
+    limit: int = Field(20, description="Максимальное количество строк результата")
+
+class ScanRow(BaseModel):
+    """Строка результата сканера."""
+    symbol: str = Field(description="Символ инструмента ticker@mic")
+    name: str = Field(description="Наименование инструмента")
+    type: str = Field(description="Тип инструмента")
+    last_close: float = Field(description="Последняя цена закрытия")
+    change_pct: Optional[float] = Field(None, description="Изменение цены за окно, %")
+    turnover: float = Field(description="Оборот за окно")
+    volatility_pct: Optional[float] = Field(None, description="Волатильность дневных доходностей за окно, %")
+    shortable: Optional[str] = Field(None, description="Статус доступности шорта (если проверялся)")
+
+class ScanResponse(BaseModel):
+    """Результат сканирования рынка."""
+    rows: List[ScanRow] = Field(description="Инструменты, прошедшие фильтры, в порядке сортировки")
+    universe_size: int = Field(description="Количество инструментов каталога после фильтров по типу/бирже/названию")
+    evaluated: int = Field(description="Количество инструментов, по которым удалось получить свечи")
+    matched: int = Field(description="Количество инструментов, прошедших ценовые фильтры")
+    truncated: bool = Field(description="Каталог был обрезан до максимального размера выборки")
+    chart_id: Optional[str] = Field(None, description=CHART_ID_DESCRIPTION)
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from enum import Enum
+from .assets import GetAssetResponse
+from .marketdata import Quote, OrderBookRow, Trade
+from .error import ErrorResponse
+
+class SnapshotPart(str, Enum):
+    """Части рыночного снимка."""
+    QUOTE = "quote"
+    ORDERBOOK = "orderbook"
+    TRADES = "trades"
+    ASSET = "asset"
+
+class SnapshotOrderBook(BaseModel):
+    """Верхние уровни стакана."""
+    bids: List[OrderBookRow] = Field(description="Лучшие уровни покупки, от лучшей цены к худшей")
+    asks: List[OrderBookRow] = Field(description="Лучшие уровни продажи, от лучшей цены к худшей")
+    spread: Optional[float] = Field(None, description="Спред между лучшим аском и лучшим бидом")
+
+class MarketSnapshotResponse(BaseModel):
+    """Сводный рыночный снимок по инструменту."""
+    symbol: str = Field(description="Символ инструмента")
+    quote: Optional[Quote] = Field(None, description="Последняя котировка")
+    orderbook: Optional[SnapshotOrderBook] = Field(None, description="Верхние уровни стакана")
+    trades: Optional[List[Trade]] = Field(None, description="Последние сделки, от новых к старым")
+    asset: Optional[GetAssetResponse] = Field(None, description="Информация об инструменте")
+    errors: Dict[str, ErrorResponse] = Field(default_factory=dict, description="Ошибки по частям снимка, которые не удалось получить")
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class TapeWindowStats(BaseModel):
+    """Агрегаты ленты сделок за скользящее окно."""
+    window_seconds: int = Field(description="Длина окна в секундах")
+    trade_count: int = Field(description="Количество сделок в окне")
+    volume: float = Field(description="Суммарный объем сделок в шт.")
+    turnover: float = Field(description="Суммарный оборот (цена * объем)")
+    vwap: Optional[float] = Field(None, description="Средневзвешенная по объему цена (VWAP)")
+    buy_volume: float = Field(description="Объем сделок на покупку")
+    sell_volume: float = Field(description="Объем сделок на продажу")
+    imbalance: Optional[float] = Field(None, description="Дисбаланс покупок/продаж (buy - sell) / (buy + sell), от -1 до 1")
+    largest_size: Optional[float] = Field(None, description="Размер крупнейшей сделки в окне")
+    largest_price: Optional[float] = Field(None, description="Цена крупнейшей сделки в окне")
+    largest_side: Optional[str] = Field(None, description="Сторона крупнейшей сделки в окне")
+
+class TradeTapeResponse(BaseModel):
+    """Сводка по ленте сделок инструмента."""
+    symbol: str = Field(description="Символ инструмента")
+    as_of: Optional[str] = Field(None, description="Метка времени последней сделки в буфере")
+    last_price: Optional[float] = Field(None, description="Цена последней сделки")
+    buffered_trades: int = Field(description="Количество сделок в буфере")
+    windows: List[TapeWindowStats] = Field(description="Агрегаты по окнам")
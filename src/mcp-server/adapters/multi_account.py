@@ -0,0 +1,184 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .account_cache import AccountSnapshotCache
+from .cache import AsyncTTLCache
+from .finam_client import FinamApiClient
+from .fx import RUB, PortfolioValuation, account_currency
+from .models import *
+from .numeric import PositionColumns, format_decimal
+from .order_router import ACTIVE_ORDER_STATUSES
+from .order_state import OrderStateStore
+
+
+def _failure(account_id: str, error: ErrorResponse) -> AccountFailure:
+    return AccountFailure(account_id=account_id, status_code=error.status_code, error=error.error)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.monotonic() - started) * 1000, 1)
+
+
+class MultiAccountService:
+    """Сводные ответы по всем счетам токена: счета опрашиваются параллельно, результат объединяется с указанием счета.
+
+    Список счетов берется из token_details и кэшируется. Снимки счетов берутся из
+    AccountSnapshotCache, заявки - из локального состояния OrderStateStore. Итоги сводки -
+    equity счетов от брокера, пересчитанные в одну валюту по курсам FxService.
+    Ошибка одного счета не прерывает ответ: она попадает в failures.
+    """
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        accounts: AccountSnapshotCache,
+        order_states: OrderStateStore,
+        valuation: PortfolioValuation,
+        accounts_ttl: float = 5 * 60,
+    ):
+        self.api = api
+        self.accounts = accounts
+        self.order_states = order_states
+        self.valuation = valuation
+        self._account_ids = AsyncTTLCache(ttl=accounts_ttl, max_size=1)
+
+    async def account_ids(self, account_ids: Optional[Sequence[str]] = None) -> Union[List[str], ErrorResponse]:
+        """Заданные счета или все счета токена."""
+        if account_ids:
+            return list(dict.fromkeys(account_ids))
+        details = await self._account_ids.get_or_load(
+            "token",
+            self.api.token_details,
+            should_cache=lambda value: not isinstance(value, ErrorResponse),
+        )
+        if isinstance(details, ErrorResponse):
+            return details
+        return list(details.account_ids)
+
+    async def _accounts(
+        self, account_ids: Optional[Sequence[str]], max_age_s: Optional[float]
+    ) -> Union[Tuple[List[Tuple[GetAccountResponse, AccountSource]], List[AccountFailure]], ErrorResponse]:
+        ids = await self.account_ids(account_ids)
+        if isinstance(ids, ErrorResponse):
+            return ids
+        results = await asyncio.gather(*(self.accounts.snapshot(account_id, max_age_s) for account_id in ids))
+        accounts, failures = [], []
+        for account_id, (response, source) in zip(ids, results):
+            if isinstance(response, ErrorResponse):
+                failures.append(_failure(account_id, response))
+            else:
+                accounts.append((response, source))
+        return accounts, failures
+
+    async def summary(
+        self, account_ids: Optional[Sequence[str]] = None, max_age_s: Optional[float] = None, base_currency: str = RUB
+    ) -> Union[AllAccountsSummaryResponse, ErrorResponse]:
+        started = time.monotonic()
+        loaded = await self._accounts(account_ids, max_age_s)
+        if isinstance(loaded, ErrorResponse):
+            return loaded
+        accounts, failures = loaded
+        # equity брокера уже учитывает множители и маржу срочного рынка, поэтому итоги - по нему, а не по количество * цена
+        currencies = [account_currency(account) for account, _ in accounts]
+        table = await self.valuation.fx.rates(currencies, base_currency)
+        factors = table.factors(currencies)
+        equity = np.array([float(account.equity.value or 0) for account, _ in accounts]) * factors
+        unrealized = np.array([float(account.unrealized_profit.value or 0) for account, _ in accounts]) * factors
+        summaries = [
+            AccountSummary(
+                account_id=account.account_id,
+                type=account.type,
+                status=account.status,
+                equity=account.equity,
+                unrealized_profit=account.unrealized_profit,
+                cash=account.cash,
+                positions=len(account.positions),
+                currency=currency,
+                equity_base=None if np.isnan(equity_base) else DecimalValue(value=format_decimal(round(equity_base, 2))),
+                unrealized_profit_base=None if np.isnan(unrealized_base) else DecimalValue(value=format_decimal(round(unrealized_base, 2))),
+                source=source,
+            )
+            for (account, source), currency, equity_base, unrealized_base in zip(accounts, currencies, equity.tolist(), unrealized.tolist())
+        ]
+        # Суммы по счетам в одной валюте: equity счетов в разных валютах складывать напрямую нельзя
+        return AllAccountsSummaryResponse(
+            accounts=summaries,
+            base_currency=table.base,
+            total_equity=DecimalValue(value=format_decimal(round(float(np.nansum(equity)), 2))),
+            total_unrealized_profit=DecimalValue(value=format_decimal(round(float(np.nansum(unrealized)), 2))),
+            warnings=table.warnings(),
+            failures=failures,
+            elapsed_ms=_elapsed_ms(started),
+        )
+
+    async def open_orders(self, account_ids: Optional[Sequence[str]] = None, max_age_s: float = 5.0) -> Union[AllOpenOrdersResponse, ErrorResponse]:
+        started = time.monotonic()
+        ids = await self.account_ids(account_ids)
+        if isinstance(ids, ErrorResponse):
+            return ids
+        results = await asyncio.gather(*(self.order_states.orders(account_id, max_age_s) for account_id in ids))
+        orders, sources, failures = [], [], []
+        for account_id, response in zip(ids, results):
+            if isinstance(response, ErrorResponse):
+                failures.append(_failure(account_id, response))
+                continue
+            active = [state for state in response.orders if state.status in ACTIVE_ORDER_STATUSES]
+            orders.extend(active)
+            sources.append(AccountOrdersSource(account_id=account_id, active_orders=len(active), freshness=response.freshness))
+        return AllOpenOrdersResponse(orders=orders, accounts=sources, failures=failures, elapsed_ms=_elapsed_ms(started))
+
+    async def combined_positions(self, account_ids: Optional[Sequence[str]] = None, max_age_s: Optional[float] = None) -> Union[CombinedPositionsResponse, ErrorResponse]:
+        started = time.monotonic()
+        loaded = await self._accounts(account_ids, max_age_s)
+        if isinstance(loaded, ErrorResponse):
+            return loaded
+        accounts, failures = loaded
+
+        shares: Dict[str, List[Tuple[str, Position]]] = defaultdict(list)
+        for account, _ in accounts:
+            for position in account.positions:
+                shares[position.symbol].append((account.account_id, position))
+
+        # Количество в позиции - в штуках, но цена - стоимость штуки только у части типов инструментов
+        unit_priced, warnings = ({}, []) if not shares else await self.valuation.asset_info.unit_priced(list(shares), accounts[0][0].account_id)
+
+        combined = []
+        for symbol, items in shares.items():
+            columns = PositionColumns.from_positions([position for _, position in items])
+            quantity = float(columns.quantity.sum())
+            # Средняя цена имеет смысл, только если известна на всех счетах и позиции одного знака
+            same_side = bool(np.all(columns.quantity > 0) or np.all(columns.quantity < 0))
+            average_price = None
+            if same_side and not np.isnan(columns.average_price).any() and quantity:
+                average_price = DecimalValue(value=format_decimal(float(np.dot(columns.quantity, columns.average_price) / quantity)))
+            current_price = float(columns.current_price[-1])
+            market_value = DecimalValue(value=format_decimal(round(quantity * current_price, 2))) if unit_priced[symbol] else None
+            combined.append(CombinedPosition(
+                symbol=symbol,
+                quantity=DecimalValue(value=format_decimal(quantity)),
+                average_price=average_price,
+                current_price=DecimalValue(value=format_decimal(current_price)),
+                market_value=market_value,
+                unrealized_pnl=DecimalValue(value=format_decimal(round(float(np.nansum(columns.unrealized_pnl)), 2))),
+                accounts=[
+                    PositionShare(
+                        account_id=account_id,
+                        quantity=position.quantity,
+                        average_price=position.average_price,
+                        unrealized_pnl=position.unrealized_pnl,
+                    )
+                    for account_id, position in items
+                ],
+            ))
+        combined.sort(key=lambda position: -abs(float(position.market_value.value)) if position.market_value else 0.0)
+        return CombinedPositionsResponse(
+            positions=combined,
+            sources=[source for _, source in accounts],
+            warnings=warnings,
+            failures=failures,
+            elapsed_ms=_elapsed_ms(started),
+        )
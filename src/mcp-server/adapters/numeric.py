@@ -0,0 +1,317 @@
+"""Быстрое преобразование DecimalValue/Money и списков моделей API в колонки NumPy.
+
+Все цены и объемы в API приходят строками. Модули аналитики работают не с моделями,
+а с колонками float64 (или масштабированными целыми int64), полученными за один проход.
+Обратное преобразование в DecimalValue выполняется лениво, только при выдаче ответа.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Sequence, Union, overload
+
+import numpy as np
+
+from .models import *
+
+NANOS_IN_UNIT = 1_000_000_000
+
+
+def _parse_float(value: Optional[str]) -> float:
+    return float(value) if value else np.nan
+
+
+def parse_decimal_strings(values: Sequence[Optional[str]], scale: Optional[int] = None) -> np.ndarray:
+    """Разбор строк в float64 (или в int64, умноженные на 10^scale). Пустые значения -> NaN (или 0)."""
+    try:
+        column = np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+    except (TypeError, ValueError):
+        # Медленный путь для списков с пропусками
+        column = np.fromiter(map(_parse_float, values), dtype=np.float64, count=len(values))
+    if scale is None:
+        return column
+    scaled = np.rint(column * 10.0**scale)
+    return np.nan_to_num(scaled, nan=0.0).astype(np.int64)
+
+
+def _json_decimals(items: Sequence[dict], key: str) -> List[Optional[str]]:
+    """Строки DecimalValue из сырого JSON ответа API. Отсутствующее поле -> None."""
+    return [(item.get(key) or {}).get("value") for item in items]
+
+
+def decimal_column(values: Sequence[Optional[DecimalValue]], scale: Optional[int] = None) -> np.ndarray:
+    """Колонка из списка DecimalValue за один проход."""
+    return parse_decimal_strings([value.value if value is not None else None for value in values], scale)
+
+
+def money_column(values: Sequence[Optional[Money]], scale: Optional[int] = None) -> np.ndarray:
+    """Колонка из списка Money: units + nanos / 10^9. При scale результат в int64 * 10^scale."""
+    units = np.array([int(value.units) if value is not None else 0 for value in values], dtype=np.int64)
+    nanos = np.array([value.nanos if value is not None else 0 for value in values], dtype=np.int64)
+    if scale is None:
+        return units.astype(np.float64) + nanos.astype(np.float64) / NANOS_IN_UNIT
+    if scale > 9:
+        raise ValueError("Money содержит не более 9 знаков после запятой")
+    divisor = 10 ** (9 - scale)
+    # nanos несет знак суммы: округляем модуль (половина - от нуля), чтобы -1.004 не стало -1.01
+    rounded = np.sign(nanos) * ((np.abs(nanos) + divisor // 2) // divisor)
+    return units * 10**scale + rounded
+
+
+def timestamp_column(values: Sequence[str]) -> np.ndarray:
+    """Метки времени ISO-8601 в int64 наносекунд UTC."""
+    if not len(values):
+        return np.empty(0, dtype=np.int64)
+    try:
+        naive = [value[:-1] if value.endswith("Z") else value for value in values]
+        return np.array(naive, dtype="datetime64[ns]").astype(np.int64)
+    except ValueError:
+        # Медленный путь для меток со смещением часового пояса
+        result = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            result[i] = int(parsed.timestamp() * NANOS_IN_UNIT)
+        return result
+
+
+def format_timestamp(ns: int) -> str:
+    """int64 наносекунд UTC -> строка в формате API."""
+    return np.datetime_as_string(np.datetime64(int(ns), "ns"), unit="s") + "Z"
+
+
+def format_decimal(value: float, decimals: Optional[int] = None) -> str:
+    """Число -> строка для DecimalValue без экспоненциальной записи."""
+    if decimals is not None:
+        return f"{value:.{decimals}f}"
+    return np.format_float_positional(value, trim="-")
+
+
+class LazyDecimalList(Sequence[DecimalValue]):
+    """Список DecimalValue поверх колонки NumPy. Объекты создаются только при обращении."""
+
+    def __init__(self, column: np.ndarray, decimals: Optional[int] = None, scale: Optional[int] = None):
+        self._column = column
+        self._decimals = decimals
+        self._scale = scale
+
+    def __len__(self) -> int:
+        return len(self._column)
+
+    @overload
+    def __getitem__(self, index: int) -> DecimalValue: ...
+    @overload
+    def __getitem__(self, index: slice) -> "LazyDecimalList": ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[DecimalValue, "LazyDecimalList"]:
+        if isinstance(index, slice):
+            return LazyDecimalList(self._column[index], self._decimals, self._scale)
+        value = self._column[index]
+        if self._scale is not None:
+            value = value / 10**self._scale
+        return DecimalValue(value=format_decimal(float(value), self._decimals))
+
+
+@dataclass
+class BarColumns:
+    """Свечи в колоночном виде."""
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_bars(cls, bars: Sequence[Bar], scale: Optional[int] = None) -> "BarColumns":
+        return cls(
+            timestamp=timestamp_column([bar.timestamp for bar in bars]),
+            open=parse_decimal_strings([bar.open.value for bar in bars], scale),
+            high=parse_decimal_strings([bar.high.value for bar in bars], scale),
+            low=parse_decimal_strings([bar.low.value for bar in bars], scale),
+            close=parse_decimal_strings([bar.close.value for bar in bars], scale),
+            volume=parse_decimal_strings([bar.volume.value for bar in bars]),
+        )
+
+    @classmethod
+    def from_json(cls, bars: Sequence[dict], scale: Optional[int] = None) -> "BarColumns":
+        """Разбор сырого JSON из ответа API без построения моделей Bar (в разы быстрее валидации pydantic)."""
+        return cls(
+            timestamp=timestamp_column([bar["timestamp"] for bar in bars]),
+            open=parse_decimal_strings(_json_decimals(bars, "open"), scale),
+            high=parse_decimal_strings(_json_decimals(bars, "high"), scale),
+            low=parse_decimal_strings(_json_decimals(bars, "low"), scale),
+            close=parse_decimal_strings(_json_decimals(bars, "close"), scale),
+            volume=parse_decimal_strings(_json_decimals(bars, "volume")),
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def take(self, index: Union[np.ndarray, slice]) -> "BarColumns":
+        return BarColumns(
+            timestamp=self.timestamp[index],
+            open=self.open[index],
+            high=self.high[index],
+            low=self.low[index],
+            close=self.close[index],
+            volume=self.volume[index],
+        )
+
+    def iter_bars(self, decimals: Optional[int] = None) -> Iterator[Bar]:
+        """Ленивое обратное преобразование в модели API."""
+        opens, highs, lows = LazyDecimalList(self.open, decimals), LazyDecimalList(self.high, decimals), LazyDecimalList(self.low, decimals)
+        closes, volumes = LazyDecimalList(self.close, decimals), LazyDecimalList(self.volume)
+        for i in range(len(self)):
+            yield Bar(
+                timestamp=format_timestamp(self.timestamp[i]),
+                open=opens[i],
+                high=highs[i],
+                low=lows[i],
+                close=closes[i],
+                volume=volumes[i],
+            )
+
+    def to_bars(self, decimals: Optional[int] = None) -> List[Bar]:
+        return list(self.iter_bars(decimals))
+
+
+@dataclass
+class QuoteColumns:
+    """Котировки нескольких инструментов в колоночном виде."""
+    symbol: List[str]
+    timestamp: np.ndarray
+    bid: np.ndarray
+    ask: np.ndarray
+    last: np.ndarray
+    volume: np.ndarray
+    turnover: np.ndarray
+    open: np.ndarray
+    close: np.ndarray
+    change: np.ndarray
+
+    @classmethod
+    def from_quotes(cls, quotes: Sequence[Quote], scale: Optional[int] = None) -> "QuoteColumns":
+        return cls(
+            symbol=[quote.symbol for quote in quotes],
+            timestamp=timestamp_column([quote.timestamp for quote in quotes]),
+            bid=parse_decimal_strings([quote.bid.value for quote in quotes], scale),
+            ask=parse_decimal_strings([quote.ask.value for quote in quotes], scale),
+            last=parse_decimal_strings([quote.last.value for quote in quotes], scale),
+            volume=parse_decimal_strings([quote.volume.value for quote in quotes]),
+            turnover=parse_decimal_strings([quote.turnover.value for quote in quotes]),
+            open=parse_decimal_strings([quote.open.value for quote in quotes], scale),
+            close=parse_decimal_strings([quote.close.value for quote in quotes], scale),
+            change=parse_decimal_strings([quote.change.value for quote in quotes], scale),
+        )
+
+    def __len__(self) -> int:
+        return len(self.symbol)
+
+
+def side_column(sides: Sequence[Optional[Union[Side, str]]]) -> np.ndarray:
+    """Сторона сделки: +1 покупка, -1 продажа, 0 не указана."""
+    return np.array(
+        [1 if side == Side.SIDE_BUY else -1 if side == Side.SIDE_SELL else 0 for side in sides],
+        dtype=np.int8,
+    )
+
+
+@dataclass
+class TradeColumns:
+    """Обезличенные или собственные сделки в колоночном виде."""
+    trade_id: List[str]
+    timestamp: np.ndarray
+    price: np.ndarray
+    size: np.ndarray
+    side: np.ndarray
+
+    @classmethod
+    def from_trades(cls, trades: Sequence[Union[Trade, AccountTrade]], scale: Optional[int] = None) -> "TradeColumns":
+        return cls(
+            trade_id=[trade.trade_id for trade in trades],
+            timestamp=timestamp_column([trade.timestamp for trade in trades]),
+            price=parse_decimal_strings([trade.price.value for trade in trades], scale),
+            size=parse_decimal_strings([trade.size.value for trade in trades]),
+            side=side_column([trade.side for trade in trades]),
+        )
+
+    @classmethod
+    def from_json(cls, trades: Sequence[dict], scale: Optional[int] = None) -> "TradeColumns":
+        return cls(
+            trade_id=[trade["trade_id"] for trade in trades],
+            timestamp=timestamp_column([trade["timestamp"] for trade in trades]),
+            price=parse_decimal_strings(_json_decimals(trades, "price"), scale),
+            size=parse_decimal_strings(_json_decimals(trades, "size")),
+            side=side_column([trade.get("side") for trade in trades]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.trade_id)
+
+
+@dataclass
+class PositionColumns:
+    """Позиции счета в колоночном виде. Необязательные поля -> NaN."""
+    symbol: List[str]
+    quantity: np.ndarray
+    average_price: np.ndarray
+    current_price: np.ndarray
+    unrealized_pnl: np.ndarray
+    daily_pnl: np.ndarray
+
+    @classmethod
+    def from_positions(cls, positions: Sequence[Position]) -> "PositionColumns":
+        return cls(
+            symbol=[position.symbol for position in positions],
+            quantity=decimal_column([position.quantity for position in positions]),
+            average_price=decimal_column([position.average_price for position in positions]),
+            current_price=decimal_column([position.current_price for position in positions]),
+            unrealized_pnl=decimal_column([position.unrealized_pnl for position in positions]),
+            daily_pnl=decimal_column([position.daily_pnl for position in positions]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.symbol)
+
+    @property
+    def market_value(self) -> np.ndarray:
+        return self.quantity * self.current_price
+
+
+@dataclass
+class OrderBookColumns:
+    """Стакан в колоночном виде. Отсутствующий объем стороны -> 0."""
+    price: np.ndarray
+    buy_size: np.ndarray
+    sell_size: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Union[OrderBookRow, StreamOrderBookRow]], scale: Optional[int] = None) -> "OrderBookColumns":
+        return cls(
+            price=parse_decimal_strings([row.price.value for row in rows], scale),
+            buy_size=np.nan_to_num(decimal_column([row.buy_size for row in rows])),
+            sell_size=np.nan_to_num(decimal_column([row.sell_size for row in rows])),
+        )
+
+    @classmethod
+    def from_json(cls, rows: Sequence[dict], scale: Optional[int] = None) -> "OrderBookColumns":
+        return cls(
+            price=parse_decimal_strings(_json_decimals(rows, "price"), scale),
+            buy_size=np.nan_to_num(parse_decimal_strings(_json_decimals(rows, "buy_size"))),
+            sell_size=np.nan_to_num(parse_decimal_strings(_json_decimals(rows, "sell_size"))),
+        )
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def bids(self) -> "OrderBookColumns":
+        """Уровни покупки, от лучшей цены к худшей."""
+        mask = self.buy_size > 0
+        order = np.argsort(-self.price[mask], kind="stable")
+        return OrderBookColumns(self.price[mask][order], self.buy_size[mask][order], self.sell_size[mask][order])
+
+    def asks(self) -> "OrderBookColumns":
+        """Уровни продажи, от лучшей цены к худшей."""
+        mask = self.sell_size > 0
+        order = np.argsort(self.price[mask], kind="stable")
+        return OrderBookColumns(self.price[mask][order], self.buy_size[mask][order], self.sell_size[mask][order])
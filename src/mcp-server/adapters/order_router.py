@@ -0,0 +1,374 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+from .finam_client import FinamApiClient
+from .latency import OrderLatencyTracker
+from .models import *
+from .order_submissions import FAILED, IN_FLIGHT, SENT, UNKNOWN, Submission, SubmissionLog, generate_client_order_id
+from .pretrade import PositionBook, PreTradeChecker, check_order_shape
+
+# Заявки, которые еще можно отменить
+ACTIVE_ORDER_STATUSES = {
+    OrderStatus.ORDER_STATUS_NEW,
+    OrderStatus.ORDER_STATUS_PARTIALLY_FILLED,
+    OrderStatus.ORDER_STATUS_PENDING_NEW,
+    OrderStatus.ORDER_STATUS_SUSPENDED,
+    OrderStatus.ORDER_STATUS_FORWARDING,
+    OrderStatus.ORDER_STATUS_WAIT,
+    OrderStatus.ORDER_STATUS_WATCHING,
+    OrderStatus.ORDER_STATUS_LINK_WAIT,
+    OrderStatus.ORDER_STATUS_SL_GUARD_TIME,
+    OrderStatus.ORDER_STATUS_SL_FORWARDING,
+    OrderStatus.ORDER_STATUS_TP_GUARD_TIME,
+    OrderStatus.ORDER_STATUS_TP_CORRECTION,
+    OrderStatus.ORDER_STATUS_TP_FORWARDING,
+    OrderStatus.ORDER_STATUS_TP_CORR_GUARD_TIME,
+}
+
+# Слушатель успешных ответов: (account_id, ответ на выставление или отмену)
+OrderListener = Callable[[str, Union[PlaceOrderResponse, CancelOrderResponse]], None]
+
+
+def _error_text(response: ErrorResponse) -> str:
+    return f"{response.status_code}: {response.error}"
+
+
+def _ambiguous(response: Union[PlaceOrderResponse, ErrorResponse]) -> bool:
+    """Ответ, по которому нельзя понять, принял ли брокер заявку: сетевая ошибка, таймаут, перегрузка, ошибка сервера."""
+    return isinstance(response, ErrorResponse) and (response.status_code in (-1, 408, 429) or response.status_code >= 500)
+
+
+def _placed(state: OrderState) -> PlaceOrderResponse:
+    return PlaceOrderResponse(
+        order_id=state.order_id, exec_id=state.exec_id, status=state.status, order=state.order, transact_at=state.transact_at
+    )
+
+
+class OrderRouter:
+    """Отправка и отмена заявок с упорядочиванием по счету и инструменту.
+
+    Заявки одного инструмента счета уходят строго последовательно, в том числе из разных
+    вызовов инструментов; разные инструменты - параллельно с ограничением одновременных запросов.
+
+    С журналом submissions выставление идемпотентно: каждой заявке присваивается client_order_id,
+    повтор той же заявки (тот же client_order_id или то же содержимое из другого вызова) не
+    отправляется, а при потерянном ответе заявка сверяется с брокером по client_order_id и только
+    затем отправляется повторно с тем же client_order_id.
+    """
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        checker: Optional[PreTradeChecker] = None,
+        submissions: Optional[SubmissionLog] = None,
+        latency: Optional[OrderLatencyTracker] = None,
+        max_concurrency: int = 8,
+        max_attempts: int = 3,
+        retry_delay: float = 0.5,
+        in_flight_timeout: float = 30.0,
+    ):
+        self.api = api
+        self.checker = checker
+        self.submissions = submissions
+        self.latency = latency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.in_flight_timeout = in_flight_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._listeners: List[OrderListener] = []
+
+    def add_listener(self, listener: OrderListener):
+        """Подписка на успешно выставленные и отмененные заявки (например, для локального состояния заявок)."""
+        self._listeners.append(listener)
+
+    def _notify(self, account_id: str, response: Union[PlaceOrderResponse, CancelOrderResponse, ErrorResponse]):
+        if isinstance(response, ErrorResponse):
+            return
+        for listener in self._listeners:
+            try:
+                listener(account_id, response)
+            except Exception as e:
+                logging.warning(f"Ошибка обработчика заявки {response.order_id}: {e}")
+
+    def _lock(self, account_id: str, symbol: str) -> asyncio.Lock:
+        return self._locks[(account_id, symbol.upper())]
+
+    async def _post(self, account_id: str, request: PlaceOrderRequest) -> Union[PlaceOrderResponse, ErrorResponse]:
+        async with self._semaphore:
+            sent_at, started = time.time(), time.monotonic()
+            try:
+                response = await self.api.place_order(account_id, request)
+            except Exception as e:
+                response = ErrorResponse(status_code=-1, error=str(e))
+        if self.latency is not None:
+            self.latency.record_response(request, sent_at, time.monotonic() - started, response)
+        return response
+
+    async def _find_placed(self, account_id: str, client_order_id: str) -> Union[PlaceOrderResponse, ErrorResponse, None]:
+        """Заявка счета у брокера по client_order_id; None - брокер такую заявку не принимал."""
+        orders = await self.api.get_orders(OrdersRequest(account_id=account_id))
+        if isinstance(orders, ErrorResponse):
+            return orders
+        for state in orders.orders:
+            if state.order.client_order_id == client_order_id:
+                return _placed(state)
+        return None
+
+    async def _check_previous(self, account_id: str, request: PlaceOrderRequest, previous: Submission) -> Optional[ErrorResponse]:
+        """Ошибка, если предыдущая отправка заявки состоялась или еще идет; None - заявку можно отправлять."""
+        if previous.client_order_id == request.client_order_id:
+            repeat_hint = "Для новой заявки укажите другой client_order_id или не передавайте его."
+        else:
+            repeat_hint = "Если нужна еще одна такая же заявка, повторите вызов с allow_repeat=True."
+        if previous.state == IN_FLIGHT and time.time() - previous.updated_at < self.in_flight_timeout:
+            return ErrorResponse(status_code=409, error=f"Такая заявка уже отправляется (client_order_id {previous.client_order_id}). {repeat_hint}")
+        if previous.state == SENT:
+            return ErrorResponse(
+                status_code=409,
+                error=f"Заявка уже выставлена: order_id {previous.order_id}, client_order_id {previous.client_order_id}. {repeat_hint}",
+            )
+        if previous.state == FAILED:
+            return None
+
+        # Ответ на предыдущую отправку потерян (или процесс упал во время отправки): сверяемся с брокером
+        found = await self._find_placed(account_id, previous.client_order_id)
+        if isinstance(found, ErrorResponse):
+            return ErrorResponse(
+                status_code=409,
+                error=f"Не удалось проверить, принята ли предыдущая заявка (client_order_id {previous.client_order_id}): {found.error}",
+            )
+        if found is None:
+            await self.submissions.finish(account_id, previous.client_order_id, FAILED)
+            return None
+        await self.submissions.finish(account_id, previous.client_order_id, SENT, found)
+        self._notify(account_id, found)
+        return ErrorResponse(
+            status_code=409,
+            error=f"Заявка уже выставлена: order_id {found.order_id}, client_order_id {previous.client_order_id}. {repeat_hint}",
+        )
+
+    async def _send(
+        self, account_id: str, request: PlaceOrderRequest, call_id: Optional[str] = None, allow_repeat: bool = False
+    ) -> Union[PlaceOrderResponse, ErrorResponse]:
+        if self.submissions is None:
+            response = await self._post(account_id, request)
+            self._notify(account_id, response)
+            return response
+
+        call_id = call_id or uuid.uuid4().hex
+        if not request.client_order_id:
+            request = request.model_copy(update={"client_order_id": generate_client_order_id()})
+        previous = await self.submissions.find_previous(account_id, request, call_id, by_content=not allow_repeat)
+        if previous is not None:
+            duplicate = await self._check_previous(account_id, request, previous)
+            if duplicate is not None:
+                logging.info(f"Повтор заявки {request.symbol} на счете {account_id} не отправлен: {duplicate.error}")
+                return duplicate
+
+        await self.submissions.begin(account_id, request, call_id)
+        response = await self._post(account_id, request)
+        for attempt in range(1, self.max_attempts):
+            if not _ambiguous(response):
+                break
+            # Повторная отправка допустима, только если брокер заявку с этим client_order_id не принял
+            await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            found = await self._find_placed(account_id, request.client_order_id)
+            if found is not None:
+                if isinstance(found, PlaceOrderResponse):
+                    response = found
+                break
+            logging.warning(f"Заявка {request.client_order_id} не дошла до брокера ({_error_text(response)}), попытка {attempt + 1}")
+            response = await self._post(account_id, request)
+
+        if isinstance(response, PlaceOrderResponse):
+            await self.submissions.finish(account_id, request.client_order_id, SENT, response)
+        elif _ambiguous(response):
+            await self.submissions.finish(account_id, request.client_order_id, UNKNOWN)
+            response = ErrorResponse(
+                status_code=response.status_code,
+                error=(
+                    f"{response.error}. Неизвестно, принята ли заявка: проверьте get_orders по client_order_id {request.client_order_id}; "
+                    "повторный вызов place_order с той же заявкой сначала сверит ее с брокером и не выставит дубль"
+                ),
+            )
+        else:
+            await self.submissions.finish(account_id, request.client_order_id, FAILED)
+        self._notify(account_id, response)
+        return response
+
+    async def _send_cancel(self, request: CancelOrderRequest) -> Union[CancelOrderResponse, ErrorResponse]:
+        async with self._semaphore:
+            try:
+                response = await self.api.cancel_order(request)
+            except Exception as e:
+                return ErrorResponse(status_code=-1, error=str(e))
+        self._notify(request.account_id, response)
+        return response
+
+    async def check(self, account_id: str, request: PlaceOrderRequest, book: Optional[PositionBook] = None) -> PreTradeCheckResponse:
+        """Проверка заявки до отправки: по правилам инструмента, если задан checker, иначе только по полям заявки."""
+        if self.checker is not None:
+            return await self.checker.check(account_id, request, book)
+        return check_order_shape(request).response(account_id, request)
+
+    async def place(
+        self, account_id: str, request: PlaceOrderRequest, allow_repeat: bool = False
+    ) -> Union[PlaceOrderResponse, PreTradeCheckResponse, ErrorResponse]:
+        """Выставление заявки после проверки; не прошедшая проверку заявка не отправляется, возвращается результат проверки.
+
+        allow_repeat=True отключает поиск повтора по содержимому (повтор по client_order_id отсекается всегда).
+        """
+        check = await self.check(account_id, request)
+        if not check.passed:
+            return check
+        async with self._lock(account_id, request.symbol):
+            return await self._send(account_id, request, allow_repeat=allow_repeat)
+
+    async def cancel(self, request: CancelOrderRequest, symbol: Optional[str] = None) -> Union[CancelOrderResponse, ErrorResponse]:
+        """Отмена заявки; если инструмент известен, отмена встает в очередь за его заявками."""
+        if symbol is None:
+            return await self._send_cancel(request)
+        async with self._lock(request.account_id, symbol):
+            return await self._send_cancel(request)
+
+    async def _place_chain(
+        self,
+        request: BatchPlaceOrdersRequest,
+        indices: List[int],
+        results: List[Optional[BatchItemResult]],
+        failed_symbols: Set[str],
+        call_id: str,
+    ):
+        """Последовательная отправка заявок одного инструмента под одной блокировкой."""
+        symbol = request.orders[indices[0]].symbol
+        async with self._lock(request.account_id, symbol):
+            for i in indices:
+                order = request.orders[i]
+                if request.stop_on_error and symbol.upper() in failed_symbols:
+                    results[i] = BatchItemResult(index=i, symbol=order.symbol, status=BatchItemStatus.SKIPPED, error="Предыдущая заявка по инструменту не прошла")
+                    continue
+                response = await self._send(request.account_id, order, call_id, request.allow_repeat)
+                if isinstance(response, ErrorResponse):
+                    failed_symbols.add(symbol.upper())
+                    results[i] = BatchItemResult(
+                        index=i, symbol=order.symbol, client_order_id=order.client_order_id, status=BatchItemStatus.FAILED, error=_error_text(response)
+                    )
+                else:
+                    results[i] = BatchItemResult(
+                        index=i,
+                        symbol=order.symbol,
+                        order_id=response.order_id,
+                        client_order_id=response.order.client_order_id,
+                        status=BatchItemStatus.SENT,
+                        order_status=response.status,
+                    )
+
+    async def place_batch(self, request: BatchPlaceOrdersRequest) -> BatchOrdersResponse:
+        started = time.monotonic()
+        results: List[Optional[BatchItemResult]] = [None] * len(request.orders)
+
+        repeated: Set[int] = set()
+        client_ids: Set[str] = set()
+        for i, order in enumerate(request.orders):
+            if order.client_order_id:
+                if order.client_order_id in client_ids:
+                    repeated.add(i)
+                client_ids.add(order.client_order_id)
+
+        # Счет запрашивается один раз на пакет. Заявки инструмента проверяются по порядку отправки,
+        # и каждая принятая сдвигает позицию для следующих
+        book = await self.checker.position_book(request.account_id) if self.checker is not None else None
+        order_of_sending = sorted(range(len(request.orders)), key=lambda i: request.sells_first and request.orders[i].side != Side.SIDE_SELL)
+        by_symbol: Dict[str, List[int]] = defaultdict(list)
+        for i in order_of_sending:
+            by_symbol[request.orders[i].symbol.upper()].append(i)
+        checks: List[Optional[PreTradeCheckResponse]] = [None] * len(request.orders)
+
+        async def check_symbol(indices: List[int]):
+            for i in indices:
+                checks[i] = await self.check(request.account_id, request.orders[i], book)
+                if checks[i].passed and i not in repeated and book is not None:
+                    book.apply(request.orders[i])
+
+        await asyncio.gather(*(check_symbol(indices) for indices in by_symbol.values()))
+
+        valid = []
+        for i, (order, check) in enumerate(zip(request.orders, checks)):
+            errors = [issue.message for issue in check.issues if issue.severity == IssueSeverity.ERROR]
+            if i in repeated:
+                errors.append("client_order_id повторяется в пакете")
+            if errors:
+                results[i] = BatchItemResult(
+                    index=i, symbol=order.symbol, status=BatchItemStatus.INVALID, error="; ".join(errors), suggested_order=check.fixed_order
+                )
+            else:
+                valid.append(i)
+
+        if request.sells_first:
+            phases = [
+                [i for i in valid if request.orders[i].side == Side.SIDE_SELL],
+                [i for i in valid if request.orders[i].side != Side.SIDE_SELL],
+            ]
+        else:
+            phases = [valid]
+
+        # Один call_id на пакет: одинаковые заявки внутри пакета не считаются повтором друг друга
+        call_id = uuid.uuid4().hex
+        failed_symbols: Set[str] = set()
+        for phase in phases:
+            chains: Dict[str, List[int]] = defaultdict(list)
+            for i in phase:
+                chains[request.orders[i].symbol.upper()].append(i)
+            await asyncio.gather(*(self._place_chain(request, indices, results, failed_symbols, call_id) for indices in chains.values()))
+
+        response = _batch_response(request.account_id, results, started)
+        logging.info(f"Пакет заявок {request.account_id}: отправлено {response.sent}, ошибок {response.failed}, пропущено {response.skipped} за {response.elapsed_ms:.0f} мс")
+        return response
+
+    async def _cancel_item(self, index: int, account_id: str, order_id: str, symbol: Optional[str]) -> BatchItemResult:
+        response = await self.cancel(CancelOrderRequest(account_id=account_id, order_id=order_id), symbol)
+        if isinstance(response, ErrorResponse):
+            return BatchItemResult(index=index, symbol=symbol, order_id=order_id, status=BatchItemStatus.FAILED, error=_error_text(response))
+        return BatchItemResult(
+            index=index, symbol=response.order.symbol, order_id=order_id, status=BatchItemStatus.SENT, order_status=response.status
+        )
+
+    async def cancel_batch(self, request: BatchCancelOrdersRequest) -> Union[BatchOrdersResponse, ErrorResponse]:
+        if not request.order_ids and not request.symbols and not request.all_active:
+            return ErrorResponse(status_code=-1, error="Укажите order_ids, symbols или all_active")
+
+        started = time.monotonic()
+        symbols_of: Dict[str, Optional[str]] = {order_id: None for order_id in request.order_ids or []}
+        if request.symbols or request.all_active:
+            orders = await self.api.get_orders(OrdersRequest(account_id=request.account_id))
+            if isinstance(orders, ErrorResponse):
+                return orders
+            wanted = {symbol.upper() for symbol in request.symbols or []}
+            for state in orders.orders:
+                if state.status in ACTIVE_ORDER_STATUSES and (request.all_active or state.order.symbol.upper() in wanted):
+                    symbols_of[state.order_id] = state.order.symbol
+
+        results = await asyncio.gather(*(
+            self._cancel_item(i, request.account_id, order_id, symbol)
+            for i, (order_id, symbol) in enumerate(symbols_of.items())
+        ))
+        response = _batch_response(request.account_id, list(results), started)
+        logging.info(f"Пакетная отмена {request.account_id}: отменено {response.sent}, ошибок {response.failed} за {response.elapsed_ms:.0f} мс")
+        return response
+
+
+def _batch_response(account_id: str, results: List[BatchItemResult], started: float) -> BatchOrdersResponse:
+    statuses = [result.status for result in results]
+    return BatchOrdersResponse(
+        account_id=account_id,
+        results=results,
+        sent=statuses.count(BatchItemStatus.SENT),
+        failed=statuses.count(BatchItemStatus.INVALID) + statuses.count(BatchItemStatus.FAILED),
+        skipped=statuses.count(BatchItemStatus.SKIPPED),
+        elapsed_ms=(time.monotonic() - started) * 1000,
+    )
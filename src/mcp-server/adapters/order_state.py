@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .dispatcher import bind_session
+from .finam_client import FinamApiClient
+from .latency import OrderLatencyTracker
+from .models import *
+from .order_router import OrderRouter
+
+# Источник потока собственных заявок и сделок (подписка OrderTradeRequest -> сообщения OrderTradeResponse)
+OrderTradeStream = Callable[[OrderTradeRequest], AsyncIterator[OrderTradeResponse]]
+# Слушатель изменений заявок счета, полученных от брокера: (account_id)
+OrderChangeListener = Callable[[str], None]
+
+
+def _signature(state: OrderState) -> Tuple:
+    """Поля, по изменению которых считаем, что заявка обновилась."""
+    return state.status, state.exec_id, state.accept_at, state.withdraw_at
+
+
+class AccountOrders:
+    """Локальное состояние заявок одного счета."""
+
+    def __init__(self, account_id: str, poll_interval: float):
+        self.account_id = account_id
+        self.orders: Dict[str, OrderState] = {}
+        # Свои выставления и отмены: order_id -> время применения (monotonic)
+        self.applied: Dict[str, float] = {}
+        self.seeded = False
+        self.source = OrderDataSource.API
+        self.synced_at = 0.0
+        self.read_at = time.monotonic()
+        self.live = False
+        self.poll_delay = poll_interval
+        self.wakeup = asyncio.Event()
+        self.refresh_lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+    def upsert(self, states: Iterable[OrderState]) -> int:
+        changed = 0
+        for state in states:
+            previous = self.orders.get(state.order_id)
+            if previous is None or _signature(previous) != _signature(state):
+                changed += 1
+            self.orders[state.order_id] = state
+        return changed
+
+    def replace(self, states: Iterable[OrderState], started: float) -> int:
+        """Полный список заявок из запроса, начатого в started. Свои выставления и отмены,
+        примененные после начала запроса, сохраняются: ответ брокера мог их еще не отражать."""
+        states = {state.order_id: state for state in states}
+        for order_id, applied_at in list(self.applied.items()):
+            if applied_at < started:
+                del self.applied[order_id]
+            elif order_id in self.orders:
+                states[order_id] = self.orders[order_id]
+        changed = sum(
+            1 for order_id, state in states.items()
+            if order_id not in self.orders or _signature(self.orders[order_id]) != _signature(state)
+        ) + len(self.orders.keys() - states.keys())
+        self.orders = states
+        return changed
+
+
+class OrderStateStore:
+    """Локальное состояние заявок по счетам: проверка статуса - чтение из памяти, а не запрос к API.
+
+    Состояние счета заполняется один раз через get_orders и дальше обновляется из потока
+    OrderTrade (если задан stream_source). Пока поток недоступен, заявки опрашиваются с
+    экспоненциальным увеличением интервала, пока ничего не меняется; свои выставления и отмены
+    применяются сразу и сбрасывают интервал опроса. Опрос останавливается, если счет давно не читали.
+    """
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        router: Optional[OrderRouter] = None,
+        stream_source: Optional[OrderTradeStream] = None,
+        poll_interval: float = 2.0,
+        max_poll_interval: float = 30.0,
+        idle_timeout: float = 5 * 60,
+        latency: Optional[OrderLatencyTracker] = None,
+    ):
+        self.api = api
+        self.latency = latency
+        self.stream_source = stream_source
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.idle_timeout = idle_timeout
+        self._accounts: Dict[str, AccountOrders] = {}
+        self._listeners: List[OrderChangeListener] = []
+        if router is not None:
+            router.add_listener(self.apply_response)
+
+    def add_listener(self, listener: OrderChangeListener):
+        """Подписка на изменения заявок счета по данным брокера (новые статусы, исполнения, снятия)."""
+        self._listeners.append(listener)
+
+    def _notify(self, account_id: str, changed: int):
+        if not changed:
+            return
+        for listener in self._listeners:
+            try:
+                listener(account_id)
+            except Exception as e:
+                logging.warning(f"Ошибка обработчика изменений заявок {account_id}: {e}")
+
+    def _account(self, account_id: str) -> AccountOrders:
+        account = self._accounts.get(account_id)
+        if account is None:
+            account = self._accounts[account_id] = AccountOrders(account_id, self.poll_interval)
+        return account
+
+    def _idle(self, account: AccountOrders) -> bool:
+        return time.monotonic() - account.read_at > self.idle_timeout
+
+    def _ensure_tracking(self, account: AccountOrders):
+        account.read_at = time.monotonic()
+        if account.task is None or account.task.done():
+            account.task = asyncio.create_task(self._track(account))
+
+    async def _refresh(self, account: AccountOrders, source: OrderDataSource) -> Union[int, ErrorResponse]:
+        """Полный список заявок через API. Возвращает количество изменившихся заявок."""
+        started = time.monotonic()
+        response = await self.api.get_orders(OrdersRequest(account_id=account.account_id))
+        if isinstance(response, ErrorResponse):
+            return response
+        changed = account.replace(response.orders, started)
+        if self.latency is not None:
+            self.latency.observe(response.orders)
+        self._notify(account.account_id, changed)
+        account.seeded = True
+        account.source = source
+        account.synced_at = time.monotonic()
+        return changed
+
+    async def _poll(self, account: AccountOrders, until: float = float("inf")):
+        """Опрос заявок до момента until (или пока счет не перестанут читать)."""
+        while time.monotonic() < until and not self._idle(account):
+            try:
+                await asyncio.wait_for(account.wakeup.wait(), timeout=min(account.poll_delay, max(until - time.monotonic(), 0)))
+            except asyncio.TimeoutError:
+                pass
+            account.wakeup.clear()
+            async with account.refresh_lock:
+                changed = await self._refresh(account, OrderDataSource.POLL)
+            if isinstance(changed, ErrorResponse):
+                logging.warning(f"Опрос заявок {account.account_id}: {changed.error}")
+            # Пока ничего не меняется (или API отвечает ошибкой), опрашиваем все реже
+            if isinstance(changed, ErrorResponse) or not changed:
+                account.poll_delay = min(account.poll_delay * 2, self.max_poll_interval)
+            else:
+                account.poll_delay = self.poll_interval
+
+    async def _stream(self, account: AccountOrders):
+        request = OrderTradeRequest(
+            action=OrderTradeAction.ACTION_SUBSCRIBE,
+            data_type=OrderTradeDataType.DATA_TYPE_ORDERS,
+            account_id=account.account_id,
+        )
+        async for message in self.stream_source(request):
+            if not account.live:
+                logging.info(f"Поток заявок {account.account_id} подключен")
+                account.live = True
+            self._notify(account.account_id, account.upsert(message.orders))
+            if self.latency is not None:
+                self.latency.observe(message.orders)
+            account.source = OrderDataSource.STREAM
+            account.synced_at = time.monotonic()
+
+    async def _track(self, account: AccountOrders):
+        """Фоновое обновление состояния счета: поток, а при его недоступности - опрос."""
+        bind_session(f"orders:{account.account_id}")
+        retry_delay = self.poll_interval
+        try:
+            while not self._idle(account):
+                if self.stream_source is None:
+                    await self._poll(account)
+                    continue
+                try:
+                    await self._stream(account)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.warning(f"Поток заявок {account.account_id} недоступен: {e}")
+                if account.live:
+                    retry_delay = self.poll_interval
+                account.live = False
+                # Пока поток переподключается, заявки опрашиваются; интервал переподключения растет
+                account.poll_delay = self.poll_interval
+                await self._poll(account, until=time.monotonic() + retry_delay)
+                retry_delay = min(retry_delay * 2, self.max_poll_interval)
+        finally:
+            account.live = False
+
+    def apply_response(self, account_id: str, response: Union[PlaceOrderResponse, CancelOrderResponse]):
+        """Свое выставление или отмена: сразу в локальное состояние, опрос ускоряется, чтобы поймать исполнение."""
+        account = self._account(account_id)
+        account.upsert([OrderState(
+            order_id=response.order_id,
+            exec_id=response.exec_id,
+            status=response.status,
+            order=response.order,
+            transact_at=response.transact_at,
+        )])
+        account.applied[response.order_id] = time.monotonic()
+        account.poll_delay = self.poll_interval
+        account.wakeup.set()
+        self._ensure_tracking(account)
+
+    def _freshness(self, account: AccountOrders) -> OrderFreshness:
+        return OrderFreshness(
+            source=account.source,
+            live=account.live,
+            age_s=0.0 if account.live else round(time.monotonic() - account.synced_at, 3),
+            poll_interval_s=None if account.live else account.poll_delay,
+        )
+
+    async def _fresh_account(self, account_id: str, max_age_s: float) -> Union[AccountOrders, ErrorResponse]:
+        account = self._account(account_id)
+        self._ensure_tracking(account)
+        if account.live:
+            return account
+        async with account.refresh_lock:
+            if not account.seeded or time.monotonic() - account.synced_at > max_age_s:
+                changed = await self._refresh(account, OrderDataSource.API)
+                if isinstance(changed, ErrorResponse):
+                    return changed
+        return account
+
+    async def orders(self, account_id: str, max_age_s: float = 5.0) -> Union[CachedOrdersResponse, ErrorResponse]:
+        """Заявки счета из локального состояния; при опросе старше max_age_s секунд состояние обновляется."""
+        account = await self._fresh_account(account_id, max_age_s)
+        if isinstance(account, ErrorResponse):
+            return account
+        return CachedOrdersResponse(orders=list(account.orders.values()), freshness=self._freshness(account))
+
+    async def order(self, account_id: str, order_id: str, max_age_s: float = 5.0) -> Union[CachedOrderResponse, ErrorResponse]:
+        """Заявка из локального состояния; заявки, которых нет в списке счета (например, старые), запрашиваются отдельно."""
+        account = await self._fresh_account(account_id, max_age_s)
+        if isinstance(account, ErrorResponse):
+            return account
+        state = account.orders.get(order_id)
+        if state is not None:
+            return CachedOrderResponse(**state.model_dump(), freshness=self._freshness(account))
+
+        response = await self.api.get_order(GetOrderRequest(account_id=account_id, order_id=order_id))
+        if isinstance(response, ErrorResponse):
+            return response
+        state = OrderState(**response.model_dump())
+        self._notify(account_id, account.upsert([state]))
+        if self.latency is not None:
+            self.latency.observe([state])
+        freshness = OrderFreshness(source=OrderDataSource.API, live=account.live, age_s=0.0)
+        return CachedOrderResponse(**response.model_dump(), freshness=freshness)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import secrets
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .local_store import LocalStore
+from .models import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_submissions (
+    account_id TEXT NOT NULL,
+    client_order_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    call_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    order_id TEXT,
+    response TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (account_id, client_order_id)
+);
+CREATE INDEX IF NOT EXISTS order_submissions_by_fingerprint ON order_submissions (account_id, fingerprint, created_at);
+"""
+
+# Состояния отправки заявки
+IN_FLIGHT = "in_flight"
+SENT = "sent"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+CLIENT_ORDER_ID_LENGTH = 20
+
+
+def generate_client_order_id() -> str:
+    """Уникальный client_order_id в пределах 20 символов: миллисекунды (hex, 11 знаков) и случайный суффикс."""
+    return f"{int(time.time() * 1000):x}{secrets.token_hex(4)}"[:CLIENT_ORDER_ID_LENGTH]
+
+
+def order_fingerprint(account_id: str, request: PlaceOrderRequest) -> str:
+    """Отпечаток содержимого заявки без client_order_id и комментария: одинаковые заявки дают одинаковый отпечаток."""
+    content = request.model_dump(mode="json", exclude={"client_order_id", "comment"})
+    content["symbol"] = content["symbol"].upper()
+    payload = json.dumps([account_id, content], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+@dataclass
+class Submission:
+    """Запись журнала отправки заявки."""
+    client_order_id: str
+    fingerprint: str
+    call_id: str
+    state: str
+    order_id: Optional[str]
+    response: Optional[str]  # ответ брокера (JSON), если заявка выставлена
+    created_at: float
+    updated_at: float
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Submission":
+        client_order_id, fingerprint, call_id, state, order_id, response, created_at, updated_at = row
+        return cls(
+            client_order_id=client_order_id,
+            fingerprint=fingerprint,
+            call_id=call_id,
+            state=state,
+            order_id=order_id,
+            response=response,
+            created_at=created_at,
+            updated_at=updated_at,
+        )
+
+
+_COLUMNS = "client_order_id, fingerprint, call_id, state, order_id, response, created_at, updated_at"
+
+
+class SubmissionLog:
+    """Журнал отправленных заявок в локальном хранилище для защиты от повторного выставления.
+
+    Повтором считается заявка с уже использованным client_order_id или заявка с тем же
+    содержимым, отправленная другим вызовом в пределах dedupe_window секунд (например, агент
+    повторил вызов place_order после таймаута). Записи старше retention удаляются.
+    """
+
+    def __init__(self, store: LocalStore, dedupe_window: float = 120.0, retention: float = 24 * 60 * 60):
+        self.store = store
+        self.dedupe_window = dedupe_window
+        self.retention = retention
+        store.register_schema(SCHEMA)
+
+    async def find_previous(self, account_id: str, request: PlaceOrderRequest, call_id: str, by_content: bool = True) -> Optional[Submission]:
+        """Предыдущая отправка той же заявки: по client_order_id, иначе (если by_content) по отпечатку в окне дедупликации."""
+        fingerprint = order_fingerprint(account_id, request)
+        since = time.time() - self.dedupe_window
+
+        def find(connection: sqlite3.Connection) -> Optional[Submission]:
+            if request.client_order_id:
+                row = connection.execute(
+                    f"SELECT {_COLUMNS} FROM order_submissions WHERE account_id = ? AND client_order_id = ?",
+                    (account_id, request.client_order_id),
+                ).fetchone()
+                if row:
+                    return Submission.from_row(row)
+            if not by_content:
+                return None
+            row = connection.execute(
+                f"""SELECT {_COLUMNS} FROM order_submissions
+                    WHERE account_id = ? AND fingerprint = ? AND created_at >= ? AND call_id != ? AND state != ?
+                    ORDER BY created_at DESC LIMIT 1""",
+                (account_id, fingerprint, since, call_id, FAILED),
+            ).fetchone()
+            return Submission.from_row(row) if row else None
+
+        return await self.store.run(find)
+
+    async def begin(self, account_id: str, request: PlaceOrderRequest, call_id: str):
+        """Запись об отправке до запроса к API: при сбое процесса заявка останется в журнале как незавершенная."""
+        now = time.time()
+
+        def insert(connection: sqlite3.Connection):
+            connection.execute("DELETE FROM order_submissions WHERE created_at < ?", (now - self.retention,))
+            connection.execute(
+                f"INSERT OR REPLACE INTO order_submissions (account_id, {_COLUMNS}) VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, ?)",
+                (account_id, request.client_order_id, order_fingerprint(account_id, request), call_id, IN_FLIGHT, now, now),
+            )
+
+        await self.store.run(insert)
+
+    async def finish(self, account_id: str, client_order_id: str, state: str, response: Optional[PlaceOrderResponse] = None):
+        """Итог отправки: sent с ответом брокера, failed или unknown, если ответ потерян."""
+        def update(connection: sqlite3.Connection):
+            connection.execute(
+                """UPDATE order_submissions SET state = ?, order_id = ?, response = ?, updated_at = ?
+                   WHERE account_id = ? AND client_order_id = ?""",
+                (
+                    state,
+                    response.order_id if response is not None else None,
+                    response.model_dump_json() if response is not None else None,
+                    time.time(),
+                    account_id,
+                    client_order_id,
+                ),
+            )
+
+        await self.store.run(update)
@@ -0,0 +1,208 @@
+import asyncio
+import heapq
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from .bars_history import DAY, NS_IN_SECOND, BarsHistory, align_series, forward_fill
+from .jobs import Job, JobRegistry
+from .models import *
+from .scanner import AssetCatalog
+
+PAIRS_JOB = "pairs_search"
+
+# 5% критическое значение теста Энгла-Грейнджера для двух рядов (MacKinnon)
+ENGLE_GRANGER_5PCT = -3.34
+
+
+def standardized_returns(closes: np.ndarray) -> np.ndarray:
+    """Стандартизованные лог-доходности (время x инструменты). Пропуски после стандартизации -> 0.
+
+    Нулевые пропуски занижают корреляцию пар с редкими котировками, но позволяют считать
+    всю матрицу одним умножением вместо попарного пересечения дат.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(closes), axis=0)
+        mean = np.nanmean(returns, axis=0)
+        std = np.nanstd(returns, axis=0)
+        standardized = (returns - mean) / np.where(std > 0, std, np.nan)
+    return np.nan_to_num(standardized)
+
+
+def block_candidates(z: np.ndarray, rows: slice, cols: slice, threshold: float, include_negative: bool, limit: int) -> List[Tuple[float, int, int, float]]:
+    """Лучшие пары блока корреляционной матрицы: (ключ ранжирования, i, j, корреляция)."""
+    block = z[:, rows].T @ z[:, cols] / max(len(z), 1)
+    scores = np.abs(block) if include_negative else block
+    row_index = np.arange(rows.start, rows.stop)[:, None]
+    col_index = np.arange(cols.start, cols.stop)[None, :]
+    # Диагональный блок: каждая пара один раз (i < j); в остальных исключаем только пару инструмента с собой
+    excluded = col_index <= row_index if rows == cols else col_index == row_index
+    scores = np.where(excluded, -np.inf, scores)
+    flat = scores.ravel()
+    candidates = np.flatnonzero(flat >= threshold)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(flat[candidates], -limit)[-limit:]]
+    i, j = np.unravel_index(candidates, block.shape)
+    return [
+        (float(flat[k]), rows.start + int(a), cols.start + int(b), float(block[a, b]))
+        for k, a, b in zip(candidates, i, j)
+    ]
+
+
+def spread_stats(log_a: np.ndarray, log_b: np.ndarray, bar_days: float) -> dict:
+    """Статистика спреда ln(a) - beta * ln(b): z-score, полураспад и t-статистика AR(1) по изменениям."""
+    valid = np.isfinite(log_a) & np.isfinite(log_b)
+    log_a, log_b = log_a[valid], log_b[valid]
+    if len(log_a) < 10:
+        return {}
+    centered_b = log_b - log_b.mean()
+    variance = centered_b @ centered_b
+    if variance <= 0:
+        return {}
+    beta = float(centered_b @ (log_a - log_a.mean()) / variance)
+    spread = log_a - beta * log_b
+    std = spread.std()
+    stats = {"hedge_ratio": beta, "spread_zscore": float((spread[-1] - spread.mean()) / std) if std > 0 else None}
+
+    # Δs_t = a + b * s_{t-1}: b < 0 - возврат к среднему
+    lagged = spread[:-1] - spread[:-1].mean()
+    delta = np.diff(spread)
+    delta = delta - delta.mean()
+    denominator = lagged @ lagged
+    if denominator <= 0:
+        return stats
+    slope = float(lagged @ delta / denominator)
+    residual = delta - slope * lagged
+    standard_error = np.sqrt(residual @ residual / max(len(delta) - 2, 1) / denominator)
+    adf_stat = slope / standard_error if standard_error > 0 else None
+    stats["adf_stat"] = float(adf_stat) if adf_stat is not None else None
+    stats["cointegrated"] = adf_stat is not None and adf_stat < ENGLE_GRANGER_5PCT
+    if -1 < slope < 0:
+        stats["half_life_days"] = float(-np.log(2) / np.log1p(slope) * bar_days)
+    return stats
+
+
+@dataclass
+class PairsState:
+    """Промежуточное состояние поиска пар."""
+    request: PairsSearchRequest
+    phase: str = "loading"
+    universe_size: int = 0
+    truncated: bool = False
+    symbols: List[str] = field(default_factory=list)
+    log_prices: Optional[np.ndarray] = None
+    bar_days: float = 1.0
+    _best: List[Tuple[float, int, int, float]] = field(default_factory=list)
+
+    def add(self, candidates: List[Tuple[float, int, int, float]]):
+        for candidate in candidates:
+            if len(self._best) < self.request.top_n:
+                heapq.heappush(self._best, candidate)
+            elif candidate[0] > self._best[0][0]:
+                heapq.heapreplace(self._best, candidate)
+
+    def pairs(self) -> List[PairStats]:
+        result = []
+        for _, i, j, correlation in sorted(self._best, reverse=True):
+            stats = spread_stats(self.log_prices[:, i], self.log_prices[:, j], self.bar_days)
+            result.append(PairStats(symbol_a=self.symbols[i], symbol_b=self.symbols[j], correlation=correlation, **stats))
+        return result
+
+
+class PairsFinder:
+    """Поиск коррелированных пар по выборке каталога фоновой задачей.
+
+    История загружается пачками (прогресс по пачкам), матрица корреляций считается блоками
+    block_size x block_size в отдельном потоке: память ограничена размером блока, а лучшие
+    пары доступны в статусе задачи до окончания расчета.
+    """
+
+    def __init__(self, catalog: AssetCatalog, history: BarsHistory, jobs: JobRegistry, max_universe: int = 1000, block_size: int = 256, load_batch: int = 25):
+        self.catalog = catalog
+        self.history = history
+        self.jobs = jobs
+        self.max_universe = max_universe
+        self.block_size = block_size
+        self.load_batch = load_batch
+
+    async def start(self, request: PairsSearchRequest) -> Union[PairsSearchStatus, ErrorResponse]:
+        assets = await self.catalog.select(request.asset_types, request.mics, request.symbols, request.name_contains)
+        if isinstance(assets, ErrorResponse):
+            return assets
+        symbols = [asset.symbol for asset in assets]
+        if request.target_symbol and request.target_symbol not in symbols:
+            symbols.insert(0, request.target_symbol)
+        if len(symbols) < 2:
+            return ErrorResponse(status_code=-1, error="В выборке меньше двух инструментов")
+
+        state = PairsState(request=request, universe_size=len(symbols), truncated=len(symbols) > self.max_universe)
+        job = self.jobs.start(PAIRS_JOB, lambda job: self._run(job, state, symbols[:self.max_universe]))
+        job.data = state
+        return self.status_of(job)
+
+    async def _run(self, job: Job, state: PairsState, symbols: List[str]) -> PairsSearchStatus:
+        request = state.request
+        batches = [symbols[i:i + self.load_batch] for i in range(0, len(symbols), self.load_batch)]
+        job.total = len(batches)
+        series = {}
+        for batch in batches:
+            loaded = await self.history.load_many(batch, TimeFrame.TIME_FRAME_D, time.time() - request.days * DAY)
+            series.update({symbol: bars for symbol, bars in loaded.items() if not isinstance(bars, ErrorResponse) and len(bars)})
+            job.done += 1
+
+        timestamps, closes = align_series(series, list(series), "close")
+        coverage = np.mean(~np.isnan(closes), axis=0) if closes.size else np.empty(0)
+        keep = np.flatnonzero(coverage >= request.min_coverage)
+        state.symbols = [list(series)[j] for j in keep]
+        if len(state.symbols) < 2:
+            state.phase = "done"
+            return self.status_of(job)
+        closes = forward_fill(closes[:, keep])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            state.log_prices = np.log(closes)
+        state.bar_days = float(np.median(np.diff(timestamps))) / NS_IN_SECOND / DAY if len(timestamps) > 1 else 1.0
+
+        z = standardized_returns(closes)
+        n = z.shape[1]
+        if request.target_symbol:
+            if request.target_symbol not in state.symbols:
+                raise RuntimeError(f"Недостаточно истории по {request.target_symbol}")
+            target = state.symbols.index(request.target_symbol)
+            # Нужна только строка целевого инструмента: один блок 1 x n
+            blocks = [(slice(target, target + 1), slice(0, n))]
+        else:
+            starts = range(0, n, self.block_size)
+            blocks = [(slice(i, min(i + self.block_size, n)), slice(j, min(j + self.block_size, n))) for i in starts for j in starts if j >= i]
+
+        state.phase = "correlating"
+        job.total += len(blocks)
+        for rows, cols in blocks:
+            candidates = await asyncio.to_thread(block_candidates, z, rows, cols, request.min_abs_correlation, request.include_negative, request.top_n)
+            state.add(candidates)
+            job.done += 1
+
+        state.phase = "done"
+        logging.info(f"Поиск пар {job.job_id}: {n} инструментов, {len(blocks)} блоков")
+        return self.status_of(job)
+
+    def status_of(self, job: Job) -> PairsSearchStatus:
+        state: PairsState = job.data
+        if state is None:
+            return PairsSearchStatus(job=job.info(), phase="loading")
+        return PairsSearchStatus(
+            job=job.info(),
+            phase=state.phase,
+            universe_size=state.universe_size,
+            evaluated=len(state.symbols),
+            truncated=state.truncated,
+            pairs=state.pairs() if state.log_prices is not None else [],
+        )
+
+    def status(self, job_id: str) -> Union[PairsSearchStatus, ErrorResponse]:
+        job = self.jobs.get(job_id, PAIRS_JOB)
+        if job is None:
+            return ErrorResponse(status_code=404, error=f"Поиск пар {job_id} не найден")
+        return self.status_of(job)
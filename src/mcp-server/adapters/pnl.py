@@ -0,0 +1,410 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .account_cache import AccountSnapshotCache
+from .asset_info import AssetInfoCache
+from .finam_client import FinamApiClient
+from .fx import FxService, base_factors, symbol_currencies
+from .history_sync import NS_IN_DAY, HistorySync, date_range_ns
+from .local_store import LocalStore, count_trades
+from .models import *
+from .numeric import PositionColumns, format_timestamp, timestamp_column
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pnl_lots (
+    account_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    trade_id TEXT NOT NULL,
+    opened_at INTEGER NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (account_id, symbol, seq)
+);
+CREATE TABLE IF NOT EXISTS pnl_realized (
+    account_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    close_trade_id TEXT NOT NULL,
+    open_trade_id TEXT NOT NULL,
+    closed_at INTEGER NOT NULL,
+    opened_at INTEGER NOT NULL,
+    quantity REAL NOT NULL,
+    open_price REAL NOT NULL,
+    close_price REAL NOT NULL,
+    pnl REAL NOT NULL,
+    PRIMARY KEY (account_id, close_trade_id, open_trade_id)
+);
+CREATE INDEX IF NOT EXISTS pnl_realized_by_time ON pnl_realized (account_id, closed_at);
+CREATE TABLE IF NOT EXISTS pnl_cursor (
+    account_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    last_timestamp INTEGER NOT NULL,
+    trades INTEGER NOT NULL,
+    PRIMARY KEY (account_id, symbol)
+);
+"""
+
+# Остаток меньше этого считается нулевым (ошибки округления float)
+EPSILON = 1e-9
+
+# Сделка для сопоставления: (trade_id, время нс, количество со знаком, цена)
+LotTrade = Tuple[str, int, float, float]
+# Открытый лот: [trade_id, время открытия нс, остаток со знаком, цена]
+Lot = List
+
+
+def match_fifo(lots: Deque[Lot], trade: LotTrade) -> List[Tuple[str, int, float, float, float]]:
+    """Сопоставление сделки с открытыми лотами по FIFO.
+
+    Сделка против направления открытых лотов погашает их с самого старого; остаток сделки
+    открывает новый лот. Возвращает закрытия (open_trade_id, opened_at, шт., цена открытия, результат).
+    """
+    trade_id, timestamp, quantity, price = trade
+    closes = []
+    while lots and abs(quantity) > EPSILON and (lots[0][2] > 0) != (quantity > 0):
+        lot = lots[0]
+        closed = min(abs(quantity), abs(lot[2]))
+        direction = 1.0 if lot[2] > 0 else -1.0
+        closes.append((lot[0], lot[1], closed, lot[3], closed * (price - lot[3]) * direction))
+        lot[2] -= closed * direction
+        quantity += closed * direction
+        if abs(lot[2]) <= EPSILON:
+            lots.popleft()
+    if abs(quantity) > EPSILON:
+        lots.append([trade_id, timestamp, quantity, price])
+    return closes
+
+
+def _trade_rows(trades: Sequence[AccountTrade]) -> List[Tuple[str, LotTrade]]:
+    """(символ, сделка) для новых сделок; сделки без направления или объема пропускаются."""
+    if not trades:
+        return []
+    timestamps = timestamp_column([trade.timestamp for trade in trades]).tolist()
+    rows = []
+    for trade, timestamp in zip(trades, timestamps):
+        size = float(trade.size.value or 0)
+        if trade.side == Side.SIDE_BUY:
+            sign = 1.0
+        elif trade.side == Side.SIDE_SELL:
+            sign = -1.0
+        else:
+            continue
+        if size:
+            rows.append((trade.symbol, (trade.trade_id, timestamp, sign * abs(size), float(trade.price.value))))
+    return rows
+
+
+def _stored_trades(connection: sqlite3.Connection, account_id: str, symbol: str) -> List[LotTrade]:
+    rows = connection.execute(
+        "SELECT trade_id, timestamp, side, size, price FROM trades WHERE account_id = ? AND symbol = ? ORDER BY timestamp, rowid",
+        (account_id, symbol),
+    ).fetchall()
+    sign = {Side.SIDE_BUY.value: 1.0, Side.SIDE_SELL.value: -1.0}
+    return [(trade_id, timestamp, sign[side] * abs(size), price) for trade_id, timestamp, side, size, price in rows if side in sign and size]
+
+
+def _apply(connection: sqlite3.Connection, account_id: str, symbol: str, trades: Iterable[LotTrade], rebuild: bool):
+    """Проведение сделок инструмента через FIFO и сохранение лотов, закрытий и курсора."""
+    if rebuild:
+        connection.execute("DELETE FROM pnl_realized WHERE account_id = ? AND symbol = ?", (account_id, symbol))
+        connection.execute("DELETE FROM pnl_cursor WHERE account_id = ? AND symbol = ?", (account_id, symbol))
+        lots: Deque[Lot] = deque()
+    else:
+        lots = deque(
+            list(row) for row in connection.execute(
+                "SELECT trade_id, opened_at, quantity, price FROM pnl_lots WHERE account_id = ? AND symbol = ? ORDER BY seq",
+                (account_id, symbol),
+            )
+        )
+    realized = []
+    last_timestamp, count = None, 0
+    for trade in trades:
+        for open_trade_id, opened_at, quantity, open_price, pnl in match_fifo(lots, trade):
+            realized.append((account_id, symbol, trade[0], open_trade_id, trade[1], opened_at, quantity, open_price, trade[3], pnl))
+        last_timestamp = trade[1] if last_timestamp is None else max(last_timestamp, trade[1])
+        count += 1
+
+    connection.executemany(
+        """INSERT OR REPLACE INTO pnl_realized
+           (account_id, symbol, close_trade_id, open_trade_id, closed_at, opened_at, quantity, open_price, close_price, pnl)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        realized,
+    )
+    connection.execute("DELETE FROM pnl_lots WHERE account_id = ? AND symbol = ?", (account_id, symbol))
+    connection.executemany(
+        "INSERT INTO pnl_lots (account_id, symbol, seq, trade_id, opened_at, quantity, price) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(account_id, symbol, seq, trade_id, opened_at, quantity, price) for seq, (trade_id, opened_at, quantity, price) in enumerate(lots)],
+    )
+    if count:
+        connection.execute(
+            """INSERT INTO pnl_cursor (account_id, symbol, last_timestamp, trades) VALUES (?, ?, ?, ?)
+               ON CONFLICT (account_id, symbol) DO UPDATE SET
+               last_timestamp = MAX(last_timestamp, excluded.last_timestamp), trades = trades + excluded.trades""",
+            (account_id, symbol, last_timestamp, count),
+        )
+
+
+def apply_trades(connection: sqlite3.Connection, account_id: str, trades: Sequence[AccountTrade]):
+    """Инкрементальное проведение новых сделок. Сделка задним числом (раньше последней
+    проведенной по инструменту) пересчитывает инструмент заново из сохраненных сделок."""
+    by_symbol: Dict[str, List[LotTrade]] = defaultdict(list)
+    for symbol, trade in _trade_rows(trades):
+        by_symbol[symbol].append(trade)
+    for symbol, items in by_symbol.items():
+        cursor = connection.execute(
+            "SELECT last_timestamp FROM pnl_cursor WHERE account_id = ? AND symbol = ?", (account_id, symbol)
+        ).fetchone()
+        if cursor is not None and min(trade[1] for trade in items) < cursor[0]:
+            _apply(connection, account_id, symbol, _stored_trades(connection, account_id, symbol), rebuild=True)
+        else:
+            _apply(connection, account_id, symbol, items, rebuild=False)
+
+
+def ensure_consistent(connection: sqlite3.Connection, account_id: str) -> bool:
+    """Пересчет счета, если в хранилище есть сделки, не прошедшие через FIFO (сохранены до подключения PnL)."""
+    processed = connection.execute("SELECT COALESCE(SUM(trades), 0) FROM pnl_cursor WHERE account_id = ?", (account_id,)).fetchone()[0]
+    skipped = connection.execute(
+        "SELECT COUNT(*) FROM trades WHERE account_id = ? AND (side NOT IN (?, ?) OR size = 0)",
+        (account_id, Side.SIDE_BUY.value, Side.SIDE_SELL.value),
+    ).fetchone()[0]
+    if processed + skipped == count_trades(connection, account_id):
+        return False
+    connection.execute("DELETE FROM pnl_lots WHERE account_id = ?", (account_id,))
+    connection.execute("DELETE FROM pnl_realized WHERE account_id = ?", (account_id,))
+    connection.execute("DELETE FROM pnl_cursor WHERE account_id = ?", (account_id,))
+    symbols = [symbol for symbol, in connection.execute("SELECT DISTINCT symbol FROM trades WHERE account_id = ?", (account_id,))]
+    for symbol in symbols:
+        _apply(connection, account_id, symbol, _stored_trades(connection, account_id, symbol), rebuild=True)
+    return True
+
+
+def _mark_price(quote: Union[LastQuoteResponse, ErrorResponse]) -> float:
+    """Цена оценки: последняя сделка, иначе середина спреда."""
+    if isinstance(quote, ErrorResponse):
+        return np.nan
+    last = float(quote.quote.last.value or 0) if quote.quote.last is not None else 0.0
+    if last > 0:
+        return last
+    bid = float(quote.quote.bid.value or 0) if quote.quote.bid is not None else 0.0
+    ask = float(quote.quote.ask.value or 0) if quote.quote.ask is not None else 0.0
+    return (bid + ask) / 2 if bid > 0 and ask > 0 else np.nan
+
+
+class PnLEngine:
+    """Реализованная и нереализованная прибыль счета по сделкам с сопоставлением лотов FIFO.
+
+    Новые сделки из HistorySync проводятся через FIFO в той же транзакции, что и сохранение:
+    открытые лоты, закрытия и курсор по инструменту хранятся в LocalStore, так что каждый вызов
+    обрабатывает только новые сделки. Сделки длинные и короткие: продажа без открытых длинных
+    лотов открывает короткий лот. Лоты восстанавливаются по сделкам за history_days, поэтому
+    при более старых позициях результат неполон - это видно по расхождению с позицией брокера.
+    Комиссии берутся из транзакций COMMISSION за период: у сделок счета поля комиссии нет.
+    Суммы пересчитываются в base_currency по текущему курсу FxService. Результат по разнице цен
+    - деньги только для инструментов с ценой за штуку (UNIT_PRICED_TYPES); у фьючерсов, опционов
+    и облигаций он в пунктах или % номинала и в итоги не входит.
+    """
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        store: LocalStore,
+        history_sync: HistorySync,
+        accounts: Optional[AccountSnapshotCache] = None,
+        history_days: int = 3 * 365,
+        fx: Optional[FxService] = None,
+        asset_info: Optional[AssetInfoCache] = None,
+    ):
+        self.api = api
+        self.accounts = accounts
+        self.fx = fx
+        self.asset_info = asset_info
+        self.store = store
+        self.history_sync = history_sync
+        self.history_days = history_days
+        self.store.register_schema(SCHEMA)
+        history_sync.add_listener(HistoryStream.TRADES, apply_trades)
+
+    async def pnl(self, request: PnLRequest) -> Union[PnLResponse, ErrorResponse]:
+        period = date_range_ns(request.start_date, request.end_date)
+        if isinstance(period, ErrorResponse):
+            return period
+        start_ns, end_ns = period
+        history_from = min(start_ns, time.time_ns() - self.history_days * NS_IN_DAY)
+
+        trades_synced, transactions_synced, account = await asyncio.gather(
+            self.history_sync.sync(request.account_id, HistoryStream.TRADES, history_from),
+            self.history_sync.sync(request.account_id, HistoryStream.TRANSACTIONS, start_ns),
+            (self.accounts or self.api).get_account(GetAccountRequest(account_id=request.account_id)),
+        )
+        warnings: List[str] = []
+        # Как и в хранимой истории: ошибка догрузки не скрывает уже сохраненные данные
+        for synced in (trades_synced, transactions_synced):
+            if isinstance(synced, ErrorResponse):
+                warnings.append(f"Не удалось догрузить историю, результат по сохраненным данным: {synced.error}")
+                logging.warning(f"PnL {request.account_id}: {synced.error}")
+
+        def load(connection: sqlite3.Connection):
+            if ensure_consistent(connection, request.account_id):
+                logging.info(f"PnL {request.account_id}: лоты пересчитаны по сохраненным сделкам")
+            symbol_filter = " AND symbol = ?" if request.symbol else ""
+            extra = [request.symbol] if request.symbol else []
+            realized = connection.execute(
+                f"""SELECT symbol, SUM(pnl), SUM(quantity) FROM pnl_realized
+                    WHERE account_id = ? AND closed_at BETWEEN ? AND ?{symbol_filter} GROUP BY symbol""",
+                [request.account_id, start_ns, end_ns] + extra,
+            ).fetchall()
+            lots = connection.execute(
+                f"""SELECT symbol, trade_id, opened_at, quantity, price FROM pnl_lots
+                    WHERE account_id = ?{symbol_filter} ORDER BY symbol, seq""",
+                [request.account_id] + extra,
+            ).fetchall()
+            fees = connection.execute(
+                f"""SELECT symbol, currency, SUM(amount) FROM transactions
+                    WHERE account_id = ? AND category = ? AND timestamp BETWEEN ? AND ?{symbol_filter} GROUP BY symbol, currency""",
+                [request.account_id, TransactionCategory.COMMISSION.value, start_ns, end_ns] + extra,
+            ).fetchall()
+            return realized, lots, fees
+
+        realized_rows, lot_rows, fee_rows = await self.store.run(load)
+
+        open_lots: Dict[str, List[Tuple[str, int, float, float]]] = defaultdict(list)
+        for symbol, trade_id, opened_at, quantity, price in lot_rows:
+            open_lots[symbol].append((trade_id, opened_at, quantity, price))
+        realized = {symbol: (pnl, quantity) for symbol, pnl, quantity in realized_rows}
+
+        broker: Dict[str, Tuple[float, float]] = {}
+        if isinstance(account, ErrorResponse):
+            warnings.append(f"Нет данных счета для сверки позиций: {account.error}")
+        else:
+            positions = PositionColumns.from_positions(account.positions)
+            for symbol, quantity, price in zip(positions.symbol, positions.quantity, positions.current_price):
+                broker[symbol] = (float(np.nan_to_num(quantity)), float(price))
+
+        held = list(open_lots)
+        quotes = await asyncio.gather(*(self.api.get_last_quote(QuoteRequest(symbol=symbol)) for symbol in held))
+        prices = {symbol: _mark_price(quote) for symbol, quote in zip(held, quotes)}
+
+        symbols = list(dict.fromkeys(list(realized) + held + [symbol for symbol, _, _ in fee_rows if symbol]))
+        base = request.base_currency.upper()
+        if self.asset_info is not None:
+            (currencies, currency_warnings), (unit_priced, priced_warnings) = await asyncio.gather(
+                symbol_currencies(self.asset_info, symbols, request.account_id),
+                self.asset_info.unit_priced(symbols, request.account_id),
+            )
+            warnings += currency_warnings + priced_warnings
+        else:
+            currencies = {symbol: base for symbol in symbols}
+            unit_priced = {symbol: True for symbol in symbols}
+        fee_currencies = [currency.upper() for _, currency, _ in fee_rows]
+        factors, fx_warnings = await base_factors(self.fx, [currencies[symbol] for symbol in symbols] + fee_currencies, base)
+        warnings += fx_warnings
+        symbol_factor = dict(zip(symbols, factors[:len(symbols)].tolist()))
+        # Комиссии приходят списаниями (отрицательными суммами)
+        fee_amounts = -np.array([amount for _, _, amount in fee_rows], dtype=np.float64)
+        fee_base = fee_amounts * factors[len(symbols):]
+        unallocated_fees = float(np.nansum(fee_base[[not symbol for symbol, _, _ in fee_rows]])) if fee_rows else 0.0
+        fees: Dict[str, List[Tuple[str, float, float]]] = defaultdict(list)
+        for (symbol, _, _), currency, amount, converted in zip(fee_rows, fee_currencies, fee_amounts.tolist(), fee_base.tolist()):
+            if symbol:
+                fees[symbol].append((currency, amount, converted))
+
+        results = []
+        # Инструменты без курса остаются в своей валюте и не входят в итоги, как и инструменты с ценой не за штуку
+        excluded = {symbol for symbol in symbols if not unit_priced[symbol]}
+        for symbol in symbols:
+            factor = symbol_factor[symbol]
+            converted = not np.isnan(factor)
+            if not converted:
+                excluded.add(symbol)
+            realized_pnl, closed = realized.get(symbol, (0.0, 0.0))
+            lots = open_lots.get(symbol, [])
+            quantity = np.array([lot[2] for lot in lots])
+            lot_price = np.array([lot[3] for lot in lots])
+            open_quantity = float(quantity.sum()) if lots else 0.0
+
+            price = prices.get(symbol, np.nan)
+            if np.isnan(price) and symbol in broker:
+                price = broker[symbol][1]
+            unrealized = None
+            lot_pnl = np.full(len(lots), np.nan)
+            if lots and not np.isnan(price):
+                lot_pnl = quantity * (price - lot_price)
+                unrealized = round(float(lot_pnl.sum()), 2)
+            elif lots:
+                warnings.append(f"{symbol}: нет текущей цены, нереализованный результат не рассчитан")
+
+            broker_quantity = broker.get(symbol, (0.0, np.nan))[0]
+            mismatch = not isinstance(account, ErrorResponse) and abs(broker_quantity - open_quantity) > EPSILON
+            if mismatch:
+                warnings.append(
+                    f"{symbol}: позиция по сделкам {open_quantity:g} не совпадает с позицией брокера {broker_quantity:g} "
+                    f"(сделки до {format_timestamp(history_from)} не учтены или были переводы бумаг)"
+                )
+            # Комиссии - в той же валюте, что и результат: в базовой при наличии курса, иначе только комиссии в валюте инструмента
+            fee, skipped = 0.0, set()
+            for currency, amount, fee_in_base in fees.get(symbol, []):
+                if converted and not np.isnan(fee_in_base):
+                    fee += fee_in_base
+                elif not converted and currency == currencies[symbol]:
+                    fee += amount
+                else:
+                    skipped.add(currency)
+            if skipped:
+                warnings.append(f"{symbol}: комиссии в {', '.join(sorted(skipped))} не пересчитаны и не учтены в результате")
+            # Результат в пунктах или % номинала не пересчитывается: это не деньги
+            if converted and unit_priced[symbol]:
+                realized_pnl *= factor
+                unrealized = None if unrealized is None else round(unrealized * factor, 2)
+                lot_pnl = lot_pnl * factor
+            results.append(SymbolPnL(
+                symbol=symbol,
+                currency=base if converted else currencies[symbol],
+                fx_rate=float(factor) if converted else None,
+                unit_priced=unit_priced[symbol],
+                realized_pnl=round(realized_pnl, 2),
+                closed_quantity=closed,
+                fees=round(fee, 2),
+                open_quantity=open_quantity,
+                average_open_price=float(np.dot(quantity, lot_price) / open_quantity) if abs(open_quantity) > EPSILON else None,
+                market_price=None if np.isnan(price) else price,
+                unrealized_pnl=unrealized,
+                net_pnl=round(realized_pnl - fee + (unrealized or 0.0), 2) if unit_priced[symbol] else None,
+                broker_quantity=broker_quantity if mismatch else None,
+                lots=[
+                    PnLLot(
+                        trade_id=trade_id,
+                        opened_at=format_timestamp(opened_at),
+                        quantity=lot_quantity,
+                        price=lot_open_price,
+                        unrealized_pnl=None if np.isnan(pnl) else round(float(pnl), 2),
+                    )
+                    for (trade_id, opened_at, lot_quantity, lot_open_price), pnl in zip(lots, lot_pnl)
+                ] if request.include_lots else [],
+            ))
+        results.sort(key=lambda item: -abs(item.net_pnl or 0.0))
+
+        totaled = [item for item in results if item.symbol not in excluded]
+        total_realized = sum(item.realized_pnl for item in totaled)
+        total_fees = sum(item.fees for item in totaled) + (0.0 if request.symbol else unallocated_fees)
+        total_unrealized = sum(item.unrealized_pnl or 0.0 for item in totaled)
+        return PnLResponse(
+            account_id=request.account_id,
+            period_from=format_timestamp(start_ns),
+            period_to=format_timestamp(end_ns),
+            history_from=format_timestamp(history_from),
+            base_currency=base,
+            symbols=results,
+            total_realized_pnl=round(total_realized, 2),
+            total_fees=round(total_fees, 2),
+            unallocated_fees=round(0.0 if request.symbol else unallocated_fees, 2),
+            total_unrealized_pnl=round(total_unrealized, 2),
+            total_net_pnl=round(total_realized - total_fees + total_unrealized, 2),
+            new_trades=0 if isinstance(trades_synced, ErrorResponse) else trades_synced.new_items,
+            warnings=warnings,
+        )
@@ -0,0 +1,267 @@
+import hashlib
+import time
+from collections import defaultdict
+from typing import List, Optional, Union
+
+import numpy as np
+
+from .account_cache import AccountSnapshotCache
+from .asset_info import AssetInfoCache
+from .bars_history import DAY, NS_IN_SECOND, BarsHistory, align_series, forward_fill
+from .cache import AsyncTTLCache
+from .finam_client import FinamApiClient
+from .models import *
+from .numeric import PositionColumns, format_timestamp
+
+YEAR_SECONDS = 365 * DAY
+
+
+def snapshot_id(positions: List[Position]) -> str:
+    """Идентификатор состава портфеля: меняется только при изменении набора позиций или их количества."""
+    items = sorted(f"{position.symbol}={position.quantity.value}" for position in positions)
+    return hashlib.sha1(";".join(items).encode()).hexdigest()[:12]
+
+
+def periods_per_year(timestamps: np.ndarray) -> Optional[float]:
+    """Число периодов ряда в году по фактической плотности точек (учитывает выходные и сессии)."""
+    if len(timestamps) < 2:
+        return None
+    span_years = (timestamps[-1] - timestamps[0]) / NS_IN_SECOND / YEAR_SECONDS
+    return (len(timestamps) - 1) / span_years if span_years > 0 else None
+
+
+def max_drawdown(values: np.ndarray) -> np.ndarray:
+    """Максимальная просадка по оси 0 в долях (отрицательное число или 0)."""
+    return np.min(values / np.maximum.accumulate(values, axis=0) - 1, axis=0)
+
+
+def _finite(value: float, digits: Optional[int] = None) -> Optional[float]:
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits) if digits is not None else float(value)
+
+
+def _equity(account: GetAccountResponse) -> Optional[float]:
+    return _finite(float(account.equity.value)) if account.equity.value else None
+
+
+def position_weights(market_value: np.ndarray) -> np.ndarray:
+    """Доли позиций в стоимости позиций по модулю."""
+    gross = float(np.nansum(np.abs(market_value)))
+    return market_value / gross if gross else np.zeros(len(market_value))
+
+
+class PortfolioAnalytics:
+    """Аналитика портфеля счета по позициям get_account и истории get_bars.
+
+    Метрики по истории кэшируются по снимку состава портфеля (snapshot_id) и параметрам запроса
+    на ttl секунд, так что повторные вопросы о том же портфеле не загружают историю заново.
+    Текущие цены, стоимость и доли позиций берутся из снимка счета при каждом вызове.
+    В стоимость, доли и ряд стоимости портфеля входят только инструменты с ценой за штуку
+    (UNIT_PRICED_TYPES); для фьючерсов, опционов и облигаций считаются только метрики цены.
+    """
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        history: BarsHistory,
+        ttl: float = 5 * 60,
+        max_snapshots: int = 256,
+        accounts: Optional[AccountSnapshotCache] = None,
+        asset_info: Optional[AssetInfoCache] = None,
+    ):
+        self.api = api
+        self.history = history
+        self.accounts = accounts
+        self.asset_info = asset_info
+        self._cache = AsyncTTLCache(ttl=ttl, max_size=max_snapshots)
+
+    async def analyze(self, request: PortfolioAnalyticsRequest) -> Union[PortfolioAnalyticsResponse, ErrorResponse]:
+        account = await (self.accounts or self.api).get_account(GetAccountRequest(account_id=request.account_id))
+        if isinstance(account, ErrorResponse):
+            return account
+        positions = [position for position in account.positions if float(position.quantity.value or 0) != 0]
+        symbols = [position.symbol for position in positions]
+        if self.asset_info is not None:
+            flags, warnings = await self.asset_info.unit_priced(symbols, request.account_id)
+        else:
+            flags, warnings = {symbol: True for symbol in symbols}, []
+        priced = np.array([flags[symbol] for symbol in symbols], dtype=bool)
+        key = (request.account_id, snapshot_id(positions), request.days, request.timeframe, request.benchmark, request.include_correlation)
+        cached = await self._cache.get_or_load(
+            key,
+            lambda: self._compute(request, account, positions, priced),
+            should_cache=lambda value: not isinstance(value, ErrorResponse),
+        )
+        if isinstance(cached, ErrorResponse):
+            return cached
+        response = self._with_current_values(cached, account, positions, priced)
+        response.warnings = warnings
+        return response
+
+    @staticmethod
+    def _market_value(columns: PositionColumns, priced: np.ndarray) -> np.ndarray:
+        """Стоимость позиций; у инструментов с ценой не за штуку - NaN."""
+        return np.where(priced, columns.market_value, np.nan)
+
+    @staticmethod
+    def _with_current_values(cached: PortfolioAnalyticsResponse, account: GetAccountResponse, positions: List[Position], priced: np.ndarray) -> PortfolioAnalyticsResponse:
+        """Копия кэшированной аналитики с оценкой по текущему снимку счета."""
+        response = cached.model_copy(deep=True)
+        columns = PositionColumns.from_positions(positions)
+        market_value = PortfolioAnalytics._market_value(columns, priced)
+        weights = position_weights(market_value)
+        response.equity = _equity(account)
+        response.positions_value = float(np.nansum(market_value))
+        # Состав тот же (snapshot_id), но порядок позиций в ответе брокера может отличаться
+        current = defaultdict(list)
+        for i, symbol in enumerate(columns.symbol):
+            current[symbol].append(i)
+        for position in response.positions:
+            i = current[position.symbol].pop(0)
+            position.price = float(columns.current_price[i])
+            position.market_value = _finite(market_value[i])
+            position.weight_pct = _finite(weights[i] * 100)
+        return response
+
+    async def _compute(
+        self, request: PortfolioAnalyticsRequest, account: GetAccountResponse, positions: List[Position], priced: np.ndarray
+    ) -> PortfolioAnalyticsResponse:
+        columns = PositionColumns.from_positions(positions)
+        market_value = self._market_value(columns, priced)
+        weights = position_weights(market_value)
+
+        symbols = list(dict.fromkeys(columns.symbol))
+        benchmark = request.benchmark
+        to_load = symbols + ([benchmark] if benchmark and benchmark not in symbols else [])
+        series = await self.history.load_many(to_load, request.timeframe, time.time() - request.days * DAY)
+        loaded = {symbol: bars for symbol, bars in series.items() if not isinstance(bars, ErrorResponse) and len(bars)}
+
+        response = PortfolioAnalyticsResponse(
+            account_id=account.account_id,
+            snapshot_id=snapshot_id(positions),
+            equity=_equity(account),
+            positions_value=float(np.nansum(market_value)),
+            positions=[
+                PositionAnalytics(
+                    symbol=symbol,
+                    quantity=float(columns.quantity[i]),
+                    price=float(columns.current_price[i]),
+                    market_value=_finite(market_value[i]),
+                    weight_pct=_finite(weights[i] * 100),
+                )
+                for i, symbol in enumerate(columns.symbol)
+            ],
+            missing_history=[symbol for symbol in symbols if symbol not in loaded],
+        )
+
+        held = [i for i, symbol in enumerate(columns.symbol) if symbol in loaded]
+        if not held:
+            return response
+        held_symbols = [columns.symbol[i] for i in held]
+        use_benchmark = benchmark is not None and benchmark in loaded
+        aligned_symbols = list(dict.fromkeys(held_symbols + ([benchmark] if use_benchmark else [])))
+        timestamps, closes = align_series(loaded, aligned_symbols, "close")
+        closes = forward_fill(closes)
+
+        # Окно начинается с первой точки, где известны цены всех инструментов
+        complete = ~np.isnan(closes).any(axis=1)
+        if complete.sum() < 2:
+            return response
+        first = int(np.argmax(complete))
+        timestamps, closes = timestamps[first:], closes[first:]
+        column_of = {symbol: j for j, symbol in enumerate(aligned_symbols)}
+        prices = closes[:, [column_of[symbol] for symbol in held_symbols]]
+        # В стоимость портфеля входят только инструменты с ценой за штуку
+        quantity = np.where(priced[held], columns.quantity[held], 0.0)
+
+        self._fill_positions(response, held, prices, quantity, timestamps)
+        portfolio_returns = self._fill_portfolio(response, prices, quantity, timestamps)
+
+        if use_benchmark:
+            benchmark_prices = closes[:, column_of[benchmark]]
+            self._fill_benchmark(response, benchmark, benchmark_prices, portfolio_returns, prices, held, timestamps)
+        elif benchmark:
+            response.missing_history.append(benchmark)
+
+        if request.include_correlation and len(held_symbols) > 1:
+            returns = prices[1:] / prices[:-1] - 1
+            with np.errstate(divide="ignore", invalid="ignore"):
+                matrix = np.corrcoef(returns, rowvar=False)
+            response.correlation = CorrelationMatrix(
+                symbols=held_symbols,
+                matrix=[[_finite(value, 4) for value in row] for row in matrix],
+            )
+        return response
+
+    @staticmethod
+    def _fill_positions(response: PortfolioAnalyticsResponse, held: List[int], prices: np.ndarray, quantity: np.ndarray, timestamps: np.ndarray):
+        scale = periods_per_year(timestamps)
+        returns = prices[1:] / prices[:-1] - 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            total_return = prices[-1] / prices[0] - 1
+            volatility = np.std(returns, axis=0, ddof=1) * np.sqrt(scale) if scale and len(returns) > 1 else np.full(len(held), np.nan)
+            drawdown = max_drawdown(prices)
+            start_value = abs(float(prices[0] @ quantity))
+            contribution = quantity * (prices[-1] - prices[0]) / start_value if start_value else np.full(len(held), np.nan)
+            # Нулевое количество здесь - позиция вне стоимости портфеля (нулевые позиции отфильтрованы раньше)
+            contribution = np.where(quantity != 0, contribution, np.nan)
+        for j, i in enumerate(held):
+            position = response.positions[i]
+            position.return_pct = _finite(total_return[j] * 100)
+            position.volatility_pct = _finite(volatility[j] * 100)
+            position.max_drawdown_pct = _finite(drawdown[j] * 100)
+            position.contribution_pct = _finite(contribution[j] * 100)
+
+    @staticmethod
+    def _fill_portfolio(response: PortfolioAnalyticsResponse, prices: np.ndarray, quantity: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """Метрики текущего состава портфеля за окно. Возвращает ряд доходностей портфеля."""
+        value = prices @ quantity
+        scale = periods_per_year(timestamps)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Деление на модуль: для портфеля с перевесом шортов знак доходности остается осмысленным
+            returns = np.diff(value) / np.abs(value[:-1])
+            std = np.std(returns, ddof=1) if len(returns) > 1 else np.nan
+            response.return_pct = _finite((value[-1] - value[0]) / abs(value[0]) * 100)
+            response.volatility_pct = _finite(std * np.sqrt(scale) * 100) if scale else None
+            response.sharpe = _finite(np.mean(returns) / std * np.sqrt(scale)) if scale and std > 0 else None
+            response.max_drawdown_pct = _finite(max_drawdown(value) * 100) if np.all(value > 0) else None
+        response.start = format_timestamp(timestamps[0])
+        response.end = format_timestamp(timestamps[-1])
+        response.bars = len(timestamps)
+        return returns
+
+    @staticmethod
+    def _fill_benchmark(
+        response: PortfolioAnalyticsResponse,
+        symbol: str,
+        benchmark_prices: np.ndarray,
+        portfolio_returns: np.ndarray,
+        prices: np.ndarray,
+        held: List[int],
+        timestamps: np.ndarray,
+    ):
+        scale = periods_per_year(timestamps)
+        benchmark_returns = benchmark_prices[1:] / benchmark_prices[:-1] - 1
+        asset_returns = prices[1:] / prices[:-1] - 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variance = np.var(benchmark_returns, ddof=1) if len(benchmark_returns) > 1 else np.nan
+            centered = benchmark_returns - benchmark_returns.mean()
+            betas = (asset_returns - asset_returns.mean(axis=0)).T @ centered / (len(centered) - 1) / variance
+            portfolio_beta = np.cov(portfolio_returns, benchmark_returns)[0, 1] / variance if len(centered) > 1 else np.nan
+            correlation = np.corrcoef(portfolio_returns, benchmark_returns)[0, 1] if len(centered) > 1 else np.nan
+            active = portfolio_returns - benchmark_returns
+            tracking_error = np.std(active, ddof=1) * np.sqrt(scale) if scale and len(active) > 1 else np.nan
+            benchmark_return = benchmark_prices[-1] / benchmark_prices[0] - 1
+
+        for j, i in enumerate(held):
+            response.positions[i].beta = _finite(betas[j], 4)
+        response.benchmark = BenchmarkComparison(
+            symbol=symbol,
+            return_pct=_finite(benchmark_return * 100),
+            volatility_pct=_finite(np.sqrt(variance * scale) * 100) if scale else None,
+            excess_return_pct=_finite(response.return_pct - benchmark_return * 100) if response.return_pct is not None else None,
+            beta=_finite(portfolio_beta, 4),
+            correlation=_finite(correlation, 4),
+            tracking_error_pct=_finite(tracking_error * 100),
+        )
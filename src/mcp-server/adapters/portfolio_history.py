@@ -0,0 +1,346 @@
+import asyncio
+import sqlite3
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .account_cache import AccountSnapshotCache
+from .asset_info import AssetInfoCache
+from .bars_history import DAY, BarsHistory
+from .downsample import lttb_indices
+from .finam_client import FinamApiClient
+from .fx import FxService, base_factors, symbol_currencies
+from .history_sync import NS_IN_DAY, HistorySync
+from .local_store import LocalStore, count_trades, count_transactions
+from .models import *
+from .numeric import PositionColumns, decimal_column, money_column, timestamp_column
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS portfolio_daily_fills (
+    account_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    trades INTEGER NOT NULL,
+    PRIMARY KEY (account_id, day, symbol)
+);
+CREATE TABLE IF NOT EXISTS portfolio_daily_cash_flows (
+    account_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    cash REAL NOT NULL,
+    external_flow REAL NOT NULL,
+    transactions INTEGER NOT NULL,
+    PRIMARY KEY (account_id, day, currency)
+);
+DROP TABLE IF EXISTS portfolio_daily_positions;
+DROP TABLE IF EXISTS portfolio_daily_cash;
+"""
+
+# Вводы и выводы средств: не влияют на доходность счета
+EXTERNAL_FLOW_CATEGORIES = {TransactionCategory.DEPOSIT, TransactionCategory.WITHDRAW, TransactionCategory.TRANSFER}
+
+SIDE_SIGN = {Side.SIDE_BUY: 1.0, Side.SIDE_SELL: -1.0}
+
+
+def day_to_date(day: int) -> str:
+    return datetime.fromtimestamp(day * DAY, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def transaction_deltas(transactions: Sequence[Transaction]) -> Dict[Tuple[int, str], List[float]]:
+    """Дневные изменения денег {(день, валюта): [изменение, внешний поток, транзакций]}."""
+    cash: Dict[Tuple[int, str], List[float]] = {}
+    if not transactions:
+        return cash
+    days = (timestamp_column([transaction.timestamp for transaction in transactions]) // NS_IN_DAY).tolist()
+    amounts = money_column([transaction.change for transaction in transactions]).tolist()
+    for transaction, day, amount in zip(transactions, days, amounts):
+        totals = cash.setdefault((day, transaction.change.currency_code.upper()), [0.0, 0.0, 0])
+        totals[0] += amount
+        if transaction.transaction_category in EXTERNAL_FLOW_CATEGORIES:
+            totals[1] += amount
+        totals[2] += 1
+    return cash
+
+
+def trade_deltas(trades: Sequence[AccountTrade]) -> Dict[Tuple[int, str], List[float]]:
+    """Дневные изменения позиций {(день, символ): [шт. со знаком, сделок]}.
+
+    Направление берется из стороны сделки, а не из движения денег: исполнения FORTS
+    и сделки с отдельно списанной комиссией деньги так не меняют.
+    """
+    positions: Dict[Tuple[int, str], List[float]] = {}
+    if not trades:
+        return positions
+    days = (timestamp_column([trade.timestamp for trade in trades]) // NS_IN_DAY).tolist()
+    sizes = decimal_column([trade.size for trade in trades])
+    for trade, day, size in zip(trades, days, np.nan_to_num(sizes).tolist()):
+        totals = positions.setdefault((day, trade.symbol), [0.0, 0])
+        # Сделки без стороны учитываются в счетчике, чтобы сверка с хранилищем сходилась
+        totals[0] += abs(size) * SIDE_SIGN.get(trade.side, 0.0)
+        totals[1] += 1
+    return positions
+
+
+def apply_transactions(connection: sqlite3.Connection, account_id: str, transactions: Sequence[Transaction]):
+    """Добавление новых транзакций в дневные изменения денег. Каждая транзакция учитывается один раз."""
+    connection.executemany(
+        """INSERT INTO portfolio_daily_cash_flows (account_id, day, currency, cash, external_flow, transactions) VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT (account_id, day, currency) DO UPDATE SET cash = cash + excluded.cash,
+           external_flow = external_flow + excluded.external_flow, transactions = transactions + excluded.transactions""",
+        [(account_id, day, currency, amount, flow, count) for (day, currency), (amount, flow, count) in transaction_deltas(transactions).items()],
+    )
+
+
+def apply_trades(connection: sqlite3.Connection, account_id: str, trades: Sequence[AccountTrade]):
+    """Добавление новых сделок в дневные изменения позиций."""
+    connection.executemany(
+        """INSERT INTO portfolio_daily_fills (account_id, day, symbol, quantity, trades) VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT (account_id, day, symbol) DO UPDATE SET quantity = quantity + excluded.quantity, trades = trades + excluded.trades""",
+        [(account_id, day, symbol, quantity, count) for (day, symbol), (quantity, count) in trade_deltas(trades).items()],
+    )
+
+
+def ensure_consistent(connection: sqlite3.Connection, account_id: str) -> bool:
+    """Пересборка дневных изменений из сохраненных сделок и транзакций, если часть из них
+    сохранена до подключения истории стоимости."""
+    rebuilt = False
+    fills = connection.execute("SELECT COALESCE(SUM(trades), 0) FROM portfolio_daily_fills WHERE account_id = ?", (account_id,)).fetchone()[0]
+    if fills != count_trades(connection, account_id):
+        connection.execute("DELETE FROM portfolio_daily_fills WHERE account_id = ?", (account_id,))
+        connection.execute(
+            """INSERT INTO portfolio_daily_fills (account_id, day, symbol, quantity, trades)
+               SELECT account_id, timestamp / ?, symbol,
+                      SUM(CASE side WHEN ? THEN ABS(size) WHEN ? THEN -ABS(size) ELSE 0 END), COUNT(*)
+               FROM trades WHERE account_id = ? GROUP BY account_id, timestamp / ?, symbol""",
+            (NS_IN_DAY, Side.SIDE_BUY.value, Side.SIDE_SELL.value, account_id, NS_IN_DAY),
+        )
+        rebuilt = True
+    flows = connection.execute("SELECT COALESCE(SUM(transactions), 0) FROM portfolio_daily_cash_flows WHERE account_id = ?", (account_id,)).fetchone()[0]
+    if flows != count_transactions(connection, account_id):
+        external = ", ".join(f"'{category.value}'" for category in EXTERNAL_FLOW_CATEGORIES)
+        connection.execute("DELETE FROM portfolio_daily_cash_flows WHERE account_id = ?", (account_id,))
+        connection.execute(
+            f"""INSERT INTO portfolio_daily_cash_flows (account_id, day, currency, cash, external_flow, transactions)
+                SELECT account_id, timestamp / ?, UPPER(currency), SUM(amount),
+                       SUM(CASE WHEN category IN ({external}) THEN amount ELSE 0 END), COUNT(*)
+                FROM transactions WHERE account_id = ? GROUP BY account_id, timestamp / ?, UPPER(currency)""",
+            (NS_IN_DAY, account_id, NS_IN_DAY),
+        )
+        rebuilt = True
+    return rebuilt
+
+
+def daily_closes(bars_timestamp: np.ndarray, bars_close: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Цена закрытия на конец каждого дня: последняя свеча в этот день или раньше. До первой свечи - NaN."""
+    index = np.searchsorted(bars_timestamp // NS_IN_DAY, days, side="right") - 1
+    closes = bars_close[np.maximum(index, 0)] if len(bars_close) else np.full(len(days), np.nan)
+    return np.where(index >= 0, closes, np.nan)
+
+
+class PortfolioHistory:
+    """История стоимости счета по сделкам и транзакциям.
+
+    Сделки и транзакции загружает HistorySync; при сохранении каждая новая сделка раскладывается
+    в дневные изменения позиций, каждая транзакция - в дневные изменения денег по валютам.
+    Позиции и деньги на конец любого дня
+    получаются от текущего состояния счета вычитанием изменений после этого дня, поэтому история
+    не обязана начинаться с открытия счета. Повторные вызовы догружают только хвост с момента
+    последней синхронизации. Деньги и позиции в разных валютах пересчитываются в base_currency
+    по текущему курсу FxService. Позиции оцениваются только у инструментов с ценой за штуку
+    (UNIT_PRICED_TYPES): фьючерсы отражаются в деньгах через вариационную маржу.
+    """
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        store: LocalStore,
+        history: BarsHistory,
+        history_sync: HistorySync,
+        accounts: Optional[AccountSnapshotCache] = None,
+        fx: Optional[FxService] = None,
+        asset_info: Optional[AssetInfoCache] = None,
+    ):
+        self.api = api
+        self.accounts = accounts
+        self.fx = fx
+        self.asset_info = asset_info
+        self.store = store
+        self.history = history
+        self.history_sync = history_sync
+        self.store.register_schema(SCHEMA)
+        history_sync.add_listener(HistoryStream.TRANSACTIONS, apply_transactions)
+        history_sync.add_listener(HistoryStream.TRADES, apply_trades)
+
+    async def value_history(self, request: PortfolioHistoryRequest) -> Union[PortfolioHistoryResponse, ErrorResponse]:
+        today = time.time_ns() // NS_IN_DAY
+        if request.start_date:
+            try:
+                start_day = (date.fromisoformat(request.start_date) - date(1970, 1, 1)).days
+            except ValueError:
+                return ErrorResponse(status_code=-1, error="start_date должен быть в формате YYYY-MM-DD")
+        else:
+            start_day = today - request.days
+        start_day = min(start_day, today)
+
+        account, synced, trades_synced = await asyncio.gather(
+            (self.accounts or self.api).get_account(GetAccountRequest(account_id=request.account_id)),
+            self.history_sync.sync(request.account_id, HistoryStream.TRANSACTIONS, start_day * NS_IN_DAY),
+            self.history_sync.sync(request.account_id, HistoryStream.TRADES, start_day * NS_IN_DAY),
+        )
+        for response in (account, synced, trades_synced):
+            if isinstance(response, ErrorResponse):
+                return response
+
+        def load(connection: sqlite3.Connection):
+            ensure_consistent(connection, request.account_id)
+            positions = connection.execute(
+                "SELECT day, symbol, quantity FROM portfolio_daily_fills WHERE account_id = ? AND day >= ?",
+                (request.account_id, start_day),
+            ).fetchall()
+            cash = connection.execute(
+                "SELECT day, currency, cash, external_flow FROM portfolio_daily_cash_flows WHERE account_id = ? AND day >= ?",
+                (request.account_id, start_day),
+            ).fetchall()
+            return positions, cash, count_transactions(connection, request.account_id)
+
+        position_rows, cash_rows, stored = await self.store.run(load)
+        days = np.arange(start_day, today + 1)
+        current = PositionColumns.from_positions(account.positions)
+        symbols = list(dict.fromkeys(current.symbol + [symbol for _, symbol, _ in position_rows]))
+        column = {symbol: j for j, symbol in enumerate(symbols)}
+
+        # Изменения после конца дня d = все изменения периода минус накопленные по день d включительно
+        position_delta = np.zeros((len(days), len(symbols)))
+        for day, symbol, quantity in position_rows:
+            if day <= today:
+                position_delta[day - start_day, column[symbol]] += quantity
+        current_cash = money_column(account.cash) if account.cash else np.empty(0)
+        account_currencies = [money.currency_code.upper() for money in account.cash]
+        currencies = list(dict.fromkeys(account_currencies + [currency for _, currency, _, _ in cash_rows]))
+        currency_column = {currency: k for k, currency in enumerate(currencies)}
+        cash_delta = np.zeros((len(days), len(currencies)))
+        flows_by_currency = np.zeros((len(days), len(currencies)))
+        for day, currency, amount, flow in cash_rows:
+            if day <= today:
+                cash_delta[day - start_day, currency_column[currency]] += amount
+                flows_by_currency[day - start_day, currency_column[currency]] += flow
+
+        current_quantity = np.zeros(len(symbols))
+        np.add.at(current_quantity, [column[symbol] for symbol in current.symbol], np.nan_to_num(current.quantity))
+        cumulative = np.cumsum(position_delta, axis=0)
+        quantities = current_quantity - (cumulative[-1] - cumulative)
+        cash_now = np.zeros(len(currencies))
+        np.add.at(cash_now, [currency_column[currency] for currency in account_currencies], current_cash)
+        cash_cumulative = np.cumsum(cash_delta, axis=0)
+        cash_by_currency = cash_now - (cash_cumulative[-1] - cash_cumulative)
+
+        # Деньги и цены пересчитываются в базовую валюту по текущему курсу
+        (symbol_currency, warnings), (priced, priced_warnings) = await asyncio.gather(
+            self._symbol_currencies(symbols, request.account_id, request.base_currency),
+            self._unit_priced(symbols, request.account_id),
+        )
+        warnings += priced_warnings
+        factors, fx_warnings = await base_factors(self.fx, currencies + symbol_currency, request.base_currency)
+        warnings += fx_warnings
+        cash_factors, price_factors = np.nan_to_num(factors[:len(currencies)]), factors[len(currencies):]
+        cash = cash_by_currency @ cash_factors
+        flows = flows_by_currency @ cash_factors
+
+        # В стоимость позиций входят только инструменты с ценой за штуку: количество * цена фьючерса или облигации -
+        # не деньги, а результат по фьючерсам уже приходит в деньги вариационной маржой
+        quantities = np.where(priced, quantities, 0.0)
+        prices, missing = await self._prices(symbols, quantities, days, current)
+        prices = prices * price_factors
+        with np.errstate(invalid="ignore"):
+            positions_value = np.nansum(np.where(quantities != 0, quantities * prices, 0.0), axis=1)
+        equity = cash + positions_value
+        return self._response(
+            request.account_id, days, equity, cash, positions_value, flows, synced.new_items, stored, missing, request.max_points,
+            request.base_currency.upper(), warnings,
+        )
+
+    async def _symbol_currencies(self, symbols: List[str], account_id: str, base: str) -> Tuple[List[str], List[str]]:
+        if self.asset_info is None:
+            return [base.upper()] * len(symbols), []
+        currencies, warnings = await symbol_currencies(self.asset_info, symbols, account_id)
+        return [currencies[symbol] for symbol in symbols], warnings
+
+    async def _unit_priced(self, symbols: List[str], account_id: str) -> Tuple[np.ndarray, List[str]]:
+        if self.asset_info is None:
+            return np.ones(len(symbols), dtype=bool), []
+        flags, warnings = await self.asset_info.unit_priced(symbols, account_id)
+        return np.array([flags[symbol] for symbol in symbols], dtype=bool), warnings
+
+    async def _prices(self, symbols: List[str], quantities: np.ndarray, days: np.ndarray, current: PositionColumns) -> Tuple[np.ndarray, List[str]]:
+        """Матрица цен закрытия (дни x инструменты) для инструментов, которые были в портфеле за период."""
+        prices = np.full(quantities.shape, np.nan)
+        held = np.flatnonzero(np.any(quantities != 0, axis=0))
+        series = await self.history.load_many(
+            [symbols[j] for j in held], TimeFrame.TIME_FRAME_D, (int(days[0]) - 10) * DAY
+        )
+        missing = []
+        for j in held:
+            bars = series[symbols[j]]
+            if isinstance(bars, ErrorResponse) or not len(bars):
+                missing.append(symbols[j])
+                continue
+            prices[:, j] = daily_closes(bars.timestamp, bars.close, days)
+        # Последний день оцениваем по текущим ценам брокера, чтобы ряд сходился с get_account
+        for symbol, price in zip(current.symbol, current.current_price):
+            if not np.isnan(price):
+                prices[-1, symbols.index(symbol)] = price
+        return prices, missing
+
+    @staticmethod
+    def _response(
+        account_id: str,
+        days: np.ndarray,
+        equity: np.ndarray,
+        cash: np.ndarray,
+        positions_value: np.ndarray,
+        flows: np.ndarray,
+        new_count: int,
+        stored: int,
+        missing: List[str],
+        max_points: int,
+        base_currency: str,
+        warnings: List[str],
+    ) -> PortfolioHistoryResponse:
+        # Доходность дня без учета потока: (E_d - F_d) / E_{d-1} - 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            daily = np.where(equity[:-1] > 0, (equity[1:] - flows[1:]) / equity[:-1] - 1, 0.0)
+        growth = np.cumprod(1 + np.concatenate(([0.0], daily)))
+        drawdown = growth / np.maximum.accumulate(growth) - 1
+        cumulative_flows = np.cumsum(np.concatenate(([0.0], flows[1:])))
+        net_flows = float(cumulative_flows[-1])
+
+        keep = lttb_indices(days, equity, max_points) if max_points > 0 else np.arange(len(days))
+        return PortfolioHistoryResponse(
+            account_id=account_id,
+            base_currency=base_currency,
+            start=day_to_date(int(days[0])),
+            end=day_to_date(int(days[-1])),
+            points=[
+                PortfolioValuePoint(
+                    date=day_to_date(int(days[i])),
+                    equity=float(equity[i]),
+                    cash=float(cash[i]),
+                    positions_value=float(positions_value[i]),
+                    cumulative_net_flow=float(cumulative_flows[i]),
+                )
+                for i in keep
+            ],
+            start_equity=float(equity[0]),
+            end_equity=float(equity[-1]),
+            net_flows=net_flows,
+            pnl=float(equity[-1] - equity[0] - net_flows),
+            twr_pct=float((growth[-1] - 1) * 100) if np.isfinite(growth[-1]) else None,
+            max_drawdown_pct=float(np.min(drawdown) * 100) if np.all(np.isfinite(drawdown)) else None,
+            new_transactions=new_count,
+            stored_transactions=stored,
+            missing_prices=missing,
+            warnings=warnings,
+        )
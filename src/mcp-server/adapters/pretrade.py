@@ -0,0 +1,263 @@
+import asyncio
+import math
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+
+from .asset_info import AssetInfoCache, TradingSpec
+from .finam_client import FinamApiClient
+from .models import *
+from .numeric import format_decimal
+
+SUPPORTED_TIME_IN_FORCE = {
+    TimeInForce.TIME_IN_FORCE_DAY,
+    TimeInForce.TIME_IN_FORCE_GOOD_TILL_CANCEL,
+    TimeInForce.TIME_IN_FORCE_IOC,
+    TimeInForce.TIME_IN_FORCE_FOK,
+}
+IMMEDIATE_TIME_IN_FORCE = {TimeInForce.TIME_IN_FORCE_IOC, TimeInForce.TIME_IN_FORCE_FOK}
+LIMIT_PRICE_TYPES = {OrderType.ORDER_TYPE_LIMIT, OrderType.ORDER_TYPE_STOP_LIMIT}
+STOP_PRICE_TYPES = {OrderType.ORDER_TYPE_STOP, OrderType.ORDER_TYPE_STOP_LIMIT}
+MAX_CLIENT_ORDER_ID = 20
+MAX_COMMENT = 128
+
+
+def parse_decimal(value: Optional[DecimalValue]) -> Optional[Decimal]:
+    if value is None or not value.value:
+        return None
+    try:
+        return Decimal(value.value)
+    except InvalidOperation:
+        return None
+
+
+class PreTradeReport:
+    """Накопитель замечаний проверки с типизированными исправлениями полей."""
+
+    def __init__(self):
+        self.issues: List[PreTradeIssue] = []
+        self.fixes: Dict[str, Any] = {}
+        self._unfixable = False
+
+    def add(self, field: str, code: str, message: str, fix: Any = None, severity: IssueSeverity = IssueSeverity.ERROR):
+        suggested = None
+        if fix is not None:
+            self.fixes[field] = fix
+            suggested = fix.value if isinstance(fix, (DecimalValue, TimeInForce, StopCondition)) else str(fix)
+        elif severity == IssueSeverity.ERROR:
+            self._unfixable = True
+        self.issues.append(PreTradeIssue(field=field, code=code, severity=severity, message=message, suggested_value=suggested))
+
+    @property
+    def errors(self) -> List[PreTradeIssue]:
+        return [issue for issue in self.issues if issue.severity == IssueSeverity.ERROR]
+
+    def fixed_order(self, request: PlaceOrderRequest) -> Optional[PlaceOrderRequest]:
+        if not self.errors or self._unfixable:
+            return None
+        return request.model_copy(update=self.fixes)
+
+    def response(self, account_id: str, request: PlaceOrderRequest) -> PreTradeCheckResponse:
+        return PreTradeCheckResponse(
+            account_id=account_id,
+            symbol=request.symbol,
+            passed=not self.errors,
+            issues=self.issues,
+            fixed_order=self.fixed_order(request),
+        )
+
+
+def check_order_shape(request: PlaceOrderRequest, report: Optional[PreTradeReport] = None) -> PreTradeReport:
+    """Проверки, не требующие данных об инструменте: количество, сторона, цены и условия по типу заявки, срок действия, длины полей."""
+    report = report or PreTradeReport()
+    quantity = parse_decimal(request.quantity)
+    if quantity is None or quantity <= 0:
+        report.add("quantity", "quantity_invalid", "quantity должно быть положительным числом")
+    if request.side not in (Side.SIDE_BUY, Side.SIDE_SELL):
+        report.add("side", "side_invalid", "side должен быть SIDE_BUY или SIDE_SELL")
+    if request.type == OrderType.ORDER_TYPE_UNSPECIFIED:
+        report.add("type", "type_missing", "не указан type")
+    if request.type in LIMIT_PRICE_TYPES and not (parse_decimal(request.limit_price) or 0) > 0:
+        report.add("limit_price", "price_missing", f"для {request.type.value} нужна положительная limit_price")
+    if request.type in STOP_PRICE_TYPES and not (parse_decimal(request.stop_price) or 0) > 0:
+        report.add("stop_price", "price_missing", f"для {request.type.value} нужна положительная stop_price")
+    if request.type in STOP_PRICE_TYPES and request.stop_condition in (None, StopCondition.STOP_CONDITION_UNSPECIFIED):
+        # Типичный случай: стоп на покупку срабатывает при росте цены, на продажу - при падении
+        condition = StopCondition.STOP_CONDITION_LAST_UP if request.side == Side.SIDE_BUY else StopCondition.STOP_CONDITION_LAST_DOWN
+        report.add("stop_condition", "stop_condition_missing", f"для {request.type.value} нужно stop_condition", condition)
+    if request.type == OrderType.ORDER_TYPE_MARKET and request.limit_price is not None:
+        report.add("limit_price", "price_ignored", "limit_price не используется в рыночной заявке", severity=IssueSeverity.WARNING)
+    if request.type == OrderType.ORDER_TYPE_MULTI_LEG and not request.legs:
+        report.add("legs", "legs_missing", "для ORDER_TYPE_MULTI_LEG нужны legs")
+
+    day = TimeInForce.TIME_IN_FORCE_DAY
+    if request.time_in_force not in SUPPORTED_TIME_IN_FORCE:
+        report.add("time_in_force", "time_in_force_unsupported", f"срок действия {request.time_in_force.value} не поддерживается", day)
+    elif request.type in STOP_PRICE_TYPES and request.time_in_force in IMMEDIATE_TIME_IN_FORCE:
+        report.add("time_in_force", "time_in_force_incompatible", f"условная заявка {request.type.value} не может быть {request.time_in_force.value}", day)
+    elif request.type == OrderType.ORDER_TYPE_MARKET and request.time_in_force == TimeInForce.TIME_IN_FORCE_GOOD_TILL_CANCEL:
+        report.add("time_in_force", "time_in_force_incompatible", "рыночная заявка исполняется сразу, GOOD_TILL_CANCEL для нее не принимается", day)
+
+    if request.client_order_id and len(request.client_order_id) > MAX_CLIENT_ORDER_ID:
+        report.add("client_order_id", "client_order_id_length", f"client_order_id длиннее {MAX_CLIENT_ORDER_ID} символов", request.client_order_id[:MAX_CLIENT_ORDER_ID])
+    if request.comment and len(request.comment) > MAX_COMMENT:
+        report.add("comment", "comment_length", f"comment длиннее {MAX_COMMENT} символов", request.comment[:MAX_COMMENT])
+    return report
+
+
+def check_lots(request: PlaceOrderRequest, spec: TradingSpec, report: PreTradeReport):
+    """Количество кратно лоту; предлагается ближайшее кратное вниз (или один лот)."""
+    quantity = parse_decimal(request.quantity)
+    if quantity is None or quantity <= 0:
+        return
+    lots = float(quantity) / spec.lot_size
+    if abs(lots - round(lots)) < 1e-9:
+        return
+    down, up = math.floor(lots) * spec.lot_size, math.ceil(lots) * spec.lot_size
+    fixed = down if down > 0 else up
+    report.add(
+        "quantity", "lot_multiple",
+        f"количество {quantity} не кратно лоту {format_decimal(spec.lot_size)}: допустимо {format_decimal(down)} или {format_decimal(up)}",
+        DecimalValue(value=format_decimal(fixed)),
+    )
+
+
+def check_prices(request: PlaceOrderRequest, spec: TradingSpec, report: PreTradeReport):
+    """Цены кратны шагу min_step / 10^decimals. Лимитная цена округляется в безопасную сторону: покупка вниз, продажа вверх."""
+    direction = -1 if request.side == Side.SIDE_BUY else 1
+    for field, price_direction in (("limit_price", direction), ("stop_price", 0)):
+        price = parse_decimal(getattr(request, field))
+        if price is None or price <= 0:
+            continue
+        rounded = spec.round_price(float(price), 0)
+        if abs(float(price) - rounded) < spec.price_step * 1e-6:
+            continue
+        fixed = spec.round_price(float(price), price_direction)
+        report.add(
+            field, "price_step",
+            f"{field} {price} не кратна шагу цены {spec.format_price(spec.price_step)}",
+            DecimalValue(value=spec.format_price(fixed)),
+        )
+
+
+@dataclass
+class PositionBook:
+    """Позиции счета на время проверки пакета заявок: счет запрашивается один раз, а каждая
+    принятая заявка сдвигает позицию, чтобы несколько продаж вместе не превысили имеющуюся."""
+    quantities: Optional[Dict[str, float]]  # None - счет недоступен
+
+    def position(self, symbol: str) -> Optional[float]:
+        if self.quantities is None:
+            return None
+        return self.quantities.get(symbol.upper(), 0.0)
+
+    def apply(self, request: PlaceOrderRequest):
+        """Учет заявки, как если бы она исполнилась."""
+        if self.quantities is None or request.side not in (Side.SIDE_BUY, Side.SIDE_SELL):
+            return
+        quantity = float(parse_decimal(request.quantity) or 0)
+        symbol = request.symbol.upper()
+        self.quantities[symbol] = self.quantities.get(symbol, 0.0) + (quantity if request.side == Side.SIDE_BUY else -quantity)
+
+
+def limit_quantity(report: PreTradeReport, code: str, message: str, allowed: float, spec: Optional[TradingSpec]):
+    """Ошибка количества с исправлением не больше allowed: меньшее из уже предложенного (кратность
+    лоту) и allowed, вниз до целого лота. Если целый лот не помещается - исправления нет."""
+    current = report.fixes.get("quantity")
+    if current is not None:
+        allowed = min(allowed, float(current.value))
+    if spec is not None:
+        allowed = math.floor(allowed / spec.lot_size + 1e-9) * spec.lot_size
+    report.add("quantity", code, message, DecimalValue(value=format_decimal(allowed)) if allowed > 0 else None)
+
+
+class PreTradeChecker:
+    """Локальная проверка заявки до отправки по кэшированным get_asset/get_asset_params.
+
+    Ошибки, которые брокер гарантированно отклонит, находятся без запроса на выставление;
+    для исправимых ошибок возвращается исправленная заявка.
+    """
+
+    def __init__(self, api: FinamApiClient, asset_info: AssetInfoCache):
+        self.api = api
+        self.asset_info = asset_info
+
+    async def position_book(self, account_id: str) -> PositionBook:
+        """Текущие позиции счета со знаком; при недоступном счете позиции неизвестны."""
+        account = await self.api.get_account(GetAccountRequest(account_id=account_id))
+        if isinstance(account, ErrorResponse):
+            return PositionBook(None)
+        quantities: Dict[str, float] = {}
+        for position in account.positions:
+            symbol = position.symbol.upper()
+            quantities[symbol] = quantities.get(symbol, 0.0) + float(position.quantity.value or 0)
+        return PositionBook(quantities)
+
+    async def _position(self, account_id: str, symbol: str, book: Optional[PositionBook]) -> Optional[float]:
+        """Позиция по инструменту со знаком (из book, если проверяется пакет) или None, если счет недоступен."""
+        if book is None:
+            book = await self.position_book(account_id)
+        return book.position(symbol)
+
+    async def _check_direction(
+        self,
+        account_id: str,
+        request: PlaceOrderRequest,
+        params: GetAssetParamsResponse,
+        spec: Optional[TradingSpec],
+        report: PreTradeReport,
+        book: Optional[PositionBook],
+    ):
+        """Запрет лонга/шорта мешает только открытию позиции: закрытие уже имеющейся разрешено."""
+        quantity = float(parse_decimal(request.quantity) or 0)
+        if request.side == Side.SIDE_BUY:
+            status = params.longable.value if params.longable is not None else None
+            if status is None or status == LongableStatus.AVAILABLE:
+                return
+            position = await self._position(account_id, request.symbol, book)
+            if position is not None and position < 0 and quantity <= -position:
+                return
+            message = f"покупка {request.symbol} недоступна ({status.value}), разрешено только закрытие шорта"
+            if position is not None and position < 0:
+                limit_quantity(report, "long_unavailable", f"{message} ({format_decimal(-position)} шт.)", -position, spec)
+            else:
+                report.add("side", "long_unavailable", message)
+        elif request.side == Side.SIDE_SELL:
+            status = params.shortable.value if params.shortable is not None else None
+            if status is None or status == ShortableStatus.AVAILABLE:
+                return
+            if status == ShortableStatus.HTB:
+                report.add("side", "short_hard_to_borrow", f"шорт {request.symbol} ограничен (HTB): возможна повышенная ставка", severity=IssueSeverity.WARNING)
+                return
+            position = await self._position(account_id, request.symbol, book)
+            if position is not None and position > 0 and quantity <= position:
+                return
+            message = f"шорт {request.symbol} недоступен ({status.value}), разрешена только продажа имеющейся позиции"
+            if position is not None and position > 0:
+                limit_quantity(report, "short_unavailable", f"{message} ({format_decimal(position)} шт.)", position, spec)
+            else:
+                report.add("side", "short_unavailable", message)
+
+    async def check(self, account_id: str, request: PlaceOrderRequest, book: Optional[PositionBook] = None) -> PreTradeCheckResponse:
+        """Проверка заявки; в пакете позиции берутся из общего book вместо запроса счета на каждую заявку."""
+        report = check_order_shape(request)
+        if request.type != OrderType.ORDER_TYPE_MULTI_LEG:
+            asset, params = await asyncio.gather(
+                self.asset_info.get_asset(request.symbol, account_id),
+                self.asset_info.get_asset_params(request.symbol, account_id),
+            )
+            spec = None
+            if isinstance(asset, ErrorResponse):
+                report.add("symbol", "asset_unavailable", f"нет данных об инструменте: {asset.error}", severity=IssueSeverity.WARNING)
+            else:
+                spec = TradingSpec.from_asset(request.symbol, asset)
+                check_lots(request, spec, report)
+                check_prices(request, spec, report)
+            if isinstance(params, ErrorResponse):
+                report.add("symbol", "params_unavailable", f"нет торговых параметров: {params.error}", severity=IssueSeverity.WARNING)
+            elif not params.tradeable:
+                report.add("symbol", "not_tradeable", f"торговля {request.symbol} на счете недоступна")
+            else:
+                await self._check_direction(account_id, request, params, spec, report, book)
+
+        return report.response(account_id, request)
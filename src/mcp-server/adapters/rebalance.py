@@ -0,0 +1,242 @@
+import asyncio
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from .account_cache import AccountSnapshotCache
+from .asset_info import AssetInfoCache, TradingSpec
+from .finam_client import FinamApiClient
+from .fx import FxService, base_factors, symbol_currencies
+from .models import *
+from .numeric import PositionColumns, format_decimal, money_column
+
+
+def _price(value: DecimalValue) -> float:
+    price = float(value.value or 0) if value is not None else 0.0
+    return price if price > 0 else np.nan
+
+
+def fit_lots_to_cash(lots: np.ndarray, lot_cost: np.ndarray, available: float) -> np.ndarray:
+    """Уменьшение покупок пропорционально, чтобы их стоимость не превышала available."""
+    buys = lots > 0
+    cost = float(np.sum(lots[buys] * lot_cost[buys]))
+    if cost <= available:
+        return lots
+    ratio = max(available, 0.0) / cost
+    lots = lots.copy()
+    lots[buys] = np.floor(lots[buys] * ratio)
+    return lots
+
+
+def fill_remaining_cash(lots: np.ndarray, gap_value: np.ndarray, lot_cost: np.ndarray, leftover: float) -> np.ndarray:
+    """Докупка по лоту в самые недовешенные инструменты, пока это приближает к цели и хватает денег.
+
+    Округление вниз оставляет не больше лота на инструмент, поэтому шагов немного.
+    """
+    lots = lots.copy()
+    gap_value = gap_value.copy()
+    for _ in range(4 * len(lots) + 1):
+        # Лот стоит добавлять, если недовес больше половины его стоимости
+        candidates = (gap_value >= lot_cost / 2) & (lot_cost <= leftover) & (lots >= 0)
+        if not candidates.any():
+            break
+        i = int(np.argmax(np.where(candidates, gap_value, -np.inf)))
+        lots[i] += 1
+        gap_value[i] -= lot_cost[i]
+        leftover -= lot_cost[i]
+    return lots
+
+
+class Rebalancer:
+    """Расчет заявок для приведения портфеля к целевым долям с учетом лотов, шага цены и денег.
+
+    Стоимость счета, доли и суммы заявок считаются в base_currency: деньги и позиции в других
+    валютах пересчитываются по текущему курсу FxService, цены заявок остаются в валюте инструмента.
+    Рассчитываются только инструменты с ценой за штуку (UNIT_PRICED_TYPES): у фьючерсов, опционов
+    и облигаций цена не равна стоимости штуки, такие позиции не входят в стоимость счета, а цели пропускаются.
+    """
+
+    def __init__(self, api: FinamApiClient, asset_info: AssetInfoCache, accounts: Optional[AccountSnapshotCache] = None, fx: Optional[FxService] = None):
+        self.api = api
+        self.asset_info = asset_info
+        self.accounts = accounts
+        self.fx = fx
+
+    @staticmethod
+    def _validate(request: RebalanceRequest) -> Union[ErrorResponse, None]:
+        symbols = [target.symbol for target in request.targets]
+        if len(set(symbols)) != len(symbols):
+            return ErrorResponse(status_code=-1, error="Инструменты в targets не должны повторяться")
+        if not request.allow_short and any(target.weight_pct < 0 for target in request.targets):
+            return ErrorResponse(status_code=-1, error="Отрицательные доли требуют allow_short=true")
+        long_total = sum(target.weight_pct for target in request.targets if target.weight_pct > 0)
+        if long_total + request.cash_reserve_pct > 100 + 1e-9:
+            return ErrorResponse(status_code=-1, error=f"Сумма долей ({long_total:g}%) и резерва денег ({request.cash_reserve_pct:g}%) больше 100%")
+        return None
+
+    async def plan(self, request: RebalanceRequest) -> Union[RebalanceResponse, ErrorResponse]:
+        error = self._validate(request)
+        if error is not None:
+            return error
+        account = await (self.accounts or self.api).get_account(GetAccountRequest(account_id=request.account_id))
+        if isinstance(account, ErrorResponse):
+            return account
+
+        positions = PositionColumns.from_positions(account.positions)
+        held_quantity: Dict[str, float] = {}
+        held_price: Dict[str, float] = {}
+        for symbol, quantity, price in zip(positions.symbol, positions.quantity, positions.current_price):
+            held_quantity[symbol] = held_quantity.get(symbol, 0.0) + float(np.nan_to_num(quantity))
+            held_price[symbol] = float(price)
+
+        weights = {target.symbol: target.weight_pct / 100 for target in request.targets}
+        if request.close_other_positions:
+            for symbol, quantity in held_quantity.items():
+                if quantity != 0:
+                    weights.setdefault(symbol, 0.0)
+        symbols = list(weights)
+        all_symbols = list(dict.fromkeys(positions.symbol + symbols))
+
+        quotes, specs, (currencies, warnings), (unit_priced, priced_warnings) = await asyncio.gather(
+            asyncio.gather(*(self.api.get_last_quote(QuoteRequest(symbol=symbol)) for symbol in symbols)),
+            self.asset_info.trading_specs(symbols, request.account_id),
+            symbol_currencies(self.asset_info, all_symbols, request.account_id),
+            self.asset_info.unit_priced(all_symbols, request.account_id),
+        )
+        warnings += priced_warnings
+
+        # Деньги и позиции в других валютах пересчитываются в базовую; без курса не учитываются
+        cash_currency = [money.currency_code.upper() for money in account.cash]
+        factors, fx_warnings = await base_factors(self.fx, cash_currency + [currencies[symbol] for symbol in all_symbols], request.base_currency)
+        warnings += fx_warnings
+        rate = dict(zip(all_symbols, factors[len(cash_currency):].tolist()))
+        cash = float(np.nansum(money_column(account.cash) * factors[:len(cash_currency)])) if account.cash else 0.0
+        held_factor = np.array([rate[symbol] if unit_priced[symbol] else 0.0 for symbol in positions.symbol])
+        total_value = cash + float(np.nansum(positions.market_value * held_factor))
+        if total_value <= 0:
+            return ErrorResponse(status_code=-1, error="Стоимость счета не положительна, ребалансировка невозможна")
+
+        usable: List[int] = []
+        bid = np.full(len(symbols), np.nan)
+        ask = np.full(len(symbols), np.nan)
+        last = np.full(len(symbols), np.nan)
+        for i, (symbol, quote) in enumerate(zip(symbols, quotes)):
+            if not unit_priced[symbol]:
+                warnings.append(f"{symbol}: цена не в деньгах за штуку, размер заявки не рассчитать, пропущен")
+                continue
+            if isinstance(specs[symbol], ErrorResponse):
+                warnings.append(f"{symbol}: нет информации об инструменте ({specs[symbol].error}), пропущен")
+                continue
+            if isinstance(quote, ErrorResponse):
+                warnings.append(f"{symbol}: нет котировки ({quote.error}), пропущен")
+                continue
+            if np.isnan(rate[symbol]):
+                warnings.append(f"{symbol}: нет курса {currencies[symbol]} к {request.base_currency.upper()}, пропущен")
+                continue
+            bid[i], ask[i], last[i] = _price(quote.quote.bid), _price(quote.quote.ask), _price(quote.quote.last)
+            usable.append(i)
+
+        symbols = [symbols[i] for i in usable]
+        bid, ask, last = bid[usable], ask[usable], last[usable]
+        spec_list: List[TradingSpec] = [specs[symbol] for symbol in symbols]
+        weight = np.array([weights[symbol] for symbol in symbols])
+        lot_size = np.array([spec.lot_size for spec in spec_list])
+        current = np.array([held_quantity.get(symbol, 0.0) for symbol in symbols])
+
+        # Оценка по последней сделке, исполнение покупок по аску, продаж по биду (с запасными вариантами)
+        value_price = np.where(np.isnan(last), np.array([held_price.get(symbol, np.nan) for symbol in symbols]), last)
+        value_price = np.where(np.isnan(value_price), (bid + ask) / 2, value_price)
+        buy_price = np.where(np.isnan(ask), value_price, ask)
+        sell_price = np.where(np.isnan(bid), value_price, bid)
+        # Цены заявок - в валюте инструмента, все суммы ниже - в базовой валюте
+        native_price, native_buy, native_sell = value_price, buy_price, sell_price
+        fx = np.array([rate[symbol] for symbol in symbols])
+        value_price, buy_price, sell_price = value_price * fx, buy_price * fx, sell_price * fx
+        priced = ~np.isnan(value_price)
+        for symbol in np.array(symbols, dtype=object)[~priced]:
+            warnings.append(f"{symbol}: нет цены для расчета, пропущен")
+
+        raw_lots = np.where(priced, (weight * total_value / np.where(priced, value_price, 1) - current) / lot_size, 0.0)
+        # Продажи округляем к ближайшему лоту, покупки - вниз (докупка ниже, если останутся деньги)
+        lots = np.where(raw_lots > 0, np.floor(raw_lots), np.round(raw_lots))
+        if not request.allow_short:
+            lots = np.maximum(lots, np.ceil(-current / lot_size - 1e-9))
+
+        order_price = np.where(lots > 0, buy_price, sell_price)
+        too_small = np.abs(lots) * lot_size * np.nan_to_num(order_price) < request.min_order_value
+        lots = np.where(too_small, 0.0, lots)
+
+        sells = lots < 0
+        proceeds = float(np.sum(-lots[sells] * lot_size[sells] * sell_price[sells]))
+        reserve = total_value * request.cash_reserve_pct / 100
+        buy_lot_cost = np.where(priced, lot_size * buy_price, np.inf)
+        lots = fit_lots_to_cash(lots, buy_lot_cost, cash + proceeds - reserve)
+        spent = float(np.sum(lots[lots > 0] * buy_lot_cost[lots > 0]))
+        gap_value = np.where(priced, weight * total_value - (current + lots * lot_size) * value_price, -np.inf)
+        lots = fill_remaining_cash(lots, gap_value, buy_lot_cost, cash + proceeds - reserve - spent)
+        # Докупка могла создать мелкие покупки; отказ от покупки деньги только освобождает
+        order_price = np.where(lots > 0, buy_price, sell_price)
+        lots = np.where((lots > 0) & (lots * lot_size * order_price < request.min_order_value), 0.0, lots)
+
+        buys = lots > 0
+        cash_after = cash + proceeds - float(np.sum(lots[buys] * buy_lot_cost[buys]))
+        target_quantity = current + lots * lot_size
+        orders = self._orders(request, symbols, spec_list, lots, lot_size, native_buy, native_sell)
+
+        with np.errstate(invalid="ignore"):
+            current_weight = current * value_price / total_value * 100
+            resulting_weight = target_quantity * value_price / total_value * 100
+        lines = [
+            RebalanceLine(
+                symbol=symbol,
+                price=float(np.nan_to_num(native_price[i])),
+                lot_size=float(lot_size[i]),
+                current_quantity=float(current[i]),
+                target_quantity=float(target_quantity[i]),
+                order_lots=int(lots[i]),
+                order_value=float(abs(lots[i]) * lot_size[i] * np.nan_to_num(order_price[i])),
+                current_weight_pct=float(np.nan_to_num(current_weight[i])),
+                target_weight_pct=float(weight[i] * 100),
+                resulting_weight_pct=float(np.nan_to_num(resulting_weight[i])),
+            )
+            for i, symbol in enumerate(symbols)
+        ]
+        return RebalanceResponse(
+            account_id=request.account_id,
+            base_currency=request.base_currency.upper(),
+            total_value=total_value,
+            cash_before=cash,
+            cash_after=cash_after,
+            orders=orders,
+            lines=lines,
+            warnings=warnings,
+        )
+
+    @staticmethod
+    def _orders(
+        request: RebalanceRequest,
+        symbols: List[str],
+        specs: List[TradingSpec],
+        lots: np.ndarray,
+        lot_size: np.ndarray,
+        buy_price: np.ndarray,
+        sell_price: np.ndarray,
+    ) -> List[PlaceOrderRequest]:
+        """Черновики заявок: продажи первыми, чтобы освободить деньги под покупки."""
+        orders = []
+        for i in [*np.flatnonzero(lots < 0), *np.flatnonzero(lots > 0)]:
+            buy = lots[i] > 0
+            spec = specs[i]
+            limit_price = None
+            if request.order_type == OrderType.ORDER_TYPE_LIMIT:
+                price = spec.round_price(buy_price[i], 1) if buy else spec.round_price(sell_price[i], -1)
+                limit_price = DecimalValue(value=spec.format_price(price))
+            orders.append(PlaceOrderRequest(
+                symbol=symbols[i],
+                quantity=DecimalValue(value=format_decimal(abs(lots[i]) * lot_size[i])),
+                side=Side.SIDE_BUY if buy else Side.SIDE_SELL,
+                type=request.order_type,
+                time_in_force=request.time_in_force,
+                limit_price=limit_price,
+            ))
+        return orders
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .bars_history import DAY, NS_IN_SECOND, BarsHistory, align_series, forward_fill
+from .cache import AsyncTTLCache
+from .finam_client import FinamApiClient
+from .models import *
+
+SHORTABLE_STATUSES = {ShortableStatus.AVAILABLE, ShortableStatus.HTB}
+
+# Запас истории до начала окна, чтобы найти базовую цену через выходные и праздники
+BASE_LOOKBACK_DAYS = 10
+
+
+class AssetCatalog:
+    """Кэшированный каталог инструментов get_assets."""
+
+    def __init__(self, api: FinamApiClient, ttl: float = 60 * 60):
+        self.api = api
+        self._cache = AsyncTTLCache(ttl=ttl, max_size=1)
+
+    async def assets(self) -> Union[List[Asset], ErrorResponse]:
+        response = await self._cache.get_or_load(
+            "assets", self.api.get_assets, should_cache=lambda value: not isinstance(value, ErrorResponse)
+        )
+        if isinstance(response, ErrorResponse):
+            return response
+        return response.assets
+
+    async def select(
+        self,
+        asset_types: Optional[List[str]] = None,
+        mics: Optional[List[str]] = None,
+        symbols: Optional[List[str]] = None,
+        name_contains: Optional[List[str]] = None,
+    ) -> Union[List[Asset], ErrorResponse]:
+        """Инструменты каталога, удовлетворяющие фильтрам по типу, бирже, символу и названию."""
+        assets = await self.assets()
+        if isinstance(assets, ErrorResponse):
+            return assets
+
+        types = {value.upper() for value in asset_types} if asset_types else None
+        mic_set = {value.upper() for value in mics} if mics else None
+        symbol_set = {value.upper() for value in symbols} if symbols else None
+        needles = [value.lower() for value in name_contains] if name_contains else None
+
+        selected = []
+        for asset in assets:
+            if types is not None and asset.type.upper() not in types:
+                continue
+            if mic_set is not None and asset.mic.upper() not in mic_set:
+                continue
+            if symbol_set is not None and asset.symbol.upper() not in symbol_set:
+                continue
+            if needles is not None:
+                haystack = f"{asset.name} {asset.ticker}".lower()
+                if not any(needle in haystack for needle in needles):
+                    continue
+            selected.append(asset)
+        return selected
+
+
+class MarketScanner:
+    """Сканер рынка: фильтры по каталогу, пакетная загрузка дневных свечей и векторный расчет метрик."""
+
+    def __init__(self, api: FinamApiClient, catalog: AssetCatalog, history: BarsHistory, max_universe: int = 500, params_concurrency: int = 8):
+        self.api = api
+        self.catalog = catalog
+        self.history = history
+        self.max_universe = max_universe
+        self._params_semaphore = asyncio.Semaphore(params_concurrency)
+
+    @staticmethod
+    def compute_metrics(timestamps: np.ndarray, closes: np.ndarray, volumes: np.ndarray, window_start: float) -> Dict[str, np.ndarray]:
+        """Метрики окна по матрицам (время x инструменты): последняя цена, изменение, оборот, волатильность."""
+        cutoff = int(window_start * NS_IN_SECOND)
+        in_window = timestamps >= cutoff
+        filled = forward_fill(closes)
+
+        last_close = filled[-1] if len(filled) else np.full(closes.shape[1], np.nan)
+        # Базовая цена - последнее закрытие до начала окна, а если истории до окна нет - первое в окне
+        before = np.flatnonzero(~in_window)
+        base = filled[before[-1]] if len(before) else np.full(closes.shape[1], np.nan)
+        first_in_window = np.argmax(in_window[:, None] & ~np.isnan(closes), axis=0)
+        base = np.where(np.isnan(base), closes[first_in_window, np.arange(closes.shape[1])], base)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change_pct = (last_close / base - 1) * 100
+            window_closes = filled[in_window]
+            returns = window_closes[1:] / window_closes[:-1] - 1
+            volatility_pct = np.nanstd(returns, axis=0) * 100 if len(returns) > 1 else np.full(closes.shape[1], np.nan)
+        turnover = np.nansum(closes[in_window] * volumes[in_window], axis=0)
+        return {
+            "last_close": last_close,
+            "change_pct": change_pct,
+            "turnover": turnover,
+            "volatility_pct": volatility_pct,
+        }
+
+    @staticmethod
+    def _filter_mask(request: ScanRequest, metrics: Dict[str, np.ndarray]) -> np.ndarray:
+        mask = ~np.isnan(metrics["last_close"])
+        bounds = [
+            ("change_pct", request.min_change_pct, request.max_change_pct),
+            ("turnover", request.min_turnover, None),
+            ("volatility_pct", request.min_volatility_pct, request.max_volatility_pct),
+        ]
+        with np.errstate(invalid="ignore"):
+            for field, lower, upper in bounds:
+                if lower is not None:
+                    mask &= metrics[field] >= lower
+                if upper is not None:
+                    mask &= metrics[field] <= upper
+        return mask
+
+    async def _shortable(self, symbol: str, account_id: str) -> Optional[ShortableStatus]:
+        async with self._params_semaphore:
+            params = await self.api.get_asset_params(GetAssetParamsRequest(symbol=symbol, account_id=account_id))
+        if isinstance(params, ErrorResponse) or params.shortable is None:
+            return None
+        return params.shortable.value
+
+    async def _check_shortable(self, candidates: List[int], assets: List[Asset], request: ScanRequest) -> Tuple[List[int], Dict[int, Optional[ShortableStatus]]]:
+        """Проверка шорта для кандидатов в порядке ранжирования, пачками, пока не наберется limit строк."""
+        statuses: Dict[int, Optional[ShortableStatus]] = {}
+        if not request.account_id:
+            return candidates[:request.limit], statuses
+        if not request.shortable_only:
+            candidates = candidates[:request.limit]
+
+        accepted: List[int] = []
+        batch_size = max(request.limit, 8)
+        for offset in range(0, len(candidates), batch_size):
+            batch = candidates[offset:offset + batch_size]
+            results = await asyncio.gather(*(self._shortable(assets[i].symbol, request.account_id) for i in batch))
+            for i, status in zip(batch, results):
+                statuses[i] = status
+                if not request.shortable_only or status in SHORTABLE_STATUSES:
+                    accepted.append(i)
+            if len(accepted) >= request.limit:
+                break
+        return accepted[:request.limit], statuses
+
+    async def scan(self, request: ScanRequest) -> Union[ScanResponse, ErrorResponse]:
+        if request.shortable_only and not request.account_id:
+            return ErrorResponse(status_code=-1, error="Для фильтра shortable_only нужен account_id")
+
+        started = time.monotonic()
+        assets = await self.catalog.select(request.asset_types, request.mics, request.symbols, request.name_contains)
+        if isinstance(assets, ErrorResponse):
+            return assets
+        universe_size = len(assets)
+        truncated = universe_size > self.max_universe
+        assets = assets[:self.max_universe]
+
+        window_start = time.time() - request.window_days * DAY
+        series = await self.history.load_many(
+            [asset.symbol for asset in assets],
+            TimeFrame.TIME_FRAME_D,
+            window_start - BASE_LOOKBACK_DAYS * DAY,
+        )
+        loaded = [i for i, asset in enumerate(assets) if not isinstance(series[asset.symbol], ErrorResponse) and len(series[asset.symbol])]
+        assets = [assets[i] for i in loaded]
+        symbols = [asset.symbol for asset in assets]
+
+        timestamps, closes = align_series(series, symbols, "close")
+        _, volumes = align_series(series, symbols, "volume")
+        metrics = self.compute_metrics(timestamps, closes, volumes, window_start) if symbols else {}
+        mask = self._filter_mask(request, metrics) if symbols else np.zeros(0, dtype=bool)
+
+        matched = np.flatnonzero(mask)
+        sort_key = metrics[request.sort_by.value][matched] if symbols else np.empty(0)
+        # Строки без метрики - в конце при любом направлении: первичный ключ lexsort - последний
+        order = np.lexsort((-sort_key if request.descending else sort_key, np.isnan(sort_key)))
+        candidates = [int(i) for i in matched[order]]
+
+        selected, statuses = await self._check_shortable(candidates, assets, request)
+        rows = [
+            ScanRow(
+                symbol=assets[i].symbol,
+                name=assets[i].name,
+                type=assets[i].type,
+                last_close=float(metrics["last_close"][i]),
+                change_pct=_optional_float(metrics["change_pct"][i]),
+                turnover=float(metrics["turnover"][i]),
+                volatility_pct=_optional_float(metrics["volatility_pct"][i]),
+                shortable=statuses[i].value if statuses.get(i) is not None else None,
+            )
+            for i in selected
+        ]
+        logging.info(f"Сканер: {universe_size} инструментов, {len(symbols)} с данными, {len(matched)} прошли фильтры за {time.monotonic() - started:.2f} с")
+        return ScanResponse(
+            rows=rows,
+            universe_size=universe_size,
+            evaluated=len(symbols),
+            matched=len(matched),
+            truncated=truncated,
+        )
+
+
+def _optional_float(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
@@ -0,0 +1,86 @@
+import asyncio
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .finam_client import FinamApiClient
+from .models import *
+from .numeric import OrderBookColumns, timestamp_column
+from .trade_tape import TradeTapeStore
+
+DEFAULT_PARTS = (SnapshotPart.QUOTE, SnapshotPart.ORDERBOOK, SnapshotPart.TRADES)
+
+
+def trim_orderbook(rows: Sequence[OrderBookRow], depth: int) -> SnapshotOrderBook:
+    """Верхние depth уровней каждой стороны стакана и спред."""
+    columns = OrderBookColumns.from_rows(rows)
+    bid_idx = np.flatnonzero(columns.buy_size > 0)
+    ask_idx = np.flatnonzero(columns.sell_size > 0)
+    bid_idx = bid_idx[np.argsort(-columns.price[bid_idx], kind="stable")][:depth]
+    ask_idx = ask_idx[np.argsort(columns.price[ask_idx], kind="stable")][:depth]
+    spread = None
+    if len(bid_idx) and len(ask_idx):
+        spread = float(columns.price[ask_idx[0]] - columns.price[bid_idx[0]])
+    return SnapshotOrderBook(
+        bids=[rows[i] for i in bid_idx],
+        asks=[rows[i] for i in ask_idx],
+        spread=spread,
+    )
+
+
+def latest_trades(trades: Sequence[Trade], limit: int) -> List[Trade]:
+    """Последние limit сделок, от новых к старым."""
+    if not trades:
+        return []
+    order = np.argsort(-timestamp_column([trade.timestamp for trade in trades]), kind="stable")
+    return [trades[i] for i in order[:limit]]
+
+
+class MarketSnapshotService:
+    """Сводный снимок рынка по инструменту: части запрашиваются параллельно одним вызовом."""
+
+    def __init__(self, api: FinamApiClient, tape_store: Optional[TradeTapeStore] = None):
+        self.api = api
+        self.tape_store = tape_store
+
+    async def snapshot(
+        self,
+        symbol: str,
+        parts: Optional[Sequence[SnapshotPart]] = None,
+        depth: int = 5,
+        trades_limit: int = 10,
+        account_id: Optional[str] = None,
+    ) -> MarketSnapshotResponse:
+        parts = list(dict.fromkeys(SnapshotPart(part) for part in parts or DEFAULT_PARTS))
+        result = MarketSnapshotResponse(symbol=symbol)
+
+        if SnapshotPart.ASSET in parts and not account_id:
+            parts.remove(SnapshotPart.ASSET)
+            result.errors[SnapshotPart.ASSET.value] = ErrorResponse(
+                status_code=-1, error="Для получения информации об инструменте нужен account_id"
+            )
+
+        requests = {
+            SnapshotPart.QUOTE: lambda: self.api.get_last_quote(QuoteRequest(symbol=symbol)),
+            SnapshotPart.ORDERBOOK: lambda: self.api.get_orderbook(OrderBookRequest(symbol=symbol)),
+            SnapshotPart.TRADES: lambda: self.api.get_latest_trades(LatestTradesRequest(symbol=symbol)),
+            SnapshotPart.ASSET: lambda: self.api.get_asset(GetAssetRequest(symbol=symbol, account_id=account_id)),
+        }
+        responses = await asyncio.gather(*(requests[part]() for part in parts), return_exceptions=True)
+
+        for part, response in zip(parts, responses):
+            if isinstance(response, Exception):
+                response = ErrorResponse(status_code=-1, error=str(response))
+            if isinstance(response, ErrorResponse):
+                result.errors[part.value] = response
+            elif part == SnapshotPart.QUOTE:
+                result.quote = response.quote
+            elif part == SnapshotPart.ORDERBOOK:
+                result.orderbook = trim_orderbook(response.orderbook.rows, depth)
+            elif part == SnapshotPart.TRADES:
+                if self.tape_store is not None:
+                    self.tape_store.ingest(symbol, response.trades)
+                result.trades = latest_trades(response.trades, trades_limit)
+            elif part == SnapshotPart.ASSET:
+                result.asset = response
+        return result
@@ -0,0 +1,247 @@
+import asyncio
+import heapq
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .backtest import BacktestEngine, simulate, validate_request
+from .jobs import Job, JobRegistry
+from .models import *
+
+SWEEP_JOB = "backtest_sweep"
+
+INTEGER_PARAMETERS = {SweepParameterName.LOOKBACK, SweepParameterName.FAST_WINDOW, SweepParameterName.SLOW_WINDOW}
+
+# Метрики, для которых меньшее значение лучше
+ASCENDING_RANK = {SweepRankField.MAX_DRAWDOWN}
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Описание массива в разделяемой памяти: в рабочие процессы передается оно, а не сами данные."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @classmethod
+    def create(cls, array: np.ndarray) -> Tuple["SharedArray", SharedMemory]:
+        block = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        return cls(block.name, array.shape, array.dtype.str), block
+
+    def attach(self) -> Tuple[np.ndarray, SharedMemory]:
+        block = SharedMemory(name=self.name)
+        return np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=block.buf), block
+
+
+# Подключенные блоки в рабочем процессе. Храним только данные последней оптимизации
+_worker_blocks: Dict[Tuple[SharedArray, ...], Tuple[List[np.ndarray], List[SharedMemory]]] = {}
+
+
+def _worker_arrays(specs: Tuple[SharedArray, ...]) -> List[np.ndarray]:
+    cached = _worker_blocks.get(specs)
+    if cached is not None:
+        return cached[0]
+    for key in list(_worker_blocks):
+        arrays, blocks = _worker_blocks.pop(key)
+        # Массивы ссылаются на буфер блока, их нужно освободить до close()
+        del arrays
+        for block in blocks:
+            block.close()
+    attached = [spec.attach() for spec in specs]
+    arrays = [array for array, _ in attached]
+    _worker_blocks[specs] = (arrays, [block for _, block in attached])
+    return arrays
+
+
+def apply_parameters(base: BacktestRequest, names: Sequence[SweepParameterName], values: Sequence[float]) -> BacktestRequest:
+    update = {
+        name.value: int(round(value)) if name in INTEGER_PARAMETERS else float(value)
+        for name, value in zip(names, values)
+    }
+    return base.model_copy(update=update)
+
+
+def evaluate_chunk(
+    specs: Tuple[SharedArray, ...],
+    base: BacktestRequest,
+    names: Sequence[SweepParameterName],
+    combos: Sequence[Tuple[int, Tuple[float, ...]]],
+) -> List[Tuple[int, Optional[dict]]]:
+    """Расчет пачки комбинаций в рабочем процессе. Недопустимые комбинации возвращаются с None."""
+    timestamps, prices = _worker_arrays(specs)
+    results = []
+    for index, values in combos:
+        request = apply_parameters(base, names, values)
+        if validate_request(request) is not None:
+            results.append((index, None))
+            continue
+        results.append((index, simulate(timestamps, prices, request).metrics(request.initial_capital)))
+    return results
+
+
+def parameter_values(parameter: SweepParameter) -> Union[np.ndarray, ErrorResponse]:
+    if parameter.values:
+        return np.unique(np.asarray(parameter.values, dtype=np.float64))
+    if parameter.start is None or parameter.stop is None or not parameter.step or parameter.step <= 0:
+        return ErrorResponse(status_code=-1, error=f"Для {parameter.name.value} нужен values или start/stop/step с положительным шагом")
+    # Половина шага в границе включает stop несмотря на ошибки округления
+    return np.round(np.arange(parameter.start, parameter.stop + parameter.step / 2, parameter.step), 10)
+
+
+@dataclass
+class SweepState:
+    """Промежуточное состояние оптимизации: счетчики и куча лучших результатов."""
+    request: SweepRequest
+    names: List[SweepParameterName]
+    combinations: int
+    bars: int = 0
+    evaluated: int = 0
+    skipped: int = 0
+    _best: List[Tuple[float, int, SweepResult]] = field(default_factory=list)
+
+    def add(self, index: int, values: Sequence[float], metrics: Optional[dict]):
+        if metrics is None:
+            self.skipped += 1
+            return
+        self.evaluated += 1
+        score = metrics.get(self.request.rank_by.value)
+        if score is None or metrics["trades"] < self.request.min_trades:
+            return
+        if self.request.rank_by in ASCENDING_RANK:
+            score = -score
+        result = SweepResult(
+            params={name.value: float(value) for name, value in zip(self.names, values)},
+            metrics=BacktestMetrics(**metrics),
+        )
+        # Минимальная куча размера top_n: в корне худший из лучших
+        entry = (score, -index, result)
+        if len(self._best) < self.request.top_n:
+            heapq.heappush(self._best, entry)
+        elif entry[:2] > self._best[0][:2]:
+            heapq.heapreplace(self._best, entry)
+
+    def best(self) -> List[SweepResult]:
+        return [result for _, _, result in sorted(self._best, key=lambda entry: entry[:2], reverse=True)]
+
+
+class SweepRunner:
+    """Оптимизация параметров бэктеста в пуле процессов.
+
+    История загружается один раз и кладется в разделяемую память; в задачи пула уходят
+    только имена блоков и пачки комбинаций. Результаты собираются по мере готовности пачек,
+    так что лучшие комбинации видны до окончания перебора, а задачу можно отменить.
+    """
+
+    def __init__(self, engine: BacktestEngine, jobs: JobRegistry, max_workers: Optional[int] = None, max_combinations: int = 100_000):
+        self.engine = engine
+        self.jobs = jobs
+        self.max_workers = max_workers or max((os.cpu_count() or 2) - 1, 1)
+        self.max_combinations = max_combinations
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, а не fork: форк процесса с работающим event loop и потоками небезопасен.
+            # Рабочий процесс заново выполняет главный модуль, поэтому server.py только запускает сервер из tools
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def start(self, request: SweepRequest) -> Union[SweepStatus, ErrorResponse]:
+        """Запуск оптимизации фоновой задачей. Прогресс - через status(job_id)."""
+        if not request.parameters:
+            return ErrorResponse(status_code=-1, error="Не заданы перебираемые параметры")
+        axes = []
+        for parameter in request.parameters:
+            values = parameter_values(parameter)
+            if isinstance(values, ErrorResponse):
+                return values
+            axes.append(values)
+        names = [parameter.name for parameter in request.parameters]
+        if len(set(names)) != len(names):
+            return ErrorResponse(status_code=-1, error="Параметры в переборе не должны повторяться")
+
+        grid_size = int(np.prod([len(values) for values in axes]))
+        combinations = min(request.samples, grid_size) if request.mode == SweepMode.RANDOM else grid_size
+        if combinations > self.max_combinations:
+            return ErrorResponse(status_code=-1, error=f"Слишком много комбинаций ({combinations}), максимум {self.max_combinations}. Используй mode=random")
+
+        state = SweepState(request=request, names=names, combinations=combinations)
+        job = self.jobs.start(SWEEP_JOB, lambda job: self._run(job, state, axes))
+        job.data = state
+        job.total = combinations
+        return self.status_of(job)
+
+    def _combinations(self, state: SweepState, axes: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Номера комбинаций в полной сетке и матрица значений параметров (комбинации x параметры)."""
+        shape = tuple(len(values) for values in axes)
+        grid_size = int(np.prod(shape))
+        if state.request.mode == SweepMode.RANDOM and state.combinations < grid_size:
+            rng = np.random.default_rng(state.request.seed)
+            indices = np.sort(rng.choice(grid_size, size=state.combinations, replace=False))
+        else:
+            indices = np.arange(grid_size)
+        coords = np.unravel_index(indices, shape)
+        return indices, np.column_stack([values[coord] for values, coord in zip(axes, coords)])
+
+    async def _run(self, job: Job, state: SweepState, axes: List[np.ndarray]) -> SweepStatus:
+        loaded = await self.engine.load_prices(state.request.base)
+        if isinstance(loaded, ErrorResponse):
+            raise RuntimeError(loaded.error)
+        _, timestamps, prices = loaded
+        state.bars = len(timestamps)
+
+        indices, values = self._combinations(state, axes)
+        combos = [(int(index), tuple(row)) for index, row in zip(indices, values.tolist())]
+        values_by_index = dict(combos)
+        chunk_size = int(np.clip(len(combos) // (self.max_workers * 8), 8, 256))
+
+        shared = [SharedArray.create(timestamps), SharedArray.create(np.ascontiguousarray(prices))]
+        specs = tuple(spec for spec, _ in shared)
+        submitted, futures = [], []
+        try:
+            pool = self._pool()
+            for offset in range(0, len(combos), chunk_size):
+                chunk = combos[offset:offset + chunk_size]
+                submitted.append(pool.submit(evaluate_chunk, specs, state.request.base, state.names, chunk))
+                futures.append(asyncio.wrap_future(submitted[-1]))
+            for next_done in asyncio.as_completed(futures):
+                for index, metrics in await next_done:
+                    state.add(index, values_by_index[index], metrics)
+                    job.done += 1
+        finally:
+            # Отмена еще не начатых пачек. Начатые нужно дождаться: они подключаются к блокам,
+            # которые удаляются ниже. Ошибки пачек здесь уже не нужны, но забираются
+            for future in submitted:
+                future.cancel()
+            await asyncio.gather(*futures, return_exceptions=True)
+            for _, block in shared:
+                block.close()
+                block.unlink()
+        logging.info(f"Оптимизация {job.job_id}: {state.evaluated} комбинаций на {state.bars} свечах")
+        return self.status_of(job)
+
+    def status_of(self, job: Job) -> SweepStatus:
+        state: SweepState = job.data
+        if state is None:
+            return SweepStatus(job=job.info())
+        return SweepStatus(
+            job=job.info(),
+            combinations=state.combinations,
+            bars=state.bars,
+            evaluated=state.evaluated,
+            skipped=state.skipped,
+            best=state.best(),
+        )
+
+    def status(self, job_id: str) -> Union[SweepStatus, ErrorResponse]:
+        job = self.jobs.get(job_id, SWEEP_JOB)
+        if job is None:
+            return ErrorResponse(status_code=404, error=f"Оптимизация {job_id} не найдена")
+        return self.status_of(job)
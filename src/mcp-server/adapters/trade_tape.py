@@ -0,0 +1,315 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from .dispatcher import bind_session
+from .finam_client import FinamApiClient
+from .models import *
+
+DEFAULT_WINDOWS = (60, 300, 900, 3600)
+# Ограничения на окна по запросу: длина окна и число окон на инструмент (сверх окон по умолчанию)
+MAX_WINDOW_SECONDS = 24 * 3600
+MAX_EXTRA_WINDOWS = 4
+
+# (timestamp в секундах, порядковый номер, цена, объем, сторона)
+_Entry = Tuple[float, int, float, float, Side]
+
+
+def _parse_timestamp(value: str) -> Optional[float]:
+    """Перевод ISO-метки времени Finam в секунды UNIX; None - метка не разбирается."""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _format_timestamp(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _insert_by_time(items: Deque, item: Any, ts: float, key: Callable[[Any], float]):
+    """Вставка в очередь, упорядоченную по времени. Опоздавшие сделки обычно близко к концу, поэтому поиск с конца."""
+    i = len(items)
+    while i > 0 and key(items[i - 1]) > ts:
+        i -= 1
+    items.insert(i, item)
+
+
+class _RollingWindow:
+    """Скользящее окно по времени с инкрементально пересчитываемыми суммами; хранит не больше capacity сделок."""
+
+    def __init__(self, seconds: int, capacity: int):
+        self.seconds = seconds
+        self.capacity = capacity
+        self._entries: Deque[_Entry] = deque()
+        # Монотонно убывающая по объему очередь для крупнейшей сделки окна
+        self._largest: Deque[_Entry] = deque()
+        self._volume = 0.0
+        self._turnover = 0.0
+        self._buy_volume = 0.0
+        self._sell_volume = 0.0
+
+    def push(self, entry: _Entry):
+        ts, _, price, size, side = entry
+        if len(self._entries) >= self.capacity:
+            self._drop_oldest()
+        if self._entries and ts < self._entries[-1][0]:
+            # Сделка старше последней (пришла в более позднем опросе): evict смотрит только на голову очереди
+            _insert_by_time(self._entries, entry, ts, key=lambda item: item[0])
+            self._rebuild_largest()
+        else:
+            self._entries.append(entry)
+            self._push_largest(entry)
+        self._volume += size
+        self._turnover += price * size
+        if side == Side.SIDE_BUY:
+            self._buy_volume += size
+        elif side == Side.SIDE_SELL:
+            self._sell_volume += size
+
+    def _push_largest(self, entry: _Entry):
+        while self._largest and self._largest[-1][3] <= entry[3]:
+            self._largest.pop()
+        self._largest.append(entry)
+
+    def _rebuild_largest(self):
+        self._largest.clear()
+        for entry in self._entries:
+            self._push_largest(entry)
+
+    def _drop_oldest(self):
+        _, seq, price, size, side = self._entries.popleft()
+        self._volume -= size
+        self._turnover -= price * size
+        if side == Side.SIDE_BUY:
+            self._buy_volume -= size
+        elif side == Side.SIDE_SELL:
+            self._sell_volume -= size
+        if self._largest and self._largest[0][1] == seq:
+            self._largest.popleft()
+
+    def evict(self, now: float):
+        cutoff = now - self.seconds
+        while self._entries and self._entries[0][0] < cutoff:
+            self._drop_oldest()
+
+        if not self._entries:
+            # Сбрасываем накопленную погрешность вычитания чисел с плавающей точкой
+            self._volume = self._turnover = self._buy_volume = self._sell_volume = 0.0
+            self._largest.clear()
+
+    def stats(self) -> TapeWindowStats:
+        directional = self._buy_volume + self._sell_volume
+        largest = self._largest[0] if self._largest else None
+        return TapeWindowStats(
+            window_seconds=self.seconds,
+            trade_count=len(self._entries),
+            volume=self._volume,
+            turnover=self._turnover,
+            vwap=self._turnover / self._volume if self._volume > 0 else None,
+            buy_volume=self._buy_volume,
+            sell_volume=self._sell_volume,
+            imbalance=(self._buy_volume - self._sell_volume) / directional if directional > 0 else None,
+            largest_size=largest[3] if largest else None,
+            largest_price=largest[2] if largest else None,
+            largest_side=largest[4].value if largest else None,
+        )
+
+
+class TradeTape:
+    """Ограниченный кольцевой буфер сделок одного инструмента с агрегатами по окнам.
+
+    Окна отсчитываются от текущего времени. Окна по умолчанию есть всегда; окон по запросу
+    не больше max_extra_windows, давно не запрашиваемые удаляются.
+    """
+
+    def __init__(self, symbol: str, capacity: int = 5000, windows: Sequence[int] = DEFAULT_WINDOWS, max_extra_windows: int = MAX_EXTRA_WINDOWS):
+        self.symbol = symbol
+        self.capacity = capacity
+        self.max_extra_windows = max_extra_windows
+        self._trades: Deque[Tuple[_Entry, Trade]] = deque()
+        self._trade_ids: Set[str] = set()
+        self._windows: Dict[int, _RollingWindow] = {}
+        # Окна по запросу в порядке последнего обращения
+        self._extra: "OrderedDict[int, None]" = OrderedDict()
+        self._seq = 0
+        self._last_ts: Optional[float] = None
+        self._last_price: Optional[float] = None
+        for seconds in windows:
+            self._windows[seconds] = self._build_window(seconds)
+
+    def __len__(self) -> int:
+        return len(self._trades)
+
+    def _build_window(self, seconds: int) -> _RollingWindow:
+        """Новое окно заполняется из текущего буфера один раз."""
+        window = _RollingWindow(seconds, self.capacity)
+        for entry, _ in self._trades:
+            window.push(entry)
+        window.evict(time.time())
+        return window
+
+    def add_window(self, seconds: int):
+        """Добавление окна по запросу; сверх лимита удаляется окно, к которому дольше всего не обращались."""
+        if seconds in self._extra:
+            self._extra.move_to_end(seconds)
+            return
+        if seconds in self._windows:
+            return
+        self._windows[seconds] = self._build_window(seconds)
+        self._extra[seconds] = None
+        while len(self._extra) > self.max_extra_windows:
+            evicted, _ = self._extra.popitem(last=False)
+            del self._windows[evicted]
+
+    def ingest(self, trades: Iterable[Trade]) -> int:
+        """Добавление сделок в буфер с дедупликацией по trade_id. Возвращает число новых сделок."""
+        fresh = [trade for trade in trades if trade.trade_id not in self._trade_ids]
+        if not fresh:
+            return 0
+
+        entries = []
+        for trade in fresh:
+            try:
+                price = float(trade.price.value)
+                size = float(trade.size.value)
+            except ValueError:
+                logging.warning(f"Пропущена сделка {trade.trade_id} по {self.symbol}: некорректные цена/объем")
+                continue
+            ts = _parse_timestamp(trade.timestamp)
+            if ts is None:
+                logging.warning(f"Пропущена сделка {trade.trade_id} по {self.symbol}: некорректное время {trade.timestamp!r}")
+                continue
+            entries.append((ts, price, size, trade))
+        entries.sort(key=lambda item: item[0])
+
+        added = 0
+        for ts, price, size, trade in entries:
+            if trade.trade_id in self._trade_ids:
+                continue
+            if len(self._trades) >= self.capacity:
+                if ts < self._trades[0][0][0]:
+                    # Буфер полон, а сделка старше всех в нем - она была бы вытеснена первой
+                    continue
+                _, evicted = self._trades.popleft()
+                self._trade_ids.discard(evicted.trade_id)
+
+            self._seq += 1
+            entry = (ts, self._seq, price, size, trade.side)
+            # Буфер упорядочен по времени и между опросами: более поздний опрос может принести более старые сделки
+            _insert_by_time(self._trades, (entry, trade), ts, key=lambda item: item[0][0])
+            self._trade_ids.add(trade.trade_id)
+            for window in self._windows.values():
+                window.push(entry)
+
+            if self._last_ts is None or ts >= self._last_ts:
+                self._last_ts = ts
+                self._last_price = price
+            added += 1
+
+        now = time.time()
+        for window in self._windows.values():
+            window.evict(now)
+        return added
+
+    def stats(self, windows: Optional[Sequence[int]] = None) -> TradeTapeResponse:
+        """Агрегаты по окнам, отсчитанным назад от текущего момента."""
+        for seconds in windows or ():
+            self.add_window(seconds)
+        selected = sorted(set(windows)) if windows else sorted(self._windows)
+        now = time.time()
+        for seconds in selected:
+            self._windows[seconds].evict(now)
+        return TradeTapeResponse(
+            symbol=self.symbol,
+            as_of=_format_timestamp(self._last_ts) if self._last_ts is not None else None,
+            last_price=self._last_price,
+            buffered_trades=len(self._trades),
+            windows=[self._windows[seconds].stats() for seconds in selected],
+        )
+
+    def recent(self, limit: int) -> List[Trade]:
+        """Последние сделки из буфера, от новых к старым."""
+        return [trade for _, trade in list(self._trades)[-limit:][::-1]] if limit > 0 else []
+
+
+class TradeTapeStore:
+    """Ленты сделок по символам, наполняемые опросом get_latest_trades или данными стрима."""
+
+    def __init__(
+        self,
+        api: FinamApiClient,
+        capacity: int = 5000,
+        windows: Sequence[int] = DEFAULT_WINDOWS,
+        poll_interval: float = 2.0,
+        idle_timeout: float = 600.0,
+    ):
+        self.api = api
+        self.capacity = capacity
+        self.windows = tuple(windows)
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self._tapes: Dict[str, TradeTape] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._last_access: Dict[str, float] = {}
+
+    def get(self, symbol: str) -> TradeTape:
+        tape = self._tapes.get(symbol)
+        if tape is None:
+            tape = TradeTape(symbol, capacity=self.capacity, windows=self.windows)
+            self._tapes[symbol] = tape
+        return tape
+
+    def ingest(self, symbol: str, trades: Iterable[Trade]) -> int:
+        """Точка входа для опроса и стрима (SubscribeLatestTradesResponse.trades)."""
+        return self.get(symbol).ingest(trades)
+
+    async def refresh(self, symbol: str) -> Optional[ErrorResponse]:
+        """Однократный опрос последних сделок по инструменту."""
+        response = await self.api.get_latest_trades(LatestTradesRequest(symbol=symbol))
+        if isinstance(response, ErrorResponse):
+            return response
+        self.ingest(symbol, response.trades)
+        return None
+
+    def track(self, symbol: str):
+        """Запуск фонового опроса ленты. Опрос останавливается после idle_timeout без обращений."""
+        self._last_access[symbol] = time.monotonic()
+        poller = self._pollers.get(symbol)
+        if poller is None or poller.done():
+            self._pollers[symbol] = asyncio.create_task(self._poll(symbol))
+
+    async def _poll(self, symbol: str):
+        bind_session(f"tape:{symbol}")
+        delay = self.poll_interval
+        while time.monotonic() - self._last_access.get(symbol, 0.0) < self.idle_timeout:
+            error = await self.refresh(symbol)
+            if error is not None:
+                logging.warning(f"Ошибка опроса ленты {symbol}: {error.status_code} {error.error}")
+                delay = min(delay * 2, 60.0)
+            else:
+                delay = self.poll_interval
+            await asyncio.sleep(delay)
+        logging.info(f"Опрос ленты {symbol} остановлен по неактивности")
+
+    async def stats(self, symbol: str, windows: Optional[Sequence[int]] = None) -> Union[TradeTapeResponse, ErrorResponse]:
+        """Агрегаты ленты. Первый запрос по символу наполняет буфер синхронно и запускает опрос."""
+        if windows:
+            invalid = [seconds for seconds in windows if not 0 < seconds <= MAX_WINDOW_SECONDS]
+            if invalid:
+                return ErrorResponse(status_code=-1, error=f"Окна должны быть от 1 до {MAX_WINDOW_SECONDS} секунд: {invalid}")
+            extra = set(windows) - set(self.windows)
+            if len(extra) > MAX_EXTRA_WINDOWS:
+                return ErrorResponse(status_code=-1, error=f"Не больше {MAX_EXTRA_WINDOWS} окон сверх стандартных {list(self.windows)}")
+        if symbol not in self._tapes or not len(self._tapes[symbol]):
+            error = await self.refresh(symbol)
+            if error is not None:
+                return error
+        self.track(symbol)
+        return self.get(symbol).stats(windows)
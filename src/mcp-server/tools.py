@@ -0,0 +1,359 @@
+import logging
+from typing import List, Optional, Union
+from mcp.server.fastmcp import FastMCP, Context
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from adapters import RequestDispatcher, HedgePolicy, FinamApiClient, TradeTapeStore, MarketSnapshotService, BarsHistory, AssetCatalog, MarketScanner, BacktestEngine, JobRegistry, SweepRunner, PortfolioAnalytics, AssetInfoCache, Rebalancer, LocalStore, HistorySync, PortfolioHistory, PairsFinder, ChartStore, PreTradeChecker, OrderLatencyTracker, SubmissionLog, OrderRouter, OrderStateStore, AccountSnapshotCache, MultiAccountService, FxService, PortfolioValuation, PnLEngine, CashFlowReport
+from adapters.charts import ARROW_MEDIA_TYPE, chart_to_arrow
+from adapters.downsample import downsample, downsample_bars
+from adapters.history_sync import date_range_ns
+from adapters.models import *
+
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+logging.info("Инициализация MCP сервера...")
+mcp = FastMCP(
+    name="Trader Tools Server",
+    stateless_http=True,
+    host="0.0.0.0"
+)
+mcp.settings.stateless_http = True
+logging.info("MCP сервер 'Trader Tools Server' создан.")
+
+api_dispatcher = RequestDispatcher(max_concurrency=10)
+api_hedging = HedgePolicy()
+api = FinamApiClient(secret_token="eyJraWQiOiJlZjk0NzA1Ni0xZDRjLTRiYTUtYTA2Yi1iYTUzZTM5MGE0MTEiLCJ0eXAiOiJKV1QiLCJhbGciOiJSUzI1NiJ9.eyJhcmVhIjoidHQiLCJwYXJlbnQiOiI5YmNlM2EyYy0xMDk2LTQ5NjMtODQzZC1lMzIwNjI2M2IxN2EiLCJhcGlUb2tlblByb3BlcnRpZXMiOiJINHNJQUFBQUFBQUFfMjFVTzBfY1FCQUdmQmVRclVpd0NDSlJraVpDQ29JOFJXbnZyZThjYm0yemE0TXZqWFZ3TGxDT08zS1BSS1RNLTFtNGlCUXBhWkltWlFyLVM2cFU2Zk1mTWp1N0lBaHB2bTkyZGg0N251OXU1dmozNTU5ZmJwS3BHV3ZwUjJWbWFubGlaZHF1WGhXZXFHbURlZ0tOblIwYXIxeXlLeTdQSW1SQk04V2VtMGprYmU0clpsbk1GUWNzcXlQN0xOV2NZaHdQSk9aRlVVS1JZLUVpSjlRenpBMXZLWTZEa0JvT0REY05ZNTFZMWpGZUpMcXVTRFZuTHBlYUpUT3NfVjdFTll0VWM2cnZxZWNiVGpRenFwbnJlNVlJWkYtX042dTdPcTZ4NlJ2R2ViTm1MZFJzOHBxbVh6UFNmdTdXa0VOWHZ5X1U4MlpoM1p6TnU4T1c4YmYwT1haMWY5bGdoblVfdWFQblNqYWxXbFR1aFpTaVFiMEFNM0lLbTBHSGFNVm9zRlI0YUhEdTNVY2pqQVZ1TlpjMFdLbmFWaTUxcEl4TmdJdzc2MmdrZ3NrYmt4UGZKcWZzaWFXUGxSbUxXQzdMQUNSVHNLVUFqaUFMZ0MwRjZnSS1NcWw0X1Y2SFZCVU9pUVdmV3dFRTBFWUF3SmtDeUtUYmpFelg3Z1ZoVFpWbGFVWlFVMlRhOTNuT3hUcXAtRUhvRWxzaHoydHAwaUpWUDRMMUU4dUhWbE0tWk5XWklGYkRoNUt3RldJRkxBVklJYUpKV3dDcVYxTTlDM1lCUUNHRFE3TUs1eTQ4aFl0dFlzRjJBTGdDR1NqZ0NtQTZXSXNDdENSQkdSTXJraTVCQlNOeVJJaUFsUkVVTUdLQTJFU0VadkdtWEVlOGlYZ0x3dUZKcUdkaUNRb2ZSaVFlcVlvVWZvSEVrbTRFd0tRQ3VKSjFxQUJ3SGN4R0F5Q0FKSm5BSUNBSFlpVTFtRHBwYnBOS0FqT0JHVUdKcEFVbFVoZXVkOVRzR2FSVWxGcUkxb3c2SkQ0aXpKVlROWWFTRHRIQ0lWbzI0S3ZYWEtLbFE3UkFpRmJGOHNTcExuNVo4SGR5N1ducFBDdWQ1Nlh6b25SZWxzNnIwbmxkT205SzUyM3B2Q3VkOTZYem9YU09QXzJaTkluZkxmdXJaUzg4SFBkSHhXcTNQUnpsbzBHN1UtVERfU2VGdlhqQnZkY2Y5MGIyM0JuX28zNTNmRkRZczJkZDdlNzROUGx3c0w5WG5DMTY1YUpmVnlWbkwwelp1WE0tckh0WnUzYjNPeXJvNU5nZVBzRGp2RDcyRDR0ZXZ0OGJGWU5pT0RweG1wUjgxQi0xdXljejc0NlA4djZnVXd6TUstYlAxVE94WnBaaDBlMy1MX2p4N1J1ckItMlROeTlDWHhpcmZaVHZ0WHVkYnJGcV9Bc1hfRGpQM01YSTJYLUR5S1M5Zk9uTzJ0ckczWTJfWUoweTBEd0dBQUEiLCJzY29udGV4dCI6IkNoQUlCeElNZEhKaFpHVmZZWEJwWDNKMUNpZ0lBeElrTmpJeE9UVTROemd0Wm1ZeU15MDBZVEl4TFdJNFpqY3ROakUwTURjM1pUZ3lOakptQ2dRSUJSSUFDZ2tJQUJJRmFIUnRiRFVLS0FnQ0VpUXpOalUzWlRRNE1TMWhNRFppTFRFeFpqQXRZalZtWlMxaFptWTVPR00yTVRreE1XSUtCUWdJRWdFekNnUUlDUklBQ2drSUNoSUZNUzQyTGpRS0tBZ0VFaVJsWmprME56QTFOaTB4WkRSakxUUmlZVFV0WVRBMllpMWlZVFV6WlRNNU1HRTBNVEV5VFFvVlZGSkJSRVZCVUVsZlMxSkJWRTlUWDFSUFMwVk9FQUVZQVNBQktnZEZSRTlZWDBSQ09nSUlBMG9UQ2dNSWh3Y1NCUWlIb1o0QkdnVUloNWJEQVZnQllBRm9BWElHVkhoQmRYUm8iLCJ6aXBwZWQiOnRydWUsImNyZWF0ZWQiOiIxNzU5NTI0OTQ0IiwicmVuZXdFeHAiOiIxNzYwMDQzNjU5Iiwic2VzcyI6Ikg0c0lBQUFBQUFBQS93WEJzUXFETUJRRlVBcDJFVno4aE9MNklPOG1rWGZIQkp1cE5PTGtWaUxpUi9wMVBlZjE2U2RDNFU4N0JMUW93VjBVdGxQRm8ybHp3RHpiZFV5S1JOaENpZEZCUXNwRjZOOFFocEswbU05eDRmMFkrdWZ2dTI1MTdHcXUreDlrQ3lLQlhnQUFBQSIsImlzcyI6InR4c2VydmVyIiwia2V5SWQiOiJlZjk0NzA1Ni0xZDRjLTRiYTUtYTA2Yi1iYTUzZTM5MGE0MTEiLCJ0eXBlIjoiQXBpVG9rZW4iLCJzZWNyZXRzIjoidXJWTmIxOUU0RklaN2E0TVhMYmRPQT09Iiwic2NvcGUiOiIiLCJ0c3RlcCI6ImZhbHNlIiwic3BpblJlcSI6ZmFsc2UsImV4cCI6MTc2MDA0MzU5OSwic3BpbkV4cCI6IjE3NjAwNDM2NTkiLCJqdGkiOiI2MjE5NTg3OC1mZjIzLTRhMjEtYjhmNy02MTQwNzdlODI2MmYifQ.DeW6-fm0xdR0JORUsG4W7BnAoNDIXKeFsgkfnf-ABtUjuoVl6V1ssKnx2To4lI-_PLzOLjgzxlplak1ONUq94Q", dispatcher=api_dispatcher, hedging=api_hedging)
+tape_store = TradeTapeStore(api)
+snapshot_service = MarketSnapshotService(api, tape_store)
+bars_history = BarsHistory(api)
+asset_catalog = AssetCatalog(api)
+scanner = MarketScanner(api, asset_catalog, bars_history)
+backtest_engine = BacktestEngine(bars_history)
+jobs = JobRegistry()
+sweep_runner = SweepRunner(backtest_engine, jobs)
+pairs_finder = PairsFinder(asset_catalog, bars_history, jobs)
+asset_info = AssetInfoCache(api)
+fx_service = FxService(api)
+local_store = LocalStore()
+history_sync = HistorySync(api, local_store)
+chart_store = ChartStore(bars_history)
+pretrade_checker = PreTradeChecker(api, asset_info)
+order_latency = OrderLatencyTracker(history_sync)
+order_submissions = SubmissionLog(local_store)
+order_router = OrderRouter(api, pretrade_checker, order_submissions, order_latency)
+# Потокового транспорта OrderTrade пока нет: состояние заявок поддерживается опросом
+order_states = OrderStateStore(api, order_router, latency=order_latency)
+account_snapshots = AccountSnapshotCache(api, order_router, order_states, history_sync)
+portfolio_analytics = PortfolioAnalytics(api, bars_history, accounts=account_snapshots, asset_info=asset_info)
+rebalancer = Rebalancer(api, asset_info, account_snapshots, fx_service)
+portfolio_history = PortfolioHistory(api, local_store, bars_history, history_sync, account_snapshots, fx_service, asset_info)
+portfolio_valuation = PortfolioValuation(api, fx_service, asset_info, account_snapshots)
+multi_accounts = MultiAccountService(api, account_snapshots, order_states, portfolio_valuation)
+pnl_engine = PnLEngine(api, local_store, history_sync, account_snapshots, fx=fx_service, asset_info=asset_info)
+cash_flows = CashFlowReport(local_store, history_sync)
+    
+@mcp.tool()
+async def token_details() -> Union[TokenDetailsResponse, ErrorResponse]:
+    """Получение информации о токене сессии + информации о доступных аккаунтах. Токен зашит внутрь, его предоставлять не нужно. Это входная точка, если не дано никаких данных."""
+    return await api.token_details()
+
+# ===== АККАУНТЫ =====
+@mcp.tool()
+async def get_account(request: GetAccountRequest, max_age_s: Optional[float] = None) -> Union[CachedAccountResponse, ErrorResponse]:
+    """Получение информации по конкретному аккаунту. Отвечает из кэша снимков счета, который сбрасывается при каждом выставлении/отмене заявки, изменении заявок и новых сделках, поэтому повторно вызывать можно часто. source.age_s - возраст данных в секундах, source.stale - снимок отдан устаревшим, пока идет обновление. max_age_s - максимальный допустимый возраст данных в секундах, если нужны гарантированно свежие данные."""
+    snapshot, source = await account_snapshots.snapshot(request.account_id, max_age_s)
+    if isinstance(snapshot, ErrorResponse):
+        return snapshot
+    return CachedAccountResponse(**snapshot.model_dump(), source=source)
+
+@mcp.tool()
+async def get_trades(request: TradesRequest) -> Union[GetTradesResponse, ErrorResponse]:
+    """Получение истории по сделкам аккаунта."""
+    return await api.get_trades(request)
+
+@mcp.tool()
+async def get_transactions(request: TransactionsRequest) -> Union[GetTransactionsResponse, ErrorResponse]:
+    """Получение списка транзакций аккаунта."""
+    return await api.get_transactions(request)
+
+@mcp.tool()
+async def get_all_accounts_summary(account_ids: Optional[List[str]] = None, max_age_s: Optional[float] = None, base_currency: str = "RUB") -> Union[AllAccountsSummaryResponse, ErrorResponse]:
+    """Сводка по всем счетам одним вызовом (equity, нереализованная прибыль, деньги, число позиций) и суммарные значения. Итоги - equity счетов по данным брокера, пересчитанные в base_currency по текущим курсам; счета без курса перечислены в warnings. Счета опрашиваются параллельно; без account_ids - все счета токена. Данные счетов берутся из кэша снимков (см. get_account); source показывает возраст данных. Используй вместо последовательных вызовов get_account."""
+    return await multi_accounts.summary(account_ids, max_age_s, base_currency)
+
+@mcp.tool()
+async def get_all_open_orders(account_ids: Optional[List[str]] = None, max_age_s: float = 5.0) -> Union[AllOpenOrdersResponse, ErrorResponse]:
+    """Активные заявки всех счетов одним вызовом (счет заявки - order.account_id), из локального состояния заявок. Без account_ids - все счета токена."""
+    return await multi_accounts.open_orders(account_ids, max_age_s)
+
+@mcp.tool()
+async def get_combined_positions(account_ids: Optional[List[str]] = None, max_age_s: Optional[float] = None) -> Union[CombinedPositionsResponse, ErrorResponse]:
+    """Позиции всех счетов, объединенные по инструментам, с разбивкой по счетам: суммарное количество, средняя цена, рыночная стоимость (только для инструментов с ценой за штуку: акции, фонды, валюта) и нереализованная прибыль. Без account_ids - все счета токена."""
+    return await multi_accounts.combined_positions(account_ids, max_age_s)
+
+@mcp.tool()
+async def sync_account_history(account_id: str, start_date: Optional[str] = None, days: int = 365) -> List[Union[HistorySyncResponse, ErrorResponse]]:
+    """Синхронизация полной истории сделок и транзакций счета с локальным хранилищем (с start_date в формате YYYY-MM-DD или за последние days дней). История загружается окнами параллельно, без обрезки по лимиту, повторно загружаются только новые записи."""
+    period = date_range_ns(start_date, None, days)
+    if isinstance(period, ErrorResponse):
+        return [period]
+    return await history_sync.sync_all(account_id, period[0])
+
+@mcp.tool()
+async def get_stored_trades(request: StoredHistoryRequest) -> Union[GetTradesResponse, ErrorResponse]:
+    """Сделки счета за период из локального хранилища (хвост догружается автоматически), с фильтром по инструменту. В отличие от get_trades не обрезается лимитом API на длинных периодах."""
+    return await history_sync.stored_trades(request)
+
+@mcp.tool()
+async def get_stored_transactions(request: StoredHistoryRequest) -> Union[GetTransactionsResponse, ErrorResponse]:
+    """Транзакции счета за период из локального хранилища (хвост догружается автоматически), с фильтрами по инструменту и категории. Используй для учетных вопросов (комиссии, дивиденды, вводы/выводы) вместо get_transactions за длинные периоды."""
+    return await history_sync.stored_transactions(request)
+
+@mcp.tool()
+async def analyze_portfolio(request: PortfolioAnalyticsRequest) -> Union[PortfolioAnalyticsResponse, ErrorResponse]:
+    """Аналитика портфеля счета одним вызовом: веса позиций, доходность, годовая волатильность, максимальная просадка и вклад каждой позиции за окно days, метрики всего портфеля (доходность, волатильность, просадка, Шарп), матрица корреляций и сравнение с бенчмарком (beta, избыточная доходность, ошибка слежения). Стоимость и веса считаются только для инструментов с ценой за штуку; фьючерсы, опционы и облигации получают только метрики цены. Используй для вопросов вида "проанализируй мой портфель" вместо цепочки get_account/get_bars."""
+    response = await portfolio_analytics.analyze(request)
+    if not isinstance(response, ErrorResponse) and response.positions:
+        response.chart_id = chart_store.portfolio_weights(response)
+    return response
+
+@mcp.tool()
+async def plan_rebalance(request: RebalanceRequest) -> Union[RebalanceResponse, ErrorResponse]:
+    """Расчет ребалансировки портфеля к целевым долям (в % от стоимости счета) по последним котировкам с учетом размера лота, шага цены и свободных денег (cash_reserve_pct остается в деньгах). Возвращает минимальный набор заявок целыми лотами в виде готовых PlaceOrderRequest (сначала продажи, затем покупки) и расчет долей до/после. Заявки НЕ выставляются: после подтверждения пользователем передай их одним вызовом в place_orders_batch с sells_first=True."""
+    return await rebalancer.plan(request)
+
+@mcp.tool()
+async def get_portfolio_history(request: PortfolioHistoryRequest) -> Union[PortfolioHistoryResponse, ErrorResponse]:
+    """История стоимости счета по дням (деньги + позиции по ценам закрытия), восстановленная по сделкам и транзакциям: ряд для графика, результат за период без учета вводов/выводов, доходность, взвешенная по времени, и максимальная просадка. Деньги и позиции в других валютах пересчитываются в base_currency по текущему курсу. История хранится локально, повторные вызовы догружают только новые записи. Используй для вопросов вида "как менялся мой счет в этом году"."""
+    response = await portfolio_history.value_history(request)
+    if not isinstance(response, ErrorResponse):
+        response.chart_id = chart_store.portfolio_history(response)
+    return response
+
+@mcp.tool()
+async def get_pnl(request: PnLRequest) -> Union[PnLResponse, ErrorResponse]:
+    """Прибыль и убытки счета по инструментам: реализованный результат закрытий за период (лоты сопоставляются по FIFO, включая короткие позиции), комиссии за период и нереализованный результат открытых лотов по последним котировкам. У фьючерсов, опционов и облигаций результат в пунктах или % номинала и в итоги не входит (unit_priced=false). Сделки хранятся локально, повторные вызовы обрабатывают только новые. Используй для вопросов вида "сколько я заработал на LKOH в этом году" вместо суммирования сделок вручную."""
+    return await pnl_engine.pnl(request)
+
+@mcp.tool()
+async def get_cash_flows(request: CashFlowRequest) -> Union[CashFlowResponse, ErrorResponse]:
+    """Сводка денежных потоков счета по категориям транзакций (дивиденды INCOME, комиссии COMMISSION, вводы DEPOSIT, выводы WITHDRAW, налоги TAX и др.) и валютам: итоги за период, сальдо по валютам и ряды по дням, неделям или месяцам. Считается по локально сохраненным транзакциям, повторные вызовы догружают только новые. Используй вместо get_stored_transactions, когда нужны суммы, а не отдельные транзакции."""
+    return await cash_flows.report(request)
+
+@mcp.tool()
+async def get_portfolio_valuation(request: PortfolioValuationRequest) -> Union[PortfolioValuationResponse, ErrorResponse]:
+    """Стоимость счета в одной базовой валюте (RUB, USD, CNY и др.): позиции в валюте инструмента и в базовой валюте, доли, денежные остатки по валютам и итоги. Курсы берутся по валютным инструментам Финам с коротким кэшем и возвращаются в rates. Используй для вопросов о стоимости счета с позициями в разных валютах вместо запроса котировок валют вручную. Для прибыли в базовой валюте передай base_currency в get_pnl."""
+    return await portfolio_valuation.value(request)
+
+# ===== ИНСТРУМЕНТЫ =====
+@mcp.tool()
+async def get_exchanges() -> Union[GetExchangesResponse, ErrorResponse]:
+    """Получение списка доступных бирж."""
+    return await api.get_exchanges()
+
+@mcp.tool()
+async def get_assets() -> Union[GetAssetsResponse, ErrorResponse]:
+    """Получение списка доступных акций, опционов, валют и других инструментов инвестирования для аккаунта."""
+    # return await api.get_assets()
+    return await ErrorResponse(status_code=200, error="слишком много выходных токенов, воспользуйтесь инструментом поиска по строке.")
+
+@mcp.tool()
+async def search_asset_by_string(search_string: str) -> Union[GetAssetsResponse, ErrorResponse]:
+    """Получение списка доступных акций, опционов, валют и других инструментов инвестирования для аккаунта. Ищется вхождение строки в названии и тикере актива. Все названия активов либо на английском, либо на русском."""
+    # return await api.get_assets()
+    assets = await api.get_assets()
+    if isinstance(assets, ErrorResponse):
+        return assets
+    
+    finds = []
+
+    assets_list = assets.model_dump()
+    search_lower = search_string.lower()
+
+    logging.info(f"Search string: {search_string}")
+
+    for asset in assets_list['assets']:
+        
+        asset_name_lower = asset['name'].lower()
+        asset_ticker_lower = asset['ticker'].lower()
+        
+        if search_lower in asset_name_lower or search_lower in asset_ticker_lower:
+            logging.info("Found")
+            finds.append(asset)
+
+    return GetAssetsResponse(assets=finds)
+    
+
+@mcp.tool()
+async def get_asset(request: GetAssetRequest) -> Union[GetAssetResponse, ErrorResponse]:
+    """Получение информации по конкретному инструменту инвестирования для аккаунта."""
+    return await asset_info.get_asset(request.symbol, request.account_id)
+
+@mcp.tool()
+async def get_asset_params(request: GetAssetParamsRequest) -> Union[GetAssetParamsResponse, ErrorResponse]:
+    """Получение торговых параметров по инструменту инвестирования для аккаунта."""
+    return await asset_info.get_asset_params(request.symbol, request.account_id)
+
+@mcp.tool()
+async def get_options_chain(request: OptionsChainRequest) -> Union[OptionsChainResponse, ErrorResponse]:
+    """Получение цепочки опционов для базового актива."""
+    return await api.get_options_chain(request)
+
+@mcp.tool()
+async def get_schedule(request: ScheduleRequest) -> Union[ScheduleResponse, ErrorResponse]:
+    """Получение расписания торгов для инструмента инвестирования."""
+    return await api.get_schedule(request)
+
+@mcp.tool()
+async def get_clock() -> Union[ClockResponse, ErrorResponse]:
+    """Получение времени на сервере."""
+    return await api.get_clock()
+
+# ===== РЫНОЧНЫЕ ДАННЫЕ =====
+@mcp.tool()
+async def get_bars(request: BarsRequest, max_points: Optional[int] = None, downsample_method: DownsampleMethod = DownsampleMethod.OHLC) -> Union[BarsResponse, DownsampledBarsResponse, ErrorResponse]:
+    """Получение исторических данных по инструменту инвестирования (агрегированные свечи). Для длинных периодов указывай max_points (например 100-300): ряд будет прорежен до этого числа свечей (ohlc - слияние соседних свечей, lttb - выбор свечей с сохранением формы графика), а к ответу приложена статистика по всему периоду (изменение, максимум/минимум, объем, волатильность, просадка)."""
+    if not max_points:
+        return await api.get_bars(request)
+    columns = await api.get_bars_columns(request)
+    if isinstance(columns, ErrorResponse):
+        return columns
+    reduced = downsample(columns, max_points, downsample_method)
+    response = downsample_bars(request.symbol, columns, max_points, downsample_method, reduced=reduced)
+    response.chart_id = chart_store.bars(request.symbol, reduced)
+    return response
+
+@mcp.tool()
+async def get_last_quote(request: QuoteRequest) -> Union[LastQuoteResponse, ErrorResponse]:
+    """Получение последней котировки по инструменту инвестирования."""
+    return await api.get_last_quote(request)
+
+@mcp.tool()
+async def get_orderbook(request: OrderBookRequest) -> Union[OrderBookResponse, ErrorResponse]:
+    """Получение текущего стакана по инструменту инвестирования."""
+    return await api.get_orderbook(request)
+
+@mcp.tool()
+async def get_latest_trades(request: LatestTradesRequest) -> Union[LatestTradesResponse, ErrorResponse]:
+    """Получение списка последних сделок по инструменту инвестирования."""
+    response = await api.get_latest_trades(request)
+    if not isinstance(response, ErrorResponse):
+        tape_store.ingest(request.symbol, response.trades)
+    return response
+
+@mcp.tool()
+async def get_trade_tape_stats(symbol: str, windows_seconds: Optional[List[int]] = None) -> Union[TradeTapeResponse, ErrorResponse]:
+    """Сводка ленты сделок по инструменту за скользящие окна: VWAP, объем, дисбаланс покупок/продаж, количество сделок и крупнейшая сделка. Используй вместо get_latest_trades для вопросов "что сейчас происходит с инструментом". Окна отсчитываются от текущего момента. По умолчанию окна 1, 5, 15 и 60 минут; windows_seconds - свои окна до 24 часов, не больше 4 сверх стандартных."""
+    return await tape_store.stats(symbol, windows_seconds)
+
+@mcp.tool()
+async def market_snapshot(symbol: str, parts: Optional[List[SnapshotPart]] = None, depth: int = 5, trades_limit: int = 10, account_id: Optional[str] = None) -> MarketSnapshotResponse:
+    """Сводный снимок рынка по инструменту одним вызовом: котировка (quote), верхние depth уровней стакана со спредом (orderbook), последние trades_limit сделок (trades) и информация об инструменте (asset, нужен account_id). Части запрашиваются параллельно. По умолчанию quote, orderbook и trades. Используй вместо нескольких отдельных вызовов get_last_quote/get_orderbook/get_latest_trades/get_asset."""
+    return await snapshot_service.snapshot(symbol, parts, depth, trades_limit, account_id)
+
+@mcp.tool()
+async def scan_market(request: ScanRequest) -> Union[ScanResponse, ErrorResponse]:
+    """Сканер рынка: поиск инструментов по фильтрам одним вызовом. Фильтры по типу инструмента, бирже (mic), списку символов и подстрокам названия/тикера; по изменению цены, обороту и волатильности за окно window_days по дневным свечам; по доступности шорта (shortable_only, нужен account_id). Возвращает ранжированную компактную таблицу. Используй вместо множества вызовов get_bars/get_asset_params по отдельным инструментам."""
+    response = await scanner.scan(request)
+    if not isinstance(response, ErrorResponse) and response.rows:
+        response.chart_id = await chart_store.scan(response, request.window_days)
+    return response
+
+@mcp.tool()
+async def start_pairs_search(request: PairsSearchRequest) -> Union[PairsSearchStatus, ErrorResponse]:
+    """Запуск поиска коррелированных пар инструментов в фоне: выборка из каталога по типу/бирже/названию, дневные доходности за days дней, корреляции по всей выборке (или только с target_symbol - "что движется вместе с X"). Для лучших пар - коэффициент хеджирования, z-score спреда, период полураспада и тест коинтеграции (кандидаты в парный арбитраж). Возвращает job_id; прогресс и результаты - get_pairs_search, отмена - cancel_job."""
+    return await pairs_finder.start(request)
+
+@mcp.tool()
+async def get_pairs_search(job_id: str) -> Union[PairsSearchStatus, ErrorResponse]:
+    """Прогресс поиска пар и лучшие найденные пары (доступны до окончания расчета)."""
+    return pairs_finder.status(job_id)
+
+@mcp.tool()
+async def run_backtest(request: BacktestRequest) -> Union[BacktestReport, ErrorResponse]:
+    """Бэктест стратегии на исторических свечах. Стратегии: spread_threshold - парный арбитраж по спреду symbol - hedge_ratio * second_symbol в пунктах (например SBER и SBERP: вход при 150, выход при 20 - entry_threshold=150, exit_threshold=20); zscore_reversion - возврат к среднему по z-score (lookback свечей, пороги в сигмах), для одного инструмента или пары; sma_cross - пересечение скользящих средних fast_window/slow_window. Возвращает метрики (PnL, просадка, доля прибыльных сделок, Шарп), последние сделки и прореженную кривую капитала."""
+    response = await backtest_engine.run(request)
+    if not isinstance(response, ErrorResponse):
+        response.chart_id = chart_store.backtest(response)
+    return response
+
+@mcp.tool()
+async def start_backtest_sweep(request: SweepRequest) -> Union[SweepStatus, ErrorResponse]:
+    """Запуск оптимизации параметров стратегии (например, порогов входа/выхода парного арбитража) перебором по истории в фоне на нескольких ядрах. Параметры задаются списком values или сеткой start/stop/step; mode=random - случайная выборка samples комбинаций. Возвращает job_id; прогресс и текущие лучшие комбинации - через get_backtest_sweep, отмена - cancel_job."""
+    return sweep_runner.start(request)
+
+@mcp.tool()
+async def get_backtest_sweep(job_id: str) -> Union[SweepStatus, ErrorResponse]:
+    """Прогресс оптимизации параметров и лучшие на текущий момент комбинации (доступны до окончания перебора)."""
+    return sweep_runner.status(job_id)
+
+@mcp.tool()
+async def cancel_job(job_id: str) -> Union[JobInfo, ErrorResponse]:
+    """Отмена фоновой задачи (оптимизации и т.п.) по job_id."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return ErrorResponse(status_code=404, error=f"Задача {job_id} не найдена")
+    return job.info()
+
+# ===== ЗАЯВКИ =====
+@mcp.tool()
+async def check_order(account_id: str, request: PlaceOrderRequest) -> PreTradeCheckResponse:
+    """Проверка заявки без отправки: доступность торговли, кратность лоту, шаг цены, доступность лонга/шорта, совместимость срока действия с типом заявки и обязательные limit_price/stop_price/stop_condition. Для исправимых ошибок возвращает fixed_order."""
+    return await order_router.check(account_id, request)
+
+@mcp.tool()
+async def place_order(account_id: str, request: PlaceOrderRequest, allow_repeat: bool = False) -> Union[PlaceOrderResponse, PreTradeCheckResponse, ErrorResponse]:
+    """Выставление биржевой заявки. Заявка сначала проверяется локально по правилам инструмента (как в check_order); если проверка не пройдена, заявка не отправляется и возвращается PreTradeCheckResponse с описанием ошибок и исправленной заявкой fixed_order - предложи ее пользователю. Повторный вызов после таймаута безопасен: та же заявка, выставленная за последние 2 минуты, второй раз не отправляется (ошибка 409 с order_id). Если пользователь действительно хочет еще одну такую же заявку, передай allow_repeat=True."""
+    return await order_router.place(account_id, request, allow_repeat)
+
+@mcp.tool()
+async def place_orders_batch(request: BatchPlaceOrdersRequest) -> BatchOrdersResponse:
+    """Выставление нескольких заявок счета одним вызовом (например, заявок из plan_rebalance - с sells_first=True). Заявки проверяются до отправки, разные инструменты отправляются параллельно, заявки одного инструмента - строго по порядку. Для каждой заявки возвращается свой результат. Используй вместо нескольких вызовов place_order."""
+    return await order_router.place_batch(request)
+
+@mcp.tool()
+async def cancel_order(request: CancelOrderRequest) -> Union[CancelOrderResponse, ErrorResponse]:
+    """Отмена биржевой заявки."""
+    return await order_router.cancel(request)
+
+@mcp.tool()
+async def cancel_orders_batch(request: BatchCancelOrdersRequest) -> Union[BatchOrdersResponse, ErrorResponse]:
+    """Отмена нескольких заявок одним вызовом: по списку order_ids, всех активных заявок по инструментам symbols ("отмени все мои заявки по SBER") или всех активных заявок счета (all_active). Для каждой заявки возвращается свой результат. Используй вместо нескольких вызовов cancel_order."""
+    return await order_router.cancel_batch(request)
+
+@mcp.tool()
+async def get_orders(request: OrdersRequest, max_age_s: float = 5.0) -> Union[CachedOrdersResponse, ErrorResponse]:
+    """Получение списка заявок для аккаунта. Отвечает из локального состояния заявок, которое обновляется в фоне и сразу после place_order/cancel_order; freshness показывает источник и возраст данных. Если данные старше max_age_s секунд, они обновляются перед ответом. Повторно вызывать для проверки статуса можно часто - это не нагружает API."""
+    return await order_states.orders(request.account_id, max_age_s)
+
+@mcp.tool()
+async def get_order(request: GetOrderRequest, max_age_s: float = 5.0) -> Union[CachedOrderResponse, ErrorResponse]:
+    """Получение информации о конкретном ордере из локального состояния заявок (см. get_orders); freshness показывает источник и возраст данных."""
+    return await order_states.order(request.account_id, request.order_id, max_age_s)
+
+@mcp.tool()
+async def get_order_latency(symbol: Optional[str] = None, stage: Optional[LatencyStage] = None, by_symbol: bool = False) -> OrderLatencyResponse:
+    """Диагностика задержек исполнения заявок с запуска сервера: от отправки place_order до ответа API (http), transact_at (transact), accept_at (accept) и первой сделки (fill). Статистика (среднее, p50/p90/p99) по типу заявки и сроку действия; by_symbol=True или symbol - с разбивкой по инструменту."""
+    return order_latency.report(symbol, stage, by_symbol)
+
+# ===== ГРАФИКИ =====
+@mcp.custom_route("/charts/{chart_id}", methods=["GET"])
+async def get_chart(request: Request) -> Response:
+    """Данные графика для интерфейса по chart_id из ответа инструмента: JSON или Arrow IPC stream (?format=arrow)."""
+    chart_id = request.path_params["chart_id"]
+    chart = chart_store.get(chart_id)
+    if chart is None:
+        return JSONResponse(ErrorResponse(status_code=404, error=f"График {chart_id} не найден или устарел").model_dump(), status_code=404)
+    if request.query_params.get("format") == "arrow":
+        data = chart_to_arrow(chart)
+        if data is None:
+            return JSONResponse(ErrorResponse(status_code=406, error="Arrow недоступен: не установлен pyarrow").model_dump(), status_code=406)
+        return Response(data, media_type=ARROW_MEDIA_TYPE)
+    return JSONResponse(chart.model_dump(mode="json"))
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    """Гистограммы задержек заявок очередь и дублирование запросов к API в текстовом формате Prometheus."""
+    return PlainTextResponse(order_latency.prometheus() + api_dispatcher.prometheus() + api_hedging.prometheus(), media_type="text/plain; version=0.0.4")
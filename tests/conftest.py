@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Адаптеры MCP-сервера импортируются как пакет adapters
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "mcp-server"))
@@ -0,0 +1,43 @@
+import asyncio
+
+from adapters.cache import AsyncTTLCache
+
+
+def test_cancelled_caller_does_not_cancel_shared_load():
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        first = asyncio.ensure_future(cache.get_or_load("key", loader))
+        second = asyncio.ensure_future(cache.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "value"
+        assert first.cancelled()
+        assert calls == 1
+        assert cache.get("key") == "value"
+
+    asyncio.run(scenario())
+
+
+def test_load_error_reaches_every_caller_and_is_not_cached():
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60)
+
+        async def loader():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(cache.get_or_load("key", loader) for _ in range(2)), return_exceptions=True)
+
+        assert [type(result) for result in results] == [ValueError, ValueError]
+        assert cache.get("key") is None
+
+    asyncio.run(scenario())
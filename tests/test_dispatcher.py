@@ -0,0 +1,85 @@
+import asyncio
+
+from adapters.dispatcher import RequestDispatcher, RequestPriority, request_session
+
+
+async def hold(dispatcher: RequestDispatcher, priority: RequestPriority, release: asyncio.Event, started: list, name: str):
+    async with dispatcher.slot(priority):
+        started.append(name)
+        await release.wait()
+
+
+async def request(dispatcher: RequestDispatcher, priority: RequestPriority, served: list, name: str, session: str = "interactive"):
+    request_session.set(session)
+    async with dispatcher.slot(priority):
+        served.append(name)
+
+
+def test_trading_and_quotes_are_served_before_queued_bulk():
+    async def scenario():
+        dispatcher = RequestDispatcher(max_concurrency=1)
+        release, served = asyncio.Event(), []
+        holder = asyncio.create_task(hold(dispatcher, RequestPriority.BULK, release, served, "running"))
+        await asyncio.sleep(0)
+        bulk = [asyncio.create_task(request(dispatcher, RequestPriority.BULK, served, f"bulk{i}", "job")) for i in range(3)]
+        await asyncio.sleep(0)
+        quote = asyncio.create_task(request(dispatcher, RequestPriority.INTERACTIVE, served, "quote"))
+        order = asyncio.create_task(request(dispatcher, RequestPriority.TRADING, served, "order"))
+        await asyncio.sleep(0)
+
+        # Выполняющийся запрос не прерывается: новые ждут, пока он не освободит слот
+        assert served == ["running"]
+        assert dispatcher.queued(RequestPriority.BULK) == 3
+        assert not dispatcher.available(RequestPriority.TRADING)
+
+        release.set()
+        await asyncio.gather(holder, quote, order, *bulk)
+        return served
+
+    assert asyncio.run(scenario()) == ["running", "order", "quote", "bulk0", "bulk1", "bulk2"]
+
+
+def test_cancelled_waiter_leaves_queue_and_does_not_hold_slot():
+    async def scenario():
+        dispatcher = RequestDispatcher(max_concurrency=1)
+        release, served = asyncio.Event(), []
+        holder = asyncio.create_task(hold(dispatcher, RequestPriority.INTERACTIVE, release, served, "running"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(request(dispatcher, RequestPriority.INTERACTIVE, served, "cancelled"))
+        await asyncio.sleep(0)
+        assert dispatcher.queued(RequestPriority.INTERACTIVE) == 1
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert dispatcher.queued(RequestPriority.INTERACTIVE) == 0
+
+        release.set()
+        await holder
+        assert dispatcher.active(RequestPriority.INTERACTIVE) == 0
+        assert dispatcher.available(RequestPriority.INTERACTIVE)
+        await request(dispatcher, RequestPriority.INTERACTIVE, served, "next")
+        return served
+
+    assert asyncio.run(scenario()) == ["running", "next"]
+
+
+def test_waiter_cancelled_after_slot_was_granted_returns_it():
+    async def scenario():
+        dispatcher = RequestDispatcher(max_concurrency=1)
+        release, served = asyncio.Event(), []
+        holder = asyncio.create_task(hold(dispatcher, RequestPriority.INTERACTIVE, release, served, "running"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(request(dispatcher, RequestPriority.INTERACTIVE, served, "cancelled"))
+        following = asyncio.create_task(request(dispatcher, RequestPriority.INTERACTIVE, served, "following"))
+        await asyncio.sleep(0)
+
+        # Слот передается первому ожидающему, но тот отменяется раньше, чем успевает выполниться
+        release.set()
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(holder, following, waiter, return_exceptions=True)
+        return served, dispatcher.active(RequestPriority.INTERACTIVE)
+
+    served, active = asyncio.run(scenario())
+    assert served == ["running", "following"]
+    assert active == 0
@@ -0,0 +1,22 @@
+import numpy as np
+
+from adapters.models import Money
+from adapters.numeric import money_column
+
+
+def money(units: int, nanos: int) -> Money:
+    return Money(currency_code="RUB", units=str(units), nanos=nanos)
+
+
+def test_money_column_scaled_rounds_half_away_from_zero():
+    values = [money(1, 5_000_000), money(-1, -5_000_000), money(-1, -4_999_999), money(0, -990_000_000)]
+
+    assert money_column(values, scale=2).tolist() == [101, -101, -100, -99]
+
+
+def test_money_column_scaled_is_symmetric():
+    positive = [money(12, 345_678_901), money(0, 1)]
+    negative = [money(-12, -345_678_901), money(0, -1)]
+
+    assert np.array_equal(money_column(negative, scale=4), -money_column(positive, scale=4))
+    assert money_column(negative).tolist() == [-12.345678901, -1e-9]
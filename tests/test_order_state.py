@@ -0,0 +1,85 @@
+import asyncio
+
+from adapters.models import *
+from adapters.order_state import OrderStateStore
+
+ACCOUNT = "A1"
+
+
+def state(order_id: str, status: OrderStatus) -> OrderState:
+    return OrderState(
+        order_id=order_id,
+        exec_id="e",
+        status=status,
+        order=Order(
+            account_id=ACCOUNT,
+            symbol="SBER@MISX",
+            quantity=DecimalValue(value="10"),
+            side=Side.SIDE_BUY,
+            type=OrderType.ORDER_TYPE_LIMIT,
+            time_in_force=TimeInForce.TIME_IN_FORCE_DAY,
+            limit_price=DecimalValue(value="300"),
+            stop_condition=StopCondition.STOP_CONDITION_UNSPECIFIED,
+            legs=[],
+            client_order_id="c" + order_id,
+            valid_before=ValidBefore.VALID_BEFORE_UNSPECIFIED,
+        ),
+        transact_at="2026-03-01T10:00:00Z",
+    )
+
+
+def placed(order_id: str, status: OrderStatus = OrderStatus.ORDER_STATUS_NEW) -> PlaceOrderResponse:
+    order = state(order_id, status)
+    return PlaceOrderResponse(order_id=order.order_id, exec_id=order.exec_id, status=order.status, order=order.order, transact_at=order.transact_at)
+
+
+class SlowApi:
+    """get_orders отвечает списком orders, снятым в момент запроса, после события release."""
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.release = asyncio.Event()
+        self.requested = asyncio.Event()
+
+    async def get_orders(self, request):
+        snapshot = list(self.orders)
+        self.requested.set()
+        await self.release.wait()
+        return GetOrdersResponse(orders=snapshot)
+
+
+def test_poll_started_before_own_order_does_not_drop_it():
+    async def scenario():
+        api = SlowApi([state("1", OrderStatus.ORDER_STATUS_NEW)])
+        store = OrderStateStore(api, poll_interval=60)
+        loading = asyncio.create_task(store.orders(ACCOUNT, max_age_s=0))
+        await api.requested.wait()
+
+        # Пока запрос списка идет, выставлена новая заявка и снята старая
+        store.apply_response(ACCOUNT, placed("2"))
+        store.apply_response(ACCOUNT, placed("1", OrderStatus.ORDER_STATUS_CANCELED))
+        api.release.set()
+        response = await loading
+
+        statuses = {order.order_id: order.status for order in response.orders}
+        store._accounts[ACCOUNT].task.cancel()
+        return statuses
+
+    assert asyncio.run(scenario()) == {"1": OrderStatus.ORDER_STATUS_CANCELED, "2": OrderStatus.ORDER_STATUS_NEW}
+
+
+def test_later_poll_replaces_own_orders():
+    async def scenario():
+        api = SlowApi([])
+        api.release.set()
+        store = OrderStateStore(api, poll_interval=60)
+        store.apply_response(ACCOUNT, placed("2"))
+        assert store._accounts[ACCOUNT].task is not None
+
+        # Брокер уже знает об исполнении: новый опрос авторитетнее своего ответа
+        api.orders = [state("2", OrderStatus.ORDER_STATUS_FILLED)]
+        response = await store.orders(ACCOUNT, max_age_s=0)
+        store._accounts[ACCOUNT].task.cancel()
+        return [(order.order_id, order.status) for order in response.orders]
+
+    assert asyncio.run(scenario()) == [("2", OrderStatus.ORDER_STATUS_FILLED)]
@@ -0,0 +1,138 @@
+import asyncio
+import sqlite3
+
+from adapters.local_store import LocalStore
+from adapters.models import *
+from adapters.order_router import OrderRouter
+from adapters.order_submissions import FAILED, SENT, SubmissionLog
+
+ACCOUNT = "A1"
+
+
+def order(client_order_id: str = None, quantity: int = 10) -> PlaceOrderRequest:
+    return PlaceOrderRequest(
+        symbol="SBER@MISX",
+        quantity=DecimalValue(value=str(quantity)),
+        side=Side.SIDE_BUY,
+        type=OrderType.ORDER_TYPE_LIMIT,
+        time_in_force=TimeInForce.TIME_IN_FORCE_DAY,
+        limit_price=DecimalValue(value="300"),
+        client_order_id=client_order_id,
+    )
+
+
+class FakeApi:
+    """Брокер, принимающий заявки; errors - ответы с ошибкой на ближайшие отправки."""
+
+    def __init__(self, errors=()):
+        self.placed = []
+        self.errors = list(errors)
+
+    async def place_order(self, account_id: str, request: PlaceOrderRequest):
+        if self.errors:
+            return self.errors.pop(0)
+        self.placed.append(request)
+        return PlaceOrderResponse(
+            order_id=f"ord{len(self.placed)}",
+            exec_id="e",
+            status=OrderStatus.ORDER_STATUS_NEW,
+            order=Order(
+                account_id=account_id,
+                stop_condition=StopCondition.STOP_CONDITION_UNSPECIFIED,
+                legs=[],
+                valid_before=ValidBefore.VALID_BEFORE_UNSPECIFIED,
+                **request.model_dump(exclude={"stop_condition", "legs", "valid_before"}),
+            ),
+            transact_at="2026-03-01T10:00:00Z",
+        )
+
+    async def get_orders(self, request: OrdersRequest):
+        return GetOrdersResponse(orders=[])
+
+
+def router(api: FakeApi, dedupe_window: float = 120.0):
+    store = LocalStore(":memory:")
+    return OrderRouter(api, submissions=SubmissionLog(store, dedupe_window=dedupe_window)), store
+
+
+def states(store: LocalStore):
+    def load(connection: sqlite3.Connection):
+        return connection.execute("SELECT client_order_id, state FROM order_submissions ORDER BY created_at").fetchall()
+
+    return asyncio.run(store.run(load))
+
+
+def test_repeated_client_order_id_is_not_sent_again():
+    api = FakeApi()
+    orders, _ = router(api)
+
+    first = asyncio.run(orders.place(ACCOUNT, order("abc")))
+    # Даже с другим содержимым и allow_repeat: client_order_id уже использован
+    second = asyncio.run(orders.place(ACCOUNT, order("abc", quantity=20), allow_repeat=True))
+
+    assert isinstance(first, PlaceOrderResponse)
+    assert isinstance(second, ErrorResponse) and second.status_code == 409
+    assert first.order_id in second.error
+    assert len(api.placed) == 1
+
+
+def test_identical_order_within_window_is_rejected():
+    api = FakeApi()
+    orders, _ = router(api)
+
+    first = asyncio.run(orders.place(ACCOUNT, order()))
+    second = asyncio.run(orders.place(ACCOUNT, order()))
+    other = asyncio.run(orders.place(ACCOUNT, order(quantity=20)))
+
+    assert isinstance(first, PlaceOrderResponse)
+    assert isinstance(second, ErrorResponse) and second.status_code == 409
+    assert "allow_repeat" in second.error
+    assert isinstance(other, PlaceOrderResponse)
+    assert len(api.placed) == 2
+
+
+def test_identical_order_after_window_is_sent():
+    api = FakeApi()
+    orders, _ = router(api, dedupe_window=0.0)
+
+    asyncio.run(orders.place(ACCOUNT, order()))
+    second = asyncio.run(orders.place(ACCOUNT, order()))
+
+    assert isinstance(second, PlaceOrderResponse)
+    assert len(api.placed) == 2
+
+
+def test_allow_repeat_bypasses_content_check():
+    api = FakeApi()
+    orders, store = router(api)
+
+    asyncio.run(orders.place(ACCOUNT, order()))
+    second = asyncio.run(orders.place(ACCOUNT, order(), allow_repeat=True))
+
+    assert isinstance(second, PlaceOrderResponse)
+    assert len(api.placed) == 2
+    assert [state for _, state in states(store)] == [SENT, SENT]
+
+
+def test_rejected_order_is_not_remembered():
+    api = FakeApi(errors=[ErrorResponse(status_code=400, error="Недостаточно средств")])
+    orders, store = router(api)
+
+    rejected = asyncio.run(orders.place(ACCOUNT, order("abc")))
+    retried = asyncio.run(orders.place(ACCOUNT, order("abc")))
+
+    assert isinstance(rejected, ErrorResponse) and rejected.status_code == 400
+    assert isinstance(retried, PlaceOrderResponse)
+    assert len(api.placed) == 1
+    assert states(store) == [("abc", SENT)]
+
+
+def test_rejected_order_does_not_block_same_content():
+    api = FakeApi(errors=[ErrorResponse(status_code=400, error="Недостаточно средств")])
+    orders, store = router(api)
+
+    asyncio.run(orders.place(ACCOUNT, order()))
+    retried = asyncio.run(orders.place(ACCOUNT, order()))
+
+    assert isinstance(retried, PlaceOrderResponse)
+    assert [state for _, state in states(store)] == [FAILED, SENT]
@@ -0,0 +1,183 @@
+import asyncio
+import sqlite3
+from collections import deque
+
+import pytest
+
+from adapters.asset_info import AssetInfoCache
+from adapters.history_sync import HistorySync
+from adapters.local_store import CORE_SCHEMA, LocalStore, insert_trades
+from adapters.models import *
+from adapters.pnl import SCHEMA, PnLEngine, apply_trades, ensure_consistent, match_fifo
+
+ACCOUNT = "A1"
+
+
+def trade(trade_id: str, side: Side, size: float, price: float, timestamp: str, symbol: str = "SBER@MISX") -> AccountTrade:
+    return AccountTrade(
+        trade_id=trade_id,
+        symbol=symbol,
+        price=DecimalValue(value=str(price)),
+        size=DecimalValue(value=str(size)),
+        side=side,
+        timestamp=timestamp,
+        order_id="o" + trade_id,
+        account_id=ACCOUNT,
+    )
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.executescript(CORE_SCHEMA + SCHEMA)
+    yield connection
+    connection.close()
+
+
+def save(connection: sqlite3.Connection, *trades: AccountTrade):
+    """Сохранение сделок и проведение новых через FIFO - как это делает HistorySync."""
+    apply_trades(connection, ACCOUNT, insert_trades(connection, ACCOUNT, trades))
+
+
+def realized(connection: sqlite3.Connection) -> float:
+    return connection.execute("SELECT COALESCE(SUM(pnl), 0) FROM pnl_realized WHERE account_id = ?", (ACCOUNT,)).fetchone()[0]
+
+
+def lots(connection: sqlite3.Connection):
+    return connection.execute("SELECT trade_id, quantity, price FROM pnl_lots WHERE account_id = ? ORDER BY seq", (ACCOUNT,)).fetchall()
+
+
+def test_match_fifo_partial_close_keeps_remainder_of_oldest_lot():
+    open_lots = deque()
+    match_fifo(open_lots, ("b1", 1, 10.0, 100.0))
+    match_fifo(open_lots, ("b2", 2, 10.0, 110.0))
+
+    closes = match_fifo(open_lots, ("s1", 3, -15.0, 120.0))
+
+    assert closes == [("b1", 1, 10.0, 100.0, 200.0), ("b2", 2, 5.0, 110.0, 50.0)]
+    assert [list(lot) for lot in open_lots] == [["b2", 2, 5.0, 110.0]]
+
+
+def test_match_fifo_short_is_closed_by_buy():
+    open_lots = deque()
+    assert match_fifo(open_lots, ("s1", 1, -5.0, 100.0)) == []
+
+    closes = match_fifo(open_lots, ("b1", 2, 3.0, 90.0))
+
+    assert closes == [("s1", 1, 3.0, 100.0, 30.0)]
+    assert [list(lot) for lot in open_lots] == [["s1", 1, -2.0, 100.0]]
+
+
+def test_match_fifo_sell_larger_than_long_flips_to_short():
+    open_lots = deque([["b1", 1, 10.0, 100.0]])
+
+    closes = match_fifo(open_lots, ("s1", 2, -15.0, 120.0))
+
+    assert closes == [("b1", 1, 10.0, 100.0, 200.0)]
+    assert [list(lot) for lot in open_lots] == [["s1", 2, -5.0, 120.0]]
+
+
+def test_apply_trades_is_incremental(connection):
+    save(connection, trade("1", Side.SIDE_BUY, 10, 100, "2026-03-01T10:00:00Z"))
+    save(connection, trade("2", Side.SIDE_SELL, 4, 110, "2026-03-02T10:00:00Z"))
+
+    assert realized(connection) == pytest.approx(40.0)
+    assert lots(connection) == [("1", 6.0, 100.0)]
+
+
+def test_backdated_trade_rebuilds_symbol(connection):
+    save(
+        connection,
+        trade("1", Side.SIDE_BUY, 10, 100, "2026-03-01T10:00:00Z"),
+        trade("2", Side.SIDE_BUY, 10, 110, "2026-03-02T10:00:00Z"),
+        trade("3", Side.SIDE_SELL, 15, 120, "2026-04-01T10:00:00Z"),
+    )
+    assert realized(connection) == pytest.approx(250.0)
+
+    # Продажа задним числом забирает часть первого лота раньше сделки 3
+    save(connection, trade("4", Side.SIDE_SELL, 5, 105, "2026-03-05T10:00:00Z"))
+
+    assert realized(connection) == pytest.approx(5 * 5 + 5 * 20 + 10 * 10)
+    assert lots(connection) == []
+    assert connection.execute("SELECT trades FROM pnl_cursor WHERE account_id = ?", (ACCOUNT,)).fetchone()[0] == 4
+
+
+def test_ensure_consistent_rebuilds_trades_saved_before_pnl(connection):
+    insert_trades(connection, ACCOUNT, [
+        trade("1", Side.SIDE_BUY, 10, 100, "2026-03-01T10:00:00Z"),
+        trade("2", Side.SIDE_SELL, 4, 110, "2026-03-02T10:00:00Z"),
+    ])
+
+    assert ensure_consistent(connection, ACCOUNT) is True
+    assert realized(connection) == pytest.approx(40.0)
+    assert lots(connection) == [("1", 6.0, 100.0)]
+    assert ensure_consistent(connection, ACCOUNT) is False
+
+
+class FakeApi:
+    """Ответы API для PnLEngine: сделки, пустые транзакции, счет и котировки."""
+
+    def __init__(self, trades, positions, asset_type="EQUITIES"):
+        self.trades = trades
+        self.positions = positions
+        self.asset_type = asset_type
+
+    async def get_trades(self, request):
+        return GetTradesResponse(trades=self.trades)
+
+    async def get_transactions(self, request):
+        return GetTransactionsResponse(transactions=[])
+
+    async def get_account(self, request):
+        zero = DecimalValue(value="0")
+        return GetAccountResponse(
+            account_id=ACCOUNT, type="t", status="s", equity=zero, unrealized_profit=zero, cash=[],
+            positions=[
+                Position(symbol=symbol, quantity=DecimalValue(value=str(quantity)), current_price=DecimalValue(value="120"), unrealized_pnl=zero)
+                for symbol, quantity in self.positions.items()
+            ],
+        )
+
+    async def get_last_quote(self, request):
+        fields = ["ask", "ask_size", "bid", "bid_size", "last_size", "volume", "turnover", "open", "high", "low", "close", "change"]
+        quote = Quote(symbol=request.symbol, timestamp="t", last=DecimalValue(value="120"), **{name: DecimalValue(value="0") for name in fields})
+        return LastQuoteResponse(symbol=request.symbol, quote=quote)
+
+    async def get_asset(self, request):
+        return GetAssetResponse(
+            board="b", id="1", ticker=request.symbol, mic="m", isin="i", type=self.asset_type, name="n",
+            decimals=0, min_step="1", lot_size=DecimalValue(value="1"), quote_currency="RUB",
+        )
+
+
+def run_pnl(positions, asset_type=None):
+    api = FakeApi([trade("1", Side.SIDE_BUY, 10, 100, "2026-03-01T10:00:00Z")], positions, asset_type or "EQUITIES")
+    store = LocalStore(":memory:")
+    engine = PnLEngine(api, store, HistorySync(api, store), asset_info=AssetInfoCache(api) if asset_type else None)
+    return asyncio.run(engine.pnl(PnLRequest(account_id=ACCOUNT, start_date="2026-01-01")))
+
+
+def test_pnl_matches_broker_position():
+    response = run_pnl({"SBER@MISX": 10})
+
+    [symbol] = response.symbols
+    assert symbol.open_quantity == 10
+    assert symbol.unrealized_pnl == pytest.approx(200.0)
+    assert not [warning for warning in response.warnings if "не совпадает" in warning]
+
+
+def test_pnl_warns_when_broker_position_differs():
+    response = run_pnl({"SBER@MISX": 25})
+
+    assert any("SBER@MISX" in warning and "не совпадает" in warning for warning in response.warnings)
+
+
+def test_pnl_in_points_is_left_out_of_totals():
+    response = run_pnl({"SBER@MISX": 10}, asset_type="FUTURES")
+
+    [symbol] = response.symbols
+    assert symbol.unit_priced is False
+    assert symbol.unrealized_pnl == pytest.approx(200.0)
+    assert symbol.net_pnl is None
+    assert response.total_unrealized_pnl == 0
+    assert any("SBER@MISX" in warning and "FUTURES" in warning for warning in response.warnings)
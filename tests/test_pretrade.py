@@ -0,0 +1,101 @@
+import asyncio
+
+from adapters.asset_info import AssetInfoCache
+from adapters.models import *
+from adapters.order_router import OrderRouter
+from adapters.pretrade import PreTradeChecker
+
+ACCOUNT = "A1"
+SYMBOL = "SBER@MISX"
+
+
+def sell(quantity: int) -> PlaceOrderRequest:
+    return PlaceOrderRequest(
+        symbol=SYMBOL,
+        quantity=DecimalValue(value=str(quantity)),
+        side=Side.SIDE_SELL,
+        type=OrderType.ORDER_TYPE_MARKET,
+        time_in_force=TimeInForce.TIME_IN_FORCE_DAY,
+    )
+
+
+class FakeApi:
+    """Инструмент без шорта с позицией position и лотом lot_size."""
+
+    def __init__(self, position: int, lot_size: int = 1):
+        self.position = position
+        self.lot_size = lot_size
+        self.account_calls = 0
+
+    async def get_account(self, request):
+        self.account_calls += 1
+        zero = DecimalValue(value="0")
+        return GetAccountResponse(
+            account_id=ACCOUNT, type="t", status="s", equity=zero, unrealized_profit=zero, cash=[],
+            positions=[Position(symbol=SYMBOL, quantity=DecimalValue(value=str(self.position)), current_price=zero, unrealized_pnl=zero)],
+        )
+
+    async def place_order(self, account_id: str, request: PlaceOrderRequest):
+        self.position -= int(request.quantity.value)
+        return PlaceOrderResponse(
+            order_id="ord1",
+            exec_id="e",
+            status=OrderStatus.ORDER_STATUS_NEW,
+            order=Order(
+                account_id=account_id,
+                stop_condition=StopCondition.STOP_CONDITION_UNSPECIFIED,
+                legs=[],
+                valid_before=ValidBefore.VALID_BEFORE_UNSPECIFIED,
+                client_order_id="c1",
+                **request.model_dump(exclude={"stop_condition", "legs", "valid_before", "client_order_id"}),
+            ),
+            transact_at="2026-03-01T10:00:00Z",
+        )
+
+    async def get_asset(self, request):
+        return GetAssetResponse(
+            board="TQBR", id="1", ticker="SBER", mic="MISX", isin="RU0009029540", type="EQUITIES", name="Сбербанк",
+            decimals=2, min_step="1", lot_size=DecimalValue(value=str(self.lot_size)),
+        )
+
+    async def get_asset_params(self, request):
+        return GetAssetParamsResponse(
+            symbol=SYMBOL, account_id=ACCOUNT, tradeable=True,
+            shortable=Shortable(value=ShortableStatus.NOT_AVAILABLE, halted_days=0),
+        )
+
+
+def checker(api: FakeApi) -> PreTradeChecker:
+    return PreTradeChecker(api, AssetInfoCache(api))
+
+
+def test_quantity_fix_is_lot_multiple_within_position():
+    api = FakeApi(position=25, lot_size=10)
+
+    check = asyncio.run(checker(api).check(ACCOUNT, sell(33)))
+
+    # Кратное лоту вниз - 30, позиция - 25: продать можно 20
+    assert not check.passed
+    assert check.fixed_order.quantity.value == "20"
+
+
+def test_quantity_below_one_lot_has_no_fix():
+    api = FakeApi(position=5, lot_size=10)
+
+    check = asyncio.run(checker(api).check(ACCOUNT, sell(7)))
+
+    assert not check.passed
+    assert check.fixed_order is None
+
+
+def test_batch_sells_together_cannot_exceed_position():
+    api = FakeApi(position=15)
+    router = OrderRouter(api, checker(api))
+
+    response = asyncio.run(router.place_batch(BatchPlaceOrdersRequest(account_id=ACCOUNT, orders=[sell(10), sell(10)])))
+
+    first, second = response.results
+    assert first.status == BatchItemStatus.SENT
+    assert second.status == BatchItemStatus.INVALID
+    assert second.suggested_order.quantity.value == "5"
+    assert api.account_calls == 1
@@ -0,0 +1,51 @@
+import time
+
+from adapters.models import *
+from adapters.trade_tape import TradeTape, _format_timestamp
+
+
+def trade(trade_id: str, seconds_ago: float, size: float, price: float = 100.0, timestamp: str = None) -> Trade:
+    return Trade(
+        trade_id=trade_id,
+        mpid="",
+        timestamp=timestamp or _format_timestamp(time.time() - seconds_ago),
+        price=DecimalValue(value=str(price)),
+        size=DecimalValue(value=str(size)),
+        side=Side.SIDE_BUY,
+    )
+
+
+def window(tape: TradeTape, seconds: int) -> TapeWindowStats:
+    [stats] = tape.stats([seconds]).windows
+    return stats
+
+
+def test_late_print_from_later_poll_leaves_short_window():
+    tape = TradeTape("SBER@MISX", windows=(60,))
+    tape.ingest([trade("1", 10, 1), trade("2", 5, 2)])
+    # Следующий опрос приносит сделку старше окна - она не должна остаться в суммах за головой очереди
+    tape.ingest([trade("3", 120, 50)])
+
+    stats = window(tape, 60)
+    assert stats.trade_count == 2
+    assert stats.volume == 3
+    assert stats.largest_size == 2
+    assert [item.trade_id for item in tape.recent(3)] == ["2", "1", "3"]
+
+
+def test_late_print_inside_window_is_counted_once_in_time_order():
+    tape = TradeTape("SBER@MISX", windows=(60,))
+    tape.ingest([trade("1", 10, 1)])
+    tape.ingest([trade("2", 30, 5)])
+
+    stats = window(tape, 60)
+    assert stats.trade_count == 2
+    assert stats.largest_size == 5
+    assert [item.trade_id for item in tape.recent(2)] == ["1", "2"]
+
+
+def test_unparseable_timestamp_is_skipped():
+    tape = TradeTape("SBER@MISX", windows=(60,))
+
+    assert tape.ingest([trade("1", 0, 1, timestamp="not a time"), trade("2", 1, 2)]) == 1
+    assert window(tape, 60).volume == 2